@@ -4,7 +4,7 @@ Automation framework.
 
 
 from . import abc, db, fs, notifications, security
-from . import configurations, context, exceptions, plugins, strings
+from . import columns, configurations, context, exceptions, plugins, strings
 
 
 __version__ = '1.11.2'
@@ -17,6 +17,9 @@ class Configurable(metaclass=ABCMeta):
     The Configurable class is an abstract base class for configurable objects.
     """
 
+    # Configurable has no state of its own, so subclasses are free to use __slots__.
+    __slots__ = ()
+
     @classmethod
     @abstractmethod
     def load_config_value(cls, manager, value, *args, **kwargs):
@@ -3,13 +3,22 @@ Interface definition for paths, file system connectors, and file system connecti
 """
 
 
+import codecs
 import csv
 import datetime
+import errno
+import hashlib
+import io
+import itertools
+import locale
 import logging
 import os
+import re
+import stat
 import time
 
 from abc import ABCMeta, abstractmethod
+from collections import namedtuple
 
 
 # This has to be imported this way to avoid an import cycle.
@@ -26,6 +35,13 @@ __all__ = [
     'Path',
     'FSConnector',
     'fs_connection',
+    'FileStatus',
+    'copy_file_object',
+    'hash_file_object',
+    'sync_file_object',
+    'FSYNC_NEVER',
+    'FSYNC_ON_CLOSE',
+    'FSYNC_EVERY_BLOCK',
 ]
 
 
@@ -34,6 +50,353 @@ log = logging.getLogger(__name__)
 
 FORM_FEED_CHAR = '\x0C'
 
+# Characters which, appearing at the end of a path, might leave it with an empty name.
+TRAILING_SEPARATORS = '/\\'
+
+# The number of bytes read and decoded at a time when splitting a file into lines.
+DEFAULT_READ_CHUNK_SIZE = 1 << 20
+
+# Lines with their endings, as recognized when reading text files in universal newlines mode.
+LINES_WITH_ENDINGS = re.compile(r'[^\r\n]*(?:\r\n|\r|\n)|[^\r\n]+')
+
+DEFAULT_COPY_BLOCK_SIZE = 1 << 20  # Bytes
+
+# The number of characters collected in memory before they are written out, when saving lines or
+# rows to a file.
+DEFAULT_WRITE_BLOCK_SIZE = 1 << 20
+
+# The number of lines or rows formatted at a time when saving them to a file.
+ROW_BATCH_SIZE = 1024
+
+# Policies for syncing written data to disk: never, just once before the file is closed, or after
+# each block of data is written. Syncing trades throughput for durability.
+FSYNC_NEVER = 'never'
+FSYNC_ON_CLOSE = 'close'
+FSYNC_EVERY_BLOCK = 'block'
+FSYNC_POLICIES = (FSYNC_NEVER, FSYNC_ON_CLOSE, FSYNC_EVERY_BLOCK)
+
+# Errors indicating the kernel can't copy between these particular descriptors, in which case we
+# fall back on copying through a buffer.
+KERNEL_COPY_UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EBADF,
+                                  getattr(errno, 'ENOTSUP', errno.EINVAL),
+                                  getattr(errno, 'EOPNOTSUPP', errno.EINVAL)}
+
+
+def _os_file_descriptor(file_obj):
+    # Return the file descriptor of a plain OS file, or None. Wrappers such as proxy files are
+    # excluded even though they expose fileno(), because writes which bypass the wrapper would not
+    # be noticed by it.
+    raw = getattr(file_obj, 'raw', file_obj)
+    if not isinstance(raw, io.FileIO) or raw.closed:
+        return None
+    return raw.fileno()
+
+
+def _has_read_ahead(file_obj, fd):
+    # Determine whether a buffered reader is holding data it has read from the descriptor but not
+    # yet handed out, without reading any more into its buffer. If so, the descriptor's position is
+    # ahead of the file object's. If the positions can't be compared, e.g. for a pipe, assume so.
+    if not isinstance(file_obj, io.BufferedReader):
+        return False
+    try:
+        return file_obj.tell() != os.lseek(fd, 0, os.SEEK_CUR)
+    except OSError:
+        return True
+
+
+def _kernel_copy(source_fd, target_fd, block_size):
+    # Copy using copy_file_range() or sendfile(), so the data never passes through user space.
+    # Returns the number of bytes copied, or None if neither is usable for these descriptors.
+    for name in ('copy_file_range', 'sendfile'):
+        function = getattr(os, name, None)
+        if function is None:
+            continue
+        total = 0
+        try:
+            while True:
+                if name == 'sendfile':
+                    count = function(target_fd, source_fd, None, block_size)
+                else:
+                    count = function(source_fd, target_fd, block_size)
+                if not count:
+                    return total
+                total += count
+        except OSError as exc:
+            if total or exc.errno not in KERNEL_COPY_UNSUPPORTED_ERRNOS:
+                raise
+    return None
+
+
+class FileStatus(namedtuple('FileStatus', ['type', 'is_link', 'size', 'modified_time',
+                                           'accessed_time', 'metadata_changed_time',
+                                           'protection_mode', 'inode_number', 'device',
+                                           'hard_link_count', 'owner_user_id', 'owner_group_id'])):
+    """
+    An immutable record of a file system object's metadata, as retrieved in a single call by
+    fs_connection.stat(). The fields share their names with the corresponding Path properties. The
+    type is 'file', 'dir', or 'other', following symbolic links. Any field the file system doesn't
+    provide is None.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_stat_result(cls, result, is_link=False):
+        """
+        Create a new FileStatus from the result of a call to os.stat().
+
+        :param result: An os.stat_result instance.
+        :param is_link: Whether the file system object is a symbolic link.
+        :return: A new FileStatus instance.
+        """
+        if stat.S_ISDIR(result.st_mode):
+            file_type = 'dir'
+        elif stat.S_ISREG(result.st_mode):
+            file_type = 'file'
+        else:
+            file_type = 'other'
+        return cls(file_type, is_link, result.st_size, result.st_mtime, result.st_atime,
+                   result.st_ctime, result.st_mode, result.st_ino, result.st_dev, result.st_nlink,
+                   result.st_uid, result.st_gid)
+
+    @property
+    def is_dir(self):
+        """Whether the file system object is a directory, or None if unknown."""
+        return None if self.type is None else self.type == 'dir'
+
+    @property
+    def is_file(self):
+        """Whether the file system object is a file, or None if unknown."""
+        return None if self.type is None else self.type == 'file'
+
+
+def copy_file_object(source_file, target_file, block_size=None):
+    """
+    Copy the remaining contents of a binary file object to another binary file object. If both are
+    plain OS files, the copy is done in the kernel where the platform supports it. Otherwise, the
+    data is copied in blocks through a single reusable buffer, using readinto() when the source
+    supports it, so no per-block allocations are made.
+
+    :param source_file: The file object to copy from, opened for binary reading.
+    :param target_file: The file object to copy to, opened for binary writing.
+    :param block_size: The number of bytes copied per block.
+    :return: The number of bytes copied.
+    """
+    if block_size is None:
+        block_size = DEFAULT_COPY_BLOCK_SIZE
+    verify_type(block_size, int)
+    assert block_size > 0
+
+    started = time.time()
+
+    source_fd = _os_file_descriptor(source_file)
+    target_fd = _os_file_descriptor(target_file)
+    total = None
+    if source_fd is not None and target_fd is not None and \
+            isinstance(source_file, (io.BufferedReader, io.FileIO)) and \
+            not _has_read_ahead(source_file, source_fd):
+        # Anything still sitting in the writer's buffer has to hit the descriptor first.
+        target_file.flush()
+        total = _kernel_copy(source_fd, target_fd, block_size)
+
+    if total is None:
+        total = 0
+        buffer = bytearray(block_size)
+        view = memoryview(buffer)
+        readinto = getattr(source_file, 'readinto', None)
+        while True:
+            if readinto is None:
+                data = source_file.read(block_size)
+                count = len(data)
+                if count:
+                    view[:count] = data
+            else:
+                count = readinto(view)
+            if not count:
+                break
+            written = 0
+            while written < count:
+                # Raw (unbuffered) files may perform short writes.
+                result = target_file.write(view[written:count])
+                written += count - written if result is None else result
+            total += count
+
+    elapsed = time.time() - started
+    log.debug("Copied %s bytes in %.3f seconds (%.1f MB/s).", total, elapsed,
+              total / (elapsed or 1e-6) / (1 << 20))
+    return total
+
+
+def _split_text(text, keep_ends=False, form_feeds=False):
+    # Split text into lines in bulk, exactly as iterating over it in text mode would, optionally
+    # splitting the lines again by form feed.
+    if keep_ends:
+        return LINES_WITH_ENDINGS.findall(text)
+    ends_with_newline = text[-1] in '\r\n'
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    if form_feeds:
+        text = text.replace(FORM_FEED_CHAR, '\n')
+    lines = text.split('\n')
+    if ends_with_newline:
+        # The last line ended with a line ending, not the end of the text.
+        lines.pop()
+    return lines
+
+
+def _read_line_batches(file_obj, encoding=None, chunk_size=None, keep_ends=False,
+                       form_feeds=False):
+    # Read a binary file object in large chunks, decode each chunk in a single call, and split it
+    # into lines in bulk, yielding a list of lines per chunk. The lines are exactly those iterating
+    # over the file in text mode would give. Each chunk's text is cut after its last line feed and
+    # the rest is carried over to the next, so no line or line ending is split across chunks.
+    if encoding is None:
+        encoding = locale.getpreferredencoding(False)
+    if chunk_size is None:
+        chunk_size = DEFAULT_READ_CHUNK_SIZE
+    verify_type(chunk_size, int)
+    assert chunk_size > 0
+
+    decoder = codecs.getincrementaldecoder(encoding)()
+    carried = []
+    while True:
+        data = file_obj.read(chunk_size)
+        text = decoder.decode(data, final=not data)
+        if data:
+            end = text.rfind('\n') + 1
+            if not end:
+                carried.append(text)
+                continue
+            rest = text[end:]
+            text = text[:end]
+        else:
+            rest = ''
+        if carried:
+            carried.append(text)
+            text = ''.join(carried)
+            carried = []
+        if rest:
+            carried.append(rest)
+        if text:
+            yield _split_text(text, keep_ends, form_feeds)
+        if not data:
+            return
+
+
+def _rebatch(batches, size):
+    # Regroup an iterator over lists into lists of the given size. Only the last may be shorter.
+    pending = []
+    for batch in batches:
+        if pending:
+            needed = size - len(pending)
+            pending.extend(batch[:needed])
+            batch = batch[needed:]
+            if len(pending) < size:
+                continue
+            yield pending
+            pending = []
+        full = len(batch) - len(batch) % size
+        for start in range(0, full, size):
+            yield batch[start:start + size]
+        pending = batch[full:]
+    if pending:
+        yield pending
+
+
+def hash_file_object(file_obj, algorithm='sha256', block_size=None):
+    """
+    Hash the remaining contents of a binary file object. The data is read in blocks through a
+    single reusable buffer, using readinto() when the file object supports it.
+
+    :param file_obj: The file object to hash, opened for binary reading.
+    :param algorithm: The name of the hash algorithm, as accepted by hashlib.new().
+    :param block_size: The number of bytes read per block.
+    :return: The hex digest of the contents.
+    """
+    verify_type(algorithm, str, non_empty=True)
+    if block_size is None:
+        block_size = DEFAULT_COPY_BLOCK_SIZE
+    verify_type(block_size, int)
+    assert block_size > 0
+
+    digest = hashlib.new(algorithm)
+    readinto = getattr(file_obj, 'readinto', None)
+    if readinto is None:
+        for block in iter(lambda: file_obj.read(block_size), b''):
+            digest.update(block)
+    else:
+        view = memoryview(bytearray(block_size))
+        count = readinto(view)
+        while count:
+            digest.update(view[:count])
+            count = readinto(view)
+    return digest.hexdigest()
+
+
+def sync_file_object(file_obj):
+    """
+    Flush a file object's pending writes, and sync them to disk if it's backed by a local file.
+    Other file objects, e.g. proxies for remote files, are only flushed.
+
+    :param file_obj: The file object to sync, opened for writing.
+    :return: None
+    """
+    file_obj.flush()
+    descriptor = _os_file_descriptor(getattr(file_obj, 'buffer', file_obj))
+    if descriptor is not None:
+        os.fsync(descriptor)
+
+
+def _line_blocks(lines, counter, block_size):
+    # Join lines into blocks of text of at least block_size characters, so they can be written with
+    # one call per block instead of one per line. The number of lines is tallied in counter[0].
+    lines = iter(lines)
+    pending = []
+    size = 0
+    while True:
+        batch = list(itertools.islice(lines, ROW_BATCH_SIZE))
+        if not batch:
+            break
+        counter[0] += len(batch)
+        text = '\n'.join([line.rstrip('\r\n') for line in batch]) + '\n'
+        pending.append(text)
+        size += len(text)
+        if size >= block_size:
+            yield ''.join(pending)
+            pending = []
+            size = 0
+    if pending:
+        yield ''.join(pending)
+
+
+class _TextSink:
+    # A minimal file-like object for csv.writer, whose write() is set to a list's append().
+    __slots__ = ('write',)
+
+
+def _row_blocks(rows, counter, block_size, delimiter, quote):
+    # Format rows into blocks of delimited text of at least block_size characters. The number of
+    # rows is tallied in counter[0].
+    pending = []
+    sink = _TextSink()
+    sink.write = pending.append
+    writer = csv.writer(sink, delimiter=delimiter, quotechar=quote)
+    rows = iter(rows)
+    size = 0
+    while True:
+        batch = list(itertools.islice(rows, ROW_BATCH_SIZE))
+        if not batch:
+            break
+        start = len(pending)
+        writer.writerows(batch)
+        counter[0] += len(batch)
+        size += sum(map(len, pending[start:]))
+        if size >= block_size:
+            yield ''.join(pending)
+            del pending[:]
+            size = 0
+    if pending:
+        yield ''.join(pending)
+
 
 # TODO: Use this to make path operations that affect multiple files/folders into atomic operations.
 #       The idea is to record everything that has done and, using temp files, make all operations
@@ -56,8 +419,12 @@ class Path(Configurable):
     """
     A Path consists of a string representing a location, together with a connection that indicates
     the object responsible for interfacing with the underlying file system on behalf of the path.
+    Paths are immutable values. The name, parent directory, and extension are parsed on first use
+    and then cached.
     """
 
+    __slots__ = ('_location', '_connection', '_name', '_dir', '_extension', '_components')
+
     _default_connection = None
 
     @classmethod
@@ -138,13 +505,20 @@ class Path(Configurable):
 
         self._location = location
         self._connection = connection
-
-        # Get rid of trailing slashes.
-        if self._location and not self.name:
+        self._name = NotImplemented
+        self._dir = NotImplemented
+        self._extension = NotImplemented
+        self._components = NotImplemented
+
+        # Get rid of trailing slashes. Only a path ending in a separator can have an empty name, so
+        # we can avoid parsing the path for the vast majority of them.
+        if location and location[-1] in TRAILING_SEPARATORS and not self.name:
             parent = self.dir
             if parent is not None:
                 assert isinstance(parent, Path)
                 self._location = parent._location
+                self._name = NotImplemented
+                self._dir = NotImplemented
 
     def copy(self):
         """
@@ -159,6 +533,24 @@ class Path(Configurable):
         """The connection this path is accessed through."""
         return self._connection
 
+    def stat(self):
+        """
+        Get the metadata of the file system object in a single call. The record is a snapshot; the
+        path itself doesn't keep it, so its metadata properties always go back to the file system.
+
+        :return: A FileStatus instance.
+        """
+        return self._connection.stat(self)
+
+    def set_modified_time(self, timestamp):
+        """
+        Set the last time the data of the file system object was modified.
+
+        :param timestamp: The time stamp, as a float.
+        :return: None
+        """
+        return self._connection.set_modified_time(self, timestamp)
+
     def __bool__(self):
         return bool(self._location)
 
@@ -200,79 +592,36 @@ class Path(Configurable):
         # Less Than
         if not isinstance(other, Path):
             return NotImplemented
-
-        self_str = str(self)
-
-        if len(self_str) >= len(str(other)):
-            return False
-
-        current = other.dir
-        while current is not None:
-            current_str = str(current)
-            if len(self_str) > len(current_str):
-                return False
-            if self_str == current_str:
-                return True
-            current = current.dir
-
-        return False
+        return self._is_ancestor_of(other, strict=True)
 
     def __le__(self, other):
         # Less than/Equal
         if not isinstance(other, Path):
             return NotImplemented
-
-        self_str = str(self)
-
-        current = other
-        while current is not None:
-            current_str = str(current)
-            if len(self_str) > len(current_str):
-                return False
-            if self_str == current_str:
-                return True
-            current = current.dir
-
-        return False
+        return self._is_ancestor_of(other, strict=False)
 
     def __gt__(self, other):
         # Greater Than
         if not isinstance(other, Path):
             return NotImplemented
-
-        other_str = str(other)
-
-        if len(str(self)) <= len(other_str):
-            return False
-
-        current = self.dir
-        while current is not None:
-            current_str = str(current)
-            if len(current_str) < len(other_str):
-                return False
-            if current_str == other_str:
-                return True
-            current = current.dir
-
-        return False
+        return other._is_ancestor_of(self, strict=True)
 
     def __ge__(self, other):
         # Greater than/Equal
         if not isinstance(other, Path):
             return NotImplemented
+        return other._is_ancestor_of(self, strict=False)
 
-        other_str = str(other)
-
-        current = self
-        while current is not None:
-            current_str = str(current)
-            if len(current_str) < len(other_str):
+    def _is_ancestor_of(self, other, strict):
+        # Compare the component tuples, so no intermediate paths have to be built.
+        mine = self.components
+        theirs = other.components
+        if len(mine) > len(theirs) or (strict and len(mine) == len(theirs)):
+            return False
+        for my_component, their_component in zip(mine, theirs):
+            if my_component != their_component:
                 return False
-            if current_str == other_str:
-                return True
-            current = current.dir
-
-        return False
+        return True
 
     def __iter__(self):
         if self.is_dir:
@@ -296,16 +645,37 @@ class Path(Configurable):
         verify_type(item, (str, Path))
         result = self._connection.join(self, item)
         assert isinstance(result, Path)
+        if isinstance(item, str):
+            self._adopt(result, item)
         return result
 
     def __truediv__(self, other):
         if isinstance(other, (str, Path)):
             result = self._connection.join(self, other)
             assert isinstance(result, Path)
+            if isinstance(other, str):
+                self._adopt(result, other)
             return result
         else:
             return NotImplemented
 
+    def _adopt(self, child, name):
+        # If the child was formed by appending a plain name to this path, we already know its name
+        # and parent, so seed its caches rather than having it parse them out again later.
+        if not name or name in ('.', '..') or any(char in name for char in TRAILING_SEPARATORS):
+            return
+        location = self._location
+        if not location or location[-1] in TRAILING_SEPARATORS:
+            return
+        if child._location[len(location):] not in ('/' + name, '\\' + name) or \
+                not child._location.startswith(location):
+            return
+        if any(char in child._location for char in '~$%'):
+            # The connection may expand these, making its idea of the name and parent different.
+            return
+        child._name = name
+        child._dir = self
+
     def __rtruediv__(self, other):
         # No need to check if other is a Path instance; that case will always be handled by
         # __truediv__, and so we won't ever see it here.
@@ -430,12 +800,32 @@ class Path(Configurable):
     @property
     def name(self):
         """The name of the file system object."""
-        return self._connection.name(self)
+        if self._name is NotImplemented:
+            self._name = self._connection.name(self)
+        return self._name
 
     @property
     def dir(self):
         """The parent directory of the file system object."""
-        return self._connection.dir(self)
+        if self._dir is NotImplemented:
+            self._dir = self._connection.dir(self)
+        return self._dir
+
+    @property
+    def components(self):
+        """
+        The normalized components of the path, as a tuple, starting with the root, which is the
+        empty string for a relative path, and ending with the name. A path is an ancestor of another
+        exactly when its components are a prefix of the other's.
+        """
+        if self._components is NotImplemented:
+            parent = self._dir
+            if parent is not NotImplemented and parent is not None and \
+                    parent._components is not NotImplemented:
+                self._components = parent._components + (self.name,)
+            else:
+                self._components = self._connection.components(self)
+        return self._components
 
     @property
     def bare_name(self):
@@ -445,7 +835,9 @@ class Path(Configurable):
     @property
     def extension(self):
         """The extension of the file system object, or the empty string."""
-        return self._connection.extension(self)
+        if self._extension is NotImplemented:
+            self._extension = self._connection.extension(self)
+        return self._extension
 
     def verify_exists(self):
         """
@@ -535,10 +927,23 @@ class Path(Configurable):
         """
         return self._connection.glob(self, pattern)
 
+    def scan(self, pattern='*'):
+        """
+        Return the paths of the files and directories appearing in this folder, each paired with a
+        FileStatus snapshot of its metadata taken when the folder was listed. Where the file system
+        lists metadata along with names, this costs no more than glob(). The snapshots are not
+        updated if the file system objects change afterward.
+
+        :param pattern: A glob-style pattern against which names must match.
+        :return: A list of (Path, FileStatus) pairs for each matching file and directory name.
+        """
+        return self._connection.scan(self, pattern)
+
     def open(self, mode='r', buffering=-1, encoding=None, errors=None, newline=None, closefd=True,
-             opener=None):
+             opener=None, compression=NotImplemented, compression_level=None, threads=None):
         """
-        Open the file.
+        Open the file. Compressed files are decompressed as they are read, and compressed as they
+        are written.
 
         :param mode: The file mode.
         :param buffering: The buffering policy.
@@ -547,8 +952,19 @@ class Path(Configurable):
         :param newline: The character sequence to use for newlines.
         :param closefd: Whether to close the descriptor after the file closes.
         :param opener: A custom opener.
+        :param compression: The compression format: 'gzip', 'bz2', 'xz', or None for an
+            uncompressed file. By default, the format is determined by the file's extension.
+        :param compression_level: The compression level, if the file is compressed.
+        :param threads: The number of threads to compress with, if the file is compressed.
         :return: The opened file object.
         """
+        # This has to be imported here to avoid an import cycle.
+        from ..fs.compression import resolve_compression
+        compression = resolve_compression(self, compression)
+        if compression is not None:
+            return self._connection.open_compressed(self, mode, compression, compression_level,
+                                                    threads, encoding, errors, newline)
+
         return self._connection.open_file(
             self,
             mode,
@@ -560,47 +976,127 @@ class Path(Configurable):
             opener
         )
 
-    def read(self, encoding=None):
+    def open_mmap(self):
+        """
+        Map the file into memory, read-only. The map can be used as a context manager, and should
+        be closed when it's no longer needed. Only local files can be mapped. Empty files can't be
+        mapped, and raise a ValueError.
+
+        :return: A read-only mmap.mmap instance.
+        """
+        return self._connection.open_mmap(self)
+
+    def read_view(self):
+        """
+        Return a read-only view of the file's contents. Local files are memory-mapped, so the data
+        is paged in on demand rather than copied into memory all at once. Other files are read
+        into memory in full.
+
+        :return: A read-only memoryview of the file's bytes.
+        """
+        return self._connection.read_view(self)
+
+    def read(self, encoding=None, memory_map=False, chunk_size=None, compression=NotImplemented):
         """
         Return an iterator over the lines from the file.
 
         :param encoding: The file encoding used to open the file.
+        :param memory_map: Whether to parse the lines directly from a memory map of the file, where
+            the connection supports it.
+        :param chunk_size: The number of bytes read and decoded at a time. Default is 1 MiB.
+        :param compression: The compression format: 'gzip', 'bz2', 'xz', or None for an
+            uncompressed file. By default, the format is determined by the file's extension.
         :return: An iterator over the lines in the file, without newlines.
         """
-        return self._connection.read(self, encoding)
+        return self._connection.read(self, encoding, memory_map, chunk_size, compression)
 
-    def load(self, encoding=None):
+    def read_batches(self, size, encoding=None, memory_map=False, chunk_size=None,
+                     compression=NotImplemented):
+        """
+        Return an iterator over lists of lines from the file, so they can be processed in bulk
+        rather than one at a time. The lines are the same as those read() returns.
+
+        :param size: The number of lines in each list. Only the last list may be shorter.
+        :param encoding: The file encoding used to open the file.
+        :param memory_map: Whether to parse the lines directly from a memory map of the file, where
+            the connection supports it.
+        :param chunk_size: The number of bytes read and decoded at a time. Default is 1 MiB.
+        :param compression: The compression format: 'gzip', 'bz2', 'xz', or None for an
+            uncompressed file. By default, the format is determined by the file's extension.
+        :return: An iterator over lists of lines, without newlines.
+        """
+        return self._connection.read_batches(self, size, encoding, memory_map, chunk_size,
+                                             compression)
+
+    def load(self, encoding=None, memory_map=False, compression=NotImplemented):
         """
         Returns a list containing the lines from the file.
 
         :param encoding: The file encoding used to open the file.
+        :param memory_map: Whether to parse the lines directly from a memory map of the file, where
+            the connection supports it.
+        :param compression: The compression format: 'gzip', 'bz2', 'xz', or None for an
+            uncompressed file. By default, the format is determined by the file's extension.
         :return: A list containing the lines in the file, without newlines.
         """
-        return self._connection.load(self, encoding)
+        return self._connection.load(self, encoding, memory_map, compression)
 
-    def read_delimited(self, delimiter=',', quote='"', encoding=None):
+    def read_delimited(self, delimiter=',', quote='"', encoding=None, memory_map=False,
+                       compression=NotImplemented):
         """
         Return an iterator over the records from the file.
 
         :param delimiter: The delimiter used to separate fields in each record.
         :param quote: The quote character used to surround field values in the record.
         :param encoding: The file encoding used to open the file.
+        :param memory_map: Whether to parse the records directly from a memory map of the file,
+            where the connection supports it.
+        :param compression: The compression format: 'gzip', 'bz2', 'xz', or None for an
+            uncompressed file. By default, the format is determined by the file's extension.
         :return: An iterator over the rows in the file.
         """
-        return self._connection.read_rows(self, delimiter, quote, encoding)
+        return self._connection.read_rows(self, delimiter, quote, encoding, memory_map,
+                                          compression)
 
-    def load_delimited(self, delimiter=',', quote='"', encoding=None):
+    def load_delimited(self, delimiter=',', quote='"', encoding=None, memory_map=False,
+                       compression=NotImplemented):
         """
         Return a list of the records from the file.
 
         :param delimiter: The delimiter used to separate fields in each record.
         :param quote: The quote character used to surround field values in the record.
         :param encoding: The file encoding used to open the file.
+        :param memory_map: Whether to parse the records directly from a memory map of the file,
+            where the connection supports it.
+        :param compression: The compression format: 'gzip', 'bz2', 'xz', or None for an
+            uncompressed file. By default, the format is determined by the file's extension.
         :return: A list containing the rows in the file.
         """
-        return self._connection.load_rows(self, delimiter, quote, encoding)
+        return self._connection.load_rows(self, delimiter, quote, encoding, memory_map,
+                                          compression)
+
+    def load_columns(self, schema=None, delimiter=',', quote='"', encoding=None,
+                     memory_map=False, header=True):
+        """
+        Load the records from the file into compact, typed columns, one per field. See
+        attila.columns.load_columns() for details.
 
-    def save(self, lines, overwrite=False, append=False, encoding=None):
+        :param schema: The types of the columns, either as a list in column order or as a
+            dictionary mapping column names to types. The types of columns not given are inferred.
+        :param delimiter: The delimiter used to separate fields in each record.
+        :param quote: The quote character used to surround field values in the record.
+        :param encoding: The file encoding used to open the file.
+        :param memory_map: Whether to parse the records directly from a memory map of the file,
+            where the connection supports it.
+        :param header: Whether the first record holds the column names.
+        :return: An OrderedDict mapping column names to columns.
+        """
+        return self._connection.load_columns(self, schema, delimiter, quote, encoding, memory_map,
+                                             header)
+
+    def save(self, lines, overwrite=False, append=False, encoding=None, atomic=False,
+             fsync=FSYNC_NEVER, block_size=None, compression=NotImplemented,
+             compression_level=None, threads=None):
         """
         Save a sequence of lines to a file.
 
@@ -608,12 +1104,22 @@ class Path(Configurable):
         :param overwrite: Whether to overwrite the file if it already exists.
         :param append: Whether to append to the file if it already exists.
         :param encoding: The encoding of the file.
+        :param atomic: Whether to write the file under a temporary name and rename it into place
+            once it's complete, so a failure partway through never leaves a partial file.
+        :param fsync: The fsync policy: FSYNC_NEVER, FSYNC_ON_CLOSE, or FSYNC_EVERY_BLOCK.
+        :param block_size: The number of characters written per block.
+        :param compression: The compression format: 'gzip', 'bz2', 'xz', or None for an
+            uncompressed file. By default, the format is determined by the file's extension.
+        :param compression_level: The compression level, if the file is compressed.
+        :param threads: The number of threads to compress with, if the file is compressed.
         :return: The number of lines written.
         """
-        return self._connection.save(self, lines, overwrite, append, encoding)
+        return self._connection.save(self, lines, overwrite, append, encoding, atomic, fsync,
+                                     block_size, compression, compression_level, threads)
 
     def save_delimited(self, rows, delimiter=',', quote='"', overwrite=False, append=False,
-                       encoding=None):
+                       encoding=None, atomic=False, fsync=FSYNC_NEVER, block_size=None,
+                       compression=NotImplemented, compression_level=None, threads=None):
         """
         Save a sequence of rows to a file.
 
@@ -623,6 +1129,14 @@ class Path(Configurable):
         :param overwrite: Whether to overwrite the file if it already exists.
         :param append: Whether to append to the file if it already exists.
         :param encoding: The encoding of the file.
+        :param atomic: Whether to write the file under a temporary name and rename it into place
+            once it's complete, so a failure partway through never leaves a partial file.
+        :param fsync: The fsync policy: FSYNC_NEVER, FSYNC_ON_CLOSE, or FSYNC_EVERY_BLOCK.
+        :param block_size: The number of characters written per block.
+        :param compression: The compression format: 'gzip', 'bz2', 'xz', or None for an
+            uncompressed file. By default, the format is determined by the file's extension.
+        :param compression_level: The compression level, if the file is compressed.
+        :param threads: The number of threads to compress with, if the file is compressed.
         :return: The number of lines written.
         """
         return self._connection.save_rows(
@@ -632,9 +1146,35 @@ class Path(Configurable):
             quote,
             overwrite,
             append,
-            encoding
+            encoding,
+            atomic,
+            fsync,
+            block_size,
+            compression,
+            compression_level,
+            threads
         )
 
+    def open_atomic(self, mode='w', encoding=None, newline=None, fsync=FSYNC_NEVER,
+                    compression=NotImplemented, compression_level=None, threads=None):
+        """
+        Open the file for writing under a temporary name in the same folder, which is renamed over
+        the file when it's closed. If an exception escapes the with block it's used in, or it's
+        aborted, the file is left as it was.
+
+        :param mode: The file mode, one of 'w', 'wb', 'a', or 'ab'.
+        :param encoding: The encoding, for text modes.
+        :param newline: The character sequence to use for newlines, for text modes.
+        :param fsync: The fsync policy: FSYNC_NEVER, FSYNC_ON_CLOSE, or FSYNC_EVERY_BLOCK.
+        :param compression: The compression format: 'gzip', 'bz2', 'xz', or None for an
+            uncompressed file. By default, the format is determined by the file's extension.
+        :param compression_level: The compression level, if the file is compressed.
+        :param threads: The number of threads to compress with, if the file is compressed.
+        :return: An attila.fs.atomic.AtomicFile instance.
+        """
+        return self._connection.open_atomic(self, mode, encoding, newline, fsync, compression,
+                                            compression_level, threads)
+
     def is_available(self, mode='r'):
         """
         Check to see if the file is available to read or write.
@@ -652,6 +1192,58 @@ class Path(Configurable):
         """
         return self._connection.is_stable(self, interval)
 
+    def watch(self, pattern='*', interval=None):
+        """
+        Watch this folder's contents, or this file, for changes. Local files are watched with
+        inotify where it is available, so changes are reported as they happen. Otherwise the
+        folder is listed periodically.
+
+        :param pattern: A glob-style pattern which the names of reported files must match, when
+            watching a folder.
+        :param interval: The number of seconds between checks, for connections which have to poll
+            for changes. Default is 1 second.
+        :return: A Watcher instance, which reports changes as FileEvent instances.
+        """
+        return self._connection.watch(self, pattern, interval)
+
+    def wait_until_stable(self, interval=None, timeout=None):
+        """
+        Wait until the file has stopped changing. The file is stable once it has gone unchanged for
+        the interval, or, where the connection can see it happen, as soon as its writer closes it.
+        Unlike is_stable(), this returns as soon as the file is stable.
+
+        :param interval: The number of seconds the file must go unchanged. Default is 1 second.
+        :param timeout: The maximum number of seconds to wait. If None, wait indefinitely.
+        :return: Whether the file became stable before the timeout expired.
+        """
+        return self._connection.wait_until_stable(self, interval, timeout)
+
+    def wait_for_file(self, pattern='*', timeout=None, stable=True, interval=None):
+        """
+        Wait for a file matching the pattern to appear in this folder. If one is already there, it
+        is returned without waiting.
+
+        :param pattern: A glob-style pattern which the file's name must match.
+        :param timeout: The maximum number of seconds to wait. If None, wait indefinitely.
+        :param stable: Whether to also wait for the file to stop changing.
+        :param interval: The number of seconds the file must go unchanged to be considered stable.
+            Default is 1 second.
+        :return: The path of the file, or None if the timeout expired first.
+        """
+        return self._connection.wait_for_file(self, pattern, timeout, stable, interval)
+
+    def hash(self, algorithm='sha256', cache=None):
+        """
+        Hash the contents of the file. If a hash cache is in use and the file hasn't changed size or
+        modification time since it was last hashed, the file isn't read at all.
+
+        :param algorithm: The name of the hash algorithm, as accepted by hashlib.new().
+        :param cache: The attila.fs.hashing.HashCache to use. If not set, the default hash cache is
+            used, if one has been set.
+        :return: The hex digest of the file's contents.
+        """
+        return self._connection.hash(self, algorithm, cache)
+
     def remove(self):
         """
         Remove the folder or file. If it doesn't exist, an error is raised.
@@ -681,7 +1273,8 @@ class Path(Configurable):
         # TODO: More documentation (Use cases) particularly for check_only flag
         return self._connection.make_dir(self, overwrite, clear, fill, check_only)
 
-    def copy_into(self, destination, overwrite=False, clear=False, fill=True, check_only=None):
+    def copy_into(self, destination, overwrite=False, clear=False, fill=True, check_only=None,
+                  workers=None):
         """
         Recursively copy the folder or file to the destination. The file or folder is added to the
         destination folder's listing and is not renamed in the process.
@@ -693,11 +1286,15 @@ class Path(Configurable):
         :param fill: Whether the destination folder is created if it doesn't exist.
         :param check_only: Whether the function should only check if it's possible, or actually
             perform the operation.
+        :param workers: The maximum number of files to copy concurrently. If not set, files are
+            copied one at a time.
         :return: None
         """
-        return self._connection.copy_into(self, destination, overwrite, clear, fill, check_only)
+        return self._connection.copy_into(self, destination, overwrite, clear, fill, check_only,
+                                           workers)
 
-    def copy_to(self, destination, overwrite=False, clear=False, fill=True, check_only=None):
+    def copy_to(self, destination, overwrite=False, clear=False, fill=True, check_only=None,
+                workers=None):
         """
         Recursively copy the folder or file to the destination. The file or folder is renamed to the
         destination's name in the process if the names differ.
@@ -708,11 +1305,62 @@ class Path(Configurable):
         :param fill: Whether the parent folder is created if it doesn't exist.
         :param check_only: Whether the function should only check if it's possible, or actually
             perform the operation.
+        :param workers: The maximum number of files to copy concurrently. If not set, files are
+            copied one at a time.
         :return: None
         """
-        return self._connection.copy_to(self, destination, overwrite, clear, fill, check_only)
+        return self._connection.copy_to(self, destination, overwrite, clear, fill, check_only,
+                                         workers)
+
+    def plan_copy_to(self, destination, overwrite=False, clear=False, fill=True):
+        """
+        Plan a recursive copy of the folder or file to the destination, without making any changes.
+        The plan can be inspected as a dry run, saved, and executed later. See
+        attila.fs.transfers.TransferPlan.
 
-    def move_into(self, destination, overwrite=False, clear=False, fill=True, check_only=None):
+        :param destination: The new location where this file system object would be copied.
+        :param overwrite: Whether conflicting files or folders should be overwritten.
+        :param clear: Whether pre-existing contents of a folder are considered to be a conflict.
+        :param fill: Whether the parent folder is created if it doesn't exist.
+        :return: A TransferPlan instance.
+        """
+        return self._connection.plan_copy_to(self, destination, overwrite, clear, fill)
+
+    def sync_to(self, destination, compare='size+mtime', delete=False, fill=True, workers=None):
+        """
+        Incrementally mirror the folder or file to the destination, copying only the files which
+        are new or have changed since the last time. The destination may be on a different
+        connection.
+
+        :param destination: The location of the mirror.
+        :param compare: How files are compared to determine whether they have changed, either
+            'size+mtime' (default) or 'hash'.
+        :param delete: Whether files and folders in the destination which aren't in the source are
+            removed.
+        :param fill: Whether the parent folder is created if it doesn't exist.
+        :param workers: The maximum number of files to copy concurrently. If not set, files are
+            copied one at a time.
+        :return: A SyncReport summarizing the files copied, skipped, and removed.
+        """
+        return self._connection.sync_to(self, destination, compare, delete, fill, workers)
+
+    def plan_sync_to(self, destination, compare='size+mtime', delete=False, fill=True):
+        """
+        Plan an incremental mirror of the folder or file to the destination, without making any
+        changes. See sync_to() and attila.fs.transfers.TransferPlan.
+
+        :param destination: The location of the mirror.
+        :param compare: How files are compared to determine whether they have changed, either
+            'size+mtime' (default) or 'hash'.
+        :param delete: Whether files and folders in the destination which aren't in the source
+            would be removed.
+        :param fill: Whether the parent folder is created if it doesn't exist.
+        :return: A TransferPlan instance.
+        """
+        return self._connection.plan_sync_to(self, destination, compare, delete, fill)
+
+    def move_into(self, destination, overwrite=False, clear=False, fill=True, check_only=None,
+                  workers=None):
         """
         Move the folder or file to the destination. The file or folder is added to the destination
         folder's listing and is not renamed in the process.
@@ -724,11 +1372,15 @@ class Path(Configurable):
         :param fill: Whether the destination folder is created if it doesn't exist.
         :param check_only: Whether the function should only check if it's possible, or actually
             perform the operation.
+        :param workers: The maximum number of files to copy concurrently. If not set, files are
+            copied one at a time.
         :return: None
         """
-        return self._connection.move_into(self, destination, overwrite, clear, fill, check_only)
+        return self._connection.move_into(self, destination, overwrite, clear, fill, check_only,
+                                           workers)
 
-    def move_to(self, destination, overwrite=False, clear=False, fill=True, check_only=None):
+    def move_to(self, destination, overwrite=False, clear=False, fill=True, check_only=None,
+                workers=None):
         """
         Move the folder or file to the destination. The file or folder is renamed to the
         destination's name in the process if the names differ.
@@ -739,9 +1391,12 @@ class Path(Configurable):
         :param fill: Whether the parent folder is created if it doesn't exist.
         :param check_only: Whether the function should only check if it's possible, or actually
             perform the operation.
+        :param workers: The maximum number of files to copy concurrently. If not set, files are
+            copied one at a time.
         :return: None
         """
-        return self._connection.move_to(self, destination, overwrite, clear, fill, check_only)
+        return self._connection.move_to(self, destination, overwrite, clear, fill, check_only,
+                                         workers)
 
     def find_unique_file(self, pattern='*', most_recent=True):
         """
@@ -756,59 +1411,101 @@ class Path(Configurable):
         """
         return self._connection.find_unique_file(self, pattern, most_recent)
 
-    def _walk_split(self, onerror):
-        dirnames = []
-        filenames = []
+    def walk(self, topdown=True, onerror=None, followlinks=False, workers=None):
+        """
+        Walk the directory tree rooted at this path, in the same manner as os.walk(). For each
+        directory in the tree, yield a tuple, (dir_path, dir_names, file_names). If topdown is set,
+        the caller can modify dir_names in place to prune the search.
 
-        try:
-            listing = self.list()
-        except Exception as exc:
-            if onerror is not None:
-                onerror(exc)
-        else:
-            for name in listing:
-                try:
-                    if self[name].is_dir:
-                        dirnames.append(name)
-                    else:
-                        filenames.append(name)
-                except OSError as exc:
-                    if onerror is not None:
-                        onerror(exc)
+        :param topdown: Whether parent directories are yielded before their children.
+        :param onerror: A function which is called with the exception when an error occurs.
+        :param followlinks: Whether to walk into directories which are symbolic links.
+        :param workers: The maximum number of directories to list concurrently, for connections
+            which support concurrent listing. Other connections ignore it.
+        :return: An iterator over (dir_path, dir_names, file_names) tuples.
+        """
+        return self._connection.walk(self, topdown, onerror, followlinks, workers)
 
-        return dirnames, filenames
+    def aexists(self, executor=None):
+        """
+        Check whether this path exists, without blocking the event loop. Use with await.
 
-    def walk(self, topdown=True, onerror=None, followlinks=False):
-        if topdown:
-            dirnames, filenames = self._walk_split(onerror)
-            yield (self, dirnames, filenames)
-            stack = [(self, dirnames)]
-            while stack:
-                dirpath, dirnames = stack.pop()
-                if dirnames:
-                    subdir = dirpath / dirnames.pop(0)
-                    assert isinstance(subdir, Path)
-                    stack.append((dirpath, dirnames))
-
-                    if followlinks or not subdir.is_link:
-                        dirnames, filenames = subdir._walk_split(onerror)
-                        yield subdir, dirnames, filenames
-                        stack.append((subdir, dirnames))
-        else:
-            dirnames, filenames = self._walk_split(onerror)
-            frame = (self, dirnames, filenames)
-            stack = [(frame, dirnames.copy())]
-            while stack:
-                frame, remaining = stack.pop()
-                dirpath = frame[0]
-                if remaining:
-                    subdir = dirpath / remaining.pop(0)
-                    if followlinks or not subdir.is_link:
-                        dirnames, filenames = dirpath._walk_split(onerror)
-                        frame = (subdir, dirnames, filenames)
-                        stack.append((frame, dirnames.copy()))
-                else:
-                    yield frame
+        :param executor: The AsyncExecutor to use. By default, the default executor is used.
+        :return: A coroutine which returns whether the path exists.
+        """
+        # This has to be imported here to avoid an import cycle.
+        from ..fs import aio
+        return aio.exists(self, executor)
+
+    def alist(self, pattern='*', executor=None):
+        """
+        List the contents of this folder, without blocking the event loop. Use with await.
+
+        :param pattern: A glob-style pattern against which names must match.
+        :param executor: The AsyncExecutor to use. By default, the default executor is used.
+        :return: A coroutine which returns a list of matching file and directory names.
+        """
+        # This has to be imported here to avoid an import cycle.
+        from ..fs import aio
+        return aio.list_dir(self, pattern, executor)
+
+    def aopen(self, mode='r', buffering=-1, encoding=None, errors=None, newline=None,
+              compression=NotImplemented, compression_level=None, threads=None, executor=None):
+        """
+        Open the file without blocking the event loop. The result can be awaited for an AsyncFile,
+        or used directly with async with, in which case the file is closed on exit.
+
+        :param mode: The file mode.
+        :param buffering: The buffering policy.
+        :param encoding: The encoding.
+        :param errors: The error handling strategy.
+        :param newline: The character sequence to use for newlines.
+        :param compression: The compression format: 'gzip', 'bz2', 'xz', or None for an
+            uncompressed file. By default, the format is determined by the file's extension.
+        :param compression_level: The compression level, if the file is compressed.
+        :param threads: The number of threads to compress with, if the file is compressed.
+        :param executor: The AsyncExecutor to use. By default, the default executor is used.
+        :return: An awaitable async context manager, which produces an AsyncFile.
+        """
+        # This has to be imported here to avoid an import cycle.
+        from ..fs import aio
+        return aio.open_file(self, mode, buffering, encoding, errors, newline,
+                             compression=compression, compression_level=compression_level,
+                             threads=threads, executor=executor)
+
+    def acopy_to(self, destination, overwrite=False, clear=False, fill=True, executor=None):
+        """
+        Recursively copy this folder or file to the destination, without blocking the event loop.
+        Use with await.
+
+        :param destination: The new location where the file or folder will be copied.
+        :param overwrite: Whether conflicting files or folders should be overwritten.
+        :param clear: Whether pre-existing contents of a folder are considered to be a conflict.
+        :param fill: Whether the parent folder is created if it doesn't exist.
+        :param executor: The AsyncExecutor to use. By default, the default executor is used.
+        :return: A coroutine which returns None.
+        """
+        if not isinstance(destination, Path):
+            destination = Path(destination)
+
+        # This has to be imported here to avoid an import cycle.
+        from ..fs import aio
+        return aio.copy_to(self, destination, overwrite, clear, fill, executor)
+
+    def awalk(self, topdown=True, onerror=None, followlinks=False, executor=None):
+        """
+        Walk the directory tree rooted at this path, in the same manner as walk(), without blocking
+        the event loop. Use with async for.
+
+        :param topdown: Whether parent directories are yielded before their children.
+        :param onerror: A function which is called with the exception when an error occurs.
+        :param followlinks: Whether to walk into directories which are symbolic links.
+        :param executor: The AsyncExecutor to use. By default, the default executor is used.
+        :return: An async iterator over (dir_path, dir_names, file_names) tuples.
+        """
+        # This has to be imported here to avoid an import cycle.
+        from ..fs import aio
+        return aio.walk(self, topdown, onerror, followlinks, executor)
 
 
 class FSConnector(Connector, Configurable, metaclass=ABCMeta):
@@ -856,8 +1553,13 @@ class FSConnector(Connector, Configurable, metaclass=ABCMeta):
         assert cls is not FSConnector  # Must be a subclass
 
         initial_cwd = manager.load_option(section, 'Initial CWD', str, None)
+        cache_ttl = manager.load_option(section, 'Cache TTL', float, None)
+        cache_size = manager.load_option(section, 'Cache Size', int, None)
 
-        return cls(*args, initial_cwd=initial_cwd, **kwargs)
+        result = cls(*args, initial_cwd=initial_cwd, **kwargs)
+        if cache_ttl is not None or cache_size is not None:
+            result.enable_cache(cache_ttl, cache_size)
+        return result
 
     def __init__(self, connection_type, initial_cwd=None):
         verify_type(connection_type, type)
@@ -866,6 +1568,7 @@ class FSConnector(Connector, Configurable, metaclass=ABCMeta):
             verify_type(initial_cwd, str)
         super().__init__(connection_type)
         self._initial_cwd = initial_cwd
+        self._caching_connector = None
 
     @property
     def initial_cwd(self):
@@ -879,8 +1582,49 @@ class FSConnector(Connector, Configurable, metaclass=ABCMeta):
             verify_type(cwd, str)
         self._initial_cwd = cwd or None
 
+    @property
+    def caching_connector(self):
+        """
+        The connector which wraps this connector's connections in caching connections, or None if
+        caching is not enabled.
+        """
+        return self._caching_connector
+
+    def enable_cache(self, ttl=None, max_size=None):
+        """
+        Have connect() wrap new connections in caching connections, which remember the answers to
+        metadata and listing queries for a limited time. All connections created by this connector
+        from then on share the same cache.
+
+        :param ttl: The number of seconds an answer remains valid.
+        :param max_size: The maximum number of paths answers are kept for.
+        :return: None
+        """
+        # This has to be imported here to avoid an import cycle.
+        from ..fs import caching
+        if ttl is None:
+            ttl = caching.DEFAULT_CACHE_TTL
+        if max_size is None:
+            max_size = caching.DEFAULT_CACHE_SIZE
+        self._caching_connector = caching.CachingFSConnector(self, ttl, max_size)
+
+    def disable_cache(self):
+        """
+        Stop wrapping new connections in caching connections.
+
+        :return: None
+        """
+        self._caching_connector = None
+
     def connect(self, *args, **kwargs):
         """Create a new connection and return it."""
+        result = self.connect_uncached(*args, **kwargs)
+        if self._caching_connector is not None:
+            result = self._caching_connector.connect(result)
+        return result
+
+    def connect_uncached(self, *args, **kwargs):
+        """Create a new connection and return it, without wrapping it in a caching connection."""
         result = super().connect(*args, **kwargs)
         if self._initial_cwd is not None:
             result.cwd = self._initial_cwd
@@ -977,6 +1721,40 @@ class fs_connection(connection, Configurable, metaclass=ABCMeta):
         """The current working directory of this file system connection, or None if undefined."""
         return self.getcwd()
 
+    @property
+    def identity(self):
+        """
+        A string identifying the file system this connection reaches, which is the same for every
+        connection to it, in any process, or None if the file system can't be identified. Paths
+        are only unique within a file system, so this is used to key persistent per-path records,
+        such as cached hashes.
+        """
+        return None
+
+    def shares_file_system(self, other):
+        """
+        Whether another connection reaches the same file system as this one, so file system
+        objects can be moved between them natively. Distinct connections to the same file system
+        are recognized by their identities.
+
+        :param other: The other connection.
+        :return: Whether the two connections share a file system.
+        """
+        verify_type(other, fs_connection)
+        if other == self:
+            return True
+        identity = self.identity
+        return identity is not None and identity == other.identity
+
+    @property
+    def clone_limit(self):
+        """
+        The maximum number of clones of this connection which can be open at once, or None if
+        there's no limit. Connections which draw on a bounded pool of sessions should override
+        this, so concurrent callers wait their turn rather than exhausting the pool.
+        """
+        return None
+
     @cwd.setter
     def cwd(self, path):
         """The current working directory of this file system connection, or None if undefined."""
@@ -1001,6 +1779,16 @@ class fs_connection(connection, Configurable, metaclass=ABCMeta):
             self.chdir(self._cwd_stack[-1])
             return result
 
+    def clone(self):
+        """
+        Return an open connection to the same file system, with the same CWD, which can be used from
+        another thread concurrently with this one. Connections that keep no per-session state can
+        safely be shared between threads, and return themselves.
+
+        :return: An open fs_connection instance.
+        """
+        return self
+
     def check_path(self, path):
         """
         Verify that the path is valid for this file system connection, and return it in string form.
@@ -1179,7 +1967,7 @@ class fs_connection(connection, Configurable, metaclass=ABCMeta):
         # By default, assumes symbolic links are not supported. Subclasses can override this
         # behavior if it isn't a good assumption, but on most non-local file systems it will
         # be accurate. It's important that this doesn't default to raising an exception
-        # because it's used in the Path.walk() method.
+        # because it's used in the walk() method.
         return False
 
     def exists(self, path):
@@ -1281,6 +2069,45 @@ class fs_connection(connection, Configurable, metaclass=ABCMeta):
         """
         return self.modified_time(path)
 
+    def set_modified_time(self, path, timestamp):
+        """
+        Set the last time the data of the file system object was modified.
+
+        :param path: The path to operate on.
+        :param timestamp: The time stamp, as a float.
+        :return: None
+        """
+        raise OperationNotSupportedError()
+
+    def stat(self, path):
+        """
+        Get the metadata of the file system object in a single call, as an immutable record.
+        Connections which can retrieve all the metadata at once should override this. By default,
+        each available field is requested separately, and fields which aren't supported are None.
+
+        :param path: The path to operate on.
+        :return: A FileStatus instance.
+        """
+        path = self.check_path(path)
+
+        if self.is_dir(path):
+            file_type = 'dir'
+        elif self.is_file(path):
+            file_type = 'file'
+        elif self.exists(path):
+            file_type = 'other'
+        else:
+            raise FileNotFoundError(path)
+
+        values = {}
+        for name in FileStatus._fields[2:]:
+            try:
+                values[name] = getattr(self, name)(path)
+            except OperationNotSupportedError:
+                values[name] = None
+
+        return FileStatus(file_type, self.is_link(path), **values)
+
     def name(self, path):
         """
         Get the name of the file system object.
@@ -1304,6 +2131,31 @@ class fs_connection(connection, Configurable, metaclass=ABCMeta):
         else:
             return Path(dir_path, self)
 
+    def components(self, path):
+        """
+        Split the path into its normalized components, starting with the root, which is the empty
+        string for a relative path, and ending with the name. These are the names of the path's
+        ancestors, as found by following dir() up to the root, but without constructing each
+        ancestor as a Path.
+
+        :param path: The path to operate on.
+        :return: A tuple of strings.
+        """
+        current = self.check_path(path)
+        result = []
+        while True:
+            parent = os.path.dirname(current)
+            if parent == current:
+                # We've reached the root, which for a relative path is the empty string.
+                result.append(current)
+                break
+            name = os.path.basename(current)
+            if name:
+                result.append(name)
+            current = parent
+        result.reverse()
+        return tuple(result)
+
     def bare_name(self, path):
         """
         Get the name of the file system object, minus any extension.
@@ -1344,6 +2196,144 @@ class fs_connection(connection, Configurable, metaclass=ABCMeta):
         self.verify_is_dir(path)
         return [self.join(path, child) for child in self.list(path, pattern)]
 
+    def scan(self, path, pattern='*'):
+        """
+        Return the paths of the files and directories appearing in this folder, each paired with a
+        FileStatus snapshot of its metadata taken when the folder was listed. Connections which
+        list metadata along with names should override this to avoid a stat() per child. Children
+        which disappear before they can be stat()ed are left out.
+
+        :param path: The path to operate on.
+        :param pattern: A glob-style pattern against which names must match.
+        :return: A list of (Path, FileStatus) pairs for each matching file and directory name.
+        """
+        results = []
+        for child in self.glob(path, pattern):
+            try:
+                results.append((child, self.stat(child)))
+            except FileNotFoundError:
+                pass
+        return results
+
+    def _split_dir(self, path, followlinks=False):
+        """
+        Split the contents of a directory into subdirectory names and file names, and determine
+        which of the subdirectories can be walked into. Errors are collected rather than raised, so
+        the listing can be performed on a worker thread and the errors reported on the caller's.
+
+        :param path: The path of the directory.
+        :param followlinks: Whether subdirectories which are symbolic links can be walked into.
+        :return: A tuple, (dir_names, file_names, errors, walkable), where walkable is the set of
+            subdirectory names which can be walked into.
+        """
+        dir_names = []
+        file_names = []
+        errors = []
+        walkable = set()
+
+        try:
+            listing = self.list(path)
+        except Exception as exc:
+            errors.append(exc)
+        else:
+            for name in listing:
+                try:
+                    child = self.join(path, name)
+                    if self.is_dir(child):
+                        dir_names.append(name)
+                        if followlinks or not self.is_link(child):
+                            walkable.add(name)
+                    else:
+                        file_names.append(name)
+                except OSError as exc:
+                    errors.append(exc)
+
+        return dir_names, file_names, errors, walkable
+
+    def _schedule_split(self, path, followlinks=False):
+        """
+        Arrange for _split_dir() to be called for the given directory, returning a function which
+        takes no arguments and returns _split_dir()'s result once it is available. By default, the
+        listing is deferred until its result is requested. Subclasses can override this to list
+        directories ahead of time, e.g. on worker threads.
+
+        :param path: The path of the directory.
+        :param followlinks: Whether subdirectories which are symbolic links can be walked into.
+        :return: A function returning a tuple, (dir_names, file_names, errors, walkable).
+        """
+        return lambda: self._split_dir(path, followlinks)
+
+    def _walk(self, top, topdown, onerror, followlinks, schedule):
+        """
+        Walk the directory tree rooted at top. Each directory's subdirectories are scheduled for
+        listing as soon as the directory's own listing has been yielded to (and possibly pruned by)
+        the caller, which lets schedule() list sibling directories ahead of time.
+
+        :param top: The path of the root directory.
+        :param topdown: Whether parent directories are yielded before their children.
+        :param onerror: A function which is called with the exception when an error occurs.
+        :param followlinks: Whether to walk into directories which are symbolic links.
+        :param schedule: A function which behaves like _schedule_split().
+        :return: An iterator over (dir_path, dir_names, file_names) tuples.
+        """
+
+        def split(pending):
+            dir_names, file_names, errors, walkable = pending()
+            if onerror is not None:
+                for error in errors:
+                    onerror(error)
+            return dir_names, file_names, walkable
+
+        def schedule_children(parent, dir_names, walkable):
+            return [(parent[name], schedule(parent[name], followlinks))
+                    for name in dir_names if name in walkable]
+
+        dir_names, file_names, walkable = split(schedule(top, followlinks))
+
+        if topdown:
+            yield top, dir_names, file_names
+            stack = [iter(schedule_children(top, dir_names, walkable))]
+            while stack:
+                child = next(stack[-1], None)
+                if child is None:
+                    stack.pop()
+                    continue
+                dir_path, pending = child
+                dir_names, file_names, walkable = split(pending)
+                yield dir_path, dir_names, file_names
+                stack.append(iter(schedule_children(dir_path, dir_names, walkable)))
+        else:
+            frame = (top, dir_names, file_names)
+            stack = [(frame, iter(schedule_children(top, dir_names, walkable)))]
+            while stack:
+                frame, children = stack[-1]
+                child = next(children, None)
+                if child is None:
+                    stack.pop()
+                    yield frame
+                    continue
+                dir_path, pending = child
+                dir_names, file_names, walkable = split(pending)
+                frame = (dir_path, dir_names, file_names)
+                stack.append((frame, iter(schedule_children(dir_path, dir_names, walkable))))
+
+    def walk(self, path, topdown=True, onerror=None, followlinks=False, workers=None):
+        """
+        Walk the directory tree rooted at this path, in the same manner as os.walk(). For each
+        directory in the tree, yield a tuple, (dir_path, dir_names, file_names). If topdown is set,
+        the caller can modify dir_names in place to prune the search.
+
+        :param path: The path to operate on.
+        :param topdown: Whether parent directories are yielded before their children.
+        :param onerror: A function which is called with the exception when an error occurs.
+        :param followlinks: Whether to walk into directories which are symbolic links.
+        :param workers: The maximum number of directories to list concurrently, for connections
+            which support concurrent listing. Other connections ignore it.
+        :return: An iterator over (dir_path, dir_names, file_names) tuples.
+        """
+        path = Path(self.check_path(path), self)
+        return self._walk(path, topdown, onerror, followlinks, self._schedule_split)
+
     def open_file(self, path, mode='r', buffering=-1, encoding=None, errors=None, newline=None,
                   closefd=True, opener=None):
         """
@@ -1361,35 +2351,148 @@ class fs_connection(connection, Configurable, metaclass=ABCMeta):
         """
         raise OperationNotSupportedError()
 
-    def read(self, path, encoding=None):
+    def open_compressed(self, path, mode='r', compression=NotImplemented, compression_level=None,
+                        threads=None, encoding=None, errors=None, newline=None):
         """
-        Return an iterator over the lines from the file.
+        Open the file, decompressing it as it's read or compressing it as it's written. The data
+        is streamed through the compressor, on top of open_file() in binary mode, so this works for
+        any connection which supports that. Files which aren't compressed are opened as usual.
+
+        :param path: The path to operate on.
+        :param mode: The file mode, one of 'r', 'w', 'a', or 'x', with 'b' or 't' optionally added.
+        :param compression: The compression format: 'gzip', 'bz2', 'xz', or None for an
+            uncompressed file. By default, the format is determined by the file's extension.
+        :param compression_level: The compression level, when writing.
+        :param threads: The number of threads to compress with, when writing.
+        :param encoding: The encoding, for text modes.
+        :param errors: The error handling strategy, for text modes.
+        :param newline: The character sequence to use for newlines, for text modes.
+        :return: The opened file object.
+        """
+        # This has to be imported here to avoid an import cycle.
+        from ..fs.compression import open_compressed
+        return open_compressed(Path(self.check_path(path), self), mode, compression,
+                               compression_level, threads, encoding, errors, newline)
+
+    def open_mmap(self, path):
+        """
+        Map the file into memory, read-only. Only connections to local file systems support this.
+
+        :param path: The path to operate on.
+        :return: A read-only mmap.mmap instance.
+        """
+        raise OperationNotSupportedError()
+
+    def read_view(self, path):
+        """
+        Return a read-only view of the file's contents. Connections which can map files into memory
+        should override this to do so. By default, the file is read into memory in full.
+
+        :param path: The path to operate on.
+        :return: A read-only memoryview of the file's bytes.
+        """
+        with self.open_file(path, mode='rb') as file_obj:
+            return memoryview(file_obj.read())
+
+    def _open_mapped(self, path, memory_map, compression=NotImplemented):
+        # Return a memory map of the file for the line and row readers to parse, or None if it
+        # should be read the usual way instead. Compressed files can't be parsed from a map.
+        if not memory_map:
+            return None
+        # This has to be imported here to avoid an import cycle.
+        from ..fs.compression import resolve_compression
+        if resolve_compression(Path(self.check_path(path), self), compression) is not None:
+            return None
+        try:
+            return self.open_mmap(path)
+        except OperationNotSupportedError:
+            return None
+        except ValueError:
+            # Empty files can't be mapped.
+            return io.BytesIO()
+
+    def _line_batches(self, path, encoding=None, memory_map=False, chunk_size=None,
+                      compression=NotImplemented):
+        """
+        Return an iterator over lists of lines from the file, one list per chunk read. Connections
+        whose files can't be read in binary chunks, such as interactive streams, should override
+        this.
 
         :param path: The path to operate on.
         :param encoding: The file encoding used to open the file.
+        :param memory_map: Whether to parse the lines directly from a memory map of the file, where
+            the connection supports it.
+        :param chunk_size: The number of bytes read and decoded at a time.
+        :param compression: The compression format: 'gzip', 'bz2', 'xz', or None for an
+            uncompressed file. By default, the format is determined by the file's extension.
+        :return: An iterator over lists of lines, without newlines.
+        """
+        file_obj = self._open_mapped(path, memory_map, compression)
+        if file_obj is None:
+            file_obj = self.open_compressed(path, 'rb', compression)
+        with file_obj:
+            # Some file systems fail to split lines by form feed character, but they should.
+            yield from _read_line_batches(file_obj, encoding, chunk_size, form_feeds=True)
+
+    def read(self, path, encoding=None, memory_map=False, chunk_size=None,
+             compression=NotImplemented):
+        """
+        Return an iterator over the lines from the file. The file is read in large binary chunks,
+        which are decoded and split into lines in bulk. Lines are split by form feed as well as
+        the usual line endings.
+
+        :param path: The path to operate on.
+        :param encoding: The file encoding used to open the file.
+        :param memory_map: Whether to parse the lines directly from a memory map of the file, where
+            the connection supports it.
+        :param chunk_size: The number of bytes read and decoded at a time. Default is 1 MiB.
+        :param compression: The compression format: 'gzip', 'bz2', 'xz', or None for an
+            uncompressed file. By default, the format is determined by the file's extension.
         :return: An iterator over the lines in the file, without newlines.
         """
         self.verify_is_file(path)
+        for batch in self._line_batches(path, encoding, memory_map, chunk_size, compression):
+            yield from batch
 
-        with self.open_file(path, encoding=encoding) as file_obj:
-            for line in file_obj:
-                line = line.rstrip('\r\n')
-                # Some file systems fail to split lines by form feed character, but they should.
-                for piece in line.split(FORM_FEED_CHAR):
-                    yield piece
+    def read_batches(self, path, size, encoding=None, memory_map=False, chunk_size=None,
+                     compression=NotImplemented):
+        """
+        Return an iterator over lists of lines from the file, so they can be processed in bulk
+        rather than one at a time. The lines are the same as those read() returns.
 
-    def load(self, path, encoding=None):
+        :param path: The path to operate on.
+        :param size: The number of lines in each list. Only the last list may be shorter.
+        :param encoding: The file encoding used to open the file.
+        :param memory_map: Whether to parse the lines directly from a memory map of the file, where
+            the connection supports it.
+        :param chunk_size: The number of bytes read and decoded at a time. Default is 1 MiB.
+        :param compression: The compression format: 'gzip', 'bz2', 'xz', or None for an
+            uncompressed file. By default, the format is determined by the file's extension.
+        :return: An iterator over lists of lines, without newlines.
+        """
+        verify_type(size, int)
+        assert size > 0
+        self.verify_is_file(path)
+        batches = self._line_batches(path, encoding, memory_map, chunk_size, compression)
+        yield from _rebatch(batches, size)
+
+    def load(self, path, encoding=None, memory_map=False, compression=NotImplemented):
         """
         Returns a list containing the lines from the file.
 
         :param path: The path to operate on.
         :param encoding: The file encoding used to open the file.
+        :param memory_map: Whether to parse the lines directly from a memory map of the file, where
+            the connection supports it.
+        :param compression: The compression format: 'gzip', 'bz2', 'xz', or None for an
+            uncompressed file. By default, the format is determined by the file's extension.
         :return: A list containing the lines in the file, without newlines.
         """
-        return list(self.read(path, encoding))
+        return list(self.read(path, encoding, memory_map, compression=compression))
 
     # TODO: Rename *_delimited methods in Path to match the *_rows methods here.
-    def read_rows(self, path, delimiter=',', quote='"', encoding=None):
+    def read_rows(self, path, delimiter=',', quote='"', encoding=None, memory_map=False,
+                  compression=NotImplemented):
         """
         Return an iterator over the records from the file.
 
@@ -1397,9 +2500,25 @@ class fs_connection(connection, Configurable, metaclass=ABCMeta):
         :param delimiter: The delimiter used to separate fields in each record.
         :param quote: The quote character used to surround field values in the record.
         :param encoding: The file encoding used to open the file.
+        :param memory_map: Whether to parse the records directly from a memory map of the file,
+            where the connection supports it.
+        :param compression: The compression format: 'gzip', 'bz2', 'xz', or None for an
+            uncompressed file. By default, the format is determined by the file's extension.
         :return: An iterator over the rows in the file.
         """
-        with self.open_file(path, encoding=encoding, newline='') as file_obj:
+        mapped = self._open_mapped(path, memory_map, compression)
+        if mapped is not None:
+            with mapped:
+                # The reader needs the line endings, to handle quoted values which span lines.
+                lines = itertools.chain.from_iterable(
+                    _read_line_batches(mapped, encoding, keep_ends=True)
+                )
+                for row in csv.reader(lines, delimiter=delimiter, quotechar=quote):
+                    yield row
+            return
+
+        with self.open_compressed(path, 'r', compression, encoding=encoding, newline='') \
+                as file_obj:
             reader = csv.reader(file_obj, delimiter=delimiter, quotechar=quote)
 
             # This is necessary because the reader only keeps a weak reference to the file, which
@@ -1407,7 +2526,8 @@ class fs_connection(connection, Configurable, metaclass=ABCMeta):
             for row in reader:
                 yield row
 
-    def load_rows(self, path, delimiter=',', quote='"', encoding=None):
+    def load_rows(self, path, delimiter=',', quote='"', encoding=None, memory_map=False,
+                  compression=NotImplemented):
         """
         Return a list of the records from the file.
 
@@ -1415,41 +2535,72 @@ class fs_connection(connection, Configurable, metaclass=ABCMeta):
         :param delimiter: The delimiter used to separate fields in each record.
         :param quote: The quote character used to surround field values in the record.
         :param encoding: The file encoding used to open the file.
+        :param memory_map: Whether to parse the records directly from a memory map of the file,
+            where the connection supports it.
+        :param compression: The compression format: 'gzip', 'bz2', 'xz', or None for an
+            uncompressed file. By default, the format is determined by the file's extension.
         :return: A list containing the rows in the file.
         """
-        return list(self.read_rows(path, delimiter, quote, encoding))
+        return list(self.read_rows(path, delimiter, quote, encoding, memory_map, compression))
 
-    def save(self, path, lines, overwrite=False, append=False, encoding=None):
+    def load_columns(self, path, schema=None, delimiter=',', quote='"', encoding=None,
+                     memory_map=False, header=True):
         """
-        Save a sequence of lines to a file.
+        Load the records from the file into compact, typed columns, one per field. See
+        attila.columns.load_columns() for details.
+
+        :param path: The path to operate on.
+        :param schema: The types of the columns, either as a list in column order or as a
+            dictionary mapping column names to types. The types of columns not given are inferred.
+        :param delimiter: The delimiter used to separate fields in each record.
+        :param quote: The quote character used to surround field values in the record.
+        :param encoding: The file encoding used to open the file.
+        :param memory_map: Whether to parse the records directly from a memory map of the file,
+            where the connection supports it.
+        :param header: Whether the first record holds the column names.
+        :return: An OrderedDict mapping column names to columns.
+        """
+        # This has to be imported here to avoid an import cycle.
+        from ..columns import load_columns
+        return load_columns(path, schema, delimiter, quote, encoding, memory_map, header)
+
+    def save(self, path, lines, overwrite=False, append=False, encoding=None, atomic=False,
+             fsync=FSYNC_NEVER, block_size=None, compression=NotImplemented,
+             compression_level=None, threads=None):
+        """
+        Save a sequence of lines to a file. The lines are collected into large blocks, which are
+        written one at a time.
 
         :param path: The path to operate on.
         :param lines: An iterator or iterable container over the lines to be written.
         :param overwrite: Whether to overwrite the file if it already exists.
         :param append: Whether to append to the file if it already exists.
         :param encoding: The encoding of the file.
+        :param atomic: Whether to write the file under a temporary name and rename it into place
+            once it's complete, so a failure partway through never leaves a partial file. See
+            open_atomic().
+        :param fsync: The fsync policy: FSYNC_NEVER, FSYNC_ON_CLOSE, or FSYNC_EVERY_BLOCK.
+        :param block_size: The number of characters written per block.
+        :param compression: The compression format: 'gzip', 'bz2', 'xz', or None for an
+            uncompressed file. By default, the format is determined by the file's extension.
+        :param compression_level: The compression level, if the file is compressed.
+        :param threads: The number of threads to compress with, if the file is compressed.
         :return: The number of lines written.
         """
-        assert not overwrite or not append
-
-        path = self.check_path(path)
-
-        if overwrite or append:
-            if self.exists(path):
-                self.verify_is_file(path)
-        else:
-            self.verify_not_exists(path)
-
-        with self.open_file(path, mode=('a' if append else 'w'), encoding=encoding) as file_obj:
-            index = -1
-            for index, line in enumerate(lines):
-                file_obj.write(line.rstrip('\r\n') + '\n')
-            return index + 1
+        counter = [0]
+        if block_size is None:
+            block_size = DEFAULT_WRITE_BLOCK_SIZE
+        blocks = _line_blocks(lines, counter, block_size)
+        self._save_blocks(path, blocks, overwrite, append, encoding, None, atomic, fsync,
+                          compression, compression_level, threads)
+        return counter[0]
 
     def save_rows(self, path, rows, delimiter=',', quote='"', overwrite=False, append=False,
-                  encoding=None):
+                  encoding=None, atomic=False, fsync=FSYNC_NEVER, block_size=None,
+                  compression=NotImplemented, compression_level=None, threads=None):
         """
-        Save a sequence of rows to a file.
+        Save a sequence of rows to a file. The rows are formatted into large blocks, which are
+        written one at a time.
 
         :param path: The path to operate on.
         :param rows: An iterator or iterable container over the rows to be written.
@@ -1458,9 +2609,31 @@ class fs_connection(connection, Configurable, metaclass=ABCMeta):
         :param overwrite: Whether to overwrite the file if it already exists.
         :param append: Whether to append to the file if it already exists.
         :param encoding: The encoding of the file.
+        :param atomic: Whether to write the file under a temporary name and rename it into place
+            once it's complete, so a failure partway through never leaves a partial file. See
+            open_atomic().
+        :param fsync: The fsync policy: FSYNC_NEVER, FSYNC_ON_CLOSE, or FSYNC_EVERY_BLOCK.
+        :param block_size: The number of characters written per block.
+        :param compression: The compression format: 'gzip', 'bz2', 'xz', or None for an
+            uncompressed file. By default, the format is determined by the file's extension.
+        :param compression_level: The compression level, if the file is compressed.
+        :param threads: The number of threads to compress with, if the file is compressed.
         :return: The number of lines written.
         """
+        counter = [0]
+        if block_size is None:
+            block_size = DEFAULT_WRITE_BLOCK_SIZE
+        blocks = _row_blocks(rows, counter, block_size, delimiter, quote)
+        self._save_blocks(path, blocks, overwrite, append, encoding, '', atomic, fsync,
+                          compression, compression_level, threads)
+        return counter[0]
+
+    def _save_blocks(self, path, blocks, overwrite, append, encoding, newline, atomic, fsync,
+                     compression, compression_level, threads):
+        # Write blocks of text to a file, on behalf of save() and save_rows().
         assert not overwrite or not append
+        assert fsync in FSYNC_POLICIES
+        verify_type(atomic, bool)
 
         path = self.check_path(path)
 
@@ -1470,13 +2643,46 @@ class fs_connection(connection, Configurable, metaclass=ABCMeta):
         else:
             self.verify_not_exists(path)
 
-        with self.open_file(path, mode=('a' if append else 'w'), encoding=encoding, newline='') \
-                as file_obj:
-            writer = csv.writer(file_obj, delimiter=delimiter, quotechar=quote)
-            index = -1
-            for index, row in enumerate(rows):
-                writer.writerow(row)
-            return index + 1
+        mode = 'a' if append else 'w'
+        if atomic:
+            with self.open_atomic(path, mode, encoding, newline, fsync, compression,
+                                  compression_level, threads) as file_obj:
+                for block in blocks:
+                    file_obj.write(block)
+                    file_obj.sync()
+        else:
+            with self.open_compressed(path, mode, compression, compression_level, threads,
+                                      encoding=encoding, newline=newline) as file_obj:
+                for block in blocks:
+                    file_obj.write(block)
+                    if fsync == FSYNC_EVERY_BLOCK:
+                        sync_file_object(file_obj)
+                if fsync != FSYNC_NEVER:
+                    sync_file_object(file_obj)
+
+    def open_atomic(self, path, mode='w', encoding=None, newline=None, fsync=FSYNC_NEVER,
+                    compression=NotImplemented, compression_level=None, threads=None):
+        """
+        Open a file for writing under a temporary name in the same folder, which is renamed over
+        the file when it's closed. If an exception escapes the with block it's used in, or it's
+        aborted, the file is left as it was. Where the file can't be renamed into place, e.g. on
+        an FTP server which refuses to rename files, it's copied instead, which isn't atomic.
+
+        :param path: The path to operate on.
+        :param mode: The file mode, one of 'w', 'wb', 'a', or 'ab'.
+        :param encoding: The encoding, for text modes.
+        :param newline: The character sequence to use for newlines, for text modes.
+        :param fsync: The fsync policy: FSYNC_NEVER, FSYNC_ON_CLOSE, or FSYNC_EVERY_BLOCK.
+        :param compression: The compression format: 'gzip', 'bz2', 'xz', or None for an
+            uncompressed file. By default, the format is determined by the file's extension.
+        :param compression_level: The compression level, if the file is compressed.
+        :param threads: The number of threads to compress with, if the file is compressed.
+        :return: An attila.fs.atomic.AtomicFile instance.
+        """
+        # This has to be imported here to avoid an import cycle.
+        from ..fs.atomic import AtomicFile
+        return AtomicFile(Path(self.check_path(path), self), mode, encoding, newline, fsync,
+                          compression, compression_level, threads)
 
     def is_available(self, path, mode='r'):
         """
@@ -1524,10 +2730,94 @@ class fs_connection(connection, Configurable, metaclass=ABCMeta):
         else:
             assert interval > 0
 
+        # Go by the path's location alone, so the size isn't answered from a directory entry.
+        path = self.check_path(path)
+
         initial_size = self.size(path)
         time.sleep(interval)
         return initial_size == self.size(path)
 
+    def watch(self, path, pattern='*', interval=None):
+        """
+        Watch a folder's contents, or a single file, for changes. By default, changes are detected
+        by listing the folder periodically. Connections which can be notified of changes as they
+        happen should override this.
+
+        :param path: The path of the folder or file to watch. If it isn't an existing folder, its
+            parent folder is watched for changes to it alone.
+        :param pattern: A glob-style pattern which the names of reported files must match, when
+            watching a folder.
+        :param interval: The number of seconds between checks, for connections which have to poll
+            for changes. Default is 1 second.
+        :return: A Watcher instance, which reports changes as FileEvent instances.
+        """
+        # This has to be imported here to avoid an import cycle.
+        from ..fs.watching import PollingWatcher
+
+        path = Path(self.check_path(path), self)
+        if path.is_dir:
+            return PollingWatcher(path, pattern, interval=interval)
+        return PollingWatcher(path.dir, name=path.name, interval=interval)
+
+    def wait_until_stable(self, path, interval=None, timeout=None):
+        """
+        Wait until a file has stopped changing. The file is stable once it has gone unchanged for
+        the interval, or, where the connection can see it happen, as soon as its writer closes it.
+        Unlike is_stable(), this returns as soon as the file is stable.
+
+        :param path: The path to operate on.
+        :param interval: The number of seconds the file must go unchanged. Default is 1 second.
+        :param timeout: The maximum number of seconds to wait. If None, wait indefinitely.
+        :return: Whether the file became stable before the timeout expired.
+        """
+        # This has to be imported here to avoid an import cycle.
+        from ..fs.watching import wait_until_stable
+        return wait_until_stable(Path(self.check_path(path), self), interval, timeout)
+
+    def wait_for_file(self, path, pattern='*', timeout=None, stable=True, interval=None):
+        """
+        Wait for a file matching the pattern to appear in a folder. If one is already there, it is
+        returned without waiting.
+
+        :param path: The path of the folder.
+        :param pattern: A glob-style pattern which the file's name must match.
+        :param timeout: The maximum number of seconds to wait. If None, wait indefinitely.
+        :param stable: Whether to also wait for the file to stop changing.
+        :param interval: The number of seconds the file must go unchanged to be considered stable.
+            Default is 1 second.
+        :return: The path of the file, or None if the timeout expired first.
+        """
+        # This has to be imported here to avoid an import cycle.
+        from ..fs.watching import wait_for_file
+        return wait_for_file(Path(self.check_path(path), self), pattern, timeout, stable,
+                             interval)
+
+    def hash(self, path, algorithm='sha256', cache=None):
+        """
+        Hash the contents of the file, streaming it in large blocks. If a hash cache is in use and
+        the file hasn't changed size or modification time since it was last hashed, the file isn't
+        read at all.
+
+        :param path: The path to operate on.
+        :param algorithm: The name of the hash algorithm, as accepted by hashlib.new().
+        :param cache: The attila.fs.hashing.HashCache to use. If not set, the default hash cache is
+            used, if one has been set.
+        :return: The hex digest of the file's contents.
+        """
+        path = Path(self.check_path(path), self)
+
+        # This has to be imported here to avoid an import cycle.
+        from ..fs.hashing import HashCache
+        if cache is None:
+            cache = HashCache.get_default()
+        else:
+            verify_type(cache, HashCache)
+
+        if cache is None:
+            with self.open_file(path, mode='rb') as file_obj:
+                return hash_file_object(file_obj, algorithm)
+        return cache.hash(path, algorithm)
+
     def remove(self, path):
         """
         Remove the folder or file. If it doesn't exist, an error is raised.
@@ -1564,23 +2854,52 @@ class fs_connection(connection, Configurable, metaclass=ABCMeta):
 
         raise OperationNotSupportedError()
 
-    def raw_copy(self, path, destination):
+    def raw_make_dir(self, path):
+        """
+        Create a directory at a specific path, with no validation. The parent folder must already
+        exist, and nothing may exist at the path itself.
+
+        :param path: The path to operate on.
+        :return: None
+        """
+        self.make_dir(path, overwrite=False, clear=False, fill=False, check_only=False)
+
+    def raw_copy(self, path, destination, block_size=None):
         """
         Copy from a specific path to another specific path, with no validation.
 
         :param path: The path to operate on.
         :param destination: The path to copy to.
+        :param block_size: The number of bytes copied per block, where applicable.
         :return: None
         """
         path = self.check_path(path)
         verify_type(destination, Path)
+
+        # Give the destination's connection a chance to handle the copy natively.
+        if destination.connection != self and \
+                destination.connection.raw_copy_from(Path(path, self), destination):
+            return
+
         with self.open_file(path, mode='rb') as source_file:
             with destination.connection.open_file(destination, mode='wb') as target_file:
-                for line in source_file:
-                    target_file.write(line)
+                copy_file_object(source_file, target_file, block_size)
+
+    def raw_copy_from(self, source, path):
+        """
+        Copy from a specific path on another connection to a specific path on this connection, with
+        no validation, if this connection can do so natively. This is called by raw_copy() on the
+        source's connection, giving the destination's connection a chance to use its own transfer
+        mechanism.
+
+        :param source: The path to copy from.
+        :param path: The path to copy to.
+        :return: Whether the copy was performed. If False, the caller performs the copy itself.
+        """
+        return False
 
     def copy_into(self, path, destination, overwrite=False, clear=False, fill=True,
-                  check_only=None):
+                  check_only=None, workers=None):
         """
         Recursively copy the folder or file to the destination. The file or folder is added to the
         destination folder's listing and is not renamed in the process.
@@ -1593,12 +2912,15 @@ class fs_connection(connection, Configurable, metaclass=ABCMeta):
         :param fill: Whether the destination folder is created if it doesn't exist.
         :param check_only: Whether the function should only check if it's possible, or actually
             perform the operation.
+        :param workers: The maximum number of files to copy concurrently. If not set, files are
+            copied one at a time.
         :return: None
         """
 
-        self.copy_to(path, destination[path.name], overwrite, clear, fill, check_only)
+        self.copy_to(path, destination[path.name], overwrite, clear, fill, check_only, workers)
 
-    def copy_to(self, path, destination, overwrite=False, clear=False, fill=True, check_only=None):
+    def copy_to(self, path, destination, overwrite=False, clear=False, fill=True, check_only=None,
+                workers=None):
         """
         Recursively copy the folder or file to the destination. The file or folder is renamed to the
         destination's name in the process if the names differ.
@@ -1610,64 +2932,83 @@ class fs_connection(connection, Configurable, metaclass=ABCMeta):
         :param fill: Whether the parent folder is created if it doesn't exist.
         :param check_only: Whether the function should only check if it's possible, or actually
             perform the operation.
+        :param workers: The maximum number of files to copy concurrently. If not set, files are
+            copied one at a time.
         :return: None
         """
 
-        if check_only is None:
-            # First check to see if it can be done before we actually make any changes. This doesn't
-            # make the whole thing perfectly atomic, but it eliminates most cases where we start to
-            # do things and then find out we shouldn't have.
+        path = Path(self.check_path(path), self)
+        verify_type(destination, Path)
 
-            self.copy_to(path, destination, overwrite, clear, fill, check_only=True)
+        # The whole copy is planned in a single pass over both trees before any changes are made.
+        # This doesn't make the whole thing perfectly atomic, but it eliminates most cases where we
+        # start to do things and then find out we shouldn't have, without listing everything twice.
+        plan = self.plan_copy_to(path, destination, overwrite, clear, fill)
+        plan.verify()
+        if not check_only:
+            plan.execute(workers)
 
-            # If we don't do this, we'll do a redundant check first on each step in the recursion.
-            check_only = False
+    def plan_copy_to(self, path, destination, overwrite=False, clear=False, fill=True):
+        """
+        Plan a recursive copy of the folder or file to the destination, without making any changes.
 
-        path = self.check_path(path)
+        :param path: The path to operate on.
+        :param destination: The new location where this file system object would be copied.
+        :param overwrite: Whether conflicting files or folders should be overwritten.
+        :param clear: Whether pre-existing contents of a folder are considered to be a conflict.
+        :param fill: Whether the parent folder is created if it doesn't exist.
+        :return: A TransferPlan instance.
+        """
 
-        verify_type(destination, Path)
-        destination = abs(destination)
+        # This has to be imported here to avoid an import cycle.
+        from ..fs.transfers import TransferPlan
+        return TransferPlan.build(Path(self.check_path(path), self), destination, overwrite, clear,
+                                  fill)
 
-        self.verify_exists(path)
-
-        # Create the target directory, if necessary. Do not clear it, regardless of the clear flag's
-        # value, as this is the new *parent* folder of the file object to be copied, and the clear
-        # flag only applies to the copied file object and its descendants.
-        destination.dir.make_dir(overwrite, clear=False, fill=fill, check_only=check_only)
-
-        is_dir = self.is_dir(path)
-
-        if is_dir:
-            destination.make_dir(overwrite, clear, fill, check_only)
-            for child in self.glob(path):
-                child.copy_into(destination, overwrite, clear, fill, check_only)
-        if not is_dir or self.is_file(path):  # It's possible for it to be both.
-            self.verify_is_file(path)
-
-            if destination.exists:
-                # TODO: This check isn't working. I think it's because of Python's support for both
-                #       forward and backward slashes in paths, and also possibly case normalization.
-                #       We really need an is_same_as() method that checks to see if the two paths
-                #       refer to the same file system object in a file system-specific way. This is
-                #       really important, because if this check fails, the source file gets deleted
-                #       because it's also the destination file.
-                if str(abs(Path(path, self))) == str(destination):
-                    # We can't overwrite the file with itself.
-                    raise FileExistsError("Attempting to overwrite file with itself: %s" % destination)
-
-                # It's not a folder, and it's in our way.
-                if not overwrite:
-                    if destination.is_dir:
-                        raise IsADirectoryError(destination)
-                    else:
-                        raise FileExistsError(destination)
-                if not check_only:
-                    destination.remove()
-            if not check_only:
-                self.raw_copy(path, destination)
+    def sync_to(self, path, destination, compare='size+mtime', delete=False, fill=True,
+                workers=None):
+        """
+        Incrementally mirror the folder or file to the destination, copying only the files which
+        are new or have changed since the last time.
+
+        :param path: The path to operate on.
+        :param destination: The location of the mirror.
+        :param compare: How files are compared to determine whether they have changed, either
+            'size+mtime' (default) or 'hash'.
+        :param delete: Whether files and folders in the destination which aren't in the source are
+            removed.
+        :param fill: Whether the parent folder is created if it doesn't exist.
+        :param workers: The maximum number of files to copy concurrently. If not set, files are
+            copied one at a time.
+        :return: A SyncReport summarizing the files copied, skipped, and removed.
+        """
+
+        plan = self.plan_sync_to(path, destination, compare, delete, fill)
+        plan.execute(workers)
+        return plan.report()
+
+    def plan_sync_to(self, path, destination, compare='size+mtime', delete=False, fill=True):
+        """
+        Plan an incremental mirror of the folder or file to the destination, without making any
+        changes.
+
+        :param path: The path to operate on.
+        :param destination: The location of the mirror.
+        :param compare: How files are compared to determine whether they have changed, either
+            'size+mtime' (default) or 'hash'.
+        :param delete: Whether files and folders in the destination which aren't in the source
+            would be removed.
+        :param fill: Whether the parent folder is created if it doesn't exist.
+        :return: A TransferPlan instance.
+        """
+
+        # This has to be imported here to avoid an import cycle.
+        from ..fs.transfers import TransferPlan
+        return TransferPlan.build_sync(Path(self.check_path(path), self), destination, compare,
+                                       delete, fill)
 
     def move_into(self, path, destination, overwrite=False, clear=False, fill=True,
-                  check_only=None):
+                  check_only=None, workers=None):
         """
         Move the folder or file to the destination. The file or folder is added to the destination
         folder's listing and is not renamed in the process.
@@ -1680,13 +3021,16 @@ class fs_connection(connection, Configurable, metaclass=ABCMeta):
         :param fill: Whether the destination folder is created if it doesn't exist.
         :param check_only: Whether the function should only check if it's possible, or actually
             perform the operation.
+        :param workers: The maximum number of files to copy concurrently. If not set, files are
+            copied one at a time.
         :return: None
         """
 
         path = Path(self.check_path(path), self)
-        self.move_to(path, destination[path.name], overwrite, clear, fill, check_only)
+        self.move_to(path, destination[path.name], overwrite, clear, fill, check_only, workers)
 
-    def move_to(self, path, destination, overwrite=False, clear=False, fill=True, check_only=None):
+    def move_to(self, path, destination, overwrite=False, clear=False, fill=True, check_only=None,
+                workers=None):
         """
         Move the folder or file to the destination. The file or folder is renamed to the
         destination's name in the process if the names differ.
@@ -1698,12 +3042,65 @@ class fs_connection(connection, Configurable, metaclass=ABCMeta):
         :param fill: Whether the parent folder is created if it doesn't exist.
         :param check_only: Whether the function should only check if it's possible, or actually
             perform the operation.
+        :param workers: The maximum number of files to copy concurrently. If not set, files are
+            copied one at a time.
         :return: None
         """
 
-        self.copy_to(path, destination, overwrite, clear, fill, check_only)
+        if check_only is None:
+            # The same checks apply as for a copy. Do them before making any changes.
+            self.copy_to(path, destination, overwrite, clear, fill, check_only=True)
+            check_only = False
+
+        if check_only:
+            self.copy_to(path, destination, overwrite, clear, fill, check_only=True)
+            return
+
+        path = Path(self.check_path(path), self)
+        verify_type(destination, Path)
+        destination = abs(destination)
+
+        # Try to move the file or folder natively first, without copying any data. This only works
+        # if the destination is on the same file system and out of the way.
+        destination.dir.make_dir(overwrite, clear=False, fill=fill, check_only=False)
+        if destination.exists:
+            if path.is_dir and destination.is_dir:
+                if not self.shares_file_system(destination.connection):
+                    # Copying merges the folder's contents into the existing one.
+                    self.copy_to(path, destination, overwrite, clear, fill, check_only=False,
+                                 workers=workers)
+                    self.remove(path)
+                    return
+                # Merge the folder's contents into the existing one, moving each child.
+                destination.make_dir(overwrite, clear, fill, check_only=False)
+                for child in self.glob(path):
+                    self.move_to(child, destination[child.name], overwrite, clear, fill,
+                                 check_only=False, workers=workers)
+                self.remove(path)
+                return
+            elif path.is_dir or destination.is_dir:
+                # The checks have already established that we can overwrite it.
+                destination.remove()
+        if self.raw_move(path, destination):
+            return
+
+        self.copy_to(path, destination, overwrite, clear, fill, check_only=False, workers=workers)
         self.remove(path)
 
+    def raw_move(self, path, destination):
+        """
+        Move a file or folder from a specific path to another specific path, with no validation, if
+        this connection can do so natively, without copying the data. If the destination exists, it
+        is a file which the caller has agreed to replace. Implementations must never remove a
+        folder to make way for the move. Connections which can't move to the destination natively
+        should return False, in which case the move is done with a copy followed by a removal.
+
+        :param path: The path to operate on.
+        :param destination: The path to move to.
+        :return: Whether the move was performed.
+        """
+        return False
+
     def rename(self, path, new_name):
         """
         Rename a file object.
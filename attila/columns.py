@@ -0,0 +1,334 @@
+"""
+Compact, typed, column-oriented loading of delimited data
+"""
+
+
+import array
+import datetime
+import math
+
+from collections import OrderedDict
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+from .abc.files import Path
+from .exceptions import verify_type
+from .strings import DateTimeParser, USDateTimeParser, parse_bool, parse_int, parse_number
+
+
+__author__ = 'Aaron Hosford'
+__all__ = [
+    'load_columns',
+]
+
+
+# The number of rows examined to infer the types of columns not given in the schema.
+INFERENCE_ROWS = 1000
+
+# The types which can be inferred, in the order they are tried.
+INFERRED_TYPES = (int, float, datetime.datetime, bool, str)
+
+# The number of distinct date/time strings remembered per column, to avoid parsing them again.
+DATE_TIME_MEMO_SIZE = 4096
+
+# The type an inferred column is widened to if a later value doesn't fit the type it was given.
+WIDER_TYPES = {
+    int: float,
+    float: str,
+    datetime.datetime: str,
+    bool: str,
+}
+
+# The array type codes and NumPy dtypes for the types with compact storage.
+ARRAY_TYPE_CODES = {
+    int: 'q',
+    float: 'd',
+    bool: 'b',
+}
+NUMPY_DTYPES = {
+    int: 'int64',
+    float: 'float64',
+    bool: 'bool',
+    datetime.datetime: 'datetime64[us]',
+    datetime.date: 'datetime64[D]',
+}
+
+
+class _TypeMismatch(Exception):
+    # Raised when a value doesn't fit the type inferred for its column.
+
+    def __init__(self, index):
+        super().__init__(index)
+        self.index = index
+
+
+# The exceptions which indicate a value couldn't be converted. The parse_*() functions use
+# ast.literal_eval(), which raises SyntaxError for some malformed strings.
+CONVERSION_ERRORS = (ValueError, TypeError, SyntaxError, OverflowError)
+
+
+def _to_int(string):
+    try:
+        return int(string)
+    except ValueError:
+        value = parse_int(string)
+        if isinstance(value, bool):
+            raise ValueError("Could not interpret string as integer: %r" % string)
+        return value
+
+
+def _to_float(string):
+    if not string:
+        return math.nan
+    try:
+        return float(string)
+    except ValueError:
+        value = parse_number(string)
+        if isinstance(value, bool):
+            raise ValueError("Could not interpret string as a number: %r" % string)
+        return float(value)
+
+
+def _to_bool(string):
+    return parse_bool(string)
+
+
+class _DateTimeConverter:
+    # Parses the date/time strings of a column. Values in a column nearly always share a format, so
+    # the format that matched last is tried on its own first, before falling back on the parser,
+    # which tries them all. Dates also tend to repeat, so recent results are remembered.
+
+    def __init__(self, parser=None, date_only=False):
+        self._parser = USDateTimeParser() if parser is None else parser
+        self._date_only = date_only
+        self._format = None
+        self._memo = {}
+
+    def _parse(self, string):
+        if self._format is not None:
+            try:
+                value = datetime.datetime.strptime(string, self._format)
+            except ValueError:
+                pass
+            else:
+                if self._parser.min_year <= value.year <= self._parser.max_year:
+                    return value
+        value = self._parser.parse(string)
+        for datetime_format in self._parser.formats:
+            try:
+                if datetime.datetime.strptime(string, datetime_format) == value:
+                    self._format = datetime_format
+                    break
+            except ValueError:
+                pass
+        return value
+
+    def __call__(self, string):
+        if not string:
+            return None
+        value = self._memo.get(string)
+        if value is not None:
+            return value
+        value = self._parse(string)
+        if self._date_only:
+            if value != value.replace(hour=0, minute=0, second=0, microsecond=0):
+                raise ValueError("Expected date; got date/time: %r" % string)
+            value = value.date()
+        if len(self._memo) >= DATE_TIME_MEMO_SIZE:
+            self._memo.clear()
+        self._memo[string] = value
+        return value
+
+
+def _converter(column_type, parser):
+    # Return a function which converts strings to values of the given type.
+    if column_type is int:
+        return _to_int
+    elif column_type is float:
+        return _to_float
+    elif column_type is bool:
+        return _to_bool
+    elif column_type is datetime.datetime:
+        return _DateTimeConverter(parser)
+    elif column_type is datetime.date:
+        return _DateTimeConverter(parser, date_only=True)
+    elif column_type is str:
+        return None
+    else:
+        # Any other callable is used as the converter itself.
+        return column_type
+
+
+def _infer_type(values, parser):
+    # Determine the narrowest type which all the non-empty values fit.
+    non_empty = [value for value in values if value]
+    if not non_empty:
+        return str
+    for column_type in INFERRED_TYPES:
+        if column_type is int and len(non_empty) < len(values):
+            # Integer columns can't represent missing values, but float columns can.
+            continue
+        if column_type is bool and len(non_empty) < len(values):
+            continue
+        if column_type is str:
+            return str
+        convert = _converter(column_type, parser)
+        try:
+            for value in non_empty:
+                convert(value)
+        except CONVERSION_ERRORS:
+            continue
+        return column_type
+    return str
+
+
+def _new_column(column_type):
+    type_code = ARRAY_TYPE_CODES.get(column_type)
+    if type_code is None:
+        return []
+    return array.array(type_code)
+
+
+def _finish_column(column, column_type, use_numpy):
+    # Convert the column to a NumPy array, if requested and it has a suitable dtype.
+    if not use_numpy:
+        return column
+    dtype = NUMPY_DTYPES.get(column_type)
+    if dtype is None:
+        return column
+    if isinstance(column, array.array):
+        # This shares the array's memory rather than copying it.
+        return numpy.frombuffer(column, dtype=dtype)
+    return numpy.array(column, dtype=dtype)
+
+
+def _load(path, names, types, inferred, use_numpy, parser, delimiter, quote, encoding,
+          memory_map, header):
+    converters = [_converter(column_type, parser) for column_type in types]
+    columns = [_new_column(column_type) for column_type in types]
+    appenders = [column.append for column in columns]
+    width = len(names)
+
+    rows = path.read_delimited(delimiter, quote, encoding, memory_map)
+    if header:
+        next(rows, None)
+    for row_number, row in enumerate(rows, 1 + header):
+        if len(row) != width:
+            if len(row) > width:
+                raise ValueError("Row %s of %s has %s values; expected %s." %
+                                 (row_number, path, len(row), width))
+            row = row + [''] * (width - len(row))
+        for index, (value, convert, append) in enumerate(zip(row, converters, appenders)):
+            try:
+                if convert is not None:
+                    value = convert(value)
+                append(value)
+            except CONVERSION_ERRORS as exc:
+                rows.close()
+                if inferred[index]:
+                    raise _TypeMismatch(index)
+                raise ValueError("Row %s of %s: Could not convert %r in column %r." %
+                                 (row_number, path, value, names[index])) from exc
+
+    return OrderedDict(
+        (name, _finish_column(column, column_type, use_numpy))
+        for name, column, column_type in zip(names, columns, types)
+    )
+
+
+def load_columns(path, schema=None, delimiter=',', quote='"', encoding=None, memory_map=False,
+                 header=True, use_numpy=None, parser=None):
+    """
+    Load a delimited file into one compact, typed column per field, rather than a list of rows of
+    strings. Integer, float, and Boolean columns are stored in arrays from the array module, or as
+    NumPy arrays if NumPy is available and use_numpy isn't False, which also stores dates and
+    date/times as datetime64 arrays. Other columns are stored as lists. (Boolean columns stored with
+    the array module hold 1 and 0 rather than True and False.)
+
+    Columns not given a type by the schema have their types inferred from their first values.
+    Empty values are allowed in float columns, where they become NaN, and in date and date/time
+    columns, where they become None. An inferred integer column with empty values is loaded as
+    float. If a later value doesn't fit a column's inferred type, the column is widened, e.g. from
+    integer to float or from date/time to string, and the file is read again.
+
+    :param path: The path of the delimited file.
+    :param schema: The types of the columns, either as a list in column order or as a dictionary
+        mapping column names to types. Types may be int, float, bool, str, datetime.date,
+        datetime.datetime, or any other callable which converts strings to values, in which case
+        the column is stored as a list of the values it returns.
+    :param delimiter: The delimiter used to separate fields in each record.
+    :param quote: The quote character used to surround field values in the record.
+    :param encoding: The file encoding used to open the file.
+    :param memory_map: Whether to parse the records directly from a memory map of the file, where
+        the connection supports it.
+    :param header: Whether the first row holds the column names. If not, the columns are named by
+        their indices.
+    :param use_numpy: Whether to store columns as NumPy arrays. By default, NumPy is used if it is
+        installed.
+    :param parser: The DateTimeParser used for date and date/time columns. By default, this is a
+        USDateTimeParser instance with default settings.
+    :return: An OrderedDict mapping column names to columns, in file order.
+    """
+    if not isinstance(path, Path):
+        path = Path(path)
+    verify_type(schema, (list, tuple, dict), allow_none=True)
+    verify_type(parser, DateTimeParser, allow_none=True)
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    elif use_numpy and numpy is None:
+        raise ImportError("NumPy is not installed.")
+    if parser is None:
+        parser = USDateTimeParser()
+
+    # Read the names and a sample of the values, for inference.
+    sample = []
+    rows = path.read_delimited(delimiter, quote, encoding, memory_map)
+    first = next(rows, None)
+    if first is None:
+        rows.close()
+        return OrderedDict()
+    if header:
+        names = first
+    else:
+        names = list(range(len(first)))
+        sample.append(first)
+    for row in rows:
+        sample.append(row)
+        if len(sample) >= INFERENCE_ROWS:
+            break
+    rows.close()
+    if len(set(names)) < len(names):
+        raise ValueError("Duplicate column names in %s: %s" % (path, names))
+
+    if schema is None:
+        schema = {}
+    elif not isinstance(schema, dict):
+        if len(schema) != len(names):
+            raise ValueError("Schema has %s types; %s has %s columns." %
+                             (len(schema), path, len(names)))
+        schema = dict(zip(names, schema))
+    for name in schema:
+        if name not in names:
+            raise KeyError(name)
+
+    types = []
+    inferred = []
+    for index, name in enumerate(names):
+        if name in schema:
+            types.append(schema[name])
+            inferred.append(False)
+        else:
+            values = [row[index] if index < len(row) else '' for row in sample]
+            types.append(_infer_type(values, parser))
+            inferred.append(True)
+
+    while True:
+        try:
+            return _load(path, names, types, inferred, use_numpy, parser, delimiter, quote,
+                         encoding, memory_map, header)
+        except _TypeMismatch as exc:
+            types[exc.index] = WIDER_TYPES[types[exc.index]]
@@ -17,6 +17,7 @@ __all__ = [
     'DirectoryNotEmptyError',
     'InvalidPathError',
     'NoDefaultFSConnectionError',
+    'TransferError',
     'SecurityError',
     'CryptographyError',
     'EncryptionError',
@@ -92,6 +93,18 @@ class NoDefaultFSConnectionError(PathError):
     """No default file system connection has been provided."""
 
 
+class TransferError(PathError):
+    """One or more files in a multi-file transfer could not be transferred."""
+
+    def __init__(self, failures):
+        # Each failure is a (source, destination, exception) tuple.
+        self.failures = list(failures)
+        super().__init__("%s file(s) failed to transfer: %s" % (
+            len(self.failures),
+            '; '.join('%s: %s' % (source, exc) for source, _, exc in self.failures)
+        ))
+
+
 class SecurityError(AttilaException):
     """Security-related error."""
 
@@ -5,18 +5,27 @@ File system-related functionality
 
 from ..abc.files import Path
 
-from . import ftp, http, local, proxies, stdio, temp
+from . import aio, atomic, caching, compression, ftp, hashing, http, indexes, local, proxies, stdio
+from . import temp, transfers, watching
 from ..exceptions import OperationNotSupportedError
 
 
 __author__ = 'Aaron Hosford'
 __all__ = [
+    'aio',
+    'atomic',
+    'caching',
+    'compression',
     'ftp',
+    'hashing',
     'http',
+    'indexes',
     'local',
     'proxies',
     'stdio',
     'temp',
+    'transfers',
+    'watching',
 ]
 
 
@@ -0,0 +1,524 @@
+"""
+An asyncio interface to file system connections
+"""
+
+
+import asyncio
+import functools
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+from ..abc.files import Path
+from ..exceptions import verify_type
+
+
+__author__ = 'Aaron Hosford'
+__all__ = [
+    'AsyncExecutor',
+    'AsyncFile',
+    'exists',
+    'list_dir',
+    'open_file',
+    'copy_to',
+    'walk',
+]
+
+
+# The maximum number of blocking file system calls in progress at once, by default.
+DEFAULT_WORKERS = 32
+
+
+class AsyncExecutor:
+    """
+    An AsyncExecutor runs blocking file system calls on a bounded pool of worker threads, so
+    coroutines can await them without blocking the event loop, and can have many of them in
+    progress at once. Connections which keep per-session state, such as FTP connections, can't be
+    used from several threads at once, so each call borrows a clone of each connection it uses,
+    and closes it as soon as the call is done, returning its session to the pool. For
+    connections with a clone_limit, such as FTP connections drawing on a bounded session pool,
+    callers wait their turn on the event loop, rather than tying up worker threads waiting for a
+    session. Connections with a clone limit of 0 can't be cloned at all, so calls using them are
+    made one at a time, on the original connection.
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    @classmethod
+    def get_default(cls):
+        """
+        Get the executor used when none is given, creating it if necessary.
+        """
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    @classmethod
+    def set_default(cls, executor):
+        """
+        Set the executor used when none is given.
+
+        :param executor: The AsyncExecutor to use by default, or None to create one when needed.
+        """
+        verify_type(executor, AsyncExecutor, allow_none=True)
+        with cls._default_lock:
+            cls._default = executor
+
+    def __init__(self, workers=DEFAULT_WORKERS):
+        """
+        Create a new executor.
+
+        :param workers: The maximum number of blocking calls in progress at once.
+        """
+        verify_type(workers, int)
+        assert workers > 0
+        self._workers = workers
+        self._executor = ThreadPoolExecutor(workers)
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False  # Do not suppress exceptions.
+
+    @property
+    def workers(self):
+        """The maximum number of blocking calls in progress at once."""
+        return self._workers
+
+    def close(self):
+        """
+        Wait for calls in progress to finish.
+
+        :return: None
+        """
+        self._executor.shutdown(wait=True)
+
+    @staticmethod
+    def _borrow(connection):
+        # Make a clone of the connection. Called on worker threads. If the connection can't be
+        # cloned, the caller holds its limit's only slot, so it can use the connection itself.
+        if connection.clone_limit == 0:
+            return connection
+        return connection.clone()
+
+    @staticmethod
+    def _give_back(connection, clone):
+        # Close the clone, so its session goes back to the pool as soon as the caller is done
+        # with it, rather than being held on to where other connections can't get at it.
+        if clone is not connection:
+            clone.close()
+
+    @staticmethod
+    def _key(connection):
+        # Connections to the same file system share a session pool, so they share a clone and a
+        # limit within each call.
+        identity = connection.identity
+        return id(connection) if identity is None else identity
+
+    def _connections(self, args):
+        # Map the keys of the connections of the Path arguments to the first connection with each
+        # key, in a consistent order so callers acquiring several limits can't deadlock each other.
+        connections = {}
+        for arg in args:
+            if isinstance(arg, Path):
+                connections.setdefault(self._key(arg.connection), arg.connection)
+        return [(key, connections[key]) for key in sorted(connections, key=str)]
+
+    async def _acquire(self, connections):
+        # Wait on the event loop until a session is available for each connection with a limit.
+        loop = asyncio.get_event_loop()
+        acquired = []
+        try:
+            for key, connection in connections:
+                limit = connection.clone_limit
+                if limit is None:
+                    continue
+                with self._lock:
+                    semaphore = self._semaphores.get((id(loop), key))
+                    if semaphore is None:
+                        # Calls on a connection which can't be cloned take turns using it.
+                        semaphore = asyncio.Semaphore(max(limit, 1))
+                        self._semaphores[(id(loop), key)] = semaphore
+                await semaphore.acquire()
+                acquired.append(semaphore)
+        except:
+            for semaphore in acquired:
+                semaphore.release()
+            raise
+        return acquired
+
+    def _call(self, function, args, kwargs, connections):
+        # Call the function with each Path argument moved onto a borrowed clone of its connection.
+        # Called on worker threads.
+        clones = {}
+        try:
+            for key, connection in connections:
+                clones[key] = (connection, self._borrow(connection))
+            moved = []
+            for arg in args:
+                if isinstance(arg, Path):
+                    connection, clone = clones[self._key(arg.connection)]
+                    if arg.connection is not connection:
+                        # Relative paths are relative to their own connection's working directory.
+                        arg = abs(arg)
+                    if clone is not arg.connection:
+                        arg = Path(str(arg), clone)
+                moved.append(arg)
+            return function(*moved, **kwargs)
+        finally:
+            for connection, clone in clones.values():
+                self._give_back(connection, clone)
+
+    async def run(self, function, *args, **kwargs):
+        """
+        Call a blocking function on a worker thread, and wait for its result. Each Path argument
+        is moved onto a clone of its connection for the duration of the call.
+
+        :param function: The function to call.
+        :param args: The positional arguments.
+        :param kwargs: The keyword arguments.
+        :return: The function's return value.
+        """
+        connections = self._connections(args)
+        acquired = await self._acquire(connections)
+        try:
+            loop = asyncio.get_event_loop()
+            call = functools.partial(self._call, function, args, kwargs, connections)
+            return await loop.run_in_executor(self._executor, call)
+        finally:
+            for semaphore in acquired:
+                semaphore.release()
+
+    def _open(self, path, args, kwargs):
+        # Open the file on a borrowed clone, which stays borrowed until the file is closed.
+        connection = path.connection
+        clone = self._borrow(connection)
+        try:
+            if clone is not connection:
+                path = Path(str(path), clone)
+            return path.open(*args, **kwargs), clone
+        except:
+            self._give_back(connection, clone)
+            raise
+
+    async def open(self, path, *args, **kwargs):
+        """
+        Open a file on a worker thread. The arguments are the same as for Path.open(). The file
+        holds on to a clone of its connection until it's closed.
+
+        :param path: The path of the file.
+        :return: An AsyncFile instance.
+        """
+        verify_type(path, Path)
+        acquired = await self._acquire(self._connections([path]))
+        try:
+            loop = asyncio.get_event_loop()
+            call = functools.partial(self._open, path, args, kwargs)
+            file_obj, clone = await loop.run_in_executor(self._executor, call)
+        except:
+            for semaphore in acquired:
+                semaphore.release()
+            raise
+
+        def release():
+            self._give_back(path.connection, clone)
+            for held in acquired:
+                held.release()
+
+        return AsyncFile(self, file_obj, release)
+
+
+class AsyncFile:
+    """
+    An AsyncFile wraps a file object opened by an AsyncExecutor, running its blocking methods on
+    the executor's worker threads. It can be used as an async context manager, and iterated over
+    with async for.
+    """
+
+    def __init__(self, executor, file_obj, release):
+        verify_type(executor, AsyncExecutor)
+        assert callable(release)
+        self._executor = executor
+        self._file_obj = file_obj
+        self._release = release
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+        return False  # Do not suppress exceptions.
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        line = await self.readline()
+        if not line:
+            raise StopAsyncIteration()
+        return line
+
+    @property
+    def file_obj(self):
+        """The wrapped file object."""
+        return self._file_obj
+
+    @property
+    def closed(self):
+        """Whether the file has been closed."""
+        return self._file_obj is None
+
+    async def _run(self, function, *args):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor._executor, functools.partial(function,
+                                                                                      *args))
+
+    async def read(self, size=-1):
+        """
+        Read up to size bytes or characters. If no size is specified, read the entire file.
+
+        :param size: The number of bytes or characters to read.
+        :return: The data read.
+        """
+        return await self._run(self._file_obj.read, size)
+
+    async def readline(self):
+        """
+        Read a line from the file.
+
+        :return: The line, with its line ending, or an empty value at the end of the file.
+        """
+        return await self._run(self._file_obj.readline)
+
+    async def readlines(self):
+        """
+        Read the remaining lines of the file.
+
+        :return: A list of the lines, with their line endings.
+        """
+        return await self._run(self._file_obj.readlines)
+
+    async def write(self, data):
+        """
+        Write to the file.
+
+        :param data: The string or bytes to write.
+        :return: None
+        """
+        await self._run(self._file_obj.write, data)
+
+    async def flush(self):
+        """Flush pending writes."""
+        await self._run(self._file_obj.flush)
+
+    async def seek(self, offset, whence=0):
+        """
+        Seek to a particular offset in the file.
+
+        :param offset: The offset to seek to.
+        :param whence: Indicates the seek origin.
+        :return: None
+        """
+        await self._run(self._file_obj.seek, offset, whence)
+
+    async def tell(self):
+        """
+        Determine the current position in the file.
+
+        :return: The offset in the file.
+        """
+        return await self._run(self._file_obj.tell)
+
+    async def close(self):
+        """
+        Close the file, and give back the connection it was opened on.
+
+        :return: None
+        """
+        if self._file_obj is None:
+            return
+        file_obj = self._file_obj
+        self._file_obj = None
+        try:
+            await self._run(file_obj.close)
+        finally:
+            self._release()
+
+
+class _FileOpener:
+    # The result of Path.aopen(), which can either be awaited for the file, or used directly as an
+    # async context manager which closes the file on exit.
+
+    def __init__(self, coroutine):
+        self._coroutine = coroutine
+        self._file = None
+
+    def __await__(self):
+        return self._coroutine.__await__()
+
+    async def __aenter__(self):
+        self._file = await self._coroutine
+        return self._file
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self._file.close()
+        return False  # Do not suppress exceptions.
+
+
+def _get_executor(executor):
+    if executor is None:
+        return AsyncExecutor.get_default()
+    verify_type(executor, AsyncExecutor)
+    return executor
+
+
+def _exists(path):
+    return path.exists
+
+
+async def exists(path, executor=None):
+    """
+    Check whether a path exists, without blocking the event loop.
+
+    :param path: The path to check.
+    :param executor: The AsyncExecutor to use. By default, the default executor is used.
+    :return: Whether the path exists.
+    """
+    verify_type(path, Path)
+    return await _get_executor(executor).run(_exists, path)
+
+
+def _list_dir(path, pattern):
+    return path.list(pattern)
+
+
+async def list_dir(path, pattern='*', executor=None):
+    """
+    List the names of the files and directories in a folder, without blocking the event loop.
+
+    :param path: The path of the folder.
+    :param pattern: A glob-style pattern against which names must match.
+    :param executor: The AsyncExecutor to use. By default, the default executor is used.
+    :return: A list of matching file and directory names.
+    """
+    verify_type(path, Path)
+    return await _get_executor(executor).run(_list_dir, path, pattern)
+
+
+def open_file(path, *args, executor=None, **kwargs):
+    """
+    Open a file without blocking the event loop. The arguments are the same as for Path.open().
+    The result can be awaited for an AsyncFile, or used directly with async with, in which case
+    the file is closed on exit.
+
+    :param path: The path of the file.
+    :param executor: The AsyncExecutor to use. By default, the default executor is used.
+    :return: An awaitable async context manager, which produces an AsyncFile.
+    """
+    verify_type(path, Path)
+    return _FileOpener(_get_executor(executor).open(path, *args, **kwargs))
+
+
+def _copy_to(path, destination, overwrite, clear, fill):
+    path.copy_to(destination, overwrite, clear, fill)
+
+
+async def copy_to(path, destination, overwrite=False, clear=False, fill=True, executor=None):
+    """
+    Recursively copy a folder or file to the destination, without blocking the event loop.
+
+    :param path: The file or folder to copy.
+    :param destination: The new location where the file or folder will be copied.
+    :param overwrite: Whether conflicting files or folders should be overwritten.
+    :param clear: Whether pre-existing contents of a folder are considered to be a conflict.
+    :param fill: Whether the parent folder is created if it doesn't exist.
+    :param executor: The AsyncExecutor to use. By default, the default executor is used.
+    :return: None
+    """
+    verify_type(path, Path)
+    verify_type(destination, Path)
+    await _get_executor(executor).run(_copy_to, path, destination, overwrite, clear, fill)
+
+
+def _split_dir(path, followlinks):
+    # List the directory, and determine which subdirectories can be walked into.
+    return path.connection._split_dir(path, followlinks)
+
+
+async def walk(path, topdown=True, onerror=None, followlinks=False, executor=None):
+    """
+    Walk the directory tree rooted at a path, in the same manner as Path.walk(), without blocking
+    the event loop. Use with async for. Each directory's subdirectories are listed concurrently,
+    as soon as its own listing has been yielded to (and possibly pruned by) the caller.
+
+    :param path: The path of the root directory.
+    :param topdown: Whether parent directories are yielded before their children.
+    :param onerror: A function which is called with the exception when an error occurs.
+    :param followlinks: Whether to walk into directories which are symbolic links.
+    :param executor: The AsyncExecutor to use. By default, the default executor is used.
+    :return: An async iterator over (dir_path, dir_names, file_names) tuples.
+    """
+    verify_type(path, Path)
+    executor = _get_executor(executor)
+
+    def schedule(dir_path):
+        return asyncio.ensure_future(executor.run(_split_dir, dir_path, followlinks))
+
+    async def split(pending):
+        dir_names, file_names, errors, walkable = await pending
+        if onerror is not None:
+            for error in errors:
+                onerror(error)
+        return dir_names, file_names, walkable
+
+    def schedule_children(parent, dir_names, walkable):
+        return [(parent[name], schedule(parent[name])) for name in dir_names if name in walkable]
+
+    scheduled = []
+    try:
+        pending = schedule(path)
+        scheduled.append(pending)
+        dir_names, file_names, walkable = await split(pending)
+        if topdown:
+            yield path, dir_names, file_names
+            children = schedule_children(path, dir_names, walkable)
+            scheduled.extend(pending for _, pending in children)
+            stack = [iter(children)]
+            while stack:
+                child = next(stack[-1], None)
+                if child is None:
+                    stack.pop()
+                    continue
+                dir_path, pending = child
+                dir_names, file_names, walkable = await split(pending)
+                yield dir_path, dir_names, file_names
+                children = schedule_children(dir_path, dir_names, walkable)
+                scheduled.extend(pending for _, pending in children)
+                stack.append(iter(children))
+        else:
+            children = schedule_children(path, dir_names, walkable)
+            scheduled.extend(pending for _, pending in children)
+            stack = [((path, dir_names, file_names), iter(children))]
+            while stack:
+                frame, children = stack[-1]
+                child = next(children, None)
+                if child is None:
+                    stack.pop()
+                    yield frame
+                    continue
+                dir_path, pending = child
+                dir_names, file_names, walkable = await split(pending)
+                children = schedule_children(dir_path, dir_names, walkable)
+                scheduled.extend(pending for _, pending in children)
+                stack.append(((dir_path, dir_names, file_names), iter(children)))
+    finally:
+        # If the walk is abandoned partway, don't leave listings running in the background.
+        for pending in scheduled:
+            pending.cancel()
@@ -0,0 +1,222 @@
+"""
+Files which are written in full or not at all
+"""
+
+
+import logging
+import os
+import uuid
+
+
+from ..abc.files import FSYNC_EVERY_BLOCK, FSYNC_NEVER, FSYNC_POLICIES, Path, sync_file_object
+from .compression import resolve_compression
+
+
+__author__ = 'Aaron Hosford'
+__all__ = [
+    'AtomicFile',
+]
+
+
+log = logging.getLogger(__name__)
+
+
+def _sync_local_dir(path):
+    # Make a rename within a local folder durable, by syncing the folder itself. Windows can't open
+    # folders this way, and doesn't need it.
+    if os.name == 'nt':
+        return
+    descriptor = os.open(str(abs(path)), os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+class AtomicFile:
+    """
+    An AtomicFile is written under a temporary name in the same folder as its destination, and
+    renamed over the destination when it's closed, so nothing watching the destination ever sees
+    it partly written. If the file is aborted, or an exception escapes the with block it's used in,
+    the temporary file is discarded and the destination is left as it was.
+
+    The replacement is not atomic in these cases:
+
+    * Where the connection can't rename files, e.g. an FTP server which refuses RNFR/RNTO, or
+      refuses to rename over an existing file, the temporary file is copied over the destination
+      in place, so it can be seen partly written, though never missing.
+    * In append mode, the destination's contents are copied when the file is opened, so anything
+      appended to it by others before the file is closed is lost.
+
+    The temporary file's name starts with a dot and ends with '.tmp', so it isn't matched by
+    patterns for the destination's extension.
+    """
+
+    def __init__(self, path, mode='w', encoding=None, newline=None, fsync=FSYNC_NEVER,
+                 compression=NotImplemented, compression_level=None, threads=None):
+        """
+        Open a new atomic file.
+
+        :param path: The destination path.
+        :param mode: The file mode, one of 'w', 'wb', 'a', or 'ab'. In append mode, the
+            destination's existing contents are copied to the temporary file first.
+        :param encoding: The encoding, for text modes.
+        :param newline: The character sequence to use for newlines, for text modes.
+        :param fsync: The fsync policy. If FSYNC_NEVER, the data is left to the OS to write out
+            when it sees fit. If FSYNC_ON_CLOSE, the data is synced to disk before the file is
+            renamed into place, and the rename is synced after. If FSYNC_EVERY_BLOCK, the data is
+            also synced each time sync() is called. Files which aren't stored locally can't be
+            synced, and ignore this.
+        :param compression: The compression format: 'gzip', 'bz2', 'xz', or None for an
+            uncompressed file. By default, the format is determined by the destination's extension.
+        :param compression_level: The compression level, if the file is compressed.
+        :param threads: The number of threads to compress with, if the file is compressed.
+        """
+        assert isinstance(path, Path)
+        assert mode in ('w', 'wb', 'a', 'ab')
+        assert fsync in FSYNC_POLICIES
+
+        self._path = path
+        self._temp_path = path.dir['.%s.%s.tmp' % (path.name, uuid.uuid4().hex[:12])]
+        self._fsync = fsync
+        self._file_obj = None
+
+        if mode.startswith('a') and path.exists:
+            path.connection.raw_copy(path, self._temp_path)
+        # The temporary file's name doesn't have the destination's extension, so the compression
+        # format has to be settled here.
+        compression = resolve_compression(path, compression)
+        self._file_obj = self._temp_path.open(mode, encoding=encoding, newline=newline,
+                                              compression=compression,
+                                              compression_level=compression_level,
+                                              threads=threads)
+
+    def __del__(self):
+        # An atomic file which was never closed wasn't finished, so it mustn't replace the
+        # destination.
+        if getattr(self, '_file_obj', None) is not None:
+            self.abort()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False  # Do not suppress exceptions.
+
+    @property
+    def path(self):
+        """The destination path."""
+        return self._path
+
+    @property
+    def temp_path(self):
+        """The path of the temporary file being written."""
+        return self._temp_path
+
+    @property
+    def closed(self):
+        """Whether the file has been closed or aborted."""
+        return self._file_obj is None
+
+    @property
+    def encoding(self):
+        """The encoding of the file."""
+        return self._file_obj.encoding
+
+    @property
+    def name(self):
+        """The name of the destination file."""
+        return self._path.name
+
+    def write(self, s):
+        """
+        Write to the file.
+
+        :param s: The string or bytes to write.
+        :return: The number of characters or bytes written.
+        """
+        return self._file_obj.write(s)
+
+    def writelines(self, lines):
+        """
+        Write a sequence of lines to the file.
+
+        :param lines: The lines to write.
+        :return: None
+        """
+        self._file_obj.writelines(lines)
+
+    def flush(self):
+        """Flush pending writes to the temporary file."""
+        self._file_obj.flush()
+
+    def sync(self):
+        """
+        Flush pending writes to the temporary file, and, if the fsync policy is FSYNC_EVERY_BLOCK,
+        sync them to disk.
+
+        :return: None
+        """
+        if self._fsync == FSYNC_EVERY_BLOCK:
+            sync_file_object(self._file_obj)
+        else:
+            self._file_obj.flush()
+
+    def tell(self):
+        """
+        Determine the current position in the file.
+
+        :return: The offset in the file.
+        """
+        return self._file_obj.tell()
+
+    def close(self):
+        """
+        Finish writing the file and rename it over the destination.
+
+        :return: None
+        """
+        if self._file_obj is None:
+            return
+        file_obj = self._file_obj
+        self._file_obj = None
+        try:
+            if self._fsync != FSYNC_NEVER:
+                sync_file_object(file_obj)
+            file_obj.close()
+            if not self._temp_path.connection.raw_move(self._temp_path, self._path):
+                log.warning("Could not rename %s to %s; copying it instead.",
+                            self._temp_path, self._path)
+                # Write over the destination in place, rather than removing it first, so it's never
+                # missing.
+                self._temp_path.connection.raw_copy(self._temp_path, self._path)
+                self._temp_path.discard()
+            elif self._fsync != FSYNC_NEVER and self._path.is_local:
+                _sync_local_dir(self._path.dir)
+        except BaseException:
+            self._discard_temp()
+            raise
+
+    def abort(self):
+        """
+        Discard the temporary file, leaving the destination as it was.
+
+        :return: None
+        """
+        file_obj = self._file_obj
+        self._file_obj = None
+        try:
+            if file_obj is not None:
+                file_obj.close()
+        finally:
+            self._discard_temp()
+
+    def _discard_temp(self):
+        try:
+            self._temp_path.discard()
+        except Exception:
+            log.exception("Could not remove temporary file %s.", self._temp_path)
@@ -0,0 +1,971 @@
+"""
+Caching of file system metadata
+"""
+
+
+import collections
+import threading
+import time
+
+from ..abc.files import Path, FSConnector, fs_connection
+from ..exceptions import OperationNotSupportedError, verify_type
+from .watching import FileEvent, Watcher
+
+
+__author__ = 'Aaron Hosford'
+__all__ = [
+    'MetadataCache',
+    'CachingFSConnector',
+    'caching_fs_connection',
+]
+
+
+DEFAULT_CACHE_TTL = 30  # Seconds
+DEFAULT_CACHE_SIZE = 4096  # Paths
+
+
+class MetadataCache:
+    """
+    A thread-safe, size-bounded cache of query results, organized by path so that everything known
+    about a path, its descendants, and its ancestors can be discarded together when it changes.
+    Paths are keyed by the identity of their file system and their absolute location on it, so
+    connections sharing the cache see the same results for the same file system object, whatever
+    their working directories, and never see each other's results for different file systems.
+    Paths on file systems which can't be identified are never cached. Results expire once they are
+    older than the time to live. When the cache holds results for more than its maximum number of
+    paths, the least recently used paths are dropped.
+    """
+
+    def __init__(self, ttl=DEFAULT_CACHE_TTL, max_size=DEFAULT_CACHE_SIZE):
+        verify_type(ttl, (int, float))
+        assert ttl >= 0
+        verify_type(max_size, int)
+        assert max_size > 0
+        self._ttl = ttl
+        self._max_size = max_size
+        self._lock = threading.Lock()
+
+        # Maps each (identity, components) key to {query: (expiration, result)}, least recently
+        # used first.
+        self._entries = collections.OrderedDict()
+
+    @property
+    def ttl(self):
+        """The number of seconds a result remains valid."""
+        return self._ttl
+
+    @property
+    def max_size(self):
+        """The maximum number of paths results are kept for."""
+        return self._max_size
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    @staticmethod
+    def _key(path):
+        # Return the identity of the path's file system and the components of its absolute location,
+        # or None if the file system can't be identified.
+        identity = path.connection.identity
+        if identity is None:
+            return None
+        return identity, abs(path).components
+
+    def get(self, path, query):
+        """
+        Look up a result.
+
+        :param path: The path the query was made about.
+        :param query: A hashable description of the query.
+        :return: A tuple, (found, result).
+        """
+        key = self._key(path)
+        if key is None:
+            return False, None
+        with self._lock:
+            results = self._entries.get(key)
+            if results is None:
+                return False, None
+            cached = results.get(query)
+            if cached is None:
+                return False, None
+            expiration, result = cached
+            if expiration < time.monotonic():
+                del results[query]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, result
+
+    def put(self, path, query, result):
+        """
+        Store a result.
+
+        :param path: The path the query was made about.
+        :param query: A hashable description of the query.
+        :param result: The result of the query.
+        :return: None
+        """
+        key = self._key(path)
+        if key is None:
+            return
+        expiration = time.monotonic() + self._ttl
+        with self._lock:
+            results = self._entries.get(key)
+            if results is None:
+                results = self._entries[key] = {}
+                while len(self._entries) > self._max_size:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(key)
+            results[query] = (expiration, result)
+
+    def invalidate(self, path):
+        """
+        Discard the results for a path, for everything under it, and for each of its ancestors,
+        whose listings and existence may have changed along with it. The path can belong to any
+        connection to the file system.
+
+        :param path: The path which has changed.
+        :return: None
+        """
+        key = self._key(path)
+        if key is None:
+            return
+        identity, components = key
+        depth = len(components)
+        with self._lock:
+            stale = [
+                (entry_identity, entry_components)
+                for entry_identity, entry_components in self._entries
+                if entry_identity == identity and
+                (entry_components[:depth] == components or
+                 components[:len(entry_components)] == entry_components)
+            ]
+            for entry_key in stale:
+                del self._entries[entry_key]
+
+    def clear(self):
+        """
+        Discard all results.
+
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+class CachingFSConnector(FSConnector):
+    """
+    A CachingFSConnector creates caching_fs_connection instances which wrap connections created by
+    another file system connector. All the connections it creates share the same cache.
+    """
+
+    @classmethod
+    def load_url(cls, manager, url):
+        """
+        Load a new Path instance from a URL string. Caching connectors have no URL scheme of their
+        own; configure caching on the underlying connector instead.
+
+        :param manager: The ConfigManager instance.
+        :param url: The URL to load.
+        :return: The resultant Path instance.
+        """
+        raise OperationNotSupportedError()
+
+    def __init__(self, connector, ttl=DEFAULT_CACHE_TTL, max_size=DEFAULT_CACHE_SIZE):
+        verify_type(connector, FSConnector)
+        super().__init__(caching_fs_connection)
+        self._connector = connector
+        self._cache = MetadataCache(ttl, max_size)
+
+    @property
+    def connector(self):
+        """The connector whose connections are wrapped."""
+        return self._connector
+
+    @property
+    def cache(self):
+        """The cache shared by this connector's connections."""
+        return self._cache
+
+    def connect(self, wrapped=None):
+        """
+        Create a new connection and return it.
+
+        :param wrapped: An existing connection created by the underlying connector, to be wrapped in
+            place of a new one.
+        :return: A new caching_fs_connection instance.
+        """
+        return super().connect(wrapped)
+
+
+# noinspection PyPep8Naming
+class caching_fs_connection(fs_connection):
+    """
+    A caching_fs_connection wraps another file system connection, remembering the answers to
+    metadata and listing queries for a limited time so repeated questions about the same paths
+    don't go back to the file system. Changes made through the caching connection discard the
+    answers they affect. Changes made by other means are not seen until the answers expire.
+    """
+
+    @classmethod
+    def get_connector_type(cls):
+        """Get the connector type associated with this connection type."""
+        return CachingFSConnector
+
+    def __init__(self, connector, wrapped=None):
+        verify_type(connector, CachingFSConnector)
+        if wrapped is None:
+            wrapped = connector.connector.connect_uncached()
+        verify_type(wrapped, fs_connection)
+        super().__init__(connector)
+        self._wrapped = wrapped
+        self._cache = connector.cache
+        if wrapped.is_open:
+            super().open()
+
+    @property
+    def wrapped(self):
+        """The connection being wrapped."""
+        return self._wrapped
+
+    @property
+    def cache(self):
+        """The cache of query results."""
+        return self._cache
+
+    @property
+    def identity(self):
+        """A string identifying the file system the wrapped connection reaches."""
+        return self._wrapped.identity
+
+    @property
+    def clone_limit(self):
+        """The maximum number of clones of the wrapped connection which can be open at once."""
+        return self._wrapped.clone_limit
+
+    def __repr__(self):
+        return type(self).__name__ + '(' + repr(self._wrapped) + ')'
+
+    def open(self):
+        """Open the connection."""
+        if not self._wrapped.is_open:
+            self._wrapped.open()
+        super().open()
+
+    def close(self):
+        """Close the connection."""
+        super().close()
+        if self._wrapped.is_open:
+            self._wrapped.close()
+
+    def clone(self):
+        """
+        Return an open connection to the same file system, with the same CWD, which can be used from
+        another thread concurrently with this one. The clone shares this connection's cache.
+
+        :return: An open caching_fs_connection instance.
+        """
+        clone = self._wrapped.clone()
+        if clone is self._wrapped:
+            return self
+        return self.connector.connect(clone)
+
+    def _rehome(self, path):
+        # Convert a path on the wrapped connection into one on this connection.
+        if path is None:
+            return None
+        return Path(str(path), self)
+
+    def _unwrap(self, path):
+        # Convert a path on this or another caching connection into one on the wrapped connection.
+        connection = path.connection
+        if isinstance(connection, caching_fs_connection):
+            return Path(str(path), connection.wrapped)
+        return path
+
+    def _invalidate(self, path):
+        # Discard cached results affected by a change to the path. The path may belong to another
+        # connection, with a cache of its own, or to another file system, in which case there may
+        # be nothing to discard from ours.
+        if not isinstance(path, Path):
+            path = Path(self.check_path(path), self)
+        connection = path.connection
+        if isinstance(connection, caching_fs_connection) and connection.cache is not self._cache:
+            connection.cache.invalidate(path)
+        self._cache.invalidate(path)
+
+    def _query(self, name, path, *args):
+        # Answer the query from the cache if possible, or else ask the wrapped connection and
+        # remember its answer.
+        path = Path(self.check_path(path), self)
+        query = (name,) + args
+        found, result = self._cache.get(path, query)
+        if not found:
+            result = getattr(self._wrapped, name)(str(path), *args)
+            self._cache.put(path, query, result)
+        return result
+
+    def check_path(self, path):
+        """
+        Verify that the path is valid for this file system connection, and return it in string form.
+
+        :param path: The path to check.
+        :return: The path, as a string value.
+        """
+        if isinstance(path, Path):
+            verify_type(path, Path)
+            assert path.connection == self
+            path = str(path)
+        return self._wrapped.check_path(path)
+
+    def getcwd(self):
+        """The current working directory of this file system connection."""
+        return self._rehome(self._wrapped.getcwd())
+
+    def chdir(self, path):
+        """Change the current working directory of this file system connection."""
+        self._wrapped.chdir(self.check_path(path))
+        super().chdir(path)
+
+    def find(self, path, include_cwd=True):
+        """
+        Try to look up the file system object using the PATH system environment variable. Return the
+        located file system object (as a Path instance) on success or None on failure.
+
+        :param path: The path to operate on.
+        :param include_cwd: Whether the current working directory be checked before the PATH.
+        :return: A Path representing the located object, or None.
+        """
+        return self._rehome(self._wrapped.find(self.check_path(path), include_cwd))
+
+    def is_local(self, path):
+        """
+        Whether the path refers to a local file system object.
+
+        :param path: The path to check.
+        :return: A bool.
+        """
+        return self._wrapped.is_local(self.check_path(path))
+
+    @property
+    def temp_dir(self):
+        """
+        Locate a directory that can be safely used for temporary files.
+
+        :return: The path to the temporary directory, or None.
+        """
+        return self._rehome(self._wrapped.temp_dir)
+
+    def abs_path(self, path):
+        """
+        Return an absolute form of a potentially relative path.
+
+        :param path: The path to operate on.
+        :return: The absolute path.
+        """
+        return self._rehome(self._wrapped.abs_path(self.check_path(path)))
+
+    def join(self, *path_elements):
+        """
+        Join several path elements together into a single path.
+
+        :param path_elements: The path elements to join.
+        :return: The resulting path.
+        """
+        path_elements = tuple(self.check_path(element) for element in path_elements)
+        return self._rehome(self._wrapped.join(*path_elements))
+
+    def name(self, path):
+        """
+        Get the name of the file system object.
+
+        :param path: The path to operate on.
+        :return: The name.
+        """
+        return self._wrapped.name(self.check_path(path))
+
+    def dir(self, path):
+        """
+        Get the parent directory of the file system object.
+
+        :param path: The path to operate on.
+        :return: The parent directory's path, or None.
+        """
+        return self._rehome(self._wrapped.dir(self.check_path(path)))
+
+    def components(self, path):
+        """
+        Split the path into its normalized components.
+
+        :param path: The path to operate on.
+        :return: A tuple of strings.
+        """
+        return self._wrapped.components(self.check_path(path))
+
+    def bare_name(self, path):
+        """
+        Get the name of the file system object, minus any extension.
+
+        :param path: The path to operate on.
+        :return: The name, minus any extension.
+        """
+        return self._wrapped.bare_name(self.check_path(path))
+
+    def extension(self, path):
+        """
+        Get the extension of the file system object, or the empty string.
+
+        :param path: The path to operate on.
+        :return: The extension.
+        """
+        return self._wrapped.extension(self.check_path(path))
+
+    def _status(self, path):
+        # Get the path's FileStatus, from the cache if possible. Most metadata queries are answered
+        # from it, so asking several questions about a path costs a single call. Nonexistence is
+        # remembered as None, and connections which can't provide a status as NotImplemented.
+        path = Path(self.check_path(path), self)
+        found, status = self._cache.get(path, ('stat',))
+        if not found:
+            try:
+                status = self._wrapped.stat(str(path))
+            except FileNotFoundError:
+                status = None
+            except OperationNotSupportedError:
+                status = NotImplemented
+            self._cache.put(path, ('stat',), status)
+        return status
+
+    def _field(self, name, path):
+        # Answer from the path's status if it has the field, or else query it directly.
+        status = self._status(path)
+        if status is None:
+            raise FileNotFoundError(self.check_path(path))
+        if status is not NotImplemented:
+            value = getattr(status, name)
+            if value is not None:
+                return value
+        return self._query(name, path)
+
+    def is_dir(self, path):
+        """
+        Determine if the path refers to an existing directory.
+
+        :param path: The path to operate on.
+        :return: Whether the path is a directory.
+        """
+        status = self._status(path)
+        if status is None:
+            return False
+        if status is NotImplemented or status.is_dir is None:
+            return self._query('is_dir', path)
+        return status.is_dir
+
+    def is_file(self, path):
+        """
+        Determine if the path refers to an existing file.
+
+        :param path: The path to operate on.
+        :return: Whether the path is a file.
+        """
+        status = self._status(path)
+        if status is None:
+            return False
+        if status is NotImplemented or status.is_file is None:
+            return self._query('is_file', path)
+        return status.is_file
+
+    def is_link(self, path):
+        """
+        Determine if the path refers to a symbolic link.
+
+        :param path: The path to operate on.
+        :return: Whether the path is a symbolic link.
+        """
+        status = self._status(path)
+        if status is None or status is NotImplemented or status.is_link is None:
+            # Links are followed, so a broken link has no status, and we have to ask.
+            return self._query('is_link', path)
+        return status.is_link
+
+    def exists(self, path):
+        """
+        Determine if the path refers to an existing file object.
+
+        :param path: The path to operate on.
+        :return: Whether the path exists.
+        """
+        status = self._status(path)
+        if status is NotImplemented:
+            return self._query('exists', path)
+        return status is not None
+
+    def protection_mode(self, path):
+        """
+        Return the protection mode of the path.
+
+        :param path: The path to operate on.
+        :return: The protection mode bits.
+        """
+        return self._field('protection_mode', path)
+
+    def inode_number(self, path):
+        """
+        Get the inode number of the file system object.
+
+        :param path: The path to operate on.
+        :return: The inode number.
+        """
+        return self._field('inode_number', path)
+
+    def device(self, path):
+        """
+        Get the device of the file system object.
+
+        :param path: The path to operate on.
+        :return: The device.
+        """
+        return self._field('device', path)
+
+    def hard_link_count(self, path):
+        """
+        Get the number of hard links to the file system object.
+
+        :param path: The path to operate on.
+        :return: The number of hard links.
+        """
+        return self._field('hard_link_count', path)
+
+    def owner_user_id(self, path):
+        """
+        Get the user ID of the owner of the file system object.
+
+        :param path: The path to operate on.
+        :return: The owner's user ID.
+        """
+        return self._field('owner_user_id', path)
+
+    def owner_group_id(self, path):
+        """
+        The group ID of the owner of the file system object.
+
+        :param path: The path to operate on.
+        :return: The owner's group ID.
+        """
+        return self._field('owner_group_id', path)
+
+    def size(self, path):
+        """
+        Get the size of the file.
+
+        :param path: The path to operate on.
+        :return: The size in bytes.
+        """
+        return self._field('size', path)
+
+    def accessed_time(self, path):
+        """
+        Get the last time the file system object was accessed.
+
+        :param path: The path to operate on.
+        :return: The time stamp, as a float.
+        """
+        return self._field('accessed_time', path)
+
+    def modified_time(self, path):
+        """
+        Get the last time the data of file system object was modified.
+
+        :param path: The path to operate on.
+        :return: The time stamp, as a float.
+        """
+        return self._field('modified_time', path)
+
+    def set_modified_time(self, path, timestamp):
+        """
+        Set the last time the data of the file system object was modified.
+
+        :param path: The path to operate on.
+        :param timestamp: The time stamp, as a float.
+        :return: None
+        """
+        path = Path(self.check_path(path), self)
+        try:
+            self._wrapped.set_modified_time(str(path), timestamp)
+        finally:
+            self._invalidate(path)
+
+    def metadata_changed_time(self, path):
+        """
+        Get the last time the data or metadata of the file system object was modified.
+
+        :param path: The path to operate on.
+        :return: The time stamp, as a float.
+        """
+        return self._field('metadata_changed_time', path)
+
+    def stat(self, path):
+        """
+        Get the metadata of the file system object in a single call, as an immutable record.
+
+        :param path: The path to operate on.
+        :return: A FileStatus instance.
+        """
+        status = self._status(path)
+        if status is None:
+            raise FileNotFoundError(self.check_path(path))
+        if status is NotImplemented:
+            raise OperationNotSupportedError()
+        return status
+
+    def list(self, path, pattern='*'):
+        """
+        Return a list of the names of the files and directories appearing in this folder.
+
+        :param path: The path to operate on.
+        :param pattern: A glob-style pattern against which names must match.
+        :return: A list of matching file and directory names.
+        """
+        return list(self._query('list', path, pattern))
+
+    def glob(self, path, pattern='*'):
+        """
+        Return a list of the source_paths to the files and directories appearing in this folder.
+
+        :param path: The path to operate on.
+        :param pattern: A glob-style pattern against which names must match.
+        :return: A list of Path instances for each matching file and directory name.
+        """
+        return [self._rehome(match) for match in self._query('glob', path, pattern)]
+
+    def scan(self, path, pattern='*'):
+        """
+        Return the paths of the files and directories appearing in this folder, each paired with a
+        FileStatus snapshot of its metadata taken when the folder was listed. The listing is cached,
+        and the children's statuses are remembered along with it, so later metadata queries about
+        them are answered from the cache.
+
+        :param path: The path to operate on.
+        :param pattern: A glob-style pattern against which names must match.
+        :return: A list of (Path, FileStatus) pairs for each matching file and directory name.
+        """
+        results = []
+        for child, status in self._query('scan', path, pattern):
+            child = self._rehome(child)
+            if not status.is_link:
+                # Links may be broken, and described as themselves, so they're left to stat().
+                self._cache.put(child, ('stat',), status)
+            results.append((child, status))
+        return results
+
+    def walk(self, path, topdown=True, onerror=None, followlinks=False, workers=None):
+        """
+        Walk the directory tree rooted at this path, in the same manner as os.walk(). The walk is
+        delegated to the wrapped connection, bypassing the cache.
+
+        :param path: The path to operate on.
+        :param topdown: Whether parent directories are yielded before their children.
+        :param onerror: A function which is called with the exception when an error occurs.
+        :param followlinks: Whether to walk into directories which are symbolic links.
+        :param workers: The maximum number of directories to list concurrently, for connections
+            which support concurrent listing.
+        :return: An iterator over (dir_path, dir_names, file_names) tuples.
+        """
+        walk = self._wrapped.walk(self.check_path(path), topdown, onerror, followlinks, workers)
+        for dir_path, dir_names, file_names in walk:
+            yield self._rehome(dir_path), dir_names, file_names
+
+    def find_unique_file(self, path, pattern='*', most_recent=True):
+        """
+        Find a file in the folder matching the given pattern and return it. If no such file is
+        found, return None. If multiple files are found, either disambiguate by recency if
+        most_recent is set, or raise an exception if most_recent is not set.
+
+        :param path: The path to operate on.
+        :param pattern: The pattern which the file must match. Default is '*' (all files).
+        :param most_recent: Whether to use recency to disambiguate when multiple files are matched
+            by the pattern.
+        :return: The uniquely identified file, as a Path instance, or None.
+        """
+        path = self.check_path(path)
+        return self._rehome(self._wrapped.find_unique_file(path, pattern, most_recent))
+
+    def is_stable(self, path, interval=None):
+        """
+        Watches for file size changes over time. Returns a Boolean indicating whether the file's
+        size was constant over the given interval. The sizes are never answered from the cache.
+
+        :param path: The path to operate on.
+        :param interval: The number of seconds to wait between checks. Default is 1 second.
+        """
+        return self._wrapped.is_stable(self.check_path(path), interval)
+
+    def watch(self, path, pattern='*', interval=None):
+        """
+        Watch a folder's contents, or a single file, for changes. Changes are detected by the
+        wrapped connection, never from the cache, and cached results about each changed path are
+        discarded as its changes are reported.
+
+        :param path: The path of the folder or file to watch. If it isn't an existing folder, its
+            parent folder is watched for changes to it alone.
+        :param pattern: A glob-style pattern which the names of reported files must match, when
+            watching a folder.
+        :param interval: The number of seconds between checks, for connections which have to poll
+            for changes. Default is 1 second.
+        :return: A Watcher instance, which reports changes as FileEvent instances.
+        """
+        path = Path(self.check_path(path), self)
+        return _CachingWatcher(self, self._wrapped.watch(self._unwrap(path), pattern, interval))
+
+    def wait_until_stable(self, path, interval=None, timeout=None):
+        """
+        Wait until a file has stopped changing. The file is stable once it has gone unchanged for
+        the interval, or, where the connection can see it happen, as soon as its writer closes it.
+        The file's status is never answered from the cache.
+
+        :param path: The path to operate on.
+        :param interval: The number of seconds the file must go unchanged. Default is 1 second.
+        :param timeout: The maximum number of seconds to wait. If None, wait indefinitely.
+        :return: Whether the file became stable before the timeout expired.
+        """
+        path = self.check_path(path)
+        try:
+            return self._wrapped.wait_until_stable(path, interval, timeout)
+        finally:
+            self._invalidate(path)
+
+    def wait_for_file(self, path, pattern='*', timeout=None, stable=True, interval=None):
+        """
+        Wait for a file matching the pattern to appear in a folder. If one is already there, it is
+        returned without waiting. The folder's contents are never answered from the cache.
+
+        :param path: The path of the folder.
+        :param pattern: A glob-style pattern which the file's name must match.
+        :param timeout: The maximum number of seconds to wait. If None, wait indefinitely.
+        :param stable: Whether to also wait for the file to stop changing.
+        :param interval: The number of seconds the file must go unchanged to be considered stable.
+            Default is 1 second.
+        :return: The path of the file, or None if the timeout expired first.
+        """
+        path = self.check_path(path)
+        try:
+            return self._rehome(self._wrapped.wait_for_file(path, pattern, timeout, stable,
+                                                            interval))
+        finally:
+            self._invalidate(path)
+
+    def open_file(self, path, mode='r', buffering=-1, encoding=None, errors=None, newline=None,
+                  closefd=True, opener=None):
+        """
+        Open the file. If the file is opened for writing, cached results about it are discarded,
+        both now and again when it is closed.
+
+        :param path: The path to operate on.
+        :param mode: The file mode.
+        :param buffering: The buffering policy.
+        :param encoding: The encoding.
+        :param errors: The error handling strategy.
+        :param newline: The character sequence to use for newlines.
+        :param closefd: Whether to close the descriptor after the file closes.
+        :param opener: A custom opener.
+        :return: The opened file object.
+        """
+        path = Path(self.check_path(path), self)
+        file_obj = self._wrapped.open_file(str(path), mode, buffering, encoding, errors, newline,
+                                           closefd, opener)
+        if not set(mode) & set('wax+'):
+            return file_obj
+        self._invalidate(path)
+        return _InvalidatingFile(file_obj, lambda: self._invalidate(path))
+
+    def open_mmap(self, path):
+        """
+        Map the file into memory, read-only, if the wrapped connection supports it.
+
+        :param path: The path to operate on.
+        :return: A read-only mmap.mmap instance.
+        """
+        return self._wrapped.open_mmap(self.check_path(path))
+
+    def read_view(self, path):
+        """
+        Return a read-only view of the file's contents.
+
+        :param path: The path to operate on.
+        :return: A read-only memoryview of the file's bytes.
+        """
+        return self._wrapped.read_view(self.check_path(path))
+
+    def remove(self, path):
+        """
+        Remove the folder or file. If it doesn't exist, an error is raised.
+
+        :param path: The path to operate on.
+        """
+        path = Path(self.check_path(path), self)
+        try:
+            self._wrapped.remove(str(path))
+        finally:
+            self._invalidate(path)
+
+    def make_dir(self, path, overwrite=False, clear=False, fill=True, check_only=None):
+        """
+        Create a directory at this location.
+
+        :param path: The path to operate on.
+        :param overwrite: Whether existing files/folders that conflict with this function are to be
+            deleted/overwritten.
+        :param clear: Whether the directory at this location must be empty for the function to be
+            satisfied.
+        :param fill: Whether the necessary parent folder(s) are to be created if the do not exist
+            already.
+        :param check_only: Whether the function should only check if it's possible, or actually
+            perform the operation.
+        :return: None
+        """
+        path = Path(self.check_path(path), self)
+        try:
+            self._wrapped.make_dir(str(path), overwrite, clear, fill, check_only)
+        finally:
+            if not check_only:
+                self._invalidate(path)
+
+    def raw_make_dir(self, path):
+        """
+        Create a directory at a specific path, with no validation.
+
+        :param path: The path to operate on.
+        :return: None
+        """
+        path = Path(self.check_path(path), self)
+        try:
+            self._wrapped.raw_make_dir(str(path))
+        finally:
+            self._invalidate(path)
+
+    def raw_copy(self, path, destination, block_size=None):
+        """
+        Copy from a specific path to another specific path, with no validation.
+
+        :param path: The path to operate on.
+        :param destination: The path to copy to.
+        :param block_size: The number of bytes copied per block, where applicable.
+        :return: None
+        """
+        verify_type(destination, Path)
+        try:
+            self._wrapped.raw_copy(self.check_path(path), self._unwrap(destination), block_size)
+        finally:
+            self._invalidate(destination)
+
+    def raw_copy_from(self, source, path):
+        """
+        Copy from a path on another connection to a specific path on this one, with no validation,
+        if the wrapped connection can do so natively.
+
+        :param source: The path to copy from.
+        :param path: The path to copy to.
+        :return: Whether the copy was performed.
+        """
+        path = Path(self.check_path(path), self)
+        try:
+            return self._wrapped.raw_copy_from(self._unwrap(source),
+                                               Path(str(path), self._wrapped))
+        finally:
+            self._invalidate(path)
+
+    def raw_move(self, path, destination):
+        """
+        Move a file or folder from a specific path to another specific path, with no validation, if
+        the wrapped connection can do so natively.
+
+        :param path: The path to operate on.
+        :param destination: The path to move to.
+        :return: Whether the move was performed.
+        """
+        path = Path(self.check_path(path), self)
+        verify_type(destination, Path)
+        try:
+            return self._wrapped.raw_move(str(path), self._unwrap(destination))
+        finally:
+            self._invalidate(path)
+            self._invalidate(destination)
+
+    def rename(self, path, new_name):
+        """
+        Rename a file object.
+
+        :param path: The path to be operated on.
+        :param new_name: The new name of the file object, as as string.
+        :return: None
+        """
+        path = Path(self.check_path(path), self)
+        try:
+            self._wrapped.rename(str(path), new_name)
+        finally:
+            self._invalidate(path)
+            if path.dir is not None:
+                self._invalidate(path.dir[new_name])
+
+
+class _InvalidatingFile:
+    # A thin wrapper around a file object opened for writing, which discards cached results about
+    # the file once it has been closed.
+
+    def __init__(self, file_obj, invalidate):
+        self._file_obj = file_obj
+        self._invalidate = invalidate
+
+    def __getattr__(self, name):
+        return getattr(self._file_obj, name)
+
+    def __iter__(self):
+        return iter(self._file_obj)
+
+    def __next__(self):
+        return next(self._file_obj)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def close(self):
+        """Close the file."""
+        try:
+            self._file_obj.close()
+        finally:
+            self._invalidate()
+
+
+class _CachingWatcher(Watcher):
+    # A thin wrapper around a watcher on the wrapped connection, which reports changes as paths on
+    # the caching connection, and discards cached results about each path as its changes arrive.
+
+    def __init__(self, connection, watcher):
+        super().__init__(connection._rehome(watcher.folder), watcher.pattern, watcher.name)
+        self._connection = connection
+        self._watcher = watcher
+
+    def _add(self, event):
+        if event is not None:
+            path = self._connection._rehome(event.path)
+            self._connection.cache.invalidate(path)
+            self._events.append(FileEvent(event.kind, path))
+
+    def _wait(self, timeout):
+        self._add(self._watcher.next_event(timeout))
+
+    def _collect(self):
+        self._add(self._watcher.pending_event())
+
+    def close(self):
+        """Stop watching."""
+        try:
+            self._watcher.close()
+        finally:
+            super().close()
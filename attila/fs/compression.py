@@ -0,0 +1,351 @@
+"""
+Transparent, streaming compression and decompression of files on any connection
+"""
+
+
+import bz2
+import collections
+import gzip
+import io
+
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+
+from ..abc.files import Path
+from ..exceptions import OperationNotSupportedError, verify_type
+
+
+__author__ = 'Aaron Hosford'
+__all__ = [
+    'GZIP',
+    'BZ2',
+    'XZ',
+    'infer_compression',
+    'resolve_compression',
+    'open_compressed',
+    'CompressedFile',
+    'ParallelCompressor',
+]
+
+
+GZIP = 'gzip'
+BZ2 = 'bz2'
+XZ = 'xz'
+COMPRESSION_FORMATS = (GZIP, BZ2, XZ)
+
+# The compression formats of files, by extension.
+COMPRESSION_EXTENSIONS = {
+    '.gz': GZIP,
+    '.gzip': GZIP,
+    '.bz2': BZ2,
+    '.xz': XZ,
+}
+
+# The number of uncompressed bytes each thread compresses at a time, when compressing in parallel.
+DEFAULT_COMPRESSION_BLOCK_SIZE = 1 << 22
+
+
+def infer_compression(name):
+    """
+    Determine the compression format of a file from its name.
+
+    :param name: The file name.
+    :return: The compression format, or None if the name doesn't indicate one.
+    """
+    verify_type(name, str)
+    return COMPRESSION_EXTENSIONS.get(_extension(name))
+
+
+def _extension(name):
+    index = name.rfind('.')
+    if index < 0:
+        return ''
+    return name[index:].lower()
+
+
+def resolve_compression(path, compression=NotImplemented):
+    """
+    Determine the compression format to use for a file.
+
+    :param path: The path of the file.
+    :param compression: The compression format: 'gzip', 'bz2', 'xz', or None for an uncompressed
+        file. By default, the format is determined by the file's extension.
+    :return: The compression format, or None.
+    """
+    verify_type(path, Path)
+    if compression is NotImplemented:
+        return infer_compression(path.name)
+    if compression is None:
+        return None
+    verify_type(compression, str, non_empty=True)
+    if compression not in COMPRESSION_FORMATS:
+        raise ValueError("Unsupported compression format: %r" % compression)
+    if compression == XZ and lzma is None:
+        raise OperationNotSupportedError("The lzma module is not available.")
+    return compression
+
+
+def _open_codec(compression, file_obj, mode, level):
+    # Open a compressed stream over a binary file object, which is left open when it's closed.
+    if compression == GZIP:
+        level = 9 if level is None else level
+        return gzip.GzipFile(fileobj=file_obj, mode=mode, compresslevel=level)
+    elif compression == BZ2:
+        level = 9 if level is None else level
+        return bz2.BZ2File(file_obj, mode, compresslevel=level)
+    else:
+        assert compression == XZ
+        return lzma.LZMAFile(file_obj, mode, preset=level)
+
+
+def _compress_function(compression, level):
+    # Return a function which compresses a block of data into a complete, self-contained stream.
+    # Concatenated streams are valid in all three formats, and decompress to the concatenated data.
+    if compression == GZIP:
+        level = 9 if level is None else level
+        return lambda data: gzip.compress(data, level)
+    elif compression == BZ2:
+        level = 9 if level is None else level
+        return lambda data: bz2.compress(data, level)
+    else:
+        assert compression == XZ
+        return lambda data: lzma.compress(data, lzma.FORMAT_XZ, preset=level)
+
+
+class CompressedFile(io.BufferedIOBase):
+    """
+    A CompressedFile reads or writes a compressed stream over a binary file object from any
+    connection, and closes the file object along with the stream.
+    """
+
+    def __init__(self, codec_file, file_obj):
+        super().__init__()
+        self._codec_file = codec_file
+        self._file_obj = file_obj
+
+    def readable(self):
+        """Whether the file can be read."""
+        return self._codec_file.readable()
+
+    def writable(self):
+        """Whether the file can be written."""
+        return self._codec_file.writable()
+
+    def read(self, size=-1):
+        """
+        Read and decompress up to size bytes. If no size is specified, read to the end of the file.
+
+        :param size: The number of bytes to read.
+        :return: The bytes read.
+        """
+        return self._codec_file.read(size)
+
+    def read1(self, size=-1):
+        """
+        Read and decompress up to size bytes, with at most one read from the file object.
+
+        :param size: The number of bytes to read.
+        :return: The bytes read.
+        """
+        return self._codec_file.read1(size)
+
+    def readinto(self, buffer):
+        """
+        Read and decompress bytes into a buffer.
+
+        :param buffer: A writable buffer.
+        :return: The number of bytes read.
+        """
+        return self._codec_file.readinto(buffer)
+
+    def readline(self, size=-1):
+        """
+        Read and decompress a line.
+
+        :param size: The maximum number of bytes to return.
+        :return: The bytes read.
+        """
+        return self._codec_file.readline(size)
+
+    def write(self, data):
+        """
+        Compress and write bytes.
+
+        :param data: The bytes to write.
+        :return: The number of uncompressed bytes written.
+        """
+        return self._codec_file.write(data)
+
+    def flush(self):
+        """Flush pending writes."""
+        if self.closed or self._codec_file.closed or not self._codec_file.writable():
+            return
+        self._codec_file.flush()
+        self._file_obj.flush()
+
+    def close(self):
+        """
+        Finish the compressed stream, if writing, and close the file object.
+
+        :return: None
+        """
+        if self.closed:
+            return
+        try:
+            try:
+                self._codec_file.close()
+            finally:
+                self._file_obj.close()
+        finally:
+            super().close()
+
+
+class ParallelCompressor(io.BufferedIOBase):
+    """
+    A ParallelCompressor compresses the data written to it in fixed-size blocks, on several threads
+    at once, and writes the compressed blocks to a binary file object in order. Each block becomes
+    a separate compressed stream, which costs a little in compression ratio, but standard tools
+    decompress the concatenated streams as a single file. The compressors release the GIL, so the
+    threads run in parallel.
+    """
+
+    def __init__(self, file_obj, compress, threads, block_size=None):
+        """
+        Wrap a binary file object with a parallel compressor.
+
+        :param file_obj: The file object to write compressed data to.
+        :param compress: A function which compresses a block of bytes into a self-contained stream.
+        :param threads: The number of threads to compress with.
+        :param block_size: The number of uncompressed bytes compressed at a time.
+        """
+        super().__init__()
+        assert callable(compress)
+        verify_type(threads, int)
+        assert threads > 0
+        if block_size is None:
+            block_size = DEFAULT_COMPRESSION_BLOCK_SIZE
+        verify_type(block_size, int)
+        assert block_size > 0
+
+        self._file_obj = file_obj
+        self._compress = compress
+        self._threads = threads
+        self._block_size = block_size
+        self._executor = ThreadPoolExecutor(threads)
+        self._pending = collections.deque()
+        self._buffer = bytearray()
+        self._submitted = 0
+
+    def writable(self):
+        """Whether the file can be written."""
+        return True
+
+    def write(self, data):
+        """
+        Write bytes, to be compressed.
+
+        :param data: The bytes to write.
+        :return: The number of uncompressed bytes written.
+        """
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+        self._buffer += data
+        while len(self._buffer) >= self._block_size:
+            block = bytes(self._buffer[:self._block_size])
+            del self._buffer[:self._block_size]
+            self._submit(block)
+        return len(data)
+
+    def _submit(self, block):
+        self._pending.append(self._executor.submit(self._compress, block))
+        self._submitted += 1
+        # Keep every thread busy, without holding more of the data in memory than that takes.
+        while len(self._pending) > 2 * self._threads:
+            self._file_obj.write(self._pending.popleft().result())
+
+    def flush(self):
+        """Compress and write out all the data written so far."""
+        if self.closed:
+            return
+        if self._buffer or not self._submitted:
+            # Even an empty file gets a stream, so it's valid in its compression format.
+            block = bytes(self._buffer)
+            del self._buffer[:]
+            self._submit(block)
+        while self._pending:
+            self._file_obj.write(self._pending.popleft().result())
+        self._file_obj.flush()
+
+    def close(self):
+        """
+        Compress and write out the remaining data, and close the file object.
+
+        :return: None
+        """
+        if self.closed:
+            return
+        try:
+            super().close()  # Flushes the remaining data.
+        finally:
+            for future in self._pending:
+                future.cancel()
+            self._executor.shutdown()
+            self._file_obj.close()
+
+
+def open_compressed(path, mode='r', compression=NotImplemented, level=None, threads=None,
+                    encoding=None, errors=None, newline=None):
+    """
+    Open a file, decompressing it as it's read or compressing it as it's written. The file is
+    streamed through the compressor, so it works with any connection which can open files in
+    binary mode. Appending adds a new compressed stream to the end of the file.
+
+    :param path: The path of the file.
+    :param mode: The file mode, one of 'r', 'w', 'a', or 'x', with 'b' or 't' optionally added.
+    :param compression: The compression format: 'gzip', 'bz2', 'xz', or None for an uncompressed
+        file. By default, the format is determined by the file's extension.
+    :param level: The compression level, when writing. Defaults to 9 for gzip and bz2, and 6 for
+        xz.
+    :param threads: The number of threads to compress with, when writing. Large files compress
+        faster with several threads. If not set, a single thread is used.
+    :param encoding: The encoding, for text modes.
+    :param errors: The error handling strategy, for text modes.
+    :param newline: The character sequence to use for newlines, for text modes.
+    :return: The opened file object.
+    """
+    verify_type(path, Path)
+    verify_type(threads, int, allow_none=True)
+    compression = resolve_compression(path, compression)
+
+    binary = 'b' in mode
+    if binary and (encoding is not None or errors is not None or newline is not None):
+        raise ValueError("Binary mode doesn't take encoding, errors, or newline arguments.")
+
+    if compression is None:
+        return path.connection.open_file(path, mode, encoding=encoding, errors=errors,
+                                         newline=newline)
+
+    base_mode = mode.replace('b', '').replace('t', '')
+    if base_mode not in ('r', 'w', 'a', 'x'):
+        raise ValueError("Unsupported mode for compressed files: %r" % mode)
+
+    file_obj = path.connection.open_file(path, base_mode + 'b')
+    try:
+        if base_mode == 'r':
+            stream = CompressedFile(_open_codec(compression, file_obj, 'rb', None), file_obj)
+        elif threads is not None and threads > 1:
+            stream = ParallelCompressor(file_obj, _compress_function(compression, level), threads)
+        else:
+            stream = CompressedFile(_open_codec(compression, file_obj, 'wb', level), file_obj)
+    except:
+        file_obj.close()
+        raise
+
+    if binary:
+        return stream
+    return io.TextIOWrapper(stream, encoding, errors, newline)
@@ -3,11 +3,21 @@ FTP file system support
 """
 
 
+import atexit
+import calendar
+import datetime
 import ftplib
+import io
+import logging
 import os
+import posixpath
+import queue
 import socket
+import threading
 import time
 
+from concurrent.futures import ThreadPoolExecutor
+
 from distutils.util import strtobool
 from urllib.parse import urlparse
 
@@ -15,26 +25,530 @@ from urllib.parse import urlparse
 from .. import strings
 from . import local
 
-from ..abc.files import Path, FSConnector, fs_connection
+from ..abc.files import Path, FileStatus, FSConnector, fs_connection
 
 from ..configurations import ConfigManager
-from ..exceptions import verify_type, OperationNotSupportedError
+from ..exceptions import DirectoryNotEmptyError, OperationNotSupportedError, verify_type
 from ..plugins import config_loader, url_scheme
 from ..security import credentials
-from .proxies import ProxyFile
+from .proxies import DEFAULT_SPOOL_SIZE, WRITEBACK_ON_CLOSE, WRITEBACK_POLICIES, ProxyFile, \
+    SpooledProxyFile, open_spooled_reader
 
 
 __author__ = 'Aaron Hosford'
 __all__ = [
+    'FTPSessionPool',
     'FTPConnector',
     'ftp_connection',
 ]
 
 
+log = logging.getLogger(__name__)
+
+
 DEFAULT_FTP_PORT = 21
 INT_TIME_FORMAT = '%Y%m%d%H%M%S'
 FLOAT_TIME_FORMAT = '%Y%m%d%H%M%S.%f'
 
+DEFAULT_POOL_SIZE = 8
+DEFAULT_POOL_IDLE_TIMEOUT = 300  # Seconds
+DEFAULT_POOL_TIMEOUT = 60  # Seconds
+
+STREAM_BUFFER_SIZE = 1 << 16  # Bytes
+
+DEFAULT_TRANSFER_CHUNK_SIZE = 1 << 16  # Bytes
+DEFAULT_TRANSFER_RETRIES = 3
+DEFAULT_TRANSFER_RETRY_INTERVAL = 5  # Seconds
+
+# Errors after which a transfer is worth retrying on a fresh session.
+TRANSIENT_ERRORS = (ConnectionError, socket.timeout, EOFError, ftplib.error_temp,
+                    ftplib.error_reply)
+
+# Reply codes indicating the server does not recognize or implement a command.
+UNSUPPORTED_COMMAND_CODES = ('500', '502', '504')
+
+# Words which, in a 550 reply, indicate access was refused, rather than that the file system object
+# doesn't exist.
+ACCESS_DENIED_WORDS = ('denied', 'permission', 'not allowed', 'forbidden')
+
+# The type facts MLSD and MLST use for symbolic links, which RFC 3659 leaves up to the server.
+LINK_TYPE_PREFIXES = ('os.unix=slink', 'os.unix=symlink', 'os.unix=link')
+
+MONTHS = {
+    name: number
+    for number, name in enumerate(('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep',
+                                   'oct', 'nov', 'dec'), 1)
+}
+
+
+def parse_timestamp(timestamp):
+    """
+    Parse a time value as returned by the MDTM and MLSD commands, of the form YYYYMMDDHHMMSS[.sss].
+    Per RFC 3659, these values are expressed in UTC.
+
+    :param timestamp: The time value string.
+    :return: The time stamp, as a float.
+    """
+    if '.' in timestamp:
+        time_format = FLOAT_TIME_FORMAT
+    else:
+        time_format = INT_TIME_FORMAT
+    parsed = datetime.datetime.strptime(timestamp, time_format)
+    return calendar.timegm(parsed.timetuple()) + parsed.microsecond / 1000000
+
+
+def parse_list_line(line):
+    """
+    Parse a line of LIST output in either of the two common formats, Unix ("ls -l") style or DOS
+    style, into a name and a dictionary of facts. The facts dictionary uses the same keys and type
+    names as MLSD: 'type' is one of 'file', 'dir', or 'link', 'size' is an int, and 'modify' is a
+    time stamp as returned by parse_timestamp(). Return None if the line is not in a recognized
+    format, as is the case for the "total" line which often precedes a Unix style listing.
+
+    :param line: The line of LIST output.
+    :return: A tuple, (name, facts), or None.
+    """
+    pieces = line.split(None, 8)
+
+    # Unix style: drwxr-xr-x 2 owner group 4096 Jan 01 12:00 name
+    if len(pieces) == 9 and len(pieces[0]) >= 10 and pieces[0][0] in '-dl':
+        mode, _, _, _, size, month, day, year_or_time, name = pieces
+        if not size.isdigit() or month.lower() not in MONTHS or not day.isdigit():
+            return None
+        facts = {'type': {'-': 'file', 'd': 'dir', 'l': 'link'}[mode[0]], 'size': int(size)}
+        if mode[0] == 'l' and ' -> ' in name:
+            name = name.split(' -> ')[0]
+        try:
+            if ':' in year_or_time:
+                # Dates in the past six months are listed with a time instead of a year.
+                hour, minute = year_or_time.split(':')
+                now = datetime.datetime.utcnow()
+                modified = datetime.datetime(now.year, MONTHS[month.lower()], int(day), int(hour),
+                                             int(minute))
+                if modified > now + datetime.timedelta(days=1):
+                    modified = modified.replace(year=now.year - 1)
+            else:
+                modified = datetime.datetime(int(year_or_time), MONTHS[month.lower()], int(day))
+        except ValueError:
+            pass
+        else:
+            facts['modify'] = calendar.timegm(modified.timetuple())
+        return name, facts
+
+    # DOS style: 01-31-17  12:00PM       <DIR>          name
+    pieces = line.split(None, 3)
+    if len(pieces) == 4 and pieces[0].count('-') == 2:
+        date, time_of_day, size, name = pieces
+        try:
+            modified = datetime.datetime.strptime(date + ' ' + time_of_day, '%m-%d-%y %I:%M%p')
+        except ValueError:
+            return None
+        if size.upper() == '<DIR>':
+            facts = {'type': 'dir'}
+        elif size.isdigit():
+            facts = {'type': 'file', 'size': int(size)}
+        else:
+            return None
+        facts['modify'] = calendar.timegm(modified.timetuple())
+        return name, facts
+
+    return None
+
+
+def normalize_facts(facts):
+    """
+    Convert the raw string facts returned by MLSD or MLST into the same form returned by
+    parse_list_line(): the type name is lower-cased, symbolic links are given the type 'link', the
+    size is converted to an int, and the modification time is converted to a time stamp. Facts that
+    can't be parsed are dropped.
+
+    :param facts: A dictionary mapping lower-case fact names to string values.
+    :return: A new dictionary of normalized facts.
+    """
+    result = dict(facts)
+    if 'type' in result:
+        result['type'] = result['type'].lower()
+        if result['type'].startswith(LINK_TYPE_PREFIXES):
+            result['type'] = 'link'
+    for key, parser in (('size', int), ('sizd', int), ('modify', parse_timestamp)):
+        if key in result:
+            try:
+                result[key] = parser(result[key])
+            except ValueError:
+                del result[key]
+    if 'size' not in result and 'sizd' in result:
+        result['size'] = result['sizd']
+    return result
+
+
+def facts_to_status(facts):
+    """
+    Convert a dictionary of normalized facts, as returned by normalize_facts() or parse_list_line(),
+    into a FileStatus. Facts the server didn't provide are left as None. The type of a symbolic
+    link is None, since it can't be classified without following the link. As with the other
+    connection types, the access and metadata change times default to the modification time.
+
+    :param facts: A dictionary of normalized facts.
+    :return: A FileStatus instance.
+    """
+    file_type = facts.get('type')
+    if file_type in ('dir', 'cdir', 'pdir'):
+        file_type = 'dir'
+    elif file_type != 'file':
+        # Links and other exotic types can't be classified without following them.
+        file_type = None
+
+    integers = {}
+    for key, base in (('unix.mode', 8), ('unix.uid', 10), ('unix.gid', 10)):
+        try:
+            integers[key] = int(facts[key], base)
+        except (KeyError, TypeError, ValueError):
+            integers[key] = None
+
+    modified_time = facts.get('modify')
+    return FileStatus(
+        type=file_type,
+        is_link=True if facts.get('type') == 'link' else None,
+        size=facts.get('size'),
+        modified_time=modified_time,
+        accessed_time=modified_time,
+        metadata_changed_time=modified_time,
+        protection_mode=integers['unix.mode'],
+        inode_number=None,
+        device=None,
+        hard_link_count=None,
+        owner_user_id=integers['unix.uid'],
+        owner_group_id=integers['unix.gid'],
+    )
+
+
+def _reply_code(exc):
+    return str(exc)[:3]
+
+
+def _is_missing(exc):
+    # Whether an error reply says the file system object doesn't exist, as opposed to, for example,
+    # access to it being denied. Servers use 550 for both, so the message has to be checked.
+    message = str(exc).lower()
+    return _reply_code(exc) == '550' and not any(word in message for word in ACCESS_DENIED_WORDS)
+
+
+def _is_list_total(line):
+    # Whether a line of LIST output is the "total" line which precedes many Unix style listings.
+    pieces = line.split()
+    return len(pieces) == 2 and pieces[0].lower() == 'total' and pieces[1].isdigit()
+
+
+class FTPSessionPool:
+    """
+    A thread-safe, bounded pool of logged-in ftplib.FTP sessions, all sharing the same server, port,
+    credential, and passive mode setting. Sessions are handed out by checkout() and reclaimed by
+    checkin(), so the TCP connection and login handshake are only paid for once per session rather
+    than once per ftp_connection. Idle sessions are health checked with a NOOP command before they
+    are handed out, and sessions which have sat idle for longer than the idle timeout are evicted.
+    """
+
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    @classmethod
+    def get_pool(cls, connector):
+        """
+        Get the shared session pool for the given connector, creating it if necessary. Connectors
+        with the same server, port, credential, passive mode setting, and pool settings share the
+        same pool. Connectors to the same server with different pool settings get separate pools,
+        so each is held to the size and timeouts it asked for.
+
+        :param connector: An FTPConnector instance.
+        :return: The FTPSessionPool instance.
+        """
+        verify_type(connector, FTPConnector)
+        key = (connector.server, connector.port, connector.credential, connector.passive,
+               connector.pool_size, connector.pool_idle_timeout, connector.pool_timeout)
+        with cls._pools_lock:
+            pool = cls._pools.get(key)
+            if pool is None:
+                pool = cls(*key)
+                cls._pools[key] = pool
+            return pool
+
+    @classmethod
+    def clear_all(cls):
+        """
+        Close the idle sessions of every pool. Sessions which are currently checked out are closed
+        when they are checked back in.
+
+        :return: None
+        """
+        with cls._pools_lock:
+            pools = list(cls._pools.values())
+        for pool in pools:
+            pool.clear()
+
+    def __init__(self, server, port, credential=None, passive=True, max_size=DEFAULT_POOL_SIZE,
+                 idle_timeout=DEFAULT_POOL_IDLE_TIMEOUT, timeout=DEFAULT_POOL_TIMEOUT):
+        verify_type(server, str, non_empty=True)
+        verify_type(port, int)
+        verify_type(passive, bool)
+        verify_type(max_size, int)
+        assert max_size > 0
+        verify_type(idle_timeout, (int, float), allow_none=True)
+        verify_type(timeout, (int, float), allow_none=True)
+
+        self._server = server
+        self._port = port
+        self._credential = credential
+        self._passive = passive
+        self._max_size = max_size
+        self._idle_timeout = idle_timeout
+        self._timeout = timeout
+
+        self._condition = threading.Condition()
+        self._idle = []  # (session, home directory, time of last use), most recently used last
+        self._homes = {}  # Maps sessions to their post-login working directories
+        self._size = 0  # Idle plus checked out sessions
+        self._generation = 0  # Incremented by clear() so stale sessions are not reused
+
+        # Server capabilities discovered by connections using the pool, e.g. whether the MLSD
+        # command is supported, so they only have to be probed once per server.
+        self.capabilities = {}
+
+    def __repr__(self):
+        return type(self).__name__ + repr((self._server, self._port, self._credential,
+                                           self._passive))
+
+    @property
+    def max_size(self):
+        """The maximum number of sessions, idle or checked out, the pool will maintain at once."""
+        return self._max_size
+
+    @property
+    def idle_timeout(self):
+        """The number of seconds an idle session is retained before it is evicted, or None."""
+        return self._idle_timeout
+
+    @property
+    def timeout(self):
+        """The number of seconds checkout() waits for a free session, or None to wait forever."""
+        return self._timeout
+
+    @property
+    def size(self):
+        """The number of sessions, idle or checked out, currently held by the pool."""
+        with self._condition:
+            return self._size
+
+    @property
+    def idle_count(self):
+        """The number of idle sessions currently held by the pool."""
+        with self._condition:
+            return len(self._idle)
+
+    def _login(self):
+        session = ftplib.FTP()
+        try:
+            session.set_pasv(self._passive)
+            session.connect(self._server, self._port)
+            if self._credential:
+                user, password, _ = self._credential
+                session.login(user, password or '')
+            home = session.pwd()
+        except:
+            self._discard(session)
+            raise
+        return session, home
+
+    @staticmethod
+    def _discard(session):
+        # noinspection PyBroadException
+        try:
+            session.quit()  # The polite way
+        except Exception:
+            session.close()  # The rude way
+
+    def _evict_expired(self):
+        # Must be called with the condition held. Returns the expired sessions, which the caller
+        # must discard after releasing the condition.
+        if self._idle_timeout is None:
+            return []
+        cutoff = time.time() - self._idle_timeout
+        expired = [session for session, _, last_used in self._idle if last_used < cutoff]
+        if expired:
+            self._idle = [entry for entry in self._idle if entry[-1] >= cutoff]
+            for session in expired:
+                del self._homes[session]
+            self._size -= len(expired)
+            self._condition.notify(len(expired))
+        return expired
+
+    def checkout(self, timeout=NotImplemented):
+        """
+        Check out a logged-in session. An idle session is reused if a healthy one is available.
+        Otherwise a new session is opened, provided the pool is not already at its maximum size; if
+        it is, wait for another thread to check a session back in.
+
+        :param timeout: The maximum number of seconds to wait for a free session, or None to wait
+            forever. Defaults to the pool's timeout.
+        :return: A tuple, (session, home), where session is an ftplib.FTP instance and home is the
+            working directory the session had immediately after login.
+        """
+        if timeout is NotImplemented:
+            timeout = self._timeout
+        if timeout is None:
+            end_time = None
+        else:
+            end_time = time.time() + timeout
+
+        while True:
+            with self._condition:
+                expired = self._evict_expired()
+                if self._idle:
+                    session, home, _ = self._idle.pop()
+                    new = False
+                elif self._size < self._max_size:
+                    self._size += 1
+                    session = home = None
+                    new = True
+                else:
+                    remaining = None if end_time is None else end_time - time.time()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("Timed out waiting for a free session in %r." % self)
+                    self._condition.wait(remaining)
+                    continue
+
+            # Network I/O happens outside the lock, so other threads aren't held up by it.
+            for expired_session in expired:
+                self._discard(expired_session)
+
+            if new:
+                try:
+                    session, home = self._login()
+                except:
+                    with self._condition:
+                        self._size -= 1
+                        self._condition.notify()
+                    raise
+                with self._condition:
+                    self._homes[session] = (home, self._generation)
+                return session, home
+
+            # Health check the idle session before handing it out.
+            try:
+                session.voidcmd('NOOP')
+            except (socket.error, IOError, EOFError, ftplib.Error):
+                self.checkin(session, reusable=False)
+                continue
+            return session, home
+
+    def checkin(self, session, reusable=True):
+        """
+        Return a checked out session to the pool.
+
+        :param session: The ftplib.FTP session, as returned by checkout().
+        :param reusable: Whether the session is in a usable state. Unusable sessions are closed
+            instead of being returned to the idle list.
+        :return: None
+        """
+        with self._condition:
+            home, generation = self._homes[session]
+            if reusable and generation == self._generation:
+                self._idle.append((session, home, time.time()))
+                session = None
+            else:
+                del self._homes[session]
+                self._size -= 1
+            self._condition.notify()
+        if session is not None:
+            self._discard(session)
+
+    def clear(self):
+        """
+        Close all idle sessions. Sessions which are currently checked out are closed instead of
+        being reused when they are checked back in.
+
+        :return: None
+        """
+        with self._condition:
+            idle = self._idle
+            self._idle = []
+            for session, _, _ in idle:
+                del self._homes[session]
+            self._size -= len(idle)
+            self._generation += 1
+            self._condition.notify_all()
+        for session, _, _ in idle:
+            self._discard(session)
+
+
+# Idle sessions are logged out politely at shutdown rather than being dropped by the OS.
+atexit.register(FTPSessionPool.clear_all)
+
+
+class FTPReadStream(io.RawIOBase):
+    """
+    A raw, read-only, forward-only stream over the data channel of an FTP RETR command. The stream
+    owns a session checked out from the pool for the duration of the transfer, so the connection
+    that opened it remains free for other commands while the file is being read.
+    """
+
+    def __init__(self, pool, session, remote_path):
+        verify_type(pool, FTPSessionPool)
+        verify_type(remote_path, str, non_empty=True)
+        super().__init__()
+        self._pool = pool
+        self._session = session
+        self._eof = False
+        try:
+            session.voidcmd('TYPE I')
+            self._socket = session.transfercmd('RETR ' + remote_path)
+        except:
+            self._session = None
+            pool.checkin(session, reusable=False)
+            raise
+
+    def readable(self):
+        """Whether the stream can be read from."""
+        return True
+
+    def readinto(self, buffer):
+        """
+        Read bytes from the data channel into a pre-allocated, writable bytes-like object.
+
+        :param buffer: The buffer to read into.
+        :return: The number of bytes read, which is 0 at the end of the file.
+        """
+        if self._eof:
+            return 0
+        count = self._socket.recv_into(buffer)
+        if not count:
+            self._eof = True
+        return count
+
+    def close(self):
+        """
+        Close the data channel and return the session to the pool.
+
+        :return: None
+        """
+        if self.closed:
+            return
+        session = self._session
+        self._session = None
+        reusable = self._eof
+        try:
+            self._socket.close()
+            if reusable:
+                # Collect the server's transfer-complete response, so the session is ready for the
+                # next command.
+                session.voidresp()
+        except (socket.error, IOError, EOFError, ftplib.Error):
+            reusable = False
+        finally:
+            # If the transfer was abandoned early, the state of the control channel is
+            # unpredictable, so the session is dropped rather than reused.
+            self._pool.checkin(session, reusable)
+            super().close()
+
 
 @config_loader
 @url_scheme('ftp')
@@ -109,6 +623,23 @@ class FTPConnector(FSConnector):
         port = manager.load_option(section, 'Port', int, None)
         passive = bool(manager.load_option(section, 'Passive', strtobool, False))
         credential = manager.load_section(section, credentials.Credential)
+        pool_size = manager.load_option(section, 'Pool Size', int, DEFAULT_POOL_SIZE)
+        pool_idle_timeout = manager.load_option(section, 'Pool Idle Timeout', float,
+                                                DEFAULT_POOL_IDLE_TIMEOUT)
+        pool_timeout = manager.load_option(section, 'Pool Timeout', float, DEFAULT_POOL_TIMEOUT)
+        transfer_chunk_size = manager.load_option(section, 'Transfer Chunk Size', int,
+                                                  DEFAULT_TRANSFER_CHUNK_SIZE)
+        transfer_retries = manager.load_option(section, 'Transfer Retries', int,
+                                               DEFAULT_TRANSFER_RETRIES)
+        transfer_retry_interval = manager.load_option(section, 'Transfer Retry Interval', float,
+                                                      DEFAULT_TRANSFER_RETRY_INTERVAL)
+        spool_size = manager.load_option(section, 'Spool Size', int, DEFAULT_SPOOL_SIZE)
+        writeback_policy = manager.load_option(section, 'Write Back Policy', str,
+                                               WRITEBACK_ON_CLOSE)
+        writeback_interval = manager.load_option(section, 'Write Back Interval', float, None)
+        writeback_batch_size = manager.load_option(section, 'Write Back Batch Size', int, None)
+        background_writeback = bool(manager.load_option(section, 'Background Write Back',
+                                                        strtobool, False))
 
         if port is not None:
             server = server + ':' + str(port)
@@ -120,10 +651,27 @@ class FTPConnector(FSConnector):
             server=server,
             credential=credential,
             passive=passive,
+            pool_size=pool_size,
+            pool_idle_timeout=pool_idle_timeout,
+            pool_timeout=pool_timeout,
+            transfer_chunk_size=transfer_chunk_size,
+            transfer_retries=transfer_retries,
+            transfer_retry_interval=transfer_retry_interval,
+            spool_size=spool_size,
+            writeback_policy=writeback_policy,
+            writeback_interval=writeback_interval,
+            writeback_batch_size=writeback_batch_size,
+            background_writeback=background_writeback,
             **kwargs
         )
 
-    def __init__(self, server, credential=None, passive=True, initial_cwd=None):
+    def __init__(self, server, credential=None, passive=True, initial_cwd=None,
+                 pool_size=DEFAULT_POOL_SIZE, pool_idle_timeout=DEFAULT_POOL_IDLE_TIMEOUT,
+                 pool_timeout=DEFAULT_POOL_TIMEOUT, transfer_chunk_size=DEFAULT_TRANSFER_CHUNK_SIZE,
+                 transfer_retries=DEFAULT_TRANSFER_RETRIES,
+                 transfer_retry_interval=DEFAULT_TRANSFER_RETRY_INTERVAL,
+                 spool_size=DEFAULT_SPOOL_SIZE, writeback_policy=WRITEBACK_ON_CLOSE,
+                 writeback_interval=None, writeback_batch_size=None, background_writeback=False):
         verify_type(server, str, non_empty=True)
         server, port = strings.split_port(server, DEFAULT_FTP_PORT)
 
@@ -131,6 +679,24 @@ class FTPConnector(FSConnector):
             assert credential.user
 
         verify_type(passive, bool)
+        verify_type(pool_size, int)
+        assert pool_size > 0
+        verify_type(pool_idle_timeout, (int, float), allow_none=True)
+        verify_type(pool_timeout, (int, float), allow_none=True)
+        verify_type(transfer_chunk_size, int)
+        assert transfer_chunk_size > 0
+        verify_type(transfer_retries, int)
+        assert transfer_retries >= 0
+        verify_type(transfer_retry_interval, (int, float))
+        assert transfer_retry_interval >= 0
+        verify_type(spool_size, int, allow_none=True)
+        assert spool_size is None or spool_size >= 0
+        assert writeback_policy in WRITEBACK_POLICIES
+        verify_type(writeback_interval, (int, float), allow_none=True)
+        assert writeback_interval is None or writeback_interval >= 0
+        verify_type(writeback_batch_size, int, allow_none=True)
+        assert writeback_batch_size is None or writeback_batch_size > 0
+        verify_type(background_writeback, bool)
 
         super().__init__(ftp_connection, initial_cwd)
 
@@ -138,6 +704,17 @@ class FTPConnector(FSConnector):
         self._port = port
         self._credential = credential
         self._passive = passive
+        self._pool_size = pool_size
+        self._pool_idle_timeout = pool_idle_timeout
+        self._pool_timeout = pool_timeout
+        self._transfer_chunk_size = transfer_chunk_size
+        self._transfer_retries = transfer_retries
+        self._transfer_retry_interval = transfer_retry_interval
+        self._spool_size = spool_size
+        self._writeback_policy = writeback_policy
+        self._writeback_interval = writeback_interval
+        self._writeback_batch_size = writeback_batch_size
+        self._background_writeback = background_writeback
 
     def __repr__(self):
         server_string = None
@@ -170,6 +747,79 @@ class FTPConnector(FSConnector):
         """Whether to access the server in passive mode."""
         return self._passive
 
+    @property
+    def pool_size(self):
+        """The maximum number of simultaneous sessions kept in the shared session pool."""
+        return self._pool_size
+
+    @property
+    def pool_idle_timeout(self):
+        """The number of seconds an idle pooled session is kept alive, or None for no limit."""
+        return self._pool_idle_timeout
+
+    @property
+    def pool_timeout(self):
+        """The number of seconds to wait for a free pooled session, or None to wait forever."""
+        return self._pool_timeout
+
+    @property
+    def pool(self):
+        """The session pool shared by connections to the same server with the same settings."""
+        return FTPSessionPool.get_pool(self)
+
+    @property
+    def transfer_chunk_size(self):
+        """The number of bytes sent or received per block during file transfers."""
+        return self._transfer_chunk_size
+
+    @property
+    def transfer_retries(self):
+        """The number of times a failed file transfer is resumed before giving up."""
+        return self._transfer_retries
+
+    @property
+    def transfer_retry_interval(self):
+        """The number of seconds to wait before resuming a failed file transfer."""
+        return self._transfer_retry_interval
+
+    @property
+    def spool_size(self):
+        """
+        The number of bytes of a file opened through a proxy which are held in memory before
+        spilling to disk, or None if proxies are always written to named temporary files.
+        """
+        return self._spool_size
+
+    @property
+    def writeback_policy(self):
+        """
+        When changes to a file opened through a proxy are uploaded: 'close' (only when the file is
+        closed), 'flush' (also whenever it is flushed), or 'interval' (also when it is flushed, if
+        the write-back interval has passed since the last upload).
+        """
+        return self._writeback_policy
+
+    @property
+    def writeback_interval(self):
+        """The minimum number of seconds between uploads of a proxy, for the 'interval' policy."""
+        return self._writeback_interval
+
+    @property
+    def writeback_batch_size(self):
+        """
+        The minimum amount which must be written to a proxy between uploads when it is flushed, or
+        None for no minimum.
+        """
+        return self._writeback_batch_size
+
+    @property
+    def background_writeback(self):
+        """
+        Whether a proxy's final upload, when it is closed, happens on another thread. The proxy's
+        wait() method waits for the upload to complete.
+        """
+        return self._background_writeback
+
     def connect(self):
         """Create a new connection and return it."""
         return super().connect()
@@ -200,6 +850,23 @@ class ftp_connection(fs_connection):
         super().__init__(connector)
 
         self._session = None
+        self._pool = None
+
+    @property
+    def identity(self):
+        """A string identifying the file system this connection reaches: the server and user."""
+        connector = self._connector
+        user = connector.credential.user if connector.credential else 'anonymous'
+        return 'ftp://%s@%s:%s' % (user, connector.server, connector.port)
+
+    @property
+    def clone_limit(self):
+        """
+        The maximum number of clones of this connection which can be open at once. This connection
+        holds one of the session pool's sessions, and each clone holds another, so a pool of one
+        session leaves no room for clones at all, and callers must use this connection serially.
+        """
+        return max(self._connector.pool.max_size - 1, 0)
 
     @property
     def is_open(self):
@@ -207,49 +874,55 @@ class ftp_connection(fs_connection):
         if self._is_open:
             try:
                 self._session.voidcmd('NOOP')
-            except (socket.error, IOError):
-                # noinspection PyBroadException
-                try:
-                    self.close()
-                except Exception:
-                    pass
-                self._is_open = False
+            except (socket.error, IOError, EOFError):
+                # The session is dead, so it must not go back into the pool for reuse.
+                self._release_session(reusable=False)
         return super().is_open
 
+    def _release_session(self, reusable=True):
+        session = self._session
+        self._session = None  # The close your eyes and pretend way
+        self._is_open = False
+        if session is not None:
+            self._pool.checkin(session, reusable)
+
     def open(self):
-        """Open the FTP connection."""
+        """Open the FTP connection, checking out a logged-in session from the shared pool."""
         assert not self.is_open
 
         cwd = self.getcwd()
 
-        self._session = ftplib.FTP()
-        self._session.set_pasv(self._connector.passive)
-        self._session.connect(self._connector.server, self._connector.port)
+        self._pool = self._connector.pool
+        self._session, home = self._pool.checkout()
 
-        if self._connector.credential:
-            user, password, _ = self._connector.credential
-            self._session.login(user, password or '')
+        try:
+            super().open()
 
-        super().open()
-        if cwd is None:
-            # This forces the CWD to be refreshed.
-            self.getcwd()
-        else:
-            # This overrides the CWD based on what it was set to before the connection was opened.
-            self.chdir(cwd)
+            # Pooled sessions retain whatever working directory their previous user left behind,
+            # so the CWD is always set explicitly.
+            self.chdir(home if cwd is None else cwd)
+        except:
+            self._release_session(reusable=False)
+            raise
 
     def close(self):
-        """Close the FTP connection"""
+        """Close the FTP connection, returning its session to the shared pool."""
         assert self.is_open
+        self._release_session()
 
-        # noinspection PyBroadException
-        try:
-            self._session.quit()  # The polite way
-        except Exception:
-            self._session.close()  # The rude way
-        finally:
-            self._session = None  # The close your eyes and pretend way
-            self._is_open = False
+    def clone(self):
+        """
+        Return a new, open connection to the same server, with the same CWD, which can be used from
+        another thread concurrently with this one. The clone has its own session from the pool.
+
+        :return: An open ftp_connection instance.
+        """
+        clone = self._connector.connect_uncached()
+        cwd = super().getcwd()
+        if cwd is not None:
+            clone.cwd = str(cwd)
+        clone.open()
+        return clone
 
     def getcwd(self):
         """Get the current working directory of this FTP connection."""
@@ -265,32 +938,219 @@ class ftp_connection(fs_connection):
         if self.is_open:
             self._session.cwd(str(super().getcwd()))
 
-    def _download(self, remote_path, local_path):
+    def _reconnect(self):
+        # Replace the session with a fresh one from the pool, restoring the working directory.
+        self._release_session(reusable=False)
+        self.open()
+
+    def _remote_size(self, file_name):
+        # Many servers refuse to report sizes in ASCII mode.
+        self._session.voidcmd('TYPE I')
+        return self._session.size(file_name)
+
+    def _transfer(self, transfer, description, retries, retry_interval):
+        # Call transfer() with the attempt number until it succeeds, resuming on a fresh session
+        # after transient failures.
+        if retries is None:
+            retries = self._connector.transfer_retries
+        if retry_interval is None:
+            retry_interval = self._connector.transfer_retry_interval
+
+        attempt = 0
+        while True:
+            try:
+                return transfer(attempt)
+            except TRANSIENT_ERRORS as exc:
+                if attempt >= retries:
+                    raise
+                attempt += 1
+                log.warning("%s failed (%s). Resuming in %s second(s); retry %s of %s.",
+                            description, exc, retry_interval, attempt, retries)
+                time.sleep(retry_interval)
+                self._reconnect()
+
+    def download(self, path, local_path, resume=False, chunk_size=None, retries=None,
+                 retry_interval=None):
+        """
+        Download a remote file to a local file. If the transfer fails partway through, it is
+        resumed from the end of the partial local file using the REST command.
+
+        :param path: The path of the remote file.
+        :param local_path: The path of the local file, as a string or a local Path.
+        :param resume: Whether to resume from an existing, partially downloaded local file, rather
+            than starting over.
+        :param chunk_size: The number of bytes per block. Defaults to the connector's setting.
+        :param retries: The number of times to resume after a failure. Defaults to the connector's
+            setting.
+        :param retry_interval: The number of seconds to wait before resuming. Defaults to the
+            connector's setting.
+        :return: None
+        """
         assert self.is_open
-        remote_path = self.check_path(remote_path)
-        assert isinstance(local_path, str)
-
-        dir_path, file_name = os.path.split(remote_path)
+        path = self.check_path(path)
+        if isinstance(local_path, Path):
+            assert local_path.is_local
+            local_path = str(abs(local_path))
+        verify_type(local_path, str, non_empty=True)
+        if chunk_size is None:
+            chunk_size = self._connector.transfer_chunk_size
 
-        with Path(dir_path, self):
-            with open(local_path, 'wb') as local_file:
-                self._session.retrbinary("RETR " + file_name, local_file.write)
+        dir_path, file_name = os.path.split(path)
 
-    def _upload(self, local_path, remote_path):
+        def transfer(attempt):
+            with Path(dir_path, self):
+                offset = 0
+                if (resume or attempt) and os.path.isfile(local_path):
+                    offset = os.path.getsize(local_path)
+                    if offset:
+                        remote_size = self._remote_size(file_name)
+                        if offset == remote_size:
+                            return
+                        elif offset > remote_size:
+                            # The remote file has changed, so the partial file is useless.
+                            offset = 0
+                with open(local_path, 'ab' if offset else 'wb') as local_file:
+                    self._session.retrbinary("RETR " + file_name, local_file.write, chunk_size,
+                                             offset or None)
+
+        self._transfer(transfer, "Download of %s" % path, retries, retry_interval)
+
+    def upload(self, local_path, path, resume=False, chunk_size=None, retries=None,
+               retry_interval=None):
+        """
+        Upload a local file to a remote file. If the transfer fails partway through, it is resumed
+        from the end of the partial remote file using the REST command.
+
+        :param local_path: The path of the local file, as a string or a local Path.
+        :param path: The path of the remote file.
+        :param resume: Whether to resume from an existing, partially uploaded remote file, rather
+            than starting over.
+        :param chunk_size: The number of bytes per block. Defaults to the connector's setting.
+        :param retries: The number of times to resume after a failure. Defaults to the connector's
+            setting.
+        :param retry_interval: The number of seconds to wait before resuming. Defaults to the
+            connector's setting.
+        :return: None
+        """
         assert self.is_open
-        assert isinstance(local_path, str)
-        remote_path = self.check_path(remote_path)
+        if isinstance(local_path, Path):
+            assert local_path.is_local
+            local_path = str(abs(local_path))
+        verify_type(local_path, str, non_empty=True)
+        path = self.check_path(path)
+        if chunk_size is None:
+            chunk_size = self._connector.transfer_chunk_size
 
-        dir_path, file_name = os.path.split(remote_path)
+        dir_path, file_name = os.path.split(path)
 
-        with Path(dir_path, self):
-            with open(local_path, 'rb') as local_file:
-                self._session.retrbinary("STOR " + file_name, local_file)
+        def transfer(attempt):
+            with Path(dir_path, self):
+                offset = 0
+                if resume or attempt:
+                    try:
+                        offset = self._remote_size(file_name)
+                    except ftplib.error_perm:
+                        offset = 0  # It doesn't exist yet.
+                    local_size = os.path.getsize(local_path)
+                    if offset == local_size:
+                        return
+                    elif offset > local_size:
+                        offset = 0
+                with open(local_path, 'rb') as local_file:
+                    local_file.seek(offset)
+                    self._session.storbinary("STOR " + file_name, local_file, chunk_size,
+                                             rest=offset or None)
+
+        self._transfer(transfer, "Upload to %s" % path, retries, retry_interval)
+
+    def _retrieve(self, path, file_obj):
+        # Download a remote file into a binary file object, such as a Spool. If the transfer fails
+        # partway through, it is resumed from what has been written so far.
+        path = self.check_path(path)
+        dir_path, file_name = os.path.split(path)
+        start = file_obj.tell()
+
+        def transfer(attempt):
+            with Path(dir_path, self):
+                offset = file_obj.tell() - start if attempt else 0
+                self._session.retrbinary("RETR " + file_name, file_obj.write,
+                                         self._connector.transfer_chunk_size, offset or None)
+
+        self._transfer(transfer, "Download of %s" % path, None, None)
+
+    def _store(self, file_obj, path):
+        # Upload a binary file object, from its current position, to a remote file. If the transfer
+        # fails partway through, it is resumed from the end of the partial remote file.
+        path = self.check_path(path)
+        dir_path, file_name = os.path.split(path)
+        start = file_obj.tell()
+
+        def transfer(attempt):
+            with Path(dir_path, self):
+                offset = 0
+                if attempt:
+                    try:
+                        offset = self._remote_size(file_name)
+                    except ftplib.error_perm:
+                        offset = 0  # It doesn't exist yet.
+                    size = file_obj.seek(0, io.SEEK_END) - start
+                    if offset == size:
+                        return
+                    elif offset > size:
+                        offset = 0
+                file_obj.seek(start + offset)
+                self._session.storbinary("STOR " + file_name, file_obj,
+                                         self._connector.transfer_chunk_size, rest=offset or None)
+
+        self._transfer(transfer, "Upload to %s" % path, None, None)
+
+    def abs_path(self, path):
+        """
+        Return an absolute form of a potentially relative path, resolved against the current
+        working directory without a round trip to the server.
+
+        :param path: The path to operate on.
+        :return: The absolute path.
+        """
+        return Path(self._absolute(path), self)
+
+    def _absolute(self, path):
+        # Make the path absolute without a round trip to the server, so it can be used by other
+        # sessions, which have their own working directories.
+        path = self.check_path(path)
+        if path.startswith('/'):
+            return path
+        return posixpath.join(str(super().getcwd()), path)
+
+    def _open_stream(self, path, mode, buffering, encoding, errors, newline):
+        # Stream the file directly from the data channel on a second pooled session. If the pool
+        # has no session to spare, return None so the caller falls back to a proxy file.
+        path = self._absolute(path)
+        try:
+            session, _ = self._pool.checkout(timeout=0)
+        except TimeoutError:
+            return None
+
+        raw = FTPReadStream(self._pool, session, path)
+        if buffering == 0 and 'b' in mode:
+            return raw
+        if buffering in (-1, 0, 1):
+            buffering = STREAM_BUFFER_SIZE
+        try:
+            stream = io.BufferedReader(raw, buffering)
+            if 'b' not in mode:
+                stream = io.TextIOWrapper(stream, encoding, errors, newline)
+        except:
+            raw.close()
+            raise
+        return stream
 
     def open_file(self, path, mode='r', buffering=-1, encoding=None, errors=None, newline=None,
                   closefd=True, opener=None):
         """
-        Open the file.
+        Open the file. Files opened for reading only are streamed directly from the server, which
+        means they can only be read sequentially. Files opened in any other mode are accessed
+        through a local proxy file.
 
         :param path: The path to operate on.
         :param mode: The file mode.
@@ -307,22 +1167,216 @@ class ftp_connection(fs_connection):
         mode = mode.lower()
         path = self.check_path(path)
 
-        # We can't work directly with an FTP file. Instead, we will create a temp file and return it
-        # as a proxy.
+        if mode in ('r', 'rb', 'rt'):
+            stream = self._open_stream(path, mode, buffering, encoding, errors, newline)
+            if stream is not None:
+                return stream
+
+        spool_size = self._connector.spool_size
+        if spool_size:
+            # Small files are proxied in memory, and only spill to disk if they grow too large.
+            # Read-only files get the buffer itself, with no proxy in between.
+            def load(file_obj):
+                self._retrieve(path, file_obj)
+
+            if mode in ('r', 'rb', 'rt'):
+                return open_spooled_reader(load, mode, encoding, errors, newline, spool_size)
+            return SpooledProxyFile(Path(path, self), mode, buffering, encoding, errors, newline,
+                                    closefd, opener, load=None if set(mode) & set('wx') else load,
+                                    writeback=self._writeback_function('_store'),
+                                    max_size=spool_size, **self._writeback_settings())
+
+        # We can't work directly with an FTP file for modes that write or seek. Instead, we will
+        # create a temp file and return it as a proxy.
         with local.local_fs_connection() as connection:
             temp_path = str(abs(connection.get_temp_file_path(self.name(path))))
 
         # If we're not truncating the file, then we'll need to copy down the data.
         if mode not in ('w', 'wb'):
-            self._download(path, temp_path)
+            self.download(path, temp_path)
 
         if mode in ('r', 'rb'):
             writeback = None
         else:
-            writeback = self._upload
+            writeback = self._writeback_function('upload')
 
         return ProxyFile(Path(path, self), mode, buffering, encoding, errors, newline, closefd,
-                         opener, proxy_path=temp_path, writeback=writeback)
+                         opener, proxy_path=temp_path, writeback=writeback,
+                         **self._writeback_settings())
+
+    def _writeback_settings(self):
+        # The connector's write-back settings, as keyword arguments for a proxy.
+        return dict(
+            writeback_policy=self._connector.writeback_policy,
+            writeback_interval=self._connector.writeback_interval,
+            writeback_batch_size=self._connector.writeback_batch_size,
+            background=self._background_writeback,
+        )
+
+    @property
+    def _background_writeback(self):
+        # Whether proxies write back in the background. Background write-backs need a clone, so if
+        # the session pool has no room for one, they happen in the foreground instead.
+        return self._connector.background_writeback and self.clone_limit > 0
+
+    def _writeback_function(self, name):
+        # Return the function a proxy uses to write back changes, which calls the named method.
+        # Background write-backs run on another thread, so they use a clone of this connection,
+        # which has its own session, and this connection remains free for use in the meantime.
+        if not self._background_writeback:
+            return getattr(self, name)
+
+        def writeback(*args):
+            clone = self.clone()
+            try:
+                # The clone has the same CWD, so our paths mean the same thing to it.
+                args = [str(arg) if isinstance(arg, Path) and arg.connection is self else arg
+                        for arg in args]
+                getattr(clone, name)(*args)
+            finally:
+                clone.close()
+
+        return writeback
+
+    def _list_entries(self, path):
+        """
+        List the contents of a directory in a single round trip, together with per-entry metadata.
+        MLSD is used if the server supports it, with fallbacks to parsing LIST output, and as a last
+        resort, to NLST, which provides names only.
+
+        :param path: The path of the directory to list, as a string.
+        :return: A dictionary mapping each name to a dictionary of MLSD-style facts. Facts which
+            could not be determined are absent.
+        """
+        capabilities = self._pool.capabilities
+        if capabilities.get('MLSD', True):
+            try:
+                return {
+                    name: normalize_facts(facts)
+                    for name, facts in self._session.mlsd(path)
+                    if facts.get('type', '').lower() not in ('cdir', 'pdir')
+                }
+            except ftplib.error_perm as exc:
+                if _reply_code(exc) not in UNSUPPORTED_COMMAND_CODES:
+                    raise
+                capabilities['MLSD'] = False
+
+        with Path(path, self):
+            lines = []
+            try:
+                self._session.retrlines('LIST', lines.append)
+            except ftplib.error_perm as exc:
+                # Some FTP servers give an error if the directory is empty.
+                if '550 No files found.' not in str(exc):
+                    raise
+
+            entries = {}
+            for index, line in enumerate(lines):
+                parsed = parse_list_line(line)
+                if parsed is None:
+                    if index == 0 and _is_list_total(line):
+                        continue
+                    break
+                name, facts = parsed
+                if name not in ('.', '..'):
+                    entries[name] = facts
+            else:
+                return entries
+
+            # The LIST output is in an unrecognized format, so we can only get names.
+            listing = self._session.nlst()
+            return {name: {} for name in listing if name not in ('.', '..')}
+
+    def _get_facts(self, path):
+        """
+        Get the MLSD-style facts for a single file system object, using MLST if the server supports
+        it, or the listing of the parent directory otherwise. Symbolic links are not followed.
+        Errors other than the file system object not existing, such as access being denied, are
+        raised.
+
+        :param path: The path of the file system object, as a string.
+        :return: A dictionary of facts, or None if the file system object does not exist.
+        """
+        capabilities = self._pool.capabilities
+        if capabilities.get('MLST', True):
+            try:
+                response = self._session.sendcmd('MLST ' + path)
+            except ftplib.error_perm as exc:
+                if _reply_code(exc) not in UNSUPPORTED_COMMAND_CODES:
+                    if _is_missing(exc):
+                        return None
+                    raise
+                capabilities['MLST'] = False
+            else:
+                for line in response.splitlines()[1:]:
+                    if line.startswith(' '):
+                        facts_string = line[1:].split(' ', 1)[0]
+                        facts = {}
+                        for fact in facts_string.rstrip(';').split(';'):
+                            key, _, value = fact.partition('=')
+                            facts[key.lower()] = value
+                        facts = normalize_facts(facts)
+                        if 'type' not in facts:
+                            break
+                        return facts
+                raise OperationNotSupportedError()
+
+        dir_path, name = posixpath.split(path.rstrip('/'))
+        if not name:
+            # The root directory has no parent to list.
+            raise OperationNotSupportedError()
+        try:
+            entries = self._list_entries(dir_path or '.')
+        except ftplib.error_perm as exc:
+            if _is_missing(exc):
+                return None
+            raise
+        facts = entries.get(name)
+        if facts is not None and 'type' not in facts:
+            raise OperationNotSupportedError()
+        return facts
+
+    def _follow_links(self, path, entries):
+        """
+        Replace the facts of any symbolic links in a listing with the type of the file system
+        object each one leads to, by following it. Links which lead nowhere are left out.
+
+        :param path: The path of the listed directory, as a string.
+        :param entries: A dictionary mapping names to facts, as returned by _list_entries().
+        :return: A new dictionary mapping names to facts.
+        """
+        result = {}
+        for name, facts in entries.items():
+            if facts.get('type') == 'link':
+                child = self.join(path, name)
+                if self.is_dir(child):
+                    facts = {'type': 'dir'}
+                elif self.is_file(child):
+                    facts = {'type': 'file'}
+                else:
+                    continue
+            result[name] = facts
+        return result
+
+    def _known_type(self, path):
+        """
+        Determine the type of a file system object from its facts, without following links.
+
+        :param path: The path of the file system object, as a string.
+        :return: 'dir', 'file', None if it doesn't exist, or NotImplemented if its facts can't say,
+            as is the case for symbolic links, or can't be retrieved.
+        """
+        try:
+            facts = self._get_facts(path)
+        except (OperationNotSupportedError, ftplib.error_perm):
+            return NotImplemented
+        if facts is None:
+            return None
+        if facts.get('type') in ('dir', 'cdir', 'pdir'):
+            return 'dir'
+        if facts.get('type') == 'file':
+            return 'file'
+        return NotImplemented
 
     def list(self, path, pattern='*'):
         """
@@ -333,26 +1387,167 @@ class ftp_connection(fs_connection):
         :return: A list of matching file and directory names.
         """
         assert self.is_open
-        path = Path(self.check_path(path), self)
-        with path:
-            try:
-                listing = self._session.nlst()
-            except Exception as exc:
-                # Some FTP servers give an error if the directory is empty.
-                if '550 No files found.' in str(exc):
-                    listing = []
-                else:
-                    raise
-            # We have to do this because we can't check if path is a directory,
-            # and if we call nlst on a file name, sometimes it will just return
-            # that file name in the list instead of bombing out.
-            listing = [name for name in listing if self.exists(path[name])]
+        path = self.check_path(path)
+        listing = list(self._list_entries(path))
         if pattern == '*':
             return listing
         else:
             pattern = strings.glob_to_regex(pattern)
             return [name for name in listing if pattern.match(name)]
 
+    def glob(self, path, pattern='*'):
+        """
+        Return a list of the source_paths to the files and directories appearing in this folder.
+
+        :param path: The path to operate on.
+        :param pattern: A glob-style pattern against which names must match.
+        :return: A list of Path instances for each matching file and directory name.
+        """
+        assert self.is_open
+        path = self.check_path(path)
+        entries = self._list_entries(path)
+        regex = None if pattern == '*' else strings.glob_to_regex(pattern)
+
+        return [
+            Path(str(self.join(path, name)), self)
+            for name in entries
+            if regex is None or regex.match(name)
+        ]
+
+    def scan(self, path, pattern='*'):
+        """
+        Return the paths of the files and directories appearing in this folder, each paired with a
+        FileStatus snapshot of its metadata taken when the folder was listed. The metadata comes
+        from the listing itself, so only symbolic links, and entries the listing couldn't
+        classify, cost further round trips. Links which lead nowhere are left out.
+
+        :param path: The path to operate on.
+        :param pattern: A glob-style pattern against which names must match.
+        :return: A list of (Path, FileStatus) pairs for each matching file and directory name.
+        """
+        assert self.is_open
+        path = self.check_path(path)
+        entries = self._list_entries(path)
+        regex = None if pattern == '*' else strings.glob_to_regex(pattern)
+
+        results = []
+        for name, facts in entries.items():
+            if regex is not None and not regex.match(name):
+                continue
+            child = Path(str(self.join(path, name)), self)
+            if facts.get('type') in ('dir', 'file'):
+                status = facts_to_status(facts)
+            else:
+                try:
+                    status = self.stat(child)
+                except FileNotFoundError:
+                    continue
+            results.append((child, status))
+        return results
+
+    def _split_dir(self, path, followlinks=False):
+        """
+        Split the contents of a directory into subdirectory names and file names, using a single
+        metadata listing, and determine which of the subdirectories can be walked into. Links are
+        recognized from the listing, so no further round trips are needed to avoid walking into
+        them. Errors are collected rather than raised.
+
+        :param path: The path of the directory.
+        :param followlinks: Whether subdirectories which are symbolic links can be walked into.
+        :return: A tuple, (dir_names, file_names, errors, walkable).
+        """
+        path = self.check_path(path)
+        try:
+            entries = self._list_entries(path)
+        except Exception as exc:
+            return [], [], [exc], set()
+
+        dir_names = []
+        file_names = []
+        errors = []
+        walkable = set()
+        for name, facts in entries.items():
+            entry_type = facts.get('type')
+            if entry_type not in ('dir', 'file'):
+                # The listing doesn't say, or it's a link and we don't know what it points to.
+                try:
+                    entry_type = 'dir' if self.is_dir(self.join(path, name)) else 'file'
+                except (OSError, ftplib.Error) as exc:
+                    errors.append(exc)
+                    continue
+            if entry_type == 'dir':
+                dir_names.append(name)
+                if followlinks or facts.get('type') != 'link':
+                    walkable.add(name)
+            else:
+                file_names.append(name)
+        return dir_names, file_names, errors, walkable
+
+    def walk(self, path, topdown=True, onerror=None, followlinks=False, workers=None):
+        """
+        Walk the directory tree rooted at this path, in the same manner as os.walk(). For each
+        directory in the tree, yield a tuple, (dir_path, dir_names, file_names). If topdown is set,
+        the caller can modify dir_names in place to prune the search.
+
+        Each directory costs a single listing round trip. If workers is greater than 1, sibling
+        directories are listed concurrently on that many additional sessions from the pool.
+
+        :param path: The path to operate on.
+        :param topdown: Whether parent directories are yielded before their children.
+        :param onerror: A function which is called with the exception when an error occurs.
+        :param followlinks: Whether to walk into directories which are symbolic links. Where the
+            server doesn't identify links in its listings, they can't be told apart from the
+            directories they lead to, and are walked into regardless.
+        :param workers: The maximum number of directories to list concurrently.
+        :return: An iterator over (dir_path, dir_names, file_names) tuples.
+        """
+        assert self.is_open
+        path = Path(self.check_path(path), self)
+
+        # This connection already holds one of the pool's sessions.
+        workers = min(workers or 1, self.clone_limit)
+        if workers < 2:
+            yield from self._walk(path, topdown, onerror, followlinks, self._schedule_split)
+            return
+
+        # Each worker thread borrows one of these connections for the duration of a listing.
+        idle = queue.Queue()
+        opened = []
+        opened_lock = threading.Lock()
+
+        def split(dir_path, follow):
+            try:
+                worker = idle.get_nowait()
+            except queue.Empty:
+                worker = self._connector.connect_uncached()
+                worker.open()
+                with opened_lock:
+                    opened.append(worker)
+            try:
+                return worker._split_dir(dir_path, follow)
+            except Exception as exc:
+                return [], [], [exc], set()
+            finally:
+                idle.put(worker)
+
+        futures = []
+
+        def schedule(dir_path, follow):
+            future = executor.submit(split, self._absolute(dir_path), follow)
+            futures.append(future)
+            return future.result
+
+        executor = ThreadPoolExecutor(workers)
+        try:
+            yield from self._walk(path, topdown, onerror, followlinks, schedule)
+        finally:
+            # If the caller stopped early, don't bother with listings nobody will look at.
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+            for worker in opened:
+                worker.close()
+
     def size(self, path):
         """
         Get the size of the file.
@@ -363,7 +1558,7 @@ class ftp_connection(fs_connection):
         assert self.is_open
         path = self.check_path(path)
 
-        return self._session.size(path)
+        return self._remote_size(path)
 
     def modified_time(self, path):
         """
@@ -383,15 +1578,75 @@ class ftp_connection(fs_connection):
                 else:
                     raise FileNotFoundError()
             timestamp = result.split()[-1]
-            if '.' in timestamp:
-                time_format = FLOAT_TIME_FORMAT
-            else:
-                time_format = INT_TIME_FORMAT
             try:
-                return time.mktime(time.strptime(timestamp, time_format))
+                return parse_timestamp(timestamp)
             except ValueError as exc:
                 raise OperationNotSupportedError() from exc
 
+    def set_modified_time(self, path, timestamp):
+        """
+        Set the last time the data of the file system object was modified, using the MFMT command,
+        which not all servers support. The time is kept to the second.
+
+        :param path: The path to operate on.
+        :param timestamp: The time stamp, as a float.
+        :return: None
+        """
+        assert self.is_open
+        path = self._absolute(path)
+        value = time.strftime(INT_TIME_FORMAT, time.gmtime(int(timestamp)))
+        try:
+            self._session.sendcmd('MFMT %s %s' % (value, path))
+        except ftplib.error_perm as exc:
+            if _is_missing(exc):
+                raise FileNotFoundError(path) from exc
+            raise OperationNotSupportedError() from exc
+
+    def raw_make_dir(self, path):
+        """
+        Create a directory at a specific path, with no validation. The parent folder must already
+        exist, and nothing may exist at the path itself.
+
+        :param path: The path to operate on.
+        :return: None
+        """
+        assert self.is_open
+        self._session.mkd(self.check_path(path))
+
+    def raw_copy(self, path, destination, block_size=None):
+        """
+        Copy from a specific path to another specific path, with no validation. Copies to the local
+        file system are downloaded directly, with resume on failure.
+
+        :param path: The path to operate on.
+        :param destination: The path to copy to.
+        :param block_size: The number of bytes copied per block. Defaults to the connector's
+            transfer chunk size for downloads.
+        :return: None
+        """
+        path = self.check_path(path)
+        verify_type(destination, Path)
+        if destination.is_local:
+            self.download(path, destination, chunk_size=block_size)
+        else:
+            super().raw_copy(path, destination, block_size)
+
+    def raw_copy_from(self, source, path):
+        """
+        Copy from a specific path on another connection to a specific path on this connection, with
+        no validation, if this connection can do so natively. Local files are uploaded directly,
+        with resume on failure.
+
+        :param source: The path to copy from.
+        :param path: The path to copy to.
+        :return: Whether the copy was performed.
+        """
+        verify_type(source, Path)
+        if not source.is_local:
+            return False
+        self.upload(source, path)
+        return True
+
     def remove(self, path):
         """
         Remove the folder or file.
@@ -401,9 +1656,104 @@ class ftp_connection(fs_connection):
         assert self.is_open
         path = self.check_path(path)
 
-        dir_path, file_name = os.path.split(path)
-        with Path(dir_path, self):
-            self._session.delete(file_name)
+        if self.is_dir(path) and not self.is_link(path):
+            for child in self.glob(path):
+                child.remove()
+            self._session.rmd(path)
+        else:
+            dir_path, file_name = os.path.split(path)
+            with Path(dir_path, self):
+                self._session.delete(file_name)
+
+    def make_dir(self, path, overwrite=False, clear=False, fill=True, check_only=None):
+        """
+        Create a directory at this location.
+
+        :param path: The path to operate on.
+        :param overwrite: Whether existing files/folders that conflict with this function are to be
+            deleted/overwritten.
+        :param clear: Whether the directory at this location must be empty for the function to be
+            satisfied.
+        :param fill: Whether the necessary parent folder(s) are to be created if the do not exist
+            already.
+        :param check_only: Whether the function should only check if it's possible, or actually
+            perform the operation.
+        :return: None
+        """
+        assert self.is_open
+        path = self.check_path(path)
+
+        if check_only is None:
+            # First check to see if it can be done before we actually make any changes. This doesn't
+            # make the whole thing perfectly atomic, but it eliminates most cases where we start to
+            # do things and then find out we shouldn't have.
+            self.make_dir(path, overwrite, clear, fill, check_only=True)
+
+            # If we don't do this, we'll do a redundant check first on each step in the recursion.
+            check_only = False
+
+        if self.is_dir(path):
+            if clear:
+                children = self.glob(path)
+                if children:
+                    if not overwrite:
+                        raise DirectoryNotEmptyError(path)
+                    if not check_only:
+                        for child in children:
+                            child.remove()
+        elif self.exists(path):
+            # It's not a folder, and it's in our way.
+            if not overwrite:
+                raise FileExistsError(path)
+            if not check_only:
+                self.remove(path)
+                self._session.mkd(path)
+        else:
+            # The path doesn't exist yet, so we need to create it.
+
+            # First ensure the parent folder exists.
+            parent = self.dir(path)
+            if parent is not None and not parent.is_dir:
+                if not fill:
+                    raise NotADirectoryError(parent)
+                parent.make_dir(overwrite, clear=False, fill=True, check_only=check_only)
+
+            # Then create the target folder.
+            if not check_only:
+                self._session.mkd(path)
+
+    def raw_move(self, path, destination):
+        """
+        Move a file or folder from a specific path to another specific path on the same server, with
+        no validation, using RNFR/RNTO. Folders are moved along with their contents in a single
+        operation. An existing file at the destination is renamed over, never deleted first, so
+        the destination doesn't go missing in between. Servers which refuse the rename, e.g.
+        across folders or over an existing file, are left to be handled by copying, as are
+        destinations which exist but aren't plain files.
+
+        :param path: The path to operate on.
+        :param destination: The path to move to.
+        :return: Whether the move was performed.
+        """
+        assert self.is_open
+        verify_type(destination, Path)
+        connection = destination.connection
+        if not isinstance(connection, ftp_connection) or not self.shares_file_system(connection):
+            return False
+
+        source_path = self._absolute(path)
+        target_path = connection._absolute(str(destination))
+        if connection.exists(target_path) and \
+                (connection.is_link(target_path) or not connection.is_file(target_path)):
+            # Only a plain file may be replaced; folders are never removed to make way.
+            return False
+        try:
+            self._session.rename(source_path, target_path)
+        except ftplib.error_perm as exc:
+            log.warning("Server refused to rename %s to %s (%s); falling back on copying.",
+                        source_path, target_path, exc)
+            return False
+        return True
 
     def rename(self, path, new_name):
         """
@@ -422,6 +1772,39 @@ class ftp_connection(fs_connection):
             with Path(dir_path, self):
                 self._session.rename(file_name, new_name)
 
+    def stat(self, path):
+        """
+        Get the metadata of the file system object in a single call, as an immutable record, using
+        MLST if the server supports it, or the listing of the parent directory otherwise.
+
+        :param path: The path to operate on.
+        :return: A FileStatus instance.
+        """
+        assert self.is_open
+        path = self.check_path(path)
+
+        try:
+            facts = self._get_facts(self._absolute(path))
+        except OperationNotSupportedError:
+            return super().stat(path)
+        if facts is None:
+            raise FileNotFoundError(path)
+        if facts.get('type') != 'link':
+            return facts_to_status(facts)
+
+        # Like os.stat(), describe what the link leads to.
+        if self.is_dir(path):
+            facts = {'type': 'dir'}
+        elif self.is_file(path):
+            facts = {'type': 'file', 'size': self.size(path)}
+            try:
+                facts['modify'] = self.modified_time(path)
+            except (OperationNotSupportedError, ftplib.error_perm):
+                pass
+        else:
+            raise FileNotFoundError(path)
+        return facts_to_status(facts)._replace(is_link=True)
+
     def is_dir(self, path):
         """
         Determine if the path refers to an existing directory.
@@ -432,6 +1815,11 @@ class ftp_connection(fs_connection):
         assert self.is_open
         path = self.check_path(path)
 
+        file_type = self._known_type(path)
+        if file_type is not NotImplemented:
+            return file_type == 'dir'
+
+        # The old fashioned way, which follows links.
         # noinspection PyBroadException
         try:
             with Path(path, self):
@@ -458,6 +1846,11 @@ class ftp_connection(fs_connection):
         assert self.is_open
         path = self.check_path(path)
 
+        file_type = self._known_type(path)
+        if file_type is not NotImplemented:
+            return file_type == 'file'
+
+        # The old fashioned way, which follows links.
         # noinspection PyBroadException
         try:
             self.size(path)
@@ -465,6 +1858,79 @@ class ftp_connection(fs_connection):
         except Exception:
             return False
 
+    def is_link(self, path):
+        """
+        Determine if the path refers to a symbolic link. Servers which follow links when describing
+        files, rather than describing the links themselves, make them indistinguishable from what
+        they lead to.
+
+        :param path: The path to operate on.
+        :return: Whether the path is a symbolic link.
+        """
+        assert self.is_open
+        path = self.check_path(path)
+
+        try:
+            facts = self._get_facts(path)
+        except (OperationNotSupportedError, ftplib.error_perm):
+            return False
+        return facts is not None and facts.get('type') == 'link'
+
+    def find_unique_file(self, path, pattern='*', most_recent=True):
+        """
+        Find a file in the folder matching the given pattern and return it. If no such file is
+        found, return None. If multiple files are found, either disambiguate by recency if
+        most_recent is set, or raise an exception if most_recent is not set.
+
+        :param path: The path to operate on.
+        :param pattern: The pattern which the file must match. Default is '*" (all files).
+        :param most_recent: Whether to use recency to disambiguate when multiple files are matched
+            by the pattern.
+        :return: The uniquely identified file, as a Path instance, or None.
+        """
+        assert self.is_open
+        path = self.check_path(path)
+
+        entries = self._list_entries(path)
+
+        # If the listing couldn't tell us what's what, fall back on the slow way.
+        if any('type' not in facts for facts in entries.values()):
+            return super().find_unique_file(path, pattern, most_recent)
+        entries = self._follow_links(path, entries)
+
+        # Ignore Microsoft Office temporary files, which start with '~$'.
+        regex = strings.glob_to_regex(pattern)
+        entries = {
+            name: facts
+            for name, facts in entries.items()
+            if facts['type'] == 'file' and regex.match(name) and not name.startswith('~$')
+        }
+
+        if not entries:
+            log.info("No file found matching the pattern %s in the folder %s.", pattern, path)
+            return None
+
+        if log.level <= logging.INFO:
+            log.info("Source file(s) identified:")
+            for name in entries:
+                log.info("    %s", str(self.join(path, name)))
+
+        if len(entries) == 1:
+            name, = entries
+        elif most_recent:
+            log.info("Only the most recent file will be used.")
+            if all('modify' in facts for facts in entries.values()):
+                name = max(entries, key=lambda entry_name: entries[entry_name]['modify'])
+            else:
+                name = max(entries, key=lambda entry_name: self.modified_time(
+                    self.join(path, entry_name)))
+            log.info("Most recent file: %s", self.join(path, name))
+        else:
+            raise FileExistsError(
+                "Multiple files identified matching the pattern %s in folder %s." % (pattern, path)
+            )
+        return Path(str(self.join(path, name)), self)
+
     def join(self, *path_elements):
         """
         Join several path elements together into a single path.
@@ -0,0 +1,199 @@
+"""
+Persistent caching of file content hashes
+"""
+
+
+import sqlite3
+import threading
+
+
+from ..abc.files import Path, hash_file_object
+from ..exceptions import verify_type
+
+
+__author__ = 'Aaron Hosford'
+__all__ = [
+    'HashCache',
+]
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_hashes (
+    identity TEXT NOT NULL,
+    location TEXT NOT NULL,
+    algorithm TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    modified_time REAL NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (identity, location, algorithm)
+)
+"""
+
+
+class HashCache:
+    """
+    A HashCache remembers the hashes of file contents in an SQLite database, so a file which hasn't
+    changed needn't be read again to hash it. Each hash is recorded along with the file's size and
+    modification time, and is only reused while both are the same. Files on connections which
+    can't identify their file system, or which don't report sizes and modification times, are
+    hashed every time. The cache can be shared by any number of threads.
+
+    Like any check based on modification times, this can be fooled by a file which is rewritten
+    with the same size within the resolution of its file system's clock.
+    """
+
+    _default = None
+
+    @classmethod
+    def get_default(cls):
+        """
+        Get the hash cache used by Path.hash() when no cache is given.
+        """
+        return cls._default
+
+    @classmethod
+    def set_default(cls, cache):
+        """
+        Set the hash cache used by Path.hash() when no cache is given.
+
+        :param cache: The HashCache to use by default, or None.
+        """
+        verify_type(cache, HashCache, allow_none=True)
+        cls._default = cache
+
+    def __init__(self, path=None):
+        """
+        Open a hash cache.
+
+        :param path: The local path of the database file, which is created if it doesn't exist. If
+            not set, the cache is kept in memory and lasts only as long as this object.
+        """
+        if path is None:
+            database = ':memory:'
+        else:
+            if not isinstance(path, Path):
+                path = Path(path)
+            assert path.is_local
+            database = str(abs(path))
+        self._path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(database, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False  # Do not suppress exceptions.
+
+    @property
+    def path(self):
+        """The path of the database file, or None if the cache is kept in memory."""
+        return self._path
+
+    @staticmethod
+    def _key(path):
+        # Return the identity, location, size, and modification time the path's hash is recorded
+        # under, or None if it can't be recorded.
+        identity = path.connection.identity
+        if identity is None:
+            return None
+        status = path.stat()
+        if status.size is None or status.modified_time is None:
+            return None
+        return identity, str(abs(path)), status.size, status.modified_time
+
+    def get(self, path, algorithm='sha256'):
+        """
+        Look up the recorded hash of a file, without reading it.
+
+        :param path: The path of the file.
+        :param algorithm: The name of the hash algorithm.
+        :return: The hex digest, or None if there is no record for the file as it is now.
+        """
+        verify_type(path, Path)
+        verify_type(algorithm, str, non_empty=True)
+        key = self._key(path)
+        if key is None:
+            return None
+        return self._get(key, algorithm)
+
+    def _get(self, key, algorithm):
+        identity, location, size, modified_time = key
+        with self._lock:
+            row = self._db.execute(
+                "SELECT size, modified_time, digest FROM file_hashes "
+                "WHERE identity = ? AND location = ? AND algorithm = ?",
+                (identity, location, algorithm)
+            ).fetchone()
+        if row is None or row[0] != size or row[1] != modified_time:
+            return None
+        return row[2]
+
+    def _put(self, key, algorithm, digest):
+        identity, location, size, modified_time = key
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?, ?, ?)",
+                (identity, location, algorithm, size, modified_time, digest)
+            )
+
+    def hash(self, path, algorithm='sha256'):
+        """
+        Return the hash of a file, reading it only if there is no record of its hash as it is now.
+
+        :param path: The path of the file.
+        :param algorithm: The name of the hash algorithm, as accepted by hashlib.new().
+        :return: The hex digest of the file's contents.
+        """
+        verify_type(path, Path)
+        verify_type(algorithm, str, non_empty=True)
+
+        # The metadata is taken before the file is read. If the file changes while it is being read,
+        # the recorded metadata won't match it any more, and it will be hashed again.
+        key = self._key(path)
+        if key is not None:
+            digest = self._get(key, algorithm)
+            if digest is not None:
+                return digest
+
+        with path.open('rb', compression=None) as file_obj:
+            digest = hash_file_object(file_obj, algorithm)
+        if key is not None:
+            self._put(key, algorithm, digest)
+        return digest
+
+    def discard(self, path):
+        """
+        Forget the recorded hashes of a file, for all algorithms.
+
+        :param path: The path of the file.
+        :return: None
+        """
+        verify_type(path, Path)
+        identity = path.connection.identity
+        if identity is None:
+            return
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM file_hashes WHERE identity = ? AND location = ?",
+                             (identity, str(abs(path))))
+
+    def clear(self):
+        """
+        Forget all recorded hashes.
+
+        :return: None
+        """
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM file_hashes")
+
+    def close(self):
+        """
+        Close the database.
+
+        :return: None
+        """
+        with self._lock:
+            self._db.close()
@@ -2,16 +2,17 @@
 HTTP file system support
 """
 
+from email.utils import parsedate_to_datetime
 from urllib.parse import urlparse
 
 import requests
 
 from ..abc.files import FSConnector, fs_connection
-from ..abc.files import Path
+from ..abc.files import FileStatus, Path
 from ..configurations import ConfigManager
-from ..exceptions import verify_type
+from ..exceptions import OperationNotSupportedError, verify_type
 from ..plugins import config_loader, url_scheme
-from .proxies import ProxyFile
+from .proxies import DEFAULT_SPOOL_SIZE, ProxyFile, open_spooled_reader
 from .local import local_fs_connection
 
 __author__ = 'Aaron Hosford'
@@ -23,6 +24,9 @@ __all__ = [
 
 DEFAULT_HTTP_PORT = 80
 
+# The number of bytes received at a time when downloading a file.
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+
 
 @config_loader
 @url_scheme('http')
@@ -53,8 +57,19 @@ class HTTPFSConnector(FSConnector):
 
         return Path(url, cls().connect())
 
-    def __init__(self, initial_cwd=None):
+    def __init__(self, initial_cwd=None, spool_size=DEFAULT_SPOOL_SIZE):
+        verify_type(spool_size, int, allow_none=True)
+        assert spool_size is None or spool_size >= 0
         super().__init__(http_fs_connection, initial_cwd)
+        self._spool_size = spool_size
+
+    @property
+    def spool_size(self):
+        """
+        The number of bytes of a downloaded file which are held in memory before spilling to disk,
+        or None if downloads are always written to named temporary files.
+        """
+        return self._spool_size
 
     def connect(self):
         """Create a new connection and return it."""
@@ -93,6 +108,14 @@ class http_fs_connection(fs_connection):
     def __repr__(self):
         return type(self).__name__ + '()'
 
+    @property
+    def identity(self):
+        """
+        A string identifying the file system this connection reaches. Paths are full URLs, so they
+        are unique on their own.
+        """
+        return 'http'
+
     def __eq__(self, other):
         if not isinstance(other, fs_connection):
             return NotImplemented
@@ -119,6 +142,22 @@ class http_fs_connection(fs_connection):
         if mode not in ('r', 'rb'):
             raise ValueError("Unsupported mode: " + repr(mode))
 
+        spool_size = self._connector.spool_size
+        if spool_size:
+            # Small files are held in memory, and only spill to disk if they're too large. The
+            # caller gets the buffer itself, with no proxy in between.
+            response = requests.get(path, stream=True)
+            try:
+                response.raise_for_status()
+
+                def load(file_obj):
+                    for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                        file_obj.write(chunk)
+
+                return open_spooled_reader(load, mode, encoding, errors, newline, spool_size)
+            finally:
+                response.close()
+
         # We can't work directly with an HTTP file using URLDownloadToFileW(). Instead, we will
         # create a temp file and return it as a proxy.
         temp_path = local_fs_connection.get_temp_file_path(self.name(path))
@@ -130,3 +169,68 @@ class http_fs_connection(fs_connection):
 
         return ProxyFile(Path(path, self), mode, buffering, encoding, errors, newline, closefd,
                          opener, proxy_path=temp_path, writeback=None)
+
+    def stat(self, path):
+        """
+        Get the metadata of the file in a single call, as an immutable record, using a HEAD request.
+        The size and modification time are taken from the Content-Length and Last-Modified headers,
+        and are None if the server doesn't send them.
+
+        :param path: The path to operate on.
+        :return: A FileStatus instance.
+        """
+        path = self.check_path(path)
+
+        response = requests.head(path, allow_redirects=True)
+        if response.status_code == 404:
+            raise FileNotFoundError(path)
+        response.raise_for_status()
+
+        try:
+            size = int(response.headers['Content-Length'])
+        except (KeyError, ValueError):
+            size = None
+
+        try:
+            modified_time = parsedate_to_datetime(response.headers['Last-Modified']).timestamp()
+        except (KeyError, TypeError, ValueError):
+            modified_time = None
+
+        return FileStatus(
+            type='file',
+            is_link=False,
+            size=size,
+            modified_time=modified_time,
+            accessed_time=modified_time,
+            metadata_changed_time=modified_time,
+            protection_mode=None,
+            inode_number=None,
+            device=None,
+            hard_link_count=None,
+            owner_user_id=None,
+            owner_group_id=None,
+        )
+
+    def size(self, path):
+        """
+        Get the size of the file.
+
+        :param path: The path to operate on.
+        :return: The size in bytes.
+        """
+        size = self.stat(path).size
+        if size is None:
+            raise OperationNotSupportedError()
+        return size
+
+    def modified_time(self, path):
+        """
+        Get the last time the data of file system object was modified.
+
+        :param path: The path to operate on.
+        :return: The time stamp, as a float.
+        """
+        modified_time = self.stat(path).modified_time
+        if modified_time is None:
+            raise OperationNotSupportedError()
+        return modified_time
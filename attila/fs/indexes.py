@@ -0,0 +1,186 @@
+"""
+Indexes over large collections of paths
+"""
+
+
+from ..abc.files import Path
+from ..exceptions import verify_type
+
+
+__author__ = 'Aaron Hosford'
+__all__ = [
+    'PathTrie',
+]
+
+
+class _Node:
+    # A node in the trie. The path is set if a path ending at this node is a member.
+
+    __slots__ = ('children', 'path')
+
+    def __init__(self):
+        self.children = {}
+        self.path = None
+
+
+class PathTrie:
+    """
+    A PathTrie is a set of paths, arranged by their components so that questions about ancestry can
+    be answered without comparing against each member in turn. Finding the members under a given
+    root, or the members a given path is under, costs time proportional to the depth of the path
+    plus the number of paths found, regardless of how many paths the trie holds. Paths on different
+    connections are kept apart, even if their locations are identical.
+    """
+
+    def __init__(self, paths=None):
+        # Connections aren't hashable, so each one's trie is found by a linear search. There are
+        # rarely more than a few.
+        self._roots = []
+        self._size = 0
+        if paths is not None:
+            for path in paths:
+                self.add(path)
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
+
+    def __iter__(self):
+        for _, root in self._roots:
+            yield from self._iter_node(root)
+
+    def __contains__(self, path):
+        if not isinstance(path, Path):
+            return False
+        node = self._find(path)
+        return node is not None and node.path is not None
+
+    def _root(self, connection, create=False):
+        for root_connection, root in self._roots:
+            if root_connection == connection:
+                return root
+        if not create:
+            return None
+        root = _Node()
+        self._roots.append((connection, root))
+        return root
+
+    def _find(self, path):
+        node = self._root(path.connection)
+        if node is None:
+            return None
+        for component in path.components:
+            node = node.children.get(component)
+            if node is None:
+                return None
+        return node
+
+    @staticmethod
+    def _iter_node(node):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.path is not None:
+                yield node.path
+            stack.extend(node.children.values())
+
+    def add(self, path):
+        """
+        Add a path to the trie. If an equal path is already a member, this is a no-op.
+
+        :param path: The path to add.
+        :return: None
+        """
+        verify_type(path, Path)
+        node = self._root(path.connection, create=True)
+        for component in path.components:
+            child = node.children.get(component)
+            if child is None:
+                child = node.children[component] = _Node()
+            node = child
+        if node.path is None:
+            node.path = path
+            self._size += 1
+
+    def discard(self, path):
+        """
+        Remove a path from the trie. If it isn't a member, this is a no-op. Paths under it are not
+        affected.
+
+        :param path: The path to remove.
+        :return: None
+        """
+        verify_type(path, Path)
+        root = self._root(path.connection)
+        if root is None:
+            return
+        nodes = [root]
+        for component in path.components:
+            child = nodes[-1].children.get(component)
+            if child is None:
+                return
+            nodes.append(child)
+        if nodes[-1].path is None:
+            return
+        nodes[-1].path = None
+        self._size -= 1
+
+        # Prune the branch back to the last node that's still needed.
+        for component, node, parent in zip(reversed(path.components), reversed(nodes),
+                                           reversed(nodes[:-1])):
+            if node.path is not None or node.children:
+                break
+            del parent.children[component]
+
+    def under(self, root, include_root=True):
+        """
+        Return an iterator over the member paths that are the given root or are under it.
+
+        :param root: The root path to look under.
+        :param include_root: Whether the root itself is included, if it's a member.
+        :return: An iterator over Path instances, in no particular order.
+        """
+        verify_type(root, Path)
+        node = self._find(root)
+        if node is None:
+            return
+        if include_root:
+            yield from self._iter_node(node)
+        else:
+            for child in node.children.values():
+                yield from self._iter_node(child)
+
+    def over(self, path, include_path=True):
+        """
+        Return an iterator over the member paths that are the given path or are ancestors of it,
+        from the outermost inward.
+
+        :param path: The path to look over.
+        :param include_path: Whether the path itself is included, if it's a member.
+        :return: An iterator over Path instances.
+        """
+        verify_type(path, Path)
+        node = self._root(path.connection)
+        if node is None:
+            return
+        components = path.components
+        for index, component in enumerate(components):
+            node = node.children.get(component)
+            if node is None:
+                return
+            if node.path is not None and (include_path or index < len(components) - 1):
+                yield node.path
+
+    def covers(self, path):
+        """
+        Determine whether the path or any of its ancestors is a member, e.g. to check whether a
+        path falls within any of a set of excluded folders.
+
+        :param path: The path to check.
+        :return: Whether the path is covered by a member of the trie.
+        """
+        for _ in self.over(path):
+            return True
+        return False
@@ -2,18 +2,23 @@
 Local file system support
 """
 
+import errno
+import fnmatch
 import glob
+import mmap
 import os
 import shutil
+import socket
 import stat
 import tempfile
 
 from urllib.parse import urlparse
 
-from ..abc.files import Path, FSConnector, fs_connection
+from ..abc.files import Path, FileStatus, FSConnector, fs_connection
 from ..configurations import ConfigManager
 from ..exceptions import DirectoryNotEmptyError, verify_type
 from ..plugins import config_loader, url_scheme
+from .watching import InotifyWatcher, inotify_available
 
 
 __author__ = 'Aaron Hosford'
@@ -93,6 +98,11 @@ class local_fs_connection(fs_connection):
     def __repr__(self):
         return type(self).__name__ + '()'
 
+    @property
+    def identity(self):
+        """A string identifying the file system this connection reaches: this machine's."""
+        return 'file://' + socket.gethostname()
+
     def __eq__(self, other):
         if not isinstance(other, fs_connection):
             return NotImplemented
@@ -298,6 +308,18 @@ class local_fs_connection(fs_connection):
         """
         return os.stat(self.check_path(path)).st_mtime
 
+    def set_modified_time(self, path, timestamp):
+        """
+        Set the last time the data of the file system object was modified. The access time is left
+        as it is.
+
+        :param path: The path to operate on.
+        :param timestamp: The time stamp, as a float.
+        :return: None
+        """
+        path = self.check_path(path)
+        os.utime(path, (os.stat(path).st_atime, timestamp))
+
     def metadata_changed_time(self, path):
         """
         Get the last time the data or metadata of the file system object was modified.
@@ -307,6 +329,21 @@ class local_fs_connection(fs_connection):
         """
         return os.stat(self.check_path(path)).st_ctime
 
+    def stat(self, path):
+        """
+        Get the metadata of the file system object in a single call, as an immutable record.
+        Symbolic links are followed.
+
+        :param path: The path to operate on.
+        :return: A FileStatus instance.
+        """
+        path = self.check_path(path)
+        result = os.lstat(path)
+        is_link = stat.S_ISLNK(result.st_mode)
+        if is_link:
+            result = os.stat(path)
+        return FileStatus.from_stat_result(result, is_link)
+
     def list(self, path, pattern='*'):
         """
         Return a list of the names of the files and directories appearing in this folder.
@@ -321,7 +358,10 @@ class local_fs_connection(fs_connection):
         if pattern == '*':
             return os.listdir(path)
 
-        return [Path(match, self).name for match in glob.iglob(os.path.join(path, pattern))]
+        if self._is_nested_pattern(pattern):
+            return [Path(match, self).name for match in glob.iglob(os.path.join(path, pattern))]
+
+        return [entry.name for entry in self._scan(path, pattern)]
 
     def glob(self, path, pattern='*'):
         """
@@ -333,7 +373,95 @@ class local_fs_connection(fs_connection):
         """
         path = self.check_path(path)
         self.verify_is_dir(path)
-        return [Path(match, self) for match in glob.iglob(os.path.join(path, pattern))]
+
+        if self._is_nested_pattern(pattern):
+            return [Path(match, self) for match in glob.iglob(os.path.join(path, pattern))]
+
+        return [Path(entry.path, self) for entry in self._scan(path, pattern)]
+
+    def scan(self, path, pattern='*'):
+        """
+        Return the paths of the files and directories appearing in this folder, each paired with a
+        FileStatus snapshot of its metadata taken when the folder was listed. The snapshots are
+        made from the directory entries, which on some platforms carry the stat information, so it
+        doesn't always cost a system call per child. Children which disappear before they can be
+        stat()ed are left out. Broken symbolic links are described as themselves, with type
+        'other'.
+
+        :param path: The path to operate on.
+        :param pattern: A glob-style pattern against which names must match.
+        :return: A list of (Path, FileStatus) pairs for each matching file and directory name.
+        """
+        path = self.check_path(path)
+        self.verify_is_dir(path)
+
+        if self._is_nested_pattern(pattern):
+            return super().scan(path, pattern)
+
+        results = []
+        for entry in self._scan(path, pattern):
+            is_link = entry.is_symlink()
+            try:
+                result = entry.stat()
+            except FileNotFoundError:
+                if not is_link:
+                    continue  # It was removed after it was listed.
+                result = entry.stat(follow_symlinks=False)
+            results.append((Path(entry.path, self), FileStatus.from_stat_result(result, is_link)))
+        return results
+
+    @staticmethod
+    def _is_nested_pattern(pattern):
+        # Patterns which reach into subdirectories are left to the glob module.
+        return os.sep in pattern or (os.altsep is not None and os.altsep in pattern)
+
+    @staticmethod
+    def _scan(path, pattern):
+        # Return the directory's entries whose names match the pattern. As with the glob module,
+        # names starting with a dot are only matched by patterns which also start with one.
+        include_hidden = pattern.startswith('.')
+        with os.scandir(path) as entries:
+            return [entry for entry in entries
+                    if (include_hidden or not entry.name.startswith('.')) and
+                    fnmatch.fnmatch(entry.name, pattern)]
+
+    def walk(self, path, topdown=True, onerror=None, followlinks=False, workers=None):
+        """
+        Walk the directory tree rooted at this path, in the same manner as os.walk(), which it uses
+        to tell files from directories without having to stat each one. For each directory in the
+        tree, yield a tuple, (dir_path, dir_names, file_names). If topdown is set, the caller can
+        modify dir_names in place to prune the search.
+
+        :param path: The path to operate on.
+        :param topdown: Whether parent directories are yielded before their children.
+        :param onerror: A function which is called with the exception when an error occurs.
+        :param followlinks: Whether to walk into directories which are symbolic links.
+        :param workers: Ignored; local directories are listed one at a time.
+        :return: An iterator over (dir_path, dir_names, file_names) tuples.
+        """
+        path = self.check_path(path)
+        for dir_path, dir_names, file_names in os.walk(path, topdown, onerror, followlinks):
+            yield Path(dir_path, self), dir_names, file_names
+
+    def watch(self, path, pattern='*', interval=None):
+        """
+        Watch a folder's contents, or a single file, for changes. On Linux, the kernel reports
+        changes through inotify as they happen, including files being closed after writing.
+        Elsewhere, the folder is listed periodically.
+
+        :param path: The path of the folder or file to watch. If it isn't an existing folder, its
+            parent folder is watched for changes to it alone.
+        :param pattern: A glob-style pattern which the names of reported files must match, when
+            watching a folder.
+        :param interval: The number of seconds between checks, when polling. Default is 1 second.
+        :return: A Watcher instance, which reports changes as FileEvent instances.
+        """
+        if not inotify_available():
+            return super().watch(path, pattern, interval)
+        path = Path(self.check_path(path), self)
+        if os.path.isdir(str(path)):
+            return InotifyWatcher(path, pattern)
+        return InotifyWatcher(path.dir, name=path.name)
 
     def open_file(self, path, mode='r', buffering=-1, encoding=None, errors=None, newline=None,
                   closefd=True, opener=None):
@@ -359,6 +487,34 @@ class local_fs_connection(fs_connection):
 
         return open(path, mode, buffering, encoding, errors, newline, closefd, opener)
 
+    def open_mmap(self, path):
+        """
+        Map the file into memory, read-only. Empty files can't be mapped, and raise a ValueError.
+
+        :param path: The path to operate on.
+        :return: A read-only mmap.mmap instance.
+        """
+        path = self.check_path(path)
+        self.verify_is_not_dir(path)
+        with open(path, 'rb') as file_obj:
+            # The map keeps its own handle to the file, so ours can be closed right away.
+            return mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read_view(self, path):
+        """
+        Return a read-only view of the file's contents, backed by a memory map, so the data is
+        paged in on demand rather than copied. The map is released when the view and any views
+        derived from it are garbage collected.
+
+        :param path: The path to operate on.
+        :return: A read-only memoryview of the file's bytes.
+        """
+        try:
+            return memoryview(self.open_mmap(path))
+        except ValueError:
+            # Empty files can't be mapped.
+            return memoryview(b'')
+
     def remove(self, path):
         """
         Remove the folder or file.
@@ -434,16 +590,49 @@ class local_fs_connection(fs_connection):
             if not check_only:
                 os.mkdir(path)
 
-    def raw_copy(self, path, destination):
+    def raw_make_dir(self, path):
+        """
+        Create a directory at a specific path, with no validation. The parent folder must already
+        exist, and nothing may exist at the path itself.
+
+        :param path: The path to operate on.
+        :return: None
+        """
+        os.mkdir(self.check_path(path))
+
+    def raw_copy(self, path, destination, block_size=None):
         """
         Copy from a specific path to another specific path, with no validation.
 
         :param path: The path to operate on.
         :param destination: The path to copy to.
+        :param block_size: The number of bytes copied per block, where applicable.
         :return: None
         """
         path = self.check_path(path)
         if destination.connection == self:
             shutil.copy2(path, str(abs(destination)))
         else:
-            super().raw_copy(path, destination)
+            super().raw_copy(path, destination, block_size)
+
+    def raw_move(self, path, destination):
+        """
+        Move a file or folder from a specific path to another specific path, with no validation, by
+        renaming it. Folders are moved atomically, along with their contents. Moves across devices
+        can't be done this way, and are left to be done by copying.
+
+        :param path: The path to operate on.
+        :param destination: The path to move to.
+        :return: Whether the move was performed.
+        """
+        path = self.check_path(path)
+        verify_type(destination, Path)
+        if not isinstance(destination.connection, local_fs_connection):
+            return False
+        try:
+            os.replace(path, str(abs(destination)))
+        except OSError as exc:
+            if exc.errno == errno.EXDEV:
+                return False
+            raise
+        return True
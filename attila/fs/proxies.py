@@ -3,25 +3,103 @@ Temporary proxy files
 """
 
 
+import io
+import locale
+import logging
+import tempfile
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+
 from ..abc.files import Path
+from ..exceptions import verify_type
 from .local import local_fs_connection
 from .temp import TempFile
 
 
 __author__ = 'Aaron Hosford'
 __all__ = [
-    'ProxyFile'
+    'WRITEBACK_ON_CLOSE',
+    'WRITEBACK_ON_FLUSH',
+    'WRITEBACK_INTERVAL',
+    'ProxyFile',
+    'Spool',
+    'SpooledProxyFile',
+    'open_spooled_reader',
 ]
 
 
+log = logging.getLogger(__name__)
+
+
+# The number of bytes a spooled proxy holds in memory before spilling to a temporary file on disk.
+DEFAULT_SPOOL_SIZE = 1 << 20
+
+# When a proxy's changes are written back to the original file. They are always written back when
+# the proxy is closed. With WRITEBACK_ON_FLUSH, they are also written back each time the proxy is
+# flushed, and with WRITEBACK_INTERVAL, when it is flushed and the interval has passed since the
+# last write-back.
+WRITEBACK_ON_CLOSE = 'close'
+WRITEBACK_ON_FLUSH = 'flush'
+WRITEBACK_INTERVAL = 'interval'
+WRITEBACK_POLICIES = (WRITEBACK_ON_CLOSE, WRITEBACK_ON_FLUSH, WRITEBACK_INTERVAL)
+
+# The minimum number of seconds between write-backs, for WRITEBACK_INTERVAL.
+DEFAULT_WRITEBACK_INTERVAL = 30
+
+# The number of threads shared by all proxies for writing back in the background.
+BACKGROUND_WRITEBACK_WORKERS = 4
+
+_background_executor = None
+_background_executor_lock = threading.Lock()
+
+
+def _get_background_executor():
+    # The executor is created on first use. Its threads are joined at exit, so write-backs in
+    # progress are allowed to finish.
+    global _background_executor
+    with _background_executor_lock:
+        if _background_executor is None:
+            _background_executor = ThreadPoolExecutor(BACKGROUND_WRITEBACK_WORKERS)
+        return _background_executor
+
+
 class ProxyFile(TempFile):
     """
-    A ProxyFile is a TempFile that acts as a proxy to another file.
+    A ProxyFile is a TempFile that acts as a proxy to another file. Changes are written back to the
+    original file when the proxy is closed, and, depending on the write-back policy, when it is
+    flushed. Changes made since the last write-back are tracked, so a proxy which hasn't changed is
+    never written back. If background is set, the final write-back happens on another thread, so
+    close() returns right away; call wait() to wait for it to complete.
     """
 
-    def __init__(self, path, *args, proxy_path=None, writeback=None, **kwargs):
+    def __init__(self, path, *args, proxy_path=None, writeback=None,
+                 writeback_policy=WRITEBACK_ON_CLOSE, writeback_interval=None,
+                 writeback_batch_size=None, background=False, **kwargs):
+        """
+        Open a new proxy.
+
+        :param path: The path of the original file.
+        :param args: The arguments for opening the proxy file, as for Path.open().
+        :param proxy_path: The path of the local file acting as a proxy.
+        :param writeback: A function which copies the proxy's contents back to the original file.
+            It is called with the proxy path and the original path.
+        :param writeback_policy: When changes are written back: WRITEBACK_ON_CLOSE (the default),
+            WRITEBACK_ON_FLUSH, or WRITEBACK_INTERVAL.
+        :param writeback_interval: The minimum number of seconds between write-backs, for
+            WRITEBACK_INTERVAL. Default is 30 seconds.
+        :param writeback_batch_size: The minimum number of bytes or characters which must be
+            written between write-backs when the proxy is flushed. Changes are always written back
+            when the proxy is closed.
+        :param background: Whether the final write-back, when the proxy is closed, happens on
+            another thread. The writeback function must be safe to call from another thread.
+        :param kwargs: The keyword arguments for opening the proxy file, as for Path.open().
+        """
         assert isinstance(path, Path)
-        assert writeback is None or callable(writeback)
+        self._init_writeback(writeback, writeback_policy, writeback_interval, writeback_batch_size,
+                             background)
         if proxy_path is None:
             proxy_path = local_fs_connection.get_temp_file_path(path.name)
             if proxy_path is None:
@@ -36,7 +114,32 @@ class ProxyFile(TempFile):
 
         super().__init__(proxy_path, *args, **kwargs)
         self._original_path = path
+
+        # Opening for writing creates or truncates the file, even if nothing is ever written.
+        mode = args[0] if args else kwargs.get('mode', 'r')
+        if set(mode) & set('wx'):
+            self._dirty = True
+
+    def _init_writeback(self, writeback, policy, interval, batch_size, background):
+        assert writeback is None or callable(writeback)
+        assert policy in WRITEBACK_POLICIES
+        verify_type(interval, (int, float), allow_none=True)
+        if interval is None:
+            interval = DEFAULT_WRITEBACK_INTERVAL
+        else:
+            assert interval >= 0
+        verify_type(batch_size, int, allow_none=True)
+        assert batch_size is None or batch_size > 0
+
         self._writeback = writeback
+        self._writeback_policy = policy
+        self._writeback_interval = interval
+        self._writeback_batch_size = batch_size
+        self._background = bool(background)
+        self._dirty = False  # Whether there are changes which haven't been written back.
+        self._unsent = 0  # The amount written since the last write-back.
+        self._last_writeback = time.time()
+        self._pending = None
 
     @property
     def path(self):
@@ -48,12 +151,460 @@ class ProxyFile(TempFile):
         """The path to the temporary local file acting as a proxy."""
         return self._path
 
+    @property
+    def dirty(self):
+        """Whether the proxy has changes which haven't been written back to the original file."""
+        return self._dirty or self._modified
+
+    @property
+    def pending(self):
+        """
+        The concurrent.futures.Future for the final write-back, if it is happening in the
+        background, or None.
+        """
+        return self._pending
+
+    def write(self, s):
+        """
+        Write to the file.
+
+        :param s: The string or bytes to write.
+        :return: None
+        """
+        super().write(s)
+        self._unsent += len(s)
+
+    def writelines(self, lines):
+        """
+        Write a sequence of lines to the file.
+
+        :param lines: The lines to write.
+        :return: None
+        """
+        if self._writeback_batch_size is None:
+            # Nothing needs the amount written.
+            super().writelines(lines)
+        else:
+            super().writelines(self._count(lines))
+
+    def _count(self, lines):
+        for line in lines:
+            self._unsent += len(line)
+            yield line
+
+    def _writeback_due(self):
+        # Determine whether a flush should write changes back, according to the policy.
+        if self._writeback_policy == WRITEBACK_ON_CLOSE:
+            return False
+        if self._writeback_batch_size is not None and self._unsent < self._writeback_batch_size:
+            return False
+        if self._writeback_policy == WRITEBACK_INTERVAL:
+            return time.time() - self._last_writeback >= self._writeback_interval
+        return True
+
+    def _copy_back(self):
+        # Copy the proxy's contents to the original file.
+        self._writeback(self._path, self._original_path)
+
+    def _finish(self):
+        # Close the file object, leaving the contents available to copy back.
+        self._file_obj.close()
+
+    def _discard(self):
+        # Discard the proxy's contents.
+        self._path.discard()
+
     def flush(self):
         """
-        Flush pending writes to disk. If writeback is set, copy changes from the proxy to the
-        original file.
+        Flush pending writes to disk. If writeback is set and the write-back policy calls for it,
+        copy changes from the proxy to the original file.
         """
         self._file_obj.flush()
-        if self._writeback is not None and self._modified:
-            self._writeback(self._path, self._original_path)
+        if self._modified:
+            self._dirty = True
+            self._modified = False
+        if self._dirty and self._writeback is not None and self._writeback_due():
+            self._copy_back()
+            self._dirty = False
+            self._unsent = 0
+            self._last_writeback = time.time()
+
+    def close(self):
+        """
+        Close the proxy, copy any changes back to the original file, and delete the proxy. If
+        background is set, the changes are copied back on another thread, and the proxy is deleted
+        once they have been.
+
+        :return: None
+        """
+        if not hasattr(self, '_file_obj'):
+            # We failed partway through opening. Remove whatever was left behind.
+            self._file_obj = None
+            if hasattr(self, '_path'):
+                self._path.discard()
+            return
+        if self._file_obj is None:
+            return
+
+        try:
+            # Don't call flush(), which could write back changes we're about to write back anyway.
+            self._file_obj.flush()
+            if self._modified:
+                self._dirty = True
+                self._modified = False
+            self._finish()
+        except:
+            self._file_obj = None
+            self._discard()
+            raise
+        self._file_obj = None
+
+        if not self._dirty or self._writeback is None:
+            self._discard()
+        elif self._background:
+            self._pending = _get_background_executor().submit(self._background_copy_back)
+        else:
+            try:
+                self._copy_back()
+            finally:
+                self._discard()
+            self._dirty = False
+
+    def _background_copy_back(self):
+        # Copy changes back on the background thread. This is done as part of the task, rather than
+        # in a done callback, so it has finished by the time wait() returns.
+        try:
+            self._copy_back()
+        except Exception:
+            log.exception("Could not write back changes to %s.", self._original_path)
+            raise
+        else:
+            self._dirty = False
+        finally:
+            self._discard()
+
+    def wait(self, timeout=None):
+        """
+        Wait for a write-back happening in the background to complete. If it failed, its exception
+        is raised here.
+
+        :param timeout: The maximum number of seconds to wait. If None, wait indefinitely.
+        :return: None
+        """
+        if self._pending is not None:
+            self._pending.result(timeout)
+
+
+class Spool(io.BufferedIOBase):
+    """
+    A Spool is a seekable binary buffer which holds its contents in memory until they grow past a
+    maximum size, and then moves them to an anonymous temporary file on disk, which the operating
+    system removes once the spool is closed. Unlike tempfile.SpooledTemporaryFile, it can be
+    wrapped in an io.TextIOWrapper.
+    """
+
+    def __init__(self, max_size=None, readable=True, writable=True, append=False):
+        """
+        Create a new, empty spool.
+
+        :param max_size: The number of bytes held in memory before spilling to disk. Defaults to
+            DEFAULT_SPOOL_SIZE.
+        :param readable: Whether the spool can be read.
+        :param writable: Whether the spool can be written.
+        :param append: Whether writes always go to the end, as with files opened in append mode.
+        """
+        super().__init__()
+        if max_size is None:
+            max_size = DEFAULT_SPOOL_SIZE
+        verify_type(max_size, int)
+        assert max_size >= 0
+        self._max_size = max_size
+        self._readable = readable
+        self._writable = writable
+        self._append = append
+        self._file_obj = io.BytesIO()
+        self._spilled = False
+
+    @property
+    def spilled(self):
+        """Whether the contents have been moved to disk."""
+        return self._spilled
+
+    def spill(self):
+        """
+        Move the contents to disk, if they aren't there already.
+
+        :return: None
+        """
+        if self._spilled:
+            return
+        file_obj = tempfile.TemporaryFile()
+        try:
+            file_obj.write(self._file_obj.getbuffer())
+            file_obj.seek(self._file_obj.tell())
+        except:
+            file_obj.close()
+            raise
+        self._file_obj.close()
+        self._file_obj = file_obj
+        self._spilled = True
+
+    def detach(self):
+        """
+        Separate the underlying BytesIO or temporary file from the spool, and return it. The spool
+        is unusable afterward.
+
+        :return: The underlying binary file object.
+        """
+        file_obj = self._file_obj
+        self._file_obj = None
+        super().close()
+        return file_obj
+
+    def readable(self):
+        """Whether the spool can be read."""
+        return self._readable
+
+    def writable(self):
+        """Whether the spool can be written."""
+        return self._writable
+
+    def seekable(self):
+        """Whether the spool supports random access. Always True."""
+        return True
+
+    def fileno(self):
+        """The file number. The contents are moved to disk first, if necessary."""
+        self.spill()
+        return self._file_obj.fileno()
+
+    def read(self, size=-1):
+        """
+        Read up to size bytes. If no size is specified, read to the end.
+
+        :param size: The number of bytes to read.
+        :return: The bytes read.
+        """
+        return self._file_obj.read(size)
+
+    def read1(self, size=-1):
+        """
+        Read up to size bytes, with at most one read from the underlying file.
+
+        :param size: The number of bytes to read.
+        :return: The bytes read.
+        """
+        return self._file_obj.read1(size)
+
+    def readinto(self, buffer):
+        """
+        Read bytes into a buffer.
+
+        :param buffer: A writable buffer.
+        :return: The number of bytes read.
+        """
+        return self._file_obj.readinto(buffer)
+
+    def readline(self, size=-1):
+        """
+        Read a line.
+
+        :param size: The maximum number of bytes to return.
+        :return: The bytes read.
+        """
+        return self._file_obj.readline(size)
+
+    def write(self, data):
+        """
+        Write bytes, spilling to disk if the contents grow too large to hold in memory.
+
+        :param data: The bytes to write.
+        :return: The number of bytes written.
+        """
+        if self._append:
+            self._file_obj.seek(0, io.SEEK_END)
+        if not self._spilled and self._file_obj.tell() + len(data) > self._max_size:
+            self.spill()
+        return self._file_obj.write(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        """
+        Seek to a particular offset.
+
+        :param offset: The offset to seek to.
+        :param whence: Indicates the seek origin.
+        :return: The new position.
+        """
+        return self._file_obj.seek(offset, whence)
+
+    def tell(self):
+        """
+        Determine the current position.
+
+        :return: The offset from the start.
+        """
+        return self._file_obj.tell()
+
+    def truncate(self, size=None):
+        """
+        Truncate the contents to the given size, or to the current position.
+
+        :param size: The new size.
+        :return: The new size.
+        """
+        return self._file_obj.truncate(size)
+
+    def flush(self):
+        """Flush pending writes."""
+        if self._file_obj is not None and not self._file_obj.closed:
+            self._file_obj.flush()
+
+    def close(self):
+        """
+        Discard the contents, whether in memory or on disk.
+
+        :return: None
+        """
+        if self.closed:
+            return
+        try:
+            if self._file_obj is not None:
+                self._file_obj.close()
+        finally:
+            super().close()
+
+
+def _wrap(spool_or_file, mode, encoding, errors, newline):
+    if 'b' in mode:
+        return spool_or_file
+    if encoding is None:
+        # Otherwise, older versions of Python ask for the file number to look for a device encoding,
+        # which spills the spool to disk.
+        encoding = locale.getpreferredencoding(False)
+    return io.TextIOWrapper(spool_or_file, encoding, errors, newline)
+
+
+def open_spooled_reader(load, mode='r', encoding=None, errors=None, newline=None, max_size=None):
+    """
+    Load a file's contents into memory, or into an anonymous temporary file if there is too much
+    to hold in memory, and return a reader for it. The reader is the buffer itself, a BytesIO or
+    the temporary file, with no proxy standing between it and the caller.
+
+    :param load: A function which writes the file's contents to the binary file object it's
+        called with.
+    :param mode: The file mode, 'r', 'rt', or 'rb'.
+    :param encoding: The encoding, for text mode.
+    :param errors: The error handling strategy, for text mode.
+    :param newline: The character sequence to use for newlines, for text mode.
+    :param max_size: The number of bytes held in memory before spilling to disk. Defaults to
+        DEFAULT_SPOOL_SIZE.
+    :return: The opened file object.
+    """
+    assert callable(load)
+    assert mode in ('r', 'rt', 'rb')
+    spool = Spool(max_size, writable=True)
+    try:
+        load(spool)
+        spool.seek(0)
+    except:
+        spool.close()
+        raise
+    return _wrap(spool.detach(), mode, encoding, errors, newline)
+
+
+class SpooledProxyFile(ProxyFile):
+    """
+    A SpooledProxyFile acts as a proxy to another file, like a ProxyFile, but holds the contents in
+    a Spool rather than a named temporary file, so small files never touch the disk.
+    """
+
+    def __init__(self, path, mode='r', buffering=-1, encoding=None, errors=None, newline=None,
+                 closefd=True, opener=None, load=None, writeback=None, max_size=None,
+                 writeback_policy=WRITEBACK_ON_CLOSE, writeback_interval=None,
+                 writeback_batch_size=None, background=False):
+        """
+        Open a new spooled proxy.
+
+        :param path: The path of the original file.
+        :param mode: The file mode.
+        :param buffering: Ignored; the spool is its own buffer.
+        :param encoding: The encoding, for text modes.
+        :param errors: The error handling strategy, for text modes.
+        :param newline: The character sequence to use for newlines, for text modes.
+        :param closefd: Ignored.
+        :param opener: Ignored.
+        :param load: A function which writes the original file's contents to the binary file
+            object it's called with, or None if the proxy starts out empty.
+        :param writeback: A function which copies the proxy's contents back to the original file.
+            It is called with a binary file object positioned at the start of the contents, and the
+            original path.
+        :param max_size: The number of bytes held in memory before spilling to disk. Defaults to
+            DEFAULT_SPOOL_SIZE.
+        :param writeback_policy: When changes are written back: WRITEBACK_ON_CLOSE (the default),
+            WRITEBACK_ON_FLUSH, or WRITEBACK_INTERVAL.
+        :param writeback_interval: The minimum number of seconds between write-backs, for
+            WRITEBACK_INTERVAL. Default is 30 seconds.
+        :param writeback_batch_size: The minimum number of bytes or characters which must be
+            written between write-backs when the proxy is flushed.
+        :param background: Whether the final write-back, when the proxy is closed, happens on
+            another thread.
+        """
+        # Set these first, so close() works if we fail partway through.
+        self._file_obj = None
         self._modified = False
+        assert isinstance(path, Path)
+        assert load is None or callable(load)
+        verify_type(mode, str, non_empty=True)
+        self._init_writeback(writeback, writeback_policy, writeback_interval, writeback_batch_size,
+                             background)
+
+        readable = 'r' in mode or '+' in mode
+        writable = 'r' not in mode or '+' in mode
+        spool = Spool(max_size, readable, writable, append='a' in mode)
+        try:
+            if load is not None:
+                load(spool)
+            spool.seek(0, io.SEEK_END if 'a' in mode else io.SEEK_SET)
+            self._file_obj = _wrap(spool, mode, encoding, errors, newline)
+        except:
+            spool.close()
+            raise
+
+        self._spool = spool
+        self._original_path = path
+
+        # Opening for writing creates or truncates the file, even if nothing is ever written.
+        if set(mode) & set('wx'):
+            self._dirty = True
+
+    @property
+    def name(self):
+        """The name of the original file."""
+        return self._original_path.name
+
+    @property
+    def proxy_path(self):
+        """Always None; the proxy's contents aren't kept in a named file."""
+        return None
+
+    @property
+    def spilled(self):
+        """Whether the proxy's contents have been moved to disk."""
+        return self._spool.spilled
+
+    def _copy_back(self):
+        # Copy the spool's contents to the original file, leaving its position as it was.
+        position = self._spool.tell()
+        self._spool.seek(0)
+        try:
+            self._writeback(self._spool, self._original_path)
+        finally:
+            self._spool.seek(position)
+
+    def _finish(self):
+        # Let go of the text wrapper, if any, without closing the spool.
+        if self._file_obj is not self._spool:
+            self._file_obj.detach()
+
+    def _discard(self):
+        self._spool.close()
@@ -7,7 +7,7 @@ import sys
 
 from urllib.parse import urlparse
 
-from ..abc.files import Path, FSConnector, fs_connection
+from ..abc.files import FORM_FEED_CHAR, Path, FSConnector, fs_connection
 from ..configurations import ConfigManager
 from ..exceptions import verify_type
 from ..plugins import config_loader, url_scheme
@@ -169,3 +169,20 @@ class stdio_fs_connection(fs_connection):
             else:
                 assert path == 'STDERR'
                 return sys.stderr
+
+    def _line_batches(self, path, encoding=None, memory_map=False, chunk_size=None,
+                      compression=NotImplemented):
+        """
+        Return an iterator over lists of lines from the stream. STDIN may be interactive, so it is
+        read a line at a time, rather than in chunks.
+
+        :param path: The path to operate on.
+        :param encoding: The file encoding used to open the file.
+        :param memory_map: Ignored. Streams can't be mapped into memory.
+        :param chunk_size: Ignored. Streams are read a line at a time.
+        :param compression: Ignored. Streams are never compressed.
+        :return: An iterator over lists of lines, without newlines.
+        """
+        with self.open_file(path, encoding=encoding) as file_obj:
+            for line in file_obj:
+                yield line.rstrip('\r\n').split(FORM_FEED_CHAR)
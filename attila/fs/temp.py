@@ -22,7 +22,8 @@ class TempFile:
 
     def __init__(self, path, *args, **kwargs):
         self._path = path
-        self._file_obj = path.open(*args, **kwargs)
+        # Temp files hold the data as-is, whatever their names.
+        self._file_obj = path.open(*args, compression=None, **kwargs)
         self._modified = False
         assert isinstance(path, Path)
         assert path.exists
@@ -109,7 +110,9 @@ class TempFile:
         return False
 
     def __iter__(self):
-        return self
+        # Iterate over the file object directly, rather than through __next__(), which adds a
+        # Python call to every line.
+        return iter(self._file_obj)
 
     def __next__(self):
         return next(self._file_obj)
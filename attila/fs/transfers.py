@@ -0,0 +1,748 @@
+"""
+Planned and concurrent multi-file transfers
+"""
+
+
+import builtins
+import json
+import logging
+import threading
+
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+from .. import exceptions
+from ..abc.files import Path
+from ..exceptions import DirectoryNotEmptyError, OperationNotSupportedError, PathError, \
+    TransferError, verify_type
+
+
+__author__ = 'Aaron Hosford'
+__all__ = [
+    'TransferStep',
+    'TransferConflict',
+    'TransferPlan',
+    'TransferEngine',
+    'SyncReport',
+]
+
+
+log = logging.getLogger(__name__)
+
+
+DEFAULT_WORKERS = 4
+
+MAKE_DIR = 'make_dir'
+REMOVE = 'remove'
+COPY = 'copy'
+OVERWRITE = 'overwrite'
+
+ACTIONS = (MAKE_DIR, REMOVE, COPY, OVERWRITE)
+FILE_ACTIONS = (COPY, OVERWRITE)
+
+SIZE_AND_MTIME = 'size+mtime'
+HASH = 'hash'
+
+COMPARISONS = (SIZE_AND_MTIME, HASH)
+
+# Synced files are given their source's modification time. The time read back from the destination
+# can be off from the one set by rounding, by up to this many seconds.
+MTIME_ROUNDING = 0.001
+
+
+class TransferStep(namedtuple('TransferStep', ['action', 'source', 'destination',
+                                               'modified_time', 'size'])):
+    """
+    A single planned change in a TransferPlan. The action is one of 'make_dir', 'remove', 'copy',
+    or 'overwrite'. The source is only set for copies and overwrites; the others act on the
+    destination alone. An overwrite removes whatever is at the destination before copying to it.
+    The modified time, if set, is the source's modification time as of when the plan was built,
+    which is given to the copy, so a later sync can tell whether the source has changed since. The
+    size, if known, is the source's size as of when the plan was built.
+    """
+
+    __slots__ = ()
+
+
+class SyncReport(namedtuple('SyncReport', ['files_copied', 'bytes_copied', 'files_skipped',
+                                           'bytes_skipped', 'items_removed'])):
+    """
+    A summary of the work done, or to be done, by a sync. Files are skipped if they were found to
+    be unchanged. Removed items are the extraneous files and folders deleted from the destination,
+    along with anything that was in the way of a copy. Byte counts are taken from the sizes the
+    files had when the sync was planned, and are None where the file system doesn't report them in
+    its listings.
+    """
+
+    __slots__ = ()
+
+
+class TransferConflict(namedtuple('TransferConflict', ['source', 'destination', 'error'])):
+    """
+    A reason a TransferPlan can't be carried out as requested, along with the exception that
+    executing it would raise. The source is None if the conflict lies in the destination's parent
+    folders.
+    """
+
+    __slots__ = ()
+
+
+def _error_type(name):
+    # Find the exception class with the given name when loading a saved conflict.
+    for module in builtins, exceptions:
+        error_type = getattr(module, name, None)
+        if isinstance(error_type, type) and issubclass(error_type, Exception):
+            return error_type
+    return PathError
+
+
+def _is_unchanged(source, source_status, destination, destination_status, compare):
+    # Determine whether the destination file is already an up-to-date copy of the source file, from
+    # the FileStatus snapshots taken when they were listed.
+    source_size = source_status.size
+    if source_size is None or source_size != destination_status.size:
+        return False
+    if compare == HASH:
+        return source.hash() == destination.hash()
+    source_time = source_status.modified_time
+    destination_time = destination_status.modified_time
+    if source_time is None or destination_time is None:
+        return False
+    # The destination was given the source's modification time when it was synced, so it's up to
+    # date if the source's time hasn't moved since. Comparing the two times doesn't depend on the
+    # file systems' clocks agreeing, or on when the sync happened.
+    if abs(source_time - destination_time) <= MTIME_ROUNDING:
+        return True
+    # File systems which keep times to the second, including FTP servers, truncate it.
+    return destination_time == int(destination_time) and 0 < source_time - destination_time < 1
+
+
+def _sum_sizes(sizes):
+    # Total the sizes recorded for the files, or return None if any of them are unknown.
+    total = 0
+    for size in sizes:
+        if size is None:
+            return None
+        total += size
+    return total
+
+
+def _perform(step):
+    # Carry out a single step. Steps are safe to repeat, so a step that was interrupted before its
+    # completion was recorded can be performed again when the plan is resumed.
+    action, source, destination, modified_time, _ = step
+    if action == MAKE_DIR:
+        try:
+            destination.connection.raw_make_dir(destination)
+        except Exception:
+            if not destination.is_dir:
+                raise
+    elif action == REMOVE:
+        destination.discard()
+    else:
+        if action == OVERWRITE:
+            destination.discard()
+        source.connection.raw_copy(source, destination)
+        if modified_time is not None:
+            try:
+                destination.set_modified_time(modified_time)
+            except OperationNotSupportedError:
+                # The copy will look changed to the next sync, and be copied again.
+                log.debug("Could not set the modification time of %s.", destination)
+
+
+class TransferPlan:
+    """
+    A TransferPlan is a manifest of the changes needed to copy a folder or file to a destination,
+    built by a single traversal of the source and destination trees. Once built, it can be
+    inspected without making any changes (a dry run), saved, and executed without listing either
+    tree again. Conflicts which would prevent the copy are collected rather than raised, so all of
+    them can be reported at once. Each step records its completion as it is executed, so a plan
+    which fails partway through can be executed again to finish the remaining steps. If a manifest
+    file is given to execute(), completions are also appended to it, so the plan can be loaded and
+    resumed after the process itself dies.
+    """
+
+    @classmethod
+    def build(cls, source, destination, overwrite=False, clear=False, fill=True):
+        """
+        Plan a recursive copy of the folder or file to the destination, with the same semantics as
+        Path.copy_to(). Nothing is changed.
+
+        :param source: The file or folder to copy.
+        :param destination: The new location where the file or folder will be copied.
+        :param overwrite: Whether conflicting files or folders should be overwritten.
+        :param clear: Whether pre-existing contents of a folder are considered to be a conflict.
+        :param fill: Whether the parent folder is created if it doesn't exist.
+        :return: A new TransferPlan instance.
+        """
+        verify_type(source, Path)
+        verify_type(destination, Path)
+        source = abs(source)
+        destination = abs(destination)
+        status = source.stat()
+
+        plan = cls()
+
+        # Do not clear the destination's parent folder, regardless of the clear flag's value, as the
+        # clear flag only applies to the copied file object and its descendants.
+        parent = destination.dir
+        if parent is None:
+            is_new = False
+        else:
+            is_new = plan._plan_dir(parent, overwrite, False, fill, False)
+        if is_new is None:
+            return plan
+        destination_status = None
+        if not is_new:
+            try:
+                destination_status = destination.stat()
+            except FileNotFoundError:
+                is_new = True
+        plan._plan_tree(source, destination, overwrite, clear, is_new, status, destination_status)
+        return plan
+
+    @classmethod
+    def build_sync(cls, source, destination, compare=SIZE_AND_MTIME, delete=False, fill=True):
+        """
+        Plan an incremental copy of the folder or file to the destination, so the destination
+        becomes a mirror of the source. Files which are new or changed are copied, and anything in
+        the way of them is overwritten. Files which are unchanged are skipped. Nothing is changed.
+        Copied files are given the source's modification time, where the destination's connection
+        supports it.
+
+        :param source: The file or folder to mirror.
+        :param destination: The location of the mirror.
+        :param compare: How files are compared to determine whether they have changed, either
+            'size+mtime' or 'hash'. With 'size+mtime', a destination file is unchanged if it has
+            the same size as the source file and still has the modification time it was given when
+            it was last synced. Times are compared to the precision the destination keeps, so an
+            edit which doesn't change the size, made within a second of the last one, can be
+            missed. Where the destination can't be given modification times, e.g. an FTP server
+            without MFMT, files are copied every time. With 'hash', a destination file is
+            unchanged if it has the same contents.
+        :param delete: Whether files and folders in the destination which aren't in the source are
+            removed.
+        :param fill: Whether the parent folder is created if it doesn't exist.
+        :return: A new TransferPlan instance.
+        """
+        verify_type(source, Path)
+        verify_type(destination, Path)
+        if compare not in COMPARISONS:
+            raise ValueError("Unsupported comparison: %r" % compare)
+        source = abs(source)
+        destination = abs(destination)
+        source.connection.verify_exists(source)
+
+        plan = cls()
+
+        # Folders above the mirror aren't part of it, so they are never overwritten.
+        parent = destination.dir
+        if parent is None:
+            is_new = False
+        else:
+            is_new = plan._plan_dir(parent, False, False, fill, False)
+        if is_new is not None:
+            plan._plan_sync(source, destination, compare, delete, is_new)
+        return plan
+
+    @classmethod
+    def load(cls, manifest, source_connection=None, destination_connection=None):
+        """
+        Load a plan from a manifest written by save(), including the completion of any steps
+        recorded by execute().
+
+        :param manifest: The path of the manifest file.
+        :param source_connection: The connection of the plan's source paths. If not set, the default
+            connection is used.
+        :param destination_connection: The connection of the plan's destination paths. If not set,
+            the default connection is used.
+        :return: A new TransferPlan instance.
+        """
+        if not isinstance(manifest, Path):
+            manifest = Path(manifest)
+
+        def source_path(location):
+            return None if location is None else Path(location, source_connection)
+
+        def destination_path(location):
+            return None if location is None else Path(location, destination_connection)
+
+        plan = cls()
+        for line in manifest.read(encoding='utf-8'):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # The process died while recording a completion. The step will be repeated.
+                log.warning("Ignoring incomplete record in transfer manifest %s.", manifest)
+                continue
+            if 'done' in record:
+                plan._completed.add(record['done'])
+            elif 'skipped' in record:
+                plan._skipped.append((source_path(record['skipped']),
+                                      destination_path(record['destination']),
+                                      record.get('size')))
+            elif 'conflict' in record:
+                error = _error_type(record['conflict'])(record['message'])
+                plan._conflicts.append(TransferConflict(source_path(record['source']),
+                                                        destination_path(record['destination']),
+                                                        error))
+            else:
+                assert record['action'] in ACTIONS
+                assert record['step'] == len(plan._steps)
+                plan._steps.append(TransferStep(record['action'], source_path(record['source']),
+                                                destination_path(record['destination']),
+                                                record.get('modified_time'), record.get('size')))
+        return plan
+
+    def __init__(self):
+        self._steps = []
+        self._conflicts = []
+        self._skipped = []  # (source, destination, size) triples
+        self._completed = set()
+        self._lock = threading.Lock()
+        self._journal = None
+
+    def __len__(self):
+        return len(self._steps)
+
+    def __iter__(self):
+        return iter(self._steps)
+
+    @property
+    def steps(self):
+        """The planned steps, in the order they are executed."""
+        return tuple(self._steps)
+
+    @property
+    def conflicts(self):
+        """The conflicts which prevent the plan from being executed."""
+        return tuple(self._conflicts)
+
+    @property
+    def skipped(self):
+        """The (source, destination) pairs of files which are left as they are, being unchanged."""
+        return tuple((source, destination) for source, destination, _ in self._skipped)
+
+    @property
+    def is_feasible(self):
+        """Whether the plan can be executed, i.e. it has no conflicts."""
+        return not self._conflicts
+
+    @property
+    def is_complete(self):
+        """Whether every step of the plan has been executed."""
+        return len(self._completed) == len(self._steps)
+
+    @property
+    def file_count(self):
+        """The number of files the plan copies."""
+        return sum(step.action in FILE_ACTIONS for step in self._steps)
+
+    def report(self):
+        """
+        Summarize the work the plan does, regardless of how much of it has been executed. The
+        summary comes from what was recorded when the plan was built, without going back to the
+        file systems.
+
+        :return: A SyncReport instance.
+        """
+        file_sizes = [step.size for step in self._steps if step.action in FILE_ACTIONS]
+        return SyncReport(
+            len(file_sizes),
+            _sum_sizes(file_sizes),
+            len(self._skipped),
+            _sum_sizes(size for _, _, size in self._skipped),
+            sum(step.action == REMOVE for step in self._steps)
+        )
+
+    def pending(self):
+        """
+        Return a list of the steps which have not been executed yet, in order, along with their
+        indices in the plan.
+
+        :return: A list of (index, step) pairs.
+        """
+        with self._lock:
+            return [(index, step) for index, step in enumerate(self._steps)
+                    if index not in self._completed]
+
+    def verify(self):
+        """
+        Raise the error for the first conflict, if there are any.
+
+        :return: None
+        """
+        if self._conflicts:
+            raise self._conflicts[0].error
+
+    def _add(self, action, source, destination, modified_time=None, size=None):
+        self._steps.append(TransferStep(action, source, destination, modified_time, size))
+
+    def _conflict(self, source, destination, error):
+        self._conflicts.append(TransferConflict(source, destination, error))
+
+    def _plan_dir(self, path, overwrite, clear, fill, is_new, status=None):
+        # Plan for a folder to exist at the path. Return True if the folder is new or will have been
+        # emptied, so nothing under it needs to be checked; False if it already exists and may have
+        # contents; or None if it can't be made, so nothing under it can be planned. The status, if
+        # given, is the FileStatus of whatever already exists at the path, from its parent folder's
+        # listing.
+        if is_new:
+            self._add(MAKE_DIR, None, path)
+            return True
+        if status is None or status.is_dir is None:
+            is_dir = path.is_dir
+        else:
+            is_dir = status.is_dir
+        if is_dir:
+            if clear:
+                children = path.glob()
+                if children:
+                    if not overwrite:
+                        self._conflict(None, path, DirectoryNotEmptyError(path))
+                        return None
+                    for child in children:
+                        self._add(REMOVE, None, child)
+                    return True
+            return False
+        if status is not None or path.exists:
+            # It's not a folder, and it's in our way.
+            if not overwrite:
+                self._conflict(None, path, FileExistsError(path))
+                return None
+            self._add(REMOVE, None, path)
+            self._add(MAKE_DIR, None, path)
+            return True
+
+        # The path doesn't exist yet, so we need to create it, after its parent.
+        parent = path.dir
+        if parent is not None and not parent.is_dir:
+            if not fill:
+                self._conflict(None, path, NotADirectoryError(parent))
+                return None
+            if self._plan_dir(parent, overwrite, False, True, False) is None:
+                return None
+        self._add(MAKE_DIR, None, path)
+        return True
+
+    def _plan_tree(self, source, destination, overwrite, clear, is_new, status,
+                   destination_status=None):
+        # The statuses are the FileStatus snapshots of the source, and of whatever is at the
+        # destination unless it's new, taken from their parent folders' listings.
+        is_dir = source.is_dir if status.is_dir is None else status.is_dir
+        if is_dir:
+            # The children's parent folder is the one we planned here, so it's always safe to fill
+            # it in.
+            children_are_new = self._plan_dir(destination, overwrite, clear, True, is_new,
+                                              destination_status)
+            if children_are_new is not None:
+                if children_are_new:
+                    targets = {}
+                else:
+                    # Each destination folder is listed once, rather than checking each target
+                    # separately, which costs a round trip per file on remote file systems.
+                    targets = {target.name: target_status
+                               for target, target_status in destination.scan()}
+                for child, child_status in source.scan():
+                    target_status = targets.get(child.name)
+                    self._plan_tree(child, destination[child.name], overwrite, clear,
+                                    target_status is None, child_status, target_status)
+        is_file = source.is_file if status.is_file is None else status.is_file
+        if is_dir and not is_file:  # It's possible for it to be both.
+            return
+        if is_new:
+            self._add(COPY, source, destination, size=status.size)
+        elif source == destination:
+            # We can't overwrite the file with itself.
+            self._conflict(source, destination,
+                           FileExistsError("Attempting to overwrite file with itself: %s" %
+                                           destination))
+        elif not overwrite:
+            # It's not a folder, and it's in our way.
+            if destination_status.is_dir is None:
+                in_the_way = destination.is_dir
+            else:
+                in_the_way = destination_status.is_dir
+            if in_the_way:
+                self._conflict(source, destination, IsADirectoryError(destination))
+            else:
+                self._conflict(source, destination, FileExistsError(destination))
+        else:
+            self._add(OVERWRITE, source, destination, size=status.size)
+
+    def _plan_sync(self, source, destination, compare, delete, is_new, source_status=None,
+                   destination_status=None):
+        # The statuses, if given, are the FileStatus snapshots from the parent folders' listings.
+        if source_status is None:
+            source_status = source.stat()
+        if source_status.is_dir:
+            children_are_new = self._plan_dir(destination, True, False, True, is_new,
+                                              destination_status)
+            if children_are_new is None:
+                return
+            children = source.scan()
+            if children_are_new:
+                targets = {}
+            else:
+                # The listings carry metadata with them, where the connection provides it, so
+                # comparing against them doesn't cost a round trip per file.
+                targets = {target.name: (target, status) for target, status in destination.scan()}
+                names = {child.name for child, _ in children}
+                for name, (target, _) in sorted(targets.items()):
+                    if name not in names and delete:
+                        self._add(REMOVE, None, target)
+            for child, child_status in children:
+                if child.name in targets:
+                    target, target_status = targets[child.name]
+                    self._plan_sync(child, target, compare, delete, False, child_status,
+                                    target_status)
+                else:
+                    self._plan_sync(child, destination[child.name], compare, delete, True,
+                                    child_status)
+            return
+        if not is_new and destination_status is None:
+            try:
+                destination_status = destination.stat()
+            except FileNotFoundError:
+                is_new = True
+        if is_new:
+            self._add(COPY, source, destination, source_status.modified_time, source_status.size)
+        elif destination_status.is_dir or \
+                not _is_unchanged(source, source_status, destination, destination_status, compare):
+            self._add(OVERWRITE, source, destination, source_status.modified_time,
+                      source_status.size)
+        else:
+            self._skipped.append((source, destination, source_status.size))
+
+    def _records(self):
+        for index, (action, source, destination, modified_time, size) in enumerate(self._steps):
+            yield json.dumps({
+                'step': index,
+                'action': action,
+                'source': None if source is None else str(source),
+                'destination': str(destination),
+                'modified_time': modified_time,
+                'size': size,
+            })
+        for source, destination, error in self._conflicts:
+            yield json.dumps({
+                'conflict': type(error).__name__,
+                'message': str(error),
+                'source': None if source is None else str(source),
+                'destination': str(destination),
+            })
+        for source, destination, size in self._skipped:
+            yield json.dumps({'skipped': str(source), 'destination': str(destination),
+                              'size': size})
+        for index in sorted(self._completed):
+            yield json.dumps({'done': index})
+
+    def save(self, manifest):
+        """
+        Save the plan, and the completion of any steps executed so far, to a manifest file, which
+        can be loaded again with TransferPlan.load(). The file consists of one JSON record per line.
+        Paths are saved by location alone, so the connections must be supplied when it is loaded.
+
+        :param manifest: The path of the manifest file. If it exists, it is overwritten.
+        :return: None
+        """
+        if not isinstance(manifest, Path):
+            manifest = Path(manifest)
+        manifest.save(self._records(), overwrite=True, encoding='utf-8', atomic=True)
+
+    def _complete(self, index):
+        # Record the completion of a step, both in memory and in the manifest, if there is one.
+        with self._lock:
+            self._completed.add(index)
+            if self._journal is not None:
+                self._journal.write(json.dumps({'done': index}) + '\n')
+                self._journal.flush()
+
+    def execute(self, workers=None, manifest=None):
+        """
+        Execute the steps of the plan which haven't been executed yet. If the plan has conflicts,
+        the error for the first one is raised before anything is changed. If a step fails, the
+        steps already executed remain recorded as complete, and calling execute() again resumes
+        from the failed step.
+
+        :param workers: The maximum number of files to copy concurrently. If not set, files are
+            copied one at a time, and the first failure stops execution. Otherwise, failed file
+            copies don't stop the others, and are reported together in a single TransferError.
+        :param manifest: The path of a manifest file where the completion of each step is recorded
+            as it happens. If it doesn't exist yet, the plan is saved to it first. To survive the
+            death of the process, it should be on the local file system.
+        :return: The number of files copied.
+        """
+        self.verify()
+        if manifest is not None:
+            if not isinstance(manifest, Path):
+                manifest = Path(manifest)
+            if not manifest.exists:
+                self.save(manifest)
+            self._journal = manifest.open('a', encoding='utf-8')
+            # If the process died partway through writing a record, the record must not run into the
+            # first new one. Blank lines are ignored when the manifest is loaded.
+            self._journal.write('\n')
+        try:
+            if workers is not None and workers > 1:
+                return TransferEngine(workers).execute(self)
+            count = 0
+            for index, step in self.pending():
+                _perform(step)
+                self._complete(index)
+                if step.action in FILE_ACTIONS:
+                    count += 1
+            return count
+        finally:
+            if self._journal is not None:
+                journal = self._journal
+                self._journal = None
+                journal.close()
+
+
+class TransferEngine:
+    """
+    A TransferEngine executes the file copies of a TransferPlan on a bounded pool of worker threads.
+    Folders are created and removed on the calling thread, in planned order, so every file copy can
+    rely on its target directory already existing. Each worker uses its own clone of the source and
+    destination connections, which for remote file systems means a separate session per worker.
+    Connections to the same file system share a clone, and the number of workers is capped by the
+    connections' clone limits, so the workers can't exhaust a bounded session pool. If any of the
+    connections can't be cloned at all, the files are copied one at a time on the calling thread,
+    using the original connections. Failed file copies don't stop the others; they are collected and
+    reported together in a single TransferError once all copies have finished.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS):
+        verify_type(workers, int)
+        assert workers > 0
+        self._workers = workers
+        self._local = threading.local()
+        self._clones = []
+        self._clones_lock = threading.Lock()
+
+    @property
+    def workers(self):
+        """The maximum number of files copied concurrently."""
+        return self._workers
+
+    @staticmethod
+    def _key(connection):
+        # Connections to the same file system share a session pool, so they share a clone.
+        identity = connection.identity
+        return id(connection) if identity is None else identity
+
+    def _worker_count(self, steps):
+        # The number of workers to use for the steps, within the clone limits of their connections,
+        # or 0 if the steps can't be run on worker threads because a connection can't be cloned.
+        workers = self._workers
+        connections = {}
+        for _, step in steps:
+            if step.action in FILE_ACTIONS:
+                for path in step.source, step.destination:
+                    connections.setdefault(self._key(path.connection), path.connection)
+        for connection in connections.values():
+            limit = connection.clone_limit
+            if limit is not None:
+                workers = min(workers, limit)
+        return workers
+
+    def _worker_path(self, path):
+        # Re-home the path onto this thread's clone of its connection.
+        clones = getattr(self._local, 'clones', None)
+        if clones is None:
+            clones = self._local.clones = {}
+        connection = path.connection
+        key = self._key(connection)
+        clone = clones.get(key)
+        if clone is None:
+            clone = connection.clone()
+            clones[key] = clone
+            if clone is not connection:
+                with self._clones_lock:
+                    self._clones.append(clone)
+        return Path(str(path), clone)
+
+    def _copy_file(self, plan, index, step, clone=True):
+        if clone:
+            step = step._replace(source=self._worker_path(step.source),
+                                 destination=self._worker_path(step.destination))
+        _perform(step)
+        plan._complete(index)
+
+    @staticmethod
+    def _run_now(function, *args):
+        # Run the function on the calling thread, and return a completed future for the outcome.
+        future = Future()
+        try:
+            future.set_result(function(*args))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+    def execute(self, plan):
+        """
+        Execute the steps of the plan which haven't been executed yet. The plan is expected to have
+        no conflicts.
+
+        :param plan: The TransferPlan to execute.
+        :return: The number of files copied.
+        """
+        verify_type(plan, TransferPlan)
+
+        failures = []
+        futures = []
+        pending = plan.pending()
+        workers = self._worker_count(pending)
+        executor = ThreadPoolExecutor(workers) if workers else None
+        submit = self._run_now if executor is None else executor.submit
+        try:
+            for index, step in pending:
+                if step.action in FILE_ACTIONS:
+                    futures.append((step, submit(self._copy_file, plan, index, step,
+                                                 executor is not None)))
+                else:
+                    _perform(step)
+                    plan._complete(index)
+        except:
+            # A directory could not be created, so nothing else can be trusted to work.
+            for _, future in futures:
+                future.cancel()
+            raise
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+            with self._clones_lock:
+                clones = self._clones
+                self._clones = []
+            for clone in clones:
+                clone.close()
+
+        for step, future in futures:
+            exc = future.exception()
+            if exc is not None:
+                log.error("Failed to copy %s to %s: %s", step.source, step.destination, exc)
+                failures.append((step.source, step.destination, exc))
+        if failures:
+            raise TransferError(failures)
+        return len(futures)
+
+    def copy_to(self, source, destination, overwrite=False, clear=False, fill=True):
+        """
+        Recursively copy the folder or file to the destination. The copy is planned in full before
+        any changes are made.
+
+        :param source: The file or folder to copy.
+        :param destination: The new location where the file or folder will be copied.
+        :param overwrite: Whether conflicting files or folders should be overwritten.
+        :param clear: Whether pre-existing contents of a folder are considered to be a conflict.
+        :param fill: Whether the parent folder is created if it doesn't exist.
+        :return: The number of files copied.
+        """
+        plan = TransferPlan.build(source, destination, overwrite, clear, fill)
+        plan.verify()
+        return self.execute(plan)
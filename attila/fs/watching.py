@@ -0,0 +1,582 @@
+"""
+Notification of changes to files, and waiting for files to arrive and finish being written
+"""
+
+
+import collections
+import ctypes
+import ctypes.util
+import errno
+import fnmatch
+import logging
+import os
+import select
+import struct
+import sys
+import time
+
+from collections import namedtuple
+
+
+from ..abc.files import Path
+from ..exceptions import verify_type
+
+
+__author__ = 'Aaron Hosford'
+__all__ = [
+    'CREATED',
+    'MODIFIED',
+    'CLOSED_WRITE',
+    'MOVED_FROM',
+    'MOVED_TO',
+    'DELETED',
+    'RESCAN',
+    'FileEvent',
+    'Watcher',
+    'PollingWatcher',
+    'InotifyWatcher',
+    'inotify_available',
+    'wait_until_stable',
+    'wait_for_file',
+]
+
+
+log = logging.getLogger(__name__)
+
+
+# The kinds of events.
+CREATED = 'created'
+MODIFIED = 'modified'
+CLOSED_WRITE = 'closed_write'
+MOVED_FROM = 'moved_from'
+MOVED_TO = 'moved_to'
+DELETED = 'deleted'
+RESCAN = 'rescan'
+
+# The kinds of events which indicate a file may have arrived.
+ARRIVAL_EVENTS = frozenset([CREATED, MODIFIED, CLOSED_WRITE, MOVED_TO])
+
+# The number of seconds between directory listings, when polling.
+DEFAULT_POLL_INTERVAL = 1
+
+# The number of seconds a file must go unchanged to be considered stable, when its writer can't be
+# seen closing it.
+DEFAULT_STABLE_INTERVAL = 1
+
+# The number of seconds a file must go unchanged after its writer closes it to be considered stable.
+# Writers sometimes close a file and immediately open it again to append more, and this gives them
+# a chance to do so.
+SETTLE_TIME = .1
+
+# inotify flags, from <sys/inotify.h>.
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_WATCH_MASK = (_IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE |
+                  _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF)
+
+# The kinds of events each inotify flag is reported as, in the order they are checked.
+_INOTIFY_KINDS = (
+    (_IN_CREATE, CREATED),
+    (_IN_MOVED_TO, MOVED_TO),
+    (_IN_MODIFY, MODIFIED),
+    (_IN_CLOSE_WRITE, CLOSED_WRITE),
+    (_IN_MOVED_FROM, MOVED_FROM),
+    (_IN_DELETE, DELETED),
+)
+
+# The header of each event read from an inotify descriptor: wd, mask, cookie, len.
+_INOTIFY_EVENT = struct.Struct('iIII')
+
+# The number of bytes read from an inotify descriptor at a time. Each event takes at most 16 bytes
+# plus the length of a file name, so this holds a few hundred events.
+_INOTIFY_BUFFER_SIZE = 1 << 16
+
+
+def _load_libc():
+    # Find the inotify functions in the C library, if this platform has them.
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    except OSError:
+        return None
+    if not hasattr(libc, 'inotify_init1'):
+        return None
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_init1.restype = ctypes.c_int
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    libc.inotify_add_watch.restype = ctypes.c_int
+    return libc
+
+
+_libc = _load_libc()
+
+
+def inotify_available():
+    """
+    Determine whether local files can be watched with inotify, rather than by polling.
+
+    :return: Whether inotify is available.
+    """
+    return _libc is not None
+
+
+class FileEvent(namedtuple('FileEvent', ['kind', 'path'])):
+    """
+    A change to a watched file or folder. The kind is one of CREATED, MODIFIED, CLOSED_WRITE,
+    MOVED_FROM, MOVED_TO, DELETED, or RESCAN. A RESCAN event means changes may have been missed,
+    e.g. because they arrived faster than they could be read, and the watched folder should be
+    listed again; its path is the folder itself.
+    """
+
+    __slots__ = ()
+
+
+class Watcher:
+    """
+    A Watcher reports changes to the contents of a folder, or to a single file, as FileEvent
+    instances. Iterating over a watcher waits for each event in turn, until the watcher is closed.
+    Events which happened before the watcher was created are not reported.
+    """
+
+    def __init__(self, path, pattern='*', name=None):
+        """
+        Create a new watcher.
+
+        :param path: The path of the folder to watch.
+        :param pattern: A glob-style pattern which the names of reported files must match.
+        :param name: The name of the only file to report on, if any. Overrides the pattern.
+        """
+        verify_type(path, Path)
+        verify_type(pattern, str, non_empty=True)
+        verify_type(name, str, non_empty=True, allow_none=True)
+        self._path = path
+        self._pattern = pattern
+        self._name = name
+        self._events = collections.deque()
+        self._closed = False
+
+    def __del__(self):
+        if not getattr(self, '_closed', True):
+            self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False  # Do not suppress exceptions.
+
+    def __iter__(self):
+        while not self._closed:
+            event = self.next_event()
+            if event is not None:
+                yield event
+
+    @property
+    def path(self):
+        """The path of the watched file or folder."""
+        if self._name is None:
+            return self._path
+        return self._path[self._name]
+
+    @property
+    def folder(self):
+        """The path of the watched folder, or of the folder containing the watched file."""
+        return self._path
+
+    @property
+    def pattern(self):
+        """The glob-style pattern which the names of reported files must match."""
+        return self._pattern
+
+    @property
+    def name(self):
+        """The name of the watched file, or None if a folder's contents are watched."""
+        return self._name
+
+    @property
+    def closed(self):
+        """Whether the watcher has been closed."""
+        return self._closed
+
+    def matches(self, name):
+        """
+        Determine whether changes to the file or folder with the given name are reported.
+
+        :param name: The name of a file or folder in the watched folder.
+        :return: Whether its changes are reported.
+        """
+        if self._name is not None:
+            return name == self._name
+        return fnmatch.fnmatch(name, self._pattern)
+
+    def _add_event(self, kind, name=None):
+        # Queue an event for the named file, or for the watched folder itself if no name is given.
+        if name is None:
+            path = self._path
+        elif self.matches(name):
+            path = self._path[name]
+        else:
+            return
+        self._events.append(FileEvent(kind, path))
+
+    def _wait(self, timeout):
+        """
+        Wait up to timeout seconds for events, and queue them. Subclasses must override this.
+
+        :param timeout: The maximum number of seconds to wait, or None to wait indefinitely.
+        :return: None
+        """
+        raise NotImplementedError()
+
+    def next_event(self, timeout=None):
+        """
+        Wait for the next event.
+
+        :param timeout: The maximum number of seconds to wait. If None, wait indefinitely.
+        :return: A FileEvent instance, or None if the timeout expired first.
+        """
+        verify_type(timeout, (int, float), allow_none=True)
+        if self._closed:
+            raise ValueError("Watcher is closed.")
+        if timeout is not None:
+            timeout = max(timeout, 0)
+            end_time = time.time() + timeout
+        else:
+            end_time = None
+        while not self._events:
+            self._wait(timeout)
+            if end_time is not None:
+                timeout = end_time - time.time()
+                if timeout <= 0:
+                    break
+        if self._events:
+            return self._events.popleft()
+        return None
+
+    def _collect(self):
+        """
+        Queue any events which have already been noticed, without waiting or checking for new
+        changes. By default, events are only noticed while waiting for them.
+
+        :return: None
+        """
+
+    def pending_event(self):
+        """
+        Get the next event which has already been noticed, without waiting. Unlike next_event(0),
+        this never checks for new changes, so a polling watcher doesn't list the folder again.
+
+        :return: A FileEvent instance, or None if no events have been noticed.
+        """
+        if self._closed:
+            raise ValueError("Watcher is closed.")
+        if not self._events:
+            self._collect()
+        if self._events:
+            return self._events.popleft()
+        return None
+
+    def close(self):
+        """
+        Stop watching.
+
+        :return: None
+        """
+        self._closed = True
+
+
+class PollingWatcher(Watcher):
+    """
+    A PollingWatcher detects changes by listing the watched folder periodically and comparing the
+    sizes and modification times of its contents. It works with any connection, but can't see a
+    file being closed, so it never reports CLOSED_WRITE, and changes which are undone between
+    listings go unnoticed.
+    """
+
+    def __init__(self, path, pattern='*', name=None, interval=None):
+        """
+        Create a new polling watcher.
+
+        :param path: The path of the folder to watch.
+        :param pattern: A glob-style pattern which the names of reported files must match.
+        :param name: The name of the only file to report on, if any. Overrides the pattern.
+        :param interval: The number of seconds between listings. Default is 1 second.
+        """
+        super().__init__(path, pattern, name)
+        verify_type(interval, (int, float), allow_none=True)
+        if interval is None:
+            interval = DEFAULT_POLL_INTERVAL
+        else:
+            assert interval > 0
+        self._interval = interval
+        self._snapshot = self._list()
+        self._last_poll = time.time()
+
+    def _list(self):
+        # Map the names of the watched files to their sizes and modification times.
+        try:
+            if self._name is None:
+                listing = self._path.scan(self._pattern)
+            else:
+                child = self._path[self._name]
+                try:
+                    listing = [(child, child.stat())]
+                except FileNotFoundError:
+                    listing = []
+        except OSError:
+            # The folder was removed, or can't be reached. Its contents are gone as far as we can
+            # tell.
+            return {}
+        return {child.name: (status.size, status.modified_time) for child, status in listing}
+
+    def _poll(self):
+        snapshot = self._list()
+        self._last_poll = time.time()
+        for name in sorted(snapshot):
+            if name not in self._snapshot:
+                self._add_event(CREATED, name)
+            elif snapshot[name] != self._snapshot[name]:
+                self._add_event(MODIFIED, name)
+        for name in sorted(self._snapshot):
+            if name not in snapshot:
+                self._add_event(DELETED, name)
+        self._snapshot = snapshot
+
+    def _wait(self, timeout):
+        """
+        Wait up to timeout seconds for events, and queue them.
+
+        :param timeout: The maximum number of seconds to wait, or None to wait indefinitely.
+        :return: None
+        """
+        delay = self._last_poll + self._interval - time.time()
+        if timeout is not None and 0 < timeout < delay:
+            time.sleep(timeout)
+            return
+        if delay > 0 and timeout != 0:
+            time.sleep(delay)
+        # A timeout of zero checks for changes immediately.
+        self._poll()
+
+
+class InotifyWatcher(Watcher):
+    """
+    An InotifyWatcher is notified of changes to a local folder by the Linux kernel as they happen,
+    without listing the folder, so it reacts to changes immediately and costs nothing while
+    waiting. It sees files being closed after writing, and reports them as CLOSED_WRITE events.
+    """
+
+    def __init__(self, path, pattern='*', name=None):
+        """
+        Create a new inotify watcher.
+
+        :param path: The path of the local folder to watch.
+        :param pattern: A glob-style pattern which the names of reported files must match.
+        :param name: The name of the only file to report on, if any. Overrides the pattern.
+        """
+        super().__init__(path, pattern, name)
+        if _libc is None:
+            raise OSError(errno.ENOSYS, "inotify is not available on this platform.")
+        assert path.is_local
+
+        self._closed = True  # Until the descriptor is open.
+        self._descriptor = _libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._descriptor < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+        self._closed = False
+
+        location = os.fsencode(str(abs(path)))
+        if _libc.inotify_add_watch(self._descriptor, location, _IN_WATCH_MASK) < 0:
+            code = ctypes.get_errno()
+            self.close()
+            raise OSError(code, os.strerror(code), str(path))
+
+    def _read(self):
+        try:
+            data = os.read(self._descriptor, _INOTIFY_BUFFER_SIZE)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            watch, mask, cookie, length = _INOTIFY_EVENT.unpack_from(data, offset)
+            offset += _INOTIFY_EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            if mask & _IN_Q_OVERFLOW:
+                log.warning("Too many changes in %s to keep up with; some were missed.",
+                            self._path)
+                self._add_event(RESCAN)
+            elif mask & (_IN_DELETE_SELF | _IN_MOVE_SELF):
+                if self._name is None:
+                    self._add_event(DELETED)
+            elif not mask & _IN_IGNORED:
+                for flag, kind in _INOTIFY_KINDS:
+                    if mask & flag:
+                        self._add_event(kind, name)
+
+    def _wait(self, timeout):
+        """
+        Wait up to timeout seconds for events, and queue them.
+
+        :param timeout: The maximum number of seconds to wait, or None to wait indefinitely.
+        :return: None
+        """
+        readable, _, _ = select.select([self._descriptor], [], [], timeout)
+        if readable:
+            self._read()
+
+    def _collect(self):
+        """
+        Queue any events which have already been noticed, without waiting or checking for new
+        changes. The kernel queues events as they happen, so reading them never blocks.
+
+        :return: None
+        """
+        self._read()
+
+    def close(self):
+        """
+        Stop watching.
+
+        :return: None
+        """
+        if self._closed:
+            return
+        super().close()
+        os.close(self._descriptor)
+
+
+def _wait_until_stable(watcher, path, interval, end_time):
+    # Wait until the watcher reports no changes to the path for the interval, or for a short time
+    # after it reports that the file was closed. Return whether the path is stable and exists.
+    stable_time = time.time() + interval
+    while True:
+        now = time.time()
+        event = None
+        if now >= stable_time:
+            # Take any changes which were noticed but not yet reported. New changes aren't looked
+            # for, since a polling watcher would have to list the folder again to find them.
+            event = watcher.pending_event()
+            if event is None:
+                if path.exists:
+                    return True
+                # It isn't there yet, or was moved away. Keep waiting for it.
+                stable_time = now + interval
+        if end_time is not None and now >= end_time:
+            return False
+        if event is None:
+            timeout = stable_time - now
+            if end_time is not None:
+                timeout = min(timeout, end_time - now)
+            event = watcher.next_event(timeout)
+            if event is None:
+                continue
+
+        # Changes to other files matching the watcher's pattern are ignored.
+        if event.kind == RESCAN:
+            stable_time = time.time() + interval
+        elif event.path.name == path.name:
+            if event.kind == CLOSED_WRITE:
+                stable_time = time.time() + SETTLE_TIME
+            else:
+                stable_time = time.time() + interval
+
+
+def wait_until_stable(path, interval=None, timeout=None, poll_interval=None):
+    """
+    Wait until a file has stopped changing. The file is stable once it has gone unchanged for the
+    interval, or, where the connection can see it happen, as soon as its writer closes it and
+    doesn't reopen it right away. Unlike is_stable(), this returns as soon as the file is stable,
+    rather than always waiting out the interval. If the file doesn't exist yet, this waits for it
+    to be created and then become stable.
+
+    :param path: The path of the file.
+    :param interval: The number of seconds the file must go unchanged. Default is 1 second.
+    :param timeout: The maximum number of seconds to wait. If None, wait indefinitely.
+    :param poll_interval: The number of seconds between checks, for connections which have to poll
+        for changes. Default is half the interval.
+    :return: Whether the file became stable before the timeout expired.
+    """
+    verify_type(path, Path)
+    verify_type(interval, (int, float), allow_none=True)
+    verify_type(timeout, (int, float), allow_none=True)
+    if interval is None:
+        interval = DEFAULT_STABLE_INTERVAL
+    else:
+        assert interval > 0
+    if poll_interval is None:
+        poll_interval = interval / 2
+    end_time = None if timeout is None else time.time() + timeout
+
+    with path.watch(interval=poll_interval) as watcher:
+        return _wait_until_stable(watcher, path, interval, end_time)
+
+
+def wait_for_file(path, pattern='*', timeout=None, stable=True, interval=None,
+                  poll_interval=None):
+    """
+    Wait for a file matching the pattern to appear in a folder. If one is already there, it is
+    returned without waiting. If several are there, the first one by name is returned.
+
+    :param path: The path of the folder.
+    :param pattern: A glob-style pattern which the file's name must match.
+    :param timeout: The maximum number of seconds to wait. If None, wait indefinitely.
+    :param stable: Whether to also wait for the file to stop changing, as for wait_until_stable().
+    :param interval: The number of seconds the file must go unchanged to be considered stable.
+        Default is 1 second.
+    :param poll_interval: The number of seconds between checks, for connections which have to poll
+        for changes. Default is 1 second, or half the interval if that is shorter.
+    :return: The path of the file, or None if the timeout expired first.
+    """
+    verify_type(path, Path)
+    verify_type(pattern, str, non_empty=True)
+    verify_type(timeout, (int, float), allow_none=True)
+    verify_type(interval, (int, float), allow_none=True)
+    if interval is None:
+        interval = DEFAULT_STABLE_INTERVAL
+    else:
+        assert interval > 0
+    if poll_interval is None:
+        poll_interval = min(DEFAULT_POLL_INTERVAL, interval / 2)
+    end_time = None if timeout is None else time.time() + timeout
+
+    # Start watching before looking, so a file which arrives in between isn't missed.
+    with path.watch(pattern, poll_interval) as watcher:
+        found = None
+        rescan = True
+        while found is None:
+            if rescan:
+                for child in sorted(path.glob(pattern), key=str):
+                    if child.is_file:
+                        found = child
+                        break
+                rescan = False
+                if found is not None:
+                    break
+            if end_time is None:
+                event = watcher.next_event()
+            else:
+                event = watcher.next_event(max(end_time - time.time(), 0))
+                if event is None:
+                    return None
+            if event.kind == RESCAN:
+                rescan = True
+            elif event.kind in ARRIVAL_EVENTS:
+                if event.path.is_file:
+                    found = event.path
+
+        if stable and not _wait_until_stable(watcher, found, interval, end_time):
+            return None
+        return found
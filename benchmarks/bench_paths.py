@@ -0,0 +1,76 @@
+"""
+Benchmark for bulk Path creation, as happens when holding the results of a large tree scan.
+
+Reports the memory held per Path and the throughput of constructing paths directly, joining names
+onto a parent, and reading back their names and parents. Run it from the repository root:
+
+    python benchmarks/bench_paths.py [count]
+
+The package doesn't import on Python 3.7 or later, where attila.threads.async() is a syntax
+error, so run it with Python 3.6. Throughput varies from run to run by 20% or more, so compare the
+medians of several runs.
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+
+from attila.abc.files import Path
+from attila.fs.local import local_fs_connection
+
+
+__author__ = 'Aaron Hosford'
+
+
+DEFAULT_COUNT = 200000
+
+
+def measure(label, count, function):
+    """
+    Time a function which creates count paths, and report the throughput.
+
+    :param label: The label to report the results under.
+    :param count: The number of paths the function creates.
+    :param function: The function to time.
+    :return: The function's return value.
+    """
+    gc.collect()
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    print("%-24s %10.0f paths/s" % (label, count / elapsed))
+    return result
+
+
+def main(count=DEFAULT_COUNT):
+    """
+    Run the benchmark.
+
+    :param count: The number of paths to create in each test.
+    :return: None
+    """
+    connection = local_fs_connection()
+    parent = Path('/data/archive/2017', connection)
+    names = ['file%07d.csv' % index for index in range(count)]
+    locations = [str(parent) + '/' + name for name in names]
+
+    measure("construct", count, lambda: [Path(location, connection) for location in locations])
+    children = measure("join", count, lambda: [parent[name] for name in names])
+    measure("name + dir", count, lambda: [(child.name, child.dir) for child in children])
+    measure("extension", count, lambda: [child.extension for child in children])
+    del children
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    paths = [Path(location, connection) for location in locations]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # Don't count the location strings themselves, which exist either way.
+    print("%-24s %10.1f bytes/path" % ("memory", (after - before) / len(paths)))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_COUNT)
@@ -0,0 +1,430 @@
+"""
+An in-memory stand-in for ftplib.FTP, so FTP connections can be tested without a server.
+"""
+
+import calendar
+import ftplib
+import itertools
+import posixpath
+import threading
+import time
+
+from unittest import mock
+
+
+__author__ = 'Aaron Hosford'
+__all__ = [
+    'FakeFTPServer',
+    'FakeFTP',
+    'FakeFTPTestCase',
+]
+
+
+_server_numbers = itertools.count()
+
+
+class FakeFTPServer:
+    """
+    The state of a fake FTP server: its files, folders, and symbolic links, which features it
+    supports, and a log of the commands it has received. Failures can be injected into transfers
+    to test recovery.
+    """
+
+    servers = {}
+
+    def __init__(self, host=None, mlsd=True, mlst=True, list_total=False,
+                 rename_over_existing=True, mfmt=True):
+        if host is None:
+            host = 'fake%d.example.com' % next(_server_numbers)
+        self.host = host
+        self.mlsd = mlsd
+        self.mlst = mlst
+        self.list_total = list_total
+        self.rename_over_existing = rename_over_existing
+        self.mfmt = mfmt
+        self.files = {}  # Maps absolute paths to contents
+        self.dirs = {'/'}
+        self.links = {}  # Maps absolute paths to link targets
+        self.times = {}  # Maps absolute paths to modification times
+        self.denied = set()  # Paths which MLST refuses to describe
+        self.failures = []  # Byte counts after which the next transfers are cut off
+        self.commands = []
+        self.sessions = []
+        self.lock = threading.RLock()
+        self.servers[host] = self
+
+    def close(self):
+        """Stop answering connections."""
+        self.servers.pop(self.host, None)
+
+    def add_file(self, path, data=b'', modified_time=None):
+        """Create a file, along with any missing parent folders."""
+        with self.lock:
+            self.add_dir(posixpath.dirname(path))
+            self.files[path] = data
+            self.times[path] = time.time() if modified_time is None else modified_time
+
+    def add_dir(self, path):
+        """Create a folder, along with any missing parent folders."""
+        with self.lock:
+            while path not in self.dirs:
+                self.dirs.add(path)
+                self.times[path] = time.time()
+                path = posixpath.dirname(path)
+
+    def add_link(self, path, target):
+        """Create a symbolic link."""
+        with self.lock:
+            self.links[path] = target
+            self.times[path] = time.time()
+
+    def count(self, command):
+        """Count the commands received which start with the given word."""
+        return sum(1 for line in self.commands if line.split()[0] == command)
+
+    def resolve(self, path):
+        """Follow any symbolic links in the path."""
+        for _ in range(40):
+            parts = path.strip('/').split('/')
+            for index in range(len(parts)):
+                prefix = '/' + '/'.join(parts[:index + 1])
+                if prefix in self.links:
+                    target = posixpath.join(posixpath.dirname(prefix), self.links[prefix])
+                    path = posixpath.normpath(posixpath.join(target, *parts[index + 1:]))
+                    break
+            else:
+                return path
+        raise ftplib.error_perm('550 Too many levels of symbolic links.')
+
+    def children(self, path):
+        """The names of the contents of a folder."""
+        prefix = path.rstrip('/') + '/'
+        names = set()
+        for entry in itertools.chain(self.files, self.dirs, self.links):
+            if entry != path and entry.startswith(prefix) and '/' not in entry[len(prefix):]:
+                names.add(entry[len(prefix):])
+        return sorted(names)
+
+    def facts(self, path, resolve=True):
+        """The MLSD facts for a file system object, as an ftplib.FTP.mlsd() would return them."""
+        if not resolve and path in self.links:
+            return {'type': 'OS.unix=slink:' + self.links[path],
+                    'modify': self._timestamp(path)}
+        real = self.resolve(path)
+        if real in self.dirs:
+            return {'type': 'dir', 'modify': self._timestamp(real)}
+        if real in self.files:
+            return {'type': 'file', 'size': str(len(self.files[real])),
+                    'modify': self._timestamp(real)}
+        return None
+
+    def _timestamp(self, path):
+        return time.strftime('%Y%m%d%H%M%S', time.gmtime(self.times.get(path, 0)))
+
+    def list_line(self, path, name):
+        """A line of Unix style LIST output describing a file system object."""
+        stamp = time.strftime('%b %d %Y', time.gmtime(self.times.get(path, 0)))
+        if path in self.links:
+            return 'lrwxrwxrwx 1 owner group 1 %s %s -> %s' % (stamp, name, self.links[path])
+        if path in self.dirs:
+            return 'drwxr-xr-x 2 owner group 4096 %s %s' % (stamp, name)
+        return '-rw-r--r-- 1 owner group %d %s %s' % (len(self.files[path]), stamp, name)
+
+    def take_failure(self):
+        """The number of bytes after which the next transfer fails, or None."""
+        with self.lock:
+            if self.failures:
+                return self.failures.pop(0)
+        return None
+
+
+class _FakeDataSocket:
+    # The data channel of a RETR command opened with transfercmd().
+
+    def __init__(self, data):
+        self._data = data
+        self._position = 0
+
+    def recv_into(self, buffer):
+        chunk = self._data[self._position:self._position + len(buffer)]
+        buffer[:len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
+
+    def close(self):
+        pass
+
+
+class FakeFTP:
+    """
+    A session with a FakeFTPServer, providing the parts of the ftplib.FTP interface which
+    ftp_connection uses.
+    """
+
+    def __init__(self):
+        self.server = None
+        self.pwd_path = '/'
+        self.alive = True
+        self.closed = False
+
+    def _command(self, line):
+        if not self.alive:
+            raise ConnectionResetError("The session has been disconnected.")
+        with self.server.lock:
+            self.server.commands.append(line)
+
+    def _path(self, path):
+        return posixpath.normpath(posixpath.join(self.pwd_path, path or '.'))
+
+    @staticmethod
+    def _missing(path):
+        return ftplib.error_perm('550 %s: No such file or directory.' % path)
+
+    def set_pasv(self, value):
+        pass
+
+    def connect(self, host='', port=0):
+        self.server = FakeFTPServer.servers.get(host)
+        if self.server is None:
+            raise ConnectionRefusedError("No fake server at %s." % host)
+        with self.server.lock:
+            self.server.sessions.append(self)
+        return '220 Welcome'
+
+    def login(self, user='', passwd=''):
+        self._command('USER ' + (user or 'anonymous'))
+        return '230 Logged in'
+
+    def quit(self):
+        self._command('QUIT')
+        self.closed = True
+        return '221 Goodbye'
+
+    def close(self):
+        self.closed = True
+
+    def pwd(self):
+        self._command('PWD')
+        return self.pwd_path
+
+    def cwd(self, path):
+        self._command('CWD ' + path)
+        path = self._path(path)
+        if self.server.resolve(path) not in self.server.dirs:
+            raise self._missing(path)
+        self.pwd_path = path
+        return '250 OK'
+
+    def voidcmd(self, command):
+        self._command(command)
+        return '200 OK'
+
+    def voidresp(self):
+        return '226 Transfer complete'
+
+    def sendcmd(self, command):
+        self._command(command)
+        verb, _, argument = command.partition(' ')
+        server = self.server
+        if verb == 'MLST':
+            if not server.mlst:
+                raise ftplib.error_perm('500 Unknown command.')
+            path = self._path(argument)
+            if path in server.denied:
+                raise ftplib.error_perm('550 Permission denied.')
+            facts = server.facts(path, resolve=False)
+            if facts is None:
+                raise self._missing(path)
+            facts_string = ''.join('%s=%s;' % item for item in sorted(facts.items()))
+            return '250-Listing %s\n %s %s\n250 End' % (path, facts_string, path)
+        if verb == 'MDTM':
+            path = server.resolve(self._path(argument))
+            if path not in server.files:
+                raise self._missing(path)
+            return '213 ' + server._timestamp(path)
+        if verb == 'MFMT' and server.mfmt:
+            value, _, name = argument.partition(' ')
+            path = server.resolve(self._path(name))
+            if path not in server.files:
+                raise self._missing(path)
+            server.times[path] = calendar.timegm(time.strptime(value, '%Y%m%d%H%M%S'))
+            return '213 Modify=%s; %s' % (value, path)
+        raise ftplib.error_perm('500 Unknown command.')
+
+    def mlsd(self, path='', facts=()):
+        self._command('MLSD ' + path)
+        server = self.server
+        if not server.mlsd:
+            raise ftplib.error_perm('500 Unknown command.')
+        path = server.resolve(self._path(path))
+        if path not in server.dirs:
+            raise self._missing(path)
+        entries = [('.', {'type': 'cdir'})]
+        for name in server.children(path):
+            entries.append((name, server.facts(posixpath.join(path, name), resolve=False)))
+        return iter(entries)
+
+    def retrlines(self, command, callback=None):
+        self._command(command)
+        server = self.server
+        verb, _, argument = command.partition(' ')
+        path = server.resolve(self._path(argument))
+        if path not in server.dirs:
+            raise self._missing(path)
+        names = server.children(path)
+        if verb == 'LIST':
+            lines = [server.list_line(posixpath.join(path, name), name) for name in names]
+            if server.list_total:
+                lines.insert(0, 'total %d' % len(lines))
+        else:
+            lines = names
+        for line in lines:
+            callback(line)
+        return '226 Transfer complete'
+
+    def nlst(self, *args):
+        lines = []
+        self.retrlines(' '.join(('NLST',) + args), lines.append)
+        return lines
+
+    def size(self, name):
+        self._command('SIZE ' + name)
+        path = self.server.resolve(self._path(name))
+        if path not in self.server.files:
+            raise self._missing(path)
+        return len(self.server.files[path])
+
+    def _cut_off(self, data):
+        # Return the data the transfer gets through before failing, and whether it fails.
+        limit = self.server.take_failure()
+        if limit is None:
+            return data, False
+        return data[:limit], True
+
+    def retrbinary(self, command, callback, blocksize=8192, rest=None):
+        if rest is not None:
+            self._command('REST %s' % rest)
+        self._command(command)
+        path = self.server.resolve(self._path(command.split(' ', 1)[1]))
+        if path not in self.server.files:
+            raise self._missing(path)
+        data, fails = self._cut_off(self.server.files[path][rest or 0:])
+        for start in range(0, len(data), blocksize):
+            callback(data[start:start + blocksize])
+        if fails:
+            self.alive = False
+            raise ConnectionResetError("Connection reset during transfer.")
+        return '226 Transfer complete'
+
+    def transfercmd(self, command, rest=None):
+        self._command(command)
+        path = self.server.resolve(self._path(command.split(' ', 1)[1]))
+        if path not in self.server.files:
+            raise self._missing(path)
+        return _FakeDataSocket(self.server.files[path])
+
+    def storbinary(self, command, fp, blocksize=8192, callback=None, rest=None):
+        if rest is not None:
+            self._command('REST %s' % rest)
+        self._command(command)
+        server = self.server
+        path = server.resolve(self._path(command.split(' ', 1)[1]))
+        if server.resolve(posixpath.dirname(path)) not in server.dirs or path in server.dirs:
+            raise self._missing(path)
+        data = fp.read()
+        data, fails = self._cut_off(data)
+        with server.lock:
+            existing = server.files.get(path, b'')
+            server.files[path] = existing[:rest] + data if rest else data
+            server.times[path] = time.time()
+        if fails:
+            self.alive = False
+            raise ConnectionResetError("Connection reset during transfer.")
+        return '226 Transfer complete'
+
+    def rename(self, from_name, to_name):
+        self._command('RNFR ' + from_name)
+        self._command('RNTO ' + to_name)
+        server = self.server
+        source = self._path(from_name)
+        target = self._path(to_name)
+        with server.lock:
+            if source not in server.files and source not in server.dirs:
+                raise self._missing(source)
+            if target in server.dirs or (target in server.files and
+                                         not server.rename_over_existing):
+                raise ftplib.error_perm('550 %s: File exists.' % target)
+            for table in (server.files, server.times):
+                for key in [key for key in table
+                            if key == source or key.startswith(source + '/')]:
+                    table[target + key[len(source):]] = table.pop(key)
+            for key in [key for key in server.dirs
+                        if key == source or key.startswith(source + '/')]:
+                server.dirs.remove(key)
+                server.dirs.add(target + key[len(source):])
+        return '250 Renamed'
+
+    def delete(self, name):
+        self._command('DELE ' + name)
+        path = self._path(name)
+        with self.server.lock:
+            if path in self.server.links:
+                del self.server.links[path]
+            elif path in self.server.files:
+                del self.server.files[path]
+            else:
+                raise self._missing(path)
+        return '250 Deleted'
+
+    def rmd(self, name):
+        self._command('RMD ' + name)
+        path = self._path(name)
+        with self.server.lock:
+            if path in self.server.links:
+                del self.server.links[path]
+            elif path not in self.server.dirs:
+                raise self._missing(path)
+            elif self.server.children(path):
+                raise ftplib.error_perm('550 %s: Directory not empty.' % path)
+            else:
+                self.server.dirs.remove(path)
+        return '250 Removed'
+
+    def mkd(self, name):
+        self._command('MKD ' + name)
+        path = self._path(name)
+        with self.server.lock:
+            if path in self.server.dirs or path in self.server.files:
+                raise ftplib.error_perm('550 %s: File exists.' % path)
+            if posixpath.dirname(path) not in self.server.dirs:
+                raise self._missing(path)
+            self.server.add_dir(path)
+        return path
+
+
+class FakeFTPTestCase:
+    """
+    A mixin for test cases which need an FTP server. Each test gets its own fake server, and an open
+    connection to it.
+    """
+
+    def setUp(self):
+        from attila.fs.ftp import FTPConnector
+        self.server = FakeFTPServer()
+        patcher = mock.patch('ftplib.FTP', FakeFTP)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.server.close)
+        self.connector = FTPConnector(self.server.host, transfer_retry_interval=0,
+                                      **self.connector_settings())
+        self.connection = self.connector.connect()
+        self.connection.open()
+        self.addCleanup(self.connector.pool.clear)
+
+    def connector_settings(self):
+        """Keyword arguments for the FTPConnector."""
+        return {}
+
+    def tearDown(self):
+        if self.connection.is_open:
+            self.connection.close()
@@ -0,0 +1,64 @@
+"""
+Helpers shared by several test modules.
+"""
+
+import asyncio
+import os
+
+
+__author__ = 'Aaron Hosford'
+__all__ = [
+    'run',
+    'make_tree',
+    'read_tree',
+]
+
+
+def run(coroutine):
+    """
+    Run a coroutine to completion on a new event loop.
+
+    :param coroutine: The coroutine to run.
+    :return: The coroutine's return value.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def make_tree(root, count=12):
+    """
+    Create a small tree of files under root, spread over a few nested folders.
+
+    :param root: The folder to create the files under.
+    :param count: The number of files to create.
+    :return: A map from the files' relative paths to their contents.
+    """
+    contents = {}
+    for index in range(count):
+        relative = os.path.join('dir%d' % (index % 3), 'sub%d' % (index % 2), 'file%d.txt' % index)
+        data = ('line %d\n' % index * (index + 1)).encode()
+        full_path = os.path.join(root, relative)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'wb') as file:
+            file.write(data)
+        contents[relative] = data
+    return contents
+
+
+def read_tree(root):
+    """
+    Read the files under root.
+
+    :param root: The folder to read the files under.
+    :return: A map from the files' relative paths to their contents.
+    """
+    contents = {}
+    for dir_path, _, file_names in os.walk(root):
+        for name in file_names:
+            full_path = os.path.join(dir_path, name)
+            with open(full_path, 'rb') as file:
+                contents[os.path.relpath(full_path, root)] = file.read()
+    return contents
@@ -0,0 +1,186 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from attila.fs import Path
+from attila.fs.aio import AsyncExecutor
+from attila.fs.ftp import FTPConnector
+
+from .fake_ftp import FakeFTPTestCase
+from .helpers import make_tree, read_tree, run
+
+
+async def collect(walk):
+    # Gather the results of an async walk, as comparable strings and sorted names.
+    return [(str(dir_path), sorted(dir_names), sorted(file_names))
+            async for dir_path, dir_names, file_names in walk]
+
+
+def describe(walk):
+    # Reduce the results of a walk to comparable strings and sorted names.
+    return [(str(dir_path), sorted(dir_names), sorted(file_names))
+            for dir_path, dir_names, file_names in walk]
+
+
+class TestAsync(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = temp_dir.name
+        self.source = os.path.join(self.root, 'source')
+        self.contents = make_tree(self.source)
+        self.executor = AsyncExecutor(4)
+        self.addCleanup(self.executor.close)
+
+    def testExistsAndList(self):
+        source = Path(self.source)
+        self.assertTrue(run(source.aexists(self.executor)))
+        self.assertFalse(run(source['missing'].aexists(self.executor)))
+        self.assertEqual(sorted(run(source.alist(executor=self.executor))),
+                         ['dir0', 'dir1', 'dir2'])
+        self.assertEqual(run(source.alist('*1', self.executor)), ['dir1'])
+
+    def testOpen(self):
+        path = Path(os.path.join(self.root, 'file.txt'))
+
+        async def write_and_read():
+            async with path.aopen('w', executor=self.executor) as file:
+                await file.write('a\n')
+                await file.write('b\n')
+            self.assertTrue(file.closed)
+
+            file = await path.aopen(executor=self.executor)
+            try:
+                lines = [line async for line in file]
+                await file.seek(2)
+                self.assertEqual(await file.tell(), 2)
+                rest = await file.read()
+            finally:
+                await file.close()
+            return lines, rest
+
+        self.assertEqual(run(write_and_read()), (['a\n', 'b\n'], 'b\n'))
+
+    def testCopyTo(self):
+        destination = os.path.join(self.root, 'destination')
+        run(Path(self.source).acopy_to(destination, executor=self.executor))
+        self.assertEqual(read_tree(destination), self.contents)
+
+    def testWalkMatchesWalk(self):
+        os.symlink(os.path.join(self.source, 'dir0'), os.path.join(self.source, 'dir1', 'link'))
+        source = Path(self.source)
+        for topdown in (True, False):
+            for followlinks in (False, True):
+                with self.subTest(topdown=topdown, followlinks=followlinks):
+                    walk = source.awalk(topdown, followlinks=followlinks, executor=self.executor)
+                    self.assertEqual(run(collect(walk)),
+                                     describe(source.walk(topdown, followlinks=followlinks)))
+
+    def testWalkPruning(self):
+        async def walk():
+            results = []
+            async for dir_path, dir_names, _ in Path(self.source).awalk(executor=self.executor):
+                results.append(str(dir_path))
+                if 'dir1' in dir_names:
+                    dir_names.remove('dir1')
+            return results
+
+        walked = run(walk())
+        self.assertEqual(len(walked), 1 + 2 + 2 * 2)  # The root, dir0, dir2, and their subfolders
+        self.assertFalse(any('dir1' in dir_path for dir_path in walked))
+
+    def testWalkErrors(self):
+        errors = []
+        walk = Path(os.path.join(self.root, 'missing')).awalk(onerror=errors.append,
+                                                              executor=self.executor)
+        self.assertEqual(run(collect(walk)), [(os.path.join(self.root, 'missing'), [], [])])
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0], OSError)
+
+    def testDefaultExecutor(self):
+        AsyncExecutor.set_default(self.executor)
+        self.addCleanup(AsyncExecutor.set_default, None)
+        self.assertIs(AsyncExecutor.get_default(), self.executor)
+        self.assertTrue(run(Path(self.source).aexists()))
+
+
+class TestAsyncFTP(FakeFTPTestCase, unittest.TestCase):
+
+    def connector_settings(self):
+        return {'pool_size': 2, 'spool_size': None}
+
+    def setUp(self):
+        super().setUp()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = temp_dir.name
+        self.contents = make_tree(os.path.join(self.root, 'source'))
+        for relative, data in self.contents.items():
+            self.server.add_file('/source/' + relative.replace(os.sep, '/'), data)
+        self.executor = AsyncExecutor(8)
+        self.addCleanup(self.executor.close)
+        self.source = Path('/source', self.connection)
+
+    def testConcurrentCalls(self):
+        # Many calls at once share the pool's sessions, without ever needing more of them.
+        paths = [Path('/source/' + relative.replace(os.sep, '/'), self.connection)
+                 for relative in self.contents]
+
+        async def check():
+            return await asyncio.gather(*[path.aexists(self.executor) for path in paths])
+
+        self.assertEqual(run(check()), [True] * len(paths))
+        self.assertLessEqual(len(self.server.sessions), self.connector.pool.max_size)
+
+        # Clones are closed as soon as their calls are done, giving their sessions back to the pool.
+        self.assertEqual(self.connector.pool.idle_count, self.connector.pool.size - 1)
+
+    def testSessionsReturned(self):
+        # The default executor is never closed, so it mustn't hold on to sessions between calls,
+        # whether for the connection it was called on or for others sharing the same pool.
+        AsyncExecutor.set_default(None)
+        self.addCleanup(AsyncExecutor.set_default, None)
+        self.addCleanup(lambda: AsyncExecutor.get_default().close())
+        connector = FTPConnector(self.server.host, pool_size=2, pool_timeout=2)
+        self.addCleanup(connector.pool.clear)
+        pool = connector.pool
+        connections = [connector.connect() for _ in range(2)]
+        for connection in connections:
+            connection.open()
+            self.assertTrue(run(Path('/source', connection).aexists()))
+            connection.close()
+            self.assertEqual(pool.idle_count, pool.size)
+        self.assertEqual(pool.size, 2)
+
+        connection = connector.connect()
+        connection.open()
+        self.assertTrue(run(Path('/source', connection).aexists()))
+        other = connector.connect()
+        other.open()
+        other.close()
+        connection.close()
+        self.assertEqual(pool.idle_count, pool.size)
+
+    def testWalkMatchesWalk(self):
+        for topdown in (True, False):
+            with self.subTest(topdown=topdown):
+                walk = self.source.awalk(topdown, executor=self.executor)
+                self.assertEqual(run(collect(walk)), describe(self.source.walk(topdown)))
+        self.assertLessEqual(len(self.server.sessions), self.connector.pool.max_size)
+
+    def testOpen(self):
+        relative = os.path.join('dir0', 'sub0', 'file0.txt')
+
+        async def read():
+            path = Path('/source/' + relative.replace(os.sep, '/'), self.connection)
+            async with path.aopen('rb', executor=self.executor) as file:
+                return await file.read()
+
+        self.assertEqual(run(read()), self.contents[relative])
+
+    def testDownload(self):
+        destination = os.path.join(self.root, 'destination')
+        run(self.source.acopy_to(Path(destination), executor=self.executor))
+        self.assertEqual(read_tree(destination), self.contents)
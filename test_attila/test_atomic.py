@@ -0,0 +1,107 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from attila.fs import Path
+
+from .fake_ftp import FakeFTPTestCase
+
+
+class TestAtomicFile(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = temp_dir.name
+        self.path = Path(os.path.join(self.root, 'data.txt'))
+        with open(str(self.path), 'w') as file:
+            file.write('old\n')
+
+    def read(self, name='data.txt'):
+        with open(os.path.join(self.root, name)) as file:
+            return file.read()
+
+    def testReplace(self):
+        with self.path.open_atomic() as file:
+            file.write('new\n')
+            self.assertEqual(self.read(), 'old\n')
+            self.assertTrue(file.temp_path.exists)
+            self.assertTrue(file.temp_path.name.startswith('.data.txt.'))
+            self.assertTrue(file.temp_path.name.endswith('.tmp'))
+        self.assertEqual(self.read(), 'new\n')
+        self.assertEqual(os.listdir(self.root), ['data.txt'])
+
+    def testExceptionDiscardsTemp(self):
+        with self.assertRaises(ValueError):
+            with self.path.open_atomic() as file:
+                file.write('new\n')
+                raise ValueError()
+        self.assertTrue(file.closed)
+        self.assertEqual(self.read(), 'old\n')
+        self.assertEqual(os.listdir(self.root), ['data.txt'])
+
+    def testAbort(self):
+        file = self.path.open_atomic('wb')
+        file.write(b'new\n')
+        file.abort()
+        self.assertEqual(self.read(), 'old\n')
+        self.assertEqual(os.listdir(self.root), ['data.txt'])
+
+    def testAppend(self):
+        with self.path.open_atomic('a') as file:
+            file.write('more\n')
+            self.assertEqual(self.read(), 'old\n')
+        self.assertEqual(self.read(), 'old\nmore\n')
+
+        # Appending to a file which doesn't exist yet creates it.
+        with Path(os.path.join(self.root, 'new.txt')).open_atomic('a') as file:
+            file.write('first\n')
+        self.assertEqual(self.read('new.txt'), 'first\n')
+
+    def testCompressed(self):
+        path = Path(os.path.join(self.root, 'data.txt.gz'))
+        with path.open_atomic() as file:
+            file.write('line 1\n')
+            file.write('line 2\n')
+        with gzip.open(str(path), 'rt') as file:
+            self.assertEqual(file.read(), 'line 1\nline 2\n')
+
+        with path.open_atomic('a') as file:
+            file.write('line 3\n')
+        with gzip.open(str(path), 'rt') as file:
+            self.assertEqual(file.read(), 'line 1\nline 2\nline 3\n')
+        self.assertEqual(sorted(os.listdir(self.root)), ['data.txt', 'data.txt.gz'])
+
+    def testSave(self):
+        self.assertEqual(self.path.save(['a', 'b'], overwrite=True, atomic=True), 2)
+        self.assertEqual(self.read(), 'a\nb\n')
+        self.assertEqual(os.listdir(self.root), ['data.txt'])
+
+
+class TestAtomicFTPFile(FakeFTPTestCase, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.server.add_file('/out/data.txt', b'old\n')
+        self.path = Path('/out/data.txt', self.connection)
+
+    def write(self):
+        with self.path.open_atomic('wb') as file:
+            file.write(b'new\n')
+            self.assertEqual(self.server.files['/out/data.txt'], b'old\n')
+        self.assertEqual(self.server.files['/out/data.txt'], b'new\n')
+        self.assertEqual(list(self.server.files), ['/out/data.txt'])
+
+    def testRenameOverExisting(self):
+        self.write()
+        self.assertIn('RNTO /out/data.txt', self.server.commands)
+        self.assertEqual(self.server.count('DELE'), 0)
+
+    def testRenameRefused(self):
+        # The server won't rename over the file, so the data is copied over it, but the file is
+        # never deleted to make way.
+        self.server.rename_over_existing = False
+        self.write()
+        self.assertNotIn('DELE /out/data.txt', self.server.commands)
+        self.assertEqual(self.server.count('DELE'), 1)  # The temporary file
@@ -0,0 +1,206 @@
+import os
+import tempfile
+import unittest
+
+from unittest import mock
+
+from attila.fs import Path
+from attila.fs.caching import MetadataCache
+from attila.fs.local import LocalFSConnector
+
+from .fake_ftp import FakeFTPTestCase
+
+
+class TestCacheKeys(FakeFTPTestCase, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.server.add_file('/data/a.csv', b'a')
+        self.server.add_file('/other/a.csv', b'aaaa')
+        self.connector.enable_cache(ttl=60)
+        self.cached = self.connector.connect()
+        self.cached.open()
+        self.addCleanup(self.cached.close)
+        self.server.commands.clear()
+
+    def testAbsoluteKeys(self):
+        self.cached.cwd = '/data'
+        self.assertEqual(Path('a.csv', self.cached).size, 1)
+        commands = len(self.server.commands)
+        self.assertEqual(Path('/data/a.csv', self.cached).size, 1)
+        self.assertEqual(len(self.server.commands), commands)
+
+    def testChangeDirectory(self):
+        self.cached.cwd = '/data'
+        self.assertEqual(Path('a.csv', self.cached).size, 1)
+        self.cached.cwd = '/other'
+        self.assertEqual(Path('a.csv', self.cached).size, 4)
+
+    def testWriteInvalidatesRelativePaths(self):
+        self.cached.cwd = '/data'
+        self.assertEqual(Path('a.csv', self.cached).size, 1)
+        with Path('/data/a.csv', self.cached).open('wb') as file:
+            file.write(b'abc')
+        self.assertEqual(Path('a.csv', self.cached).size, 3)
+
+    def testFileSystemsAreKeptApart(self):
+        cache = MetadataCache()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            local_path = Path(os.path.join(temp_dir, 'a.csv'))
+            ftp_path = Path(str(local_path), self.connection)
+            cache.put(ftp_path, ('size',), 1)
+            self.assertEqual(cache.get(ftp_path, ('size',)), (True, 1))
+            self.assertEqual(cache.get(local_path, ('size',)), (False, None))
+
+            # Invalidating a path on one file system leaves the other's results alone.
+            cache.put(local_path, ('size',), 2)
+            cache.invalidate(local_path)
+            self.assertEqual(cache.get(ftp_path, ('size',)), (True, 1))
+            self.assertEqual(len(cache), 1)
+
+    def testConnectionsShareResults(self):
+        connector = LocalFSConnector()
+        connector.enable_cache(ttl=60)
+        first = connector.connect()
+        second = connector.connect()
+        self.assertIs(first.cache, second.cache)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, 'a.csv')
+            with open(file_path, 'wb') as file:
+                file.write(b'a')
+            self.assertEqual(Path(file_path, first).size, 1)
+            Path(file_path, second).remove()
+            self.assertFalse(Path(file_path, first).exists)
+
+
+class TestMetadataCache(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = Path(temp_dir.name)
+
+    def testExpiry(self):
+        cache = MetadataCache(ttl=10)
+        with mock.patch('attila.fs.caching.time.monotonic', return_value=100.0) as monotonic:
+            cache.put(self.root, ('size',), 1)
+            monotonic.return_value = 110.0
+            self.assertEqual(cache.get(self.root, ('size',)), (True, 1))
+            monotonic.return_value = 110.5
+            self.assertEqual(cache.get(self.root, ('size',)), (False, None))
+
+    def testLeastRecentlyUsedAreDropped(self):
+        cache = MetadataCache(max_size=2)
+        cache.put(self.root['a'], ('size',), 1)
+        cache.put(self.root['b'], ('size',), 2)
+        self.assertEqual(cache.get(self.root['a'], ('size',)), (True, 1))
+        cache.put(self.root['c'], ('size',), 3)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get(self.root['a'], ('size',)), (True, 1))
+        self.assertEqual(cache.get(self.root['b'], ('size',)), (False, None))
+        self.assertEqual(cache.get(self.root['c'], ('size',)), (True, 3))
+
+    def testInvalidate(self):
+        # A change discards what is known about the path, its descendants, and its ancestors, but
+        # not about its siblings.
+        cache = MetadataCache()
+        paths = [self.root, self.root['d'], self.root['d']['f'], self.root['e']]
+        for path in paths:
+            cache.put(path, ('exists',), True)
+        cache.invalidate(self.root['d'])
+        self.assertEqual([cache.get(path, ('exists',))[0] for path in paths],
+                         [False, False, False, True])
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
+class TestCachingConnection(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = temp_dir.name
+        with open(os.path.join(self.root, 'a.txt'), 'wb') as file:
+            file.write(b'abc')
+        connector = LocalFSConnector()
+        connector.enable_cache(ttl=60)
+        self.connection = connector.connect()
+        self.cache = self.connection.cache
+
+    def path(self, *names):
+        return Path(os.path.join(self.root, *names), self.connection)
+
+    def append(self, name, data):
+        # Change a file behind the caching connection's back.
+        with open(os.path.join(self.root, name), 'ab') as file:
+            file.write(data)
+
+    def testAnswersAreCached(self):
+        self.assertEqual(self.path('a.txt').size, 3)
+        self.assertEqual(self.path('b.txt').exists, False)
+        self.assertEqual(self.path().list(), ['a.txt'])
+        self.append('a.txt', b'def')
+        self.append('b.txt', b'b')
+        self.assertEqual(self.path('a.txt').size, 3)
+        self.assertEqual(self.path('b.txt').exists, False)
+        self.assertEqual(self.path().list(), ['a.txt'])
+
+        self.cache.clear()
+        self.assertEqual(self.path('a.txt').size, 6)
+        self.assertEqual(self.path('b.txt').exists, True)
+        self.assertEqual(sorted(self.path().list()), ['a.txt', 'b.txt'])
+
+    def testMetadataSharesOneStatus(self):
+        path = self.path('a.txt')
+        with mock.patch.object(self.connection.wrapped, 'stat',
+                               wraps=self.connection.wrapped.stat) as stat:
+            self.assertTrue(path.is_file)
+            self.assertEqual(path.size, 3)
+            self.assertEqual(path.modified_time, os.path.getmtime(str(path)))
+            self.assertEqual(path.stat().size, 3)
+        self.assertEqual(stat.call_count, 1)
+
+    def testWritesInvalidate(self):
+        self.assertEqual(self.path('a.txt').size, 3)
+        self.assertEqual(self.path().list(), ['a.txt'])
+        with self.path('a.txt').open('ab') as file:
+            file.write(b'def')
+        self.assertEqual(self.path('a.txt').size, 6)
+
+        with self.path('b.txt').open('wb') as file:
+            file.write(b'b')
+        self.assertEqual(sorted(self.path().list()), ['a.txt', 'b.txt'])
+
+        self.path('sub').make_dir()
+        self.assertTrue(self.path('sub').is_dir)
+        self.assertEqual(sorted(self.path().list()), ['a.txt', 'b.txt', 'sub'])
+
+    def testRemoveAndRename(self):
+        self.assertTrue(self.path('a.txt').exists)
+        self.assertFalse(self.path('b.txt').exists)
+        self.assertEqual(self.path().list(), ['a.txt'])
+        self.connection.rename(self.path('a.txt'), 'b.txt')
+        self.assertFalse(self.path('a.txt').exists)
+        self.assertEqual(self.path('b.txt').size, 3)
+        self.assertEqual(self.path().list(), ['b.txt'])
+        self.path('b.txt').remove()
+        self.assertFalse(self.path('b.txt').exists)
+        self.assertEqual(self.path().list(), [])
+
+    def testScanSeedsStatuses(self):
+        os.symlink(os.path.join(self.root, 'a.txt'), os.path.join(self.root, 'link'))
+        scanned = dict(self.path().scan())
+        self.assertEqual(scanned[self.path('a.txt')].size, 3)
+        self.append('a.txt', b'def')
+
+        # The file's status was remembered from the listing, but the link's is looked up.
+        self.assertEqual(self.path('a.txt').size, 3)
+        self.assertEqual(self.path('link').size, 6)
+        self.assertTrue(self.path('link').is_link)
+
+    def testSetModifiedTime(self):
+        path = self.path('a.txt')
+        self.assertNotEqual(path.modified_time, 1000000000)
+        path.set_modified_time(1000000000)
+        self.assertEqual(path.modified_time, 1000000000)
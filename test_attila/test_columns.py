@@ -0,0 +1,160 @@
+import array
+import datetime
+import math
+import os
+import tempfile
+import unittest
+
+from unittest import mock
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from attila.columns import load_columns
+
+
+class TestLoadColumns(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.path = os.path.join(temp_dir.name, 'data.csv')
+
+    def write(self, *lines):
+        with open(self.path, 'w') as file:
+            for line in lines:
+                file.write(line + '\n')
+
+    def load(self, **kwargs):
+        kwargs.setdefault('use_numpy', False)
+        return load_columns(self.path, **kwargs)
+
+    def testInference(self):
+        self.write('int,float,bool,date,str,empty',
+                   '1,1.5,true,2020-01-02,a,',
+                   '-2,2,false,2020-01-03 04:05:06,b,',
+                   '3,-0.25,yes,2020-01-04,c,')
+        columns = self.load()
+        self.assertEqual(list(columns), ['int', 'float', 'bool', 'date', 'str', 'empty'])
+        self.assertEqual(columns['int'], array.array('q', [1, -2, 3]))
+        self.assertEqual(columns['float'], array.array('d', [1.5, 2.0, -0.25]))
+        self.assertEqual(columns['bool'], array.array('b', [1, 0, 1]))
+        self.assertEqual(columns['date'], [datetime.datetime(2020, 1, 2),
+                                           datetime.datetime(2020, 1, 3, 4, 5, 6),
+                                           datetime.datetime(2020, 1, 4)])
+        self.assertEqual(columns['str'], ['a', 'b', 'c'])
+        self.assertEqual(columns['empty'], ['', '', ''])
+
+    def testBlanks(self):
+        # Blank values make integer columns floats, and Boolean columns strings. Blank dates are
+        # None.
+        self.write('int,bool,date',
+                   '1,true,01/02/2020',
+                   ',,',
+                   '3,false,01/04/2020')
+        columns = self.load()
+        self.assertIsInstance(columns['int'], array.array)
+        self.assertEqual(columns['int'].typecode, 'd')
+        self.assertEqual(columns['int'][0], 1.0)
+        self.assertTrue(math.isnan(columns['int'][1]))
+        self.assertEqual(columns['bool'], ['true', '', 'false'])
+        self.assertEqual(columns['date'], [datetime.datetime(2020, 1, 2), None,
+                                           datetime.datetime(2020, 1, 4)])
+
+    def testShortRowsArePadded(self):
+        self.write('a,b,c',
+                   '1.5,x,2020-01-02',
+                   '2.5')
+        columns = self.load()
+        self.assertEqual(columns['a'], array.array('d', [1.5, 2.5]))
+        self.assertEqual(columns['b'], ['x', ''])
+        self.assertEqual(columns['c'], [datetime.datetime(2020, 1, 2), None])
+
+    def testWidening(self):
+        # Values past the rows used for inference which don't fit the inferred types widen them,
+        # from integer to float to string, and from date/time or Boolean to string.
+        self.write('number,text,date,bool',
+                   '1,1,2020-01-02,true',
+                   '2,2,2020-01-03,false',
+                   '2.5,2.5,,yes',
+                   '3,x,soon,maybe')
+        with mock.patch('attila.columns.INFERENCE_ROWS', 2):
+            columns = self.load()
+        self.assertEqual(columns['number'], array.array('d', [1, 2, 2.5, 3]))
+        self.assertEqual(columns['text'], ['1', '2', '2.5', 'x'])
+        self.assertEqual(columns['date'], ['2020-01-02', '2020-01-03', '', 'soon'])
+        self.assertEqual(columns['bool'], ['true', 'false', 'yes', 'maybe'])
+
+    def testSchema(self):
+        self.write('a,b,c',
+                   '1,2020-01-02,x',
+                   '2,2020-01-03,y')
+        columns = self.load(schema={'a': float, 'b': datetime.date, 'c': str.upper})
+        self.assertEqual(columns['a'], array.array('d', [1, 2]))
+        self.assertEqual(columns['b'], [datetime.date(2020, 1, 2), datetime.date(2020, 1, 3)])
+        self.assertEqual(columns['c'], ['X', 'Y'])
+
+        columns = self.load(schema=[str, str, str])
+        self.assertEqual(columns['a'], ['1', '2'])
+
+        self.assertRaises(ValueError, self.load, schema=[str, str])
+        self.assertRaises(KeyError, self.load, schema={'d': str})
+
+    def testSchemaMismatch(self):
+        # Types given by the schema are never widened.
+        self.write('a',
+                   '1',
+                   'x')
+        with self.assertRaises(ValueError) as context:
+            self.load(schema={'a': int})
+        self.assertIn('Row 3', str(context.exception))
+
+    def testNoHeader(self):
+        self.write('1,a',
+                   '2,b')
+        columns = self.load(header=False)
+        self.assertEqual(list(columns), [0, 1])
+        self.assertEqual(columns[0], array.array('q', [1, 2]))
+        self.assertEqual(columns[1], ['a', 'b'])
+
+    def testBadFiles(self):
+        self.write()
+        self.assertEqual(self.load(), {})
+
+        self.write('a,a',
+                   '1,2')
+        self.assertRaises(ValueError, self.load)
+
+        self.write('a,b',
+                   '1,2,3')
+        self.assertRaises(ValueError, self.load)
+
+    def testNumPyRequired(self):
+        self.write('a',
+                   '1')
+        with mock.patch('attila.columns.numpy', None):
+            self.assertRaises(ImportError, self.load, use_numpy=True)
+            self.assertIsInstance(load_columns(self.path)['a'], array.array)
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed.")
+    def testNumPy(self):
+        self.write('int,float,bool,date,datetime,str',
+                   '1,1.5,true,2020-01-02,2020-01-02 03:04:05,a',
+                   '2,,false,,,b')
+        columns = load_columns(self.path, schema={'date': datetime.date})
+        self.assertEqual(columns['int'].dtype, numpy.int64)
+        self.assertEqual(columns['int'].tolist(), [1, 2])
+        self.assertEqual(columns['float'].dtype, numpy.float64)
+        self.assertEqual(columns['float'][0], 1.5)
+        self.assertTrue(numpy.isnan(columns['float'][1]))
+        self.assertEqual(columns['bool'].dtype, numpy.bool_)
+        self.assertEqual(columns['bool'].tolist(), [True, False])
+        self.assertEqual(columns['date'].dtype, numpy.dtype('datetime64[D]'))
+        self.assertEqual(columns['date'][0], numpy.datetime64('2020-01-02'))
+        self.assertTrue(numpy.isnat(columns['date'][1]))
+        self.assertEqual(columns['datetime'].dtype, numpy.dtype('datetime64[us]'))
+        self.assertEqual(columns['datetime'][0], numpy.datetime64('2020-01-02T03:04:05'))
+        self.assertTrue(numpy.isnat(columns['datetime'][1]))
+        self.assertEqual(columns['str'], ['a', 'b'])
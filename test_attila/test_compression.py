@@ -0,0 +1,157 @@
+import bz2
+import gzip
+import lzma
+import os
+import random
+import tempfile
+import unittest
+
+from unittest import mock
+
+from attila.fs import Path
+from attila.fs.compression import infer_compression, resolve_compression
+
+from .fake_ftp import FakeFTPTestCase
+
+
+# The extension and decompression function for each compression format.
+FORMATS = {
+    'gzip': ('.gz', gzip.decompress),
+    'bz2': ('.bz2', bz2.decompress),
+    'xz': ('.xz', lzma.decompress),
+}
+
+LINES = ['line %d' % index for index in range(1000)]
+DATA = ''.join(line + '\n' for line in LINES).encode()
+
+
+class TestCompression(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = temp_dir.name
+
+    def path(self, name):
+        return Path(os.path.join(self.root, name))
+
+    def raw(self, path):
+        with open(str(path), 'rb') as file:
+            return file.read()
+
+    def testInference(self):
+        self.assertEqual(infer_compression('data.csv.gz'), 'gzip')
+        self.assertEqual(infer_compression('DATA.GZIP'), 'gzip')
+        self.assertEqual(infer_compression('data.bz2'), 'bz2')
+        self.assertEqual(infer_compression('data.tar.xz'), 'xz')
+        self.assertIsNone(infer_compression('data.csv'))
+        self.assertIsNone(infer_compression('gz'))
+
+        path = self.path('data.gz')
+        self.assertEqual(resolve_compression(path), 'gzip')
+        self.assertIsNone(resolve_compression(path, None))
+        self.assertEqual(resolve_compression(self.path('data'), 'xz'), 'xz')
+        self.assertRaises(ValueError, resolve_compression, path, 'zip')
+
+    def testRoundTrip(self):
+        for compression, (extension, decompress) in FORMATS.items():
+            with self.subTest(compression=compression):
+                path = self.path('data' + extension)
+                self.assertEqual(path.save(LINES), len(LINES))
+                self.assertEqual(decompress(self.raw(path)), DATA)
+                self.assertEqual(path.load(), LINES)
+                self.assertEqual(list(path.read()), LINES)
+                with path.open('rb') as file:
+                    self.assertEqual(file.read(), DATA)
+
+                # The format can be given explicitly, regardless of the extension.
+                path = self.path(compression)
+                with path.open('wb', compression=compression) as file:
+                    file.write(DATA)
+                self.assertEqual(decompress(self.raw(path)), DATA)
+                with path.open('rb', compression=compression) as file:
+                    self.assertEqual(file.readline(), b'line 0\n')
+                    self.assertEqual(file.read(), DATA[len(b'line 0\n'):])
+
+    def testUncompressed(self):
+        path = self.path('data.gz')
+        path.save(LINES, compression=None)
+        self.assertEqual(self.raw(path), DATA)
+        self.assertEqual(path.load(compression=None), LINES)
+
+    def testCompressionLevel(self):
+        words = ['alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta', 'eta']
+        generator = random.Random(0)
+        lines = [' '.join(generator.choice(words) for _ in range(10)) for _ in range(2000)]
+        fast = self.path('fast.gz')
+        best = self.path('best.gz')
+        fast.save(lines, compression_level=1)
+        best.save(lines)
+        self.assertLess(len(self.raw(best)), len(self.raw(fast)))
+        self.assertEqual(fast.load(), lines)
+        self.assertEqual(best.load(), lines)
+
+    def testThreaded(self):
+        # Each block is compressed separately, as a stream of its own, and the streams decompress
+        # as one.
+        for compression, (extension, decompress) in FORMATS.items():
+            with self.subTest(compression=compression):
+                path = self.path('data' + extension)
+                with mock.patch('attila.fs.compression.DEFAULT_COMPRESSION_BLOCK_SIZE', 1000):
+                    with path.open('wb', threads=4) as file:
+                        for line in LINES:
+                            file.write(line.encode() + b'\n')
+                self.assertEqual(decompress(self.raw(path)), DATA)
+                self.assertEqual(path.load(), LINES)
+
+                with mock.patch('attila.fs.compression.DEFAULT_COMPRESSION_BLOCK_SIZE', 1000):
+                    path.save(LINES, overwrite=True, threads=4)
+                self.assertEqual(path.load(), LINES)
+
+    def testThreadedEmptyFile(self):
+        for compression, (extension, decompress) in FORMATS.items():
+            with self.subTest(compression=compression):
+                path = self.path('empty' + extension)
+                with path.open('wb', threads=2):
+                    pass
+                self.assertEqual(decompress(self.raw(path)), b'')
+                self.assertEqual(path.load(), [])
+
+    def testAppend(self):
+        for compression, (extension, decompress) in FORMATS.items():
+            with self.subTest(compression=compression):
+                path = self.path('data' + extension)
+                path.save(LINES[:10])
+                path.save(LINES[10:], append=True)
+                self.assertEqual(decompress(self.raw(path)), DATA)
+                self.assertEqual(path.load(), LINES)
+                with path.open('a', threads=2) as file:
+                    file.write('last\n')
+                self.assertEqual(path.load(), LINES + ['last'])
+
+    def testText(self):
+        path = self.path('text.gz')
+        with path.open('w', encoding='latin-1', newline='\r\n') as file:
+            file.write('café\n')
+        self.assertEqual(gzip.decompress(self.raw(path)), b'caf\xe9\r\n')
+        with path.open(encoding='latin-1') as file:
+            self.assertEqual(file.read(), 'café\n')
+
+    def testBadModes(self):
+        path = self.path('data.gz')
+        self.assertRaises(ValueError, path.open, 'wb', encoding='utf-8')
+        self.assertRaises(ValueError, path.open, 'r+b')
+        self.assertFalse(path.exists)
+
+
+class TestFTPCompression(FakeFTPTestCase, unittest.TestCase):
+
+    def testRoundTrip(self):
+        for compression, (extension, decompress) in FORMATS.items():
+            with self.subTest(compression=compression):
+                path = Path('/data' + extension, self.connection)
+                path.save(LINES)
+                self.assertEqual(decompress(self.server.files['/data' + extension]), DATA)
+                self.assertEqual(path.load(), LINES)
+                path.save(['more'], append=True)
+                self.assertEqual(path.load(), LINES + ['more'])
@@ -0,0 +1,371 @@
+import errno
+import io
+import itertools
+import os
+import tempfile
+import unittest
+
+from unittest import mock
+
+import attila.abc.files
+
+from attila.abc.files import _read_line_batches, copy_file_object
+from attila.fs import Path
+from attila.fs.local import local_fs_connection
+
+
+class TestCopyFileObject(unittest.TestCase):
+
+    data = os.urandom(300000)
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.source_path = os.path.join(temp_dir.name, 'source.bin')
+        self.target_path = os.path.join(temp_dir.name, 'target.bin')
+        with open(self.source_path, 'wb') as file:
+            file.write(self.data)
+
+        kernel_copy = attila.abc.files._kernel_copy
+        patcher = mock.patch('attila.abc.files._kernel_copy', side_effect=kernel_copy)
+        self.kernel_copy = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def readTarget(self):
+        with open(self.target_path, 'rb') as file:
+            return file.read()
+
+    def testKernelCopy(self):
+        with open(self.source_path, 'rb') as source, open(self.target_path, 'wb') as target:
+            self.assertEqual(copy_file_object(source, target), len(self.data))
+            self.assertEqual(source.tell(), len(self.data))
+        self.assertTrue(self.kernel_copy.called)
+        self.assertEqual(self.readTarget(), self.data)
+
+    def testKernelCopyFromOffset(self):
+        with open(self.source_path, 'rb') as source, open(self.target_path, 'wb') as target:
+            source.seek(1000)
+            target.write(b'header')
+            copy_file_object(source, target)
+        self.assertTrue(self.kernel_copy.called)
+        self.assertEqual(self.readTarget(), b'header' + self.data[1000:])
+
+    def testReadAhead(self):
+        # Once the reader has buffered data, the descriptor is ahead of it, so the copy has to go
+        # through the buffer instead.
+        with open(self.source_path, 'rb') as source, open(self.target_path, 'wb') as target:
+            self.assertEqual(source.read(10), self.data[:10])
+            copy_file_object(source, target)
+        self.assertFalse(self.kernel_copy.called)
+        self.assertEqual(self.readTarget(), self.data[10:])
+
+    def testBlockCopy(self):
+        with open(self.source_path, 'rb') as source, open(self.target_path, 'wb') as target:
+            self.assertEqual(copy_file_object(source, target, block_size=4096), len(self.data))
+        with open(self.source_path, 'rb', buffering=0) as source:
+            with open(self.target_path, 'ab') as target:
+                target.write(b'!')
+                wrapped = mock.Mock(wraps=target)  # Not a plain OS file
+                copy_file_object(source, wrapped)
+        self.assertEqual(self.readTarget(), self.data + b'!' + self.data)
+
+
+class TestPathOrdering(unittest.TestCase):
+    # Paths are ordered by ancestry, which differs from comparing their strings.
+
+    def setUp(self):
+        self.root = tempfile.gettempdir()
+
+    def path(self, *names):
+        return Path(os.path.join(self.root, *names))
+
+    def testSiblingsWithSharedPrefix(self):
+        a, ab = self.path('a'), self.path('ab')
+        self.assertLess(str(a), str(ab))
+        self.assertFalse(a < ab)
+        self.assertFalse(a <= ab)
+        self.assertFalse(ab > a)
+        self.assertFalse(ab >= a)
+
+        a_b, a_dash_b = self.path('a', 'b'), self.path('a-b')
+        self.assertGreater(str(a_b), str(a_dash_b))
+        self.assertFalse(a_b < a_dash_b)
+        self.assertFalse(a_dash_b < a_b)
+        self.assertFalse(a < a_dash_b)
+        self.assertTrue(a < a_b)
+
+    def testAncestors(self):
+        a, a_b, a_b_c = self.path('a'), self.path('a', 'b'), self.path('a', 'b', 'c')
+        self.assertTrue(a < a_b < a_b_c)
+        self.assertTrue(a_b_c > a)
+        self.assertTrue(a <= a_b_c)
+        self.assertTrue(a_b_c >= a_b)
+        self.assertFalse(a_b < a)
+        self.assertFalse(a_b_c <= a)
+
+        # A path is its own ancestor, but not strictly so, however it's written.
+        self.assertTrue(a <= a)
+        self.assertTrue(a >= a)
+        self.assertFalse(a < a)
+        self.assertFalse(a > a)
+        self.assertTrue(Path(str(a) + os.sep) <= a)
+        self.assertFalse(Path(str(a) + os.sep) < a)
+
+    def testOtherTypes(self):
+        self.assertRaises(TypeError, lambda: self.path('a') < str(self.path('a', 'b')))
+        self.assertRaises(TypeError, lambda: self.path('a') >= None)
+
+
+class TestLocalMetadata(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = temp_dir.name
+        os.mkdir(os.path.join(self.root, 'sub'))
+        with open(os.path.join(self.root, 'a.txt'), 'wb') as file:
+            file.write(b'abc')
+
+    def testGlobbedPathsAreCurrent(self):
+        globbed = {path.name: path for path in Path(self.root).glob()}
+        self.assertTrue(globbed['sub'].is_dir)
+        with open(os.path.join(self.root, 'a.txt'), 'ab') as file:
+            file.write(b'def')
+        self.assertEqual(globbed['a.txt'].size, 6)
+        os.remove(os.path.join(self.root, 'a.txt'))
+        self.assertFalse(globbed['a.txt'].exists)
+
+    def testScan(self):
+        os.symlink(os.path.join(self.root, 'nowhere'), os.path.join(self.root, 'broken'))
+        scanned = {path.name: status for path, status in Path(self.root).scan()}
+        self.assertEqual(sorted(scanned), ['a.txt', 'broken', 'sub'])
+        self.assertEqual(scanned['a.txt'].type, 'file')
+        self.assertEqual(scanned['a.txt'].size, 3)
+        self.assertFalse(scanned['a.txt'].is_link)
+        self.assertEqual(scanned['sub'].type, 'dir')
+        self.assertEqual(scanned['broken'].type, 'other')
+        self.assertTrue(scanned['broken'].is_link)
+
+        # The snapshots are taken when the folder is listed, and don't follow later changes.
+        with open(os.path.join(self.root, 'a.txt'), 'ab') as file:
+            file.write(b'def')
+        self.assertEqual(scanned['a.txt'].size, 3)
+        self.assertEqual(Path(self.root).scan('a.*')[0][1].size, 6)
+
+    def testStatIsASnapshot(self):
+        path = Path(os.path.join(self.root, 'a.txt'))
+        status = path.stat()
+        self.assertEqual(status.size, 3)
+        with open(os.path.join(self.root, 'a.txt'), 'ab') as file:
+            file.write(b'def')
+        self.assertEqual(status.size, 3)
+        self.assertEqual(path.size, 6)
+        self.assertEqual(path.stat().size, 6)
+        os.remove(os.path.join(self.root, 'a.txt'))
+        self.assertFalse(path.exists)
+        self.assertRaises(FileNotFoundError, path.stat)
+
+
+class TestLocalMove(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = temp_dir.name
+        self.write('src', 'a.txt', data=b'abc')
+        self.write('src', 'sub', 'b.txt', data=b'def')
+
+    def path(self, *names):
+        return Path(os.path.join(self.root, *names))
+
+    def write(self, *names, data):
+        path = os.path.join(self.root, *names)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(data)
+
+    def read(self, *names):
+        with open(os.path.join(self.root, *names), 'rb') as file:
+            return file.read()
+
+    def patchReplace(self, error=None):
+        patcher = mock.patch.object(os, 'replace', autospec=True,
+                                    side_effect=error, wraps=None if error else os.replace)
+        replace = patcher.start()
+        self.addCleanup(patcher.stop)
+        return replace
+
+    def testMoveFile(self):
+        replace = self.patchReplace()
+        self.write('dest.txt', data=b'old')
+        self.path('src', 'a.txt').move_to(self.path('dest.txt'), overwrite=True)
+        replace.assert_called_once_with(os.path.join(self.root, 'src', 'a.txt'),
+                                        os.path.join(self.root, 'dest.txt'))
+        self.assertEqual(self.read('dest.txt'), b'abc')
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'src', 'a.txt')))
+
+    def testMoveFolder(self):
+        # The folder is renamed as a whole, rather than file by file.
+        replace = self.patchReplace()
+        self.path('src').move_to(self.path('new', 'dest'))
+        replace.assert_called_once_with(os.path.join(self.root, 'src'),
+                                        os.path.join(self.root, 'new', 'dest'))
+        self.assertEqual(self.read('new', 'dest', 'a.txt'), b'abc')
+        self.assertEqual(self.read('new', 'dest', 'sub', 'b.txt'), b'def')
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'src')))
+
+    def testCrossDevice(self):
+        # Renames across devices fail, and the move falls back on copying and removing.
+        replace = self.patchReplace(OSError(errno.EXDEV, os.strerror(errno.EXDEV)))
+        self.assertFalse(self.path('src').connection.raw_move(self.path('src'),
+                                                              self.path('dest')))
+        self.path('src', 'a.txt').move_to(self.path('dest.txt'))
+        self.path('src').move_to(self.path('dest'))
+        self.assertTrue(replace.called)
+        self.assertEqual(self.read('dest.txt'), b'abc')
+        self.assertEqual(sorted(os.listdir(os.path.join(self.root, 'dest'))), ['sub'])
+        self.assertEqual(self.read('dest', 'sub', 'b.txt'), b'def')
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'src')))
+
+    def testOtherErrors(self):
+        self.patchReplace(OSError(errno.EACCES, os.strerror(errno.EACCES)))
+        with self.assertRaises(PermissionError):
+            self.path('src').move_to(self.path('dest'))
+        self.assertEqual(self.read('src', 'a.txt'), b'abc')
+
+    def testMergeFolder(self):
+        # Moving onto an existing folder merges the contents, moving each child into place.
+        self.write('dest', 'a.txt', data=b'old')
+        self.write('dest', 'sub', 'c.txt', data=b'ghi')
+        self.write('dest', 'd.txt', data=b'jkl')
+        replace = self.patchReplace()
+        self.path('src').move_to(self.path('dest'), overwrite=True)
+        self.assertEqual(replace.call_count, 2)
+        self.assertEqual(self.read('dest', 'a.txt'), b'abc')
+        self.assertEqual(self.read('dest', 'sub', 'b.txt'), b'def')
+        self.assertEqual(self.read('dest', 'sub', 'c.txt'), b'ghi')
+        self.assertEqual(self.read('dest', 'd.txt'), b'jkl')
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'src')))
+
+    def testMergeConflict(self):
+        # Conflicts are found before anything is moved.
+        self.write('dest', 'sub', 'b.txt', data=b'old')
+        self.assertRaises(FileExistsError, self.path('src').move_to, self.path('dest'))
+        self.assertEqual(self.read('src', 'a.txt'), b'abc')
+        self.assertEqual(self.read('dest', 'sub', 'b.txt'), b'old')
+
+
+# Texts whose line breaks, CR, LF, CRLF and form feed, and multibyte UTF-8 characters land on
+# every possible chunk boundary for the small chunk sizes the line reader is tested with.
+LINE_TEXTS = [
+    '',
+    'one line',
+    'one\ntwo\r\nthree\rfour\n',
+    'ab\r\ncd\r\n\r\nef',
+    '\n\n\r\n\r\r\n\r',
+    'trailing cr\r',
+    'page one\fpage two\n\f\nlast page\f',
+    'na\u00efve \u20acuro \U0001d11e\n\u00f1\r\n\u20ac\r\U0001d11e\f\u00e9',
+]
+
+
+def text_mode_lines(text):
+    # The lines read() gave before it read in chunks: those of iterating over the file in text
+    # mode, with their line endings removed, split again by form feed.
+    lines = []
+    for line in io.StringIO(text, newline=None):
+        lines.extend(line.rstrip('\r\n').split('\f'))
+    return lines
+
+
+class TestLineReader(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.file_path = os.path.join(temp_dir.name, 'lines.txt')
+
+    def write(self, text):
+        with open(self.file_path, 'wb') as file:
+            file.write(text.encode('utf-8'))
+        return Path(self.file_path)
+
+    def testRead(self):
+        for text, chunk_size in itertools.product(LINE_TEXTS, range(1, 9)):
+            with self.subTest(text=text, chunk_size=chunk_size):
+                path = self.write(text)
+                self.assertEqual(list(path.read('utf-8', chunk_size=chunk_size)),
+                                 text_mode_lines(text))
+
+    def testReadBatches(self):
+        for text, chunk_size, size in itertools.product(LINE_TEXTS, (1, 3, 7), (1, 2, 5)):
+            with self.subTest(text=text, chunk_size=chunk_size, size=size):
+                path = self.write(text)
+                batches = list(path.read_batches(size, 'utf-8', chunk_size=chunk_size))
+                self.assertEqual(list(itertools.chain.from_iterable(batches)),
+                                 text_mode_lines(text))
+                self.assertTrue(all(len(batch) == size for batch in batches[:-1]))
+                self.assertTrue(all(0 < len(batch) <= size for batch in batches))
+
+    def testLinesWithEndings(self):
+        # Without form feeds, the lines kept with their endings are exactly those of splitlines().
+        for text, chunk_size in itertools.product(LINE_TEXTS, range(1, 9)):
+            text = text.replace('\f', ' ')
+            with self.subTest(text=text, chunk_size=chunk_size):
+                file_obj = io.BytesIO(text.encode('utf-8'))
+                batches = _read_line_batches(file_obj, 'utf-8', chunk_size, keep_ends=True)
+                self.assertEqual(list(itertools.chain.from_iterable(batches)),
+                                 text.splitlines(keepends=True))
+
+
+class TestMemoryMap(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = temp_dir.name
+
+    def write(self, name, data):
+        file_path = os.path.join(self.root, name)
+        with open(file_path, 'wb') as file:
+            file.write(data)
+        return Path(file_path)
+
+    def testEmptyFile(self):
+        path = self.write('empty.txt', b'')
+        self.assertRaises(ValueError, path.open_mmap)
+        view = path.read_view()
+        self.assertEqual(view.tobytes(), b'')
+        self.assertTrue(view.readonly)
+        self.assertEqual(list(path.read(memory_map=True)), [])
+        self.assertEqual(path.load_delimited(memory_map=True), [])
+
+    def testReadView(self):
+        data = os.urandom(100000)
+        path = self.write('data.bin', data)
+        view = path.read_view()
+        self.assertTrue(view.readonly)
+        self.assertEqual(len(view), len(data))
+        self.assertEqual(view.tobytes(), data)
+        self.assertEqual(view[1000:1010].tobytes(), data[1000:1010])
+        with path.open_mmap() as mapped:
+            self.assertEqual(mapped[:], data)
+
+    def testReadParity(self):
+        open_mmap = local_fs_connection.open_mmap
+        with mock.patch.object(local_fs_connection, 'open_mmap', autospec=True,
+                               side_effect=open_mmap) as mapped:
+            for text in LINE_TEXTS[1:]:
+                with self.subTest(text=text):
+                    path = self.write('lines.txt', text.encode('utf-8'))
+                    self.assertEqual(list(path.read('utf-8', memory_map=True)),
+                                     list(path.read('utf-8')))
+                    self.assertEqual(list(path.read_batches(2, 'utf-8', memory_map=True)),
+                                     list(path.read_batches(2, 'utf-8')))
+
+            # Quoted values may span lines, so the rows need the original line endings.
+            path = self.write('rows.csv', 'a,"b\r\nc",d\r\n"e\rf",g\n\u20ac,"h\ni"\n'.encode())
+            self.assertEqual(path.load_delimited(encoding='utf-8', memory_map=True),
+                             path.load_delimited(encoding='utf-8'))
+        # Every memory-mapped read went through the map.
+        self.assertEqual(mapped.call_count, 2 * len(LINE_TEXTS[1:]) + 1)
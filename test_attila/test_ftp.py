@@ -1,9 +1,530 @@
+import ftplib
+import itertools
+import os
+import tempfile
+import threading
 import unittest
 
+from unittest import mock
+
 from attila.fs import Path
-from attila.fs.ftp import FTPConnector
+from attila.fs.aio import AsyncExecutor
+from attila.fs.ftp import FTPConnector, FTPReadStream, FTPSessionPool, facts_to_status, \
+    normalize_facts, parse_list_line
 from attila.security.credentials import Credential
 
+from .fake_ftp import FakeFTP, FakeFTPServer, FakeFTPTestCase
+from .helpers import make_tree, read_tree, run
+
+
+class TestListParsing(unittest.TestCase):
+
+    def testUnixStyle(self):
+        name, facts = parse_list_line('drwxr-xr-x 2 owner group 4096 Jan 31  2017 my folder')
+        self.assertEqual(name, 'my folder')
+        self.assertEqual(facts['type'], 'dir')
+        self.assertEqual(facts['size'], 4096)
+
+        name, facts = parse_list_line('lrwxrwxrwx 1 owner group 6 Jan 31 12:00 link -> target')
+        self.assertEqual(name, 'link')
+        self.assertEqual(facts['type'], 'link')
+
+    def testDOSStyle(self):
+        name, facts = parse_list_line('01-31-17  12:00PM                 1234 report.csv')
+        self.assertEqual(name, 'report.csv')
+        self.assertEqual(facts['type'], 'file')
+        self.assertEqual(facts['size'], 1234)
+
+    def testUnrecognized(self):
+        self.assertIsNone(parse_list_line('total 12'))
+
+    def testFactsToStatus(self):
+        _, facts = parse_list_line('-rw-r--r-- 1 owner group 1234 Jan 31  2017 report.csv')
+        status = facts_to_status(facts)
+        self.assertEqual(status.type, 'file')
+        self.assertEqual(status.size, 1234)
+        self.assertEqual(status.modified_time, facts['modify'])
+        self.assertIsNone(status.owner_user_id)
+
+        _, facts = parse_list_line('lrwxrwxrwx 1 owner group 6 Jan 31 12:00 link -> target')
+        self.assertIsNone(facts_to_status(facts).type)
+        self.assertTrue(facts_to_status(facts).is_link)
+
+    def testMLSDLinks(self):
+        for link_type in ('OS.unix=slink:/target', 'OS.unix=symlink'):
+            facts = normalize_facts({'type': link_type, 'size': '6'})
+            self.assertEqual(facts['type'], 'link')
+            self.assertEqual(facts['size'], 6)
+        self.assertEqual(normalize_facts({'type': 'Dir'})['type'], 'dir')
+
+
+class TestListing(FakeFTPTestCase, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.server.add_file('/data/a.csv', b'a')
+        self.server.add_file('/data/sub/b.csv', b'bb')
+        self.server.add_file('/other/c.csv', b'ccc')
+        self.server.add_link('/data/file_link', '/other/c.csv')
+        self.server.add_link('/data/dir_link', '/other')
+        self.server.add_link('/data/broken_link', '/nowhere')
+
+    def checkLinks(self):
+        data = Path('/data', self.connection)
+        self.assertEqual(sorted(data.list()),
+                         ['a.csv', 'broken_link', 'dir_link', 'file_link', 'sub'])
+        self.assertTrue(data['file_link'].exists)
+        self.assertTrue(data['file_link'].is_file)
+        self.assertFalse(data['file_link'].is_dir)
+        self.assertTrue(data['dir_link'].is_dir)
+        self.assertFalse(data['broken_link'].exists)
+
+        globbed = {path.name: path for path in data.glob()}
+        self.assertTrue(globbed['file_link'].is_file)
+        self.assertTrue(globbed['dir_link'].is_dir)
+
+        scanned = {path.name: status for path, status in data.scan()}
+        self.assertEqual(sorted(scanned), ['a.csv', 'dir_link', 'file_link', 'sub'])
+        self.assertEqual(scanned['file_link'].type, 'file')
+        self.assertEqual(scanned['dir_link'].type, 'dir')
+        self.assertEqual(scanned['a.csv'].size, 1)
+
+        walked = {str(parent): (sorted(dirs), sorted(files)) for parent, dirs, files in data.walk()}
+        self.assertEqual(walked['/data'], (['dir_link', 'sub'], ['a.csv', 'broken_link',
+                                                                  'file_link']))
+
+        found = data.find_unique_file('file_*')
+        self.assertEqual(found.name, 'file_link')
+
+    def testLinksWithMLSD(self):
+        self.checkLinks()
+        status = Path('/data/file_link', self.connection).stat()
+        self.assertEqual(status.type, 'file')
+        self.assertEqual(status.size, 3)
+        self.assertTrue(status.is_link)
+
+    def testListing(self):
+        root = Path('/', self.connection)
+        self.assertEqual(sorted(root.list()), ['data', 'other'])
+        data = Path('/data', self.connection)
+        self.assertEqual(sorted(data.list('*.csv')), ['a.csv'])
+        self.assertEqual(data.find_unique_file('a.*').name, 'a.csv')
+        self.assertEqual(str(data['sub'].find_unique_file('*.csv')), '/data/sub/b.csv')
+        self.assertIsNone(root.find_unique_file('*.csv'))
+
+    def testLinksWithList(self):
+        self.server.mlsd = self.server.mlst = False
+        self.checkLinks()
+
+    def testListTotalLine(self):
+        self.server.mlsd = False
+        self.server.list_total = True
+        self.server.commands.clear()
+        self.assertEqual(sorted(Path('/data/sub', self.connection).list()), ['b.csv'])
+        self.assertEqual(self.server.count('NLST'), 0)
+        (entry, status), = Path('/data/sub', self.connection).scan()
+        self.assertEqual(entry.name, 'b.csv')
+        self.assertEqual(status.size, 2)
+
+    def testMissingDirectory(self):
+        for mlsd in (True, False):
+            self.server.mlsd = mlsd
+            missing = Path('/missing', self.connection)
+            self.assertRaises(ftplib.error_perm, missing.list)
+            self.assertRaises(ftplib.error_perm, missing.glob)
+            self.assertRaises(ftplib.error_perm, missing.find_unique_file)
+            self.assertFalse(missing.exists)
+            self.assertRaises(FileNotFoundError, missing.stat)
+
+    def testAccessDenied(self):
+        self.server.denied.add('/data/a.csv')
+        path = Path('/data/a.csv', self.connection)
+        self.assertRaises(ftplib.error_perm, path.stat)
+        self.assertTrue(path.is_file)
+
+    def testWalkLinkCycle(self):
+        self.server.add_dir('/top/sub')
+        self.server.add_link('/top/sub/loop', '/top')
+        for mlsd, workers in itertools.product((True, False), (None, 4)):
+            self.server.mlsd = self.server.mlst = mlsd
+            top = Path('/top', self.connection)
+            walked = list(itertools.islice(top.walk(workers=workers), 100))
+            self.assertEqual([(str(path), dirs) for path, dirs, _ in walked],
+                             [('/top', ['sub']), ('/top/sub', ['loop'])])
+
+        walked = itertools.islice(top.walk(followlinks=True), 5)
+        self.assertEqual([str(path) for path, _, _ in walked],
+                         ['/top', '/top/sub', '/top/sub/loop', '/top/sub/loop/sub',
+                          '/top/sub/loop/sub/loop'])
+
+    def testRemoveLink(self):
+        Path('/data/dir_link', self.connection).remove()
+        self.assertEqual(Path('/other', self.connection).list(), ['c.csv'])
+        self.assertNotIn('/data/dir_link', self.server.links)
+
+
+class TestMoves(FakeFTPTestCase, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.server.add_file('/source/a.txt', b'a')
+        self.server.add_file('/source/sub/b.txt', b'b')
+        self.server.add_file('/target/keep.txt', b'keep')
+        self.server.add_file('/target/sub/keep.txt', b'keep')
+
+        # A second connection to the same server, through a connector of its own.
+        connector = FTPConnector(self.server.host, transfer_retry_interval=0)
+        self.other = connector.connect()
+        self.other.open()
+        self.addCleanup(self.other.close)
+
+    def testSharesFileSystem(self):
+        self.assertIsNot(self.other, self.connection)
+        self.assertTrue(self.connection.shares_file_system(self.other))
+        self.assertFalse(self.connection.shares_file_system(Path(os.getcwd()).connection))
+
+    def testMergeThroughOtherConnection(self):
+        Path('/source', self.connection).move_to(Path('/target', self.other))
+        self.assertEqual(self.server.files, {
+            '/target/a.txt': b'a',
+            '/target/keep.txt': b'keep',
+            '/target/sub/b.txt': b'b',
+            '/target/sub/keep.txt': b'keep',
+        })
+        self.assertNotIn('/source', self.server.dirs)
+        self.assertEqual(self.server.count('RETR'), 0)
+
+    def testMergeFromOtherFileSystem(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = os.path.join(temp_dir, 'source')
+            os.makedirs(os.path.join(source, 'sub'))
+            with open(os.path.join(source, 'sub', 'c.txt'), 'wb') as file:
+                file.write(b'c')
+            Path(source).move_to(Path('/target', self.other))
+            self.assertFalse(os.path.exists(source))
+        self.assertEqual(self.server.files['/target/sub/c.txt'], b'c')
+        self.assertEqual(self.server.files['/target/sub/keep.txt'], b'keep')
+
+    def testRawMoveNeverRemovesFolders(self):
+        self.assertFalse(self.connection.raw_move('/source', Path('/target', self.other)))
+        self.assertFalse(self.connection.raw_move('/source/a.txt', Path('/target/sub', self.other)))
+        self.assertEqual(self.server.files['/target/sub/keep.txt'], b'keep')
+        self.assertEqual(self.server.count('RMD'), 0)
+
+    def testReplaceFile(self):
+        self.server.rename_over_existing = False
+        source = Path('/source/a.txt', self.connection)
+        self.assertRaises(FileExistsError, source.move_to, Path('/target/keep.txt', self.other))
+        source.move_to(Path('/target/keep.txt', self.other), overwrite=True)
+        self.assertEqual(self.server.files['/target/keep.txt'], b'a')
+        self.assertNotIn('/source/a.txt', self.server.files)
+
+
+class TestSessionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeFTPServer()
+        patcher = mock.patch('ftplib.FTP', FakeFTP)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.server.close)
+
+    def testCheckoutAndRelease(self):
+        pool = FTPSessionPool(self.server.host, 21, max_size=2, timeout=0)
+        first, home = pool.checkout()
+        self.assertEqual(home, '/')
+        second, _ = pool.checkout()
+        self.assertIsNot(first, second)
+        self.assertEqual(pool.size, 2)
+        self.assertEqual(pool.idle_count, 0)
+
+        pool.checkin(first)
+        self.assertEqual(pool.idle_count, 1)
+        session, _ = pool.checkout()
+        self.assertIs(session, first)
+        self.assertEqual(len(self.server.sessions), 2)
+
+        pool.checkin(session, reusable=False)
+        self.assertTrue(session.closed)
+        self.assertEqual(pool.size, 1)
+        pool.checkin(second)
+        pool.clear()
+        self.assertEqual(pool.size, 0)
+
+    def testTimeout(self):
+        pool = FTPSessionPool(self.server.host, 21, max_size=1, timeout=.05)
+        session, _ = pool.checkout()
+        self.assertRaises(TimeoutError, pool.checkout)
+        self.assertRaises(TimeoutError, pool.checkout, timeout=0)
+
+        # A waiting thread gets the session as soon as it is checked back in.
+        threading.Timer(.05, pool.checkin, [session]).start()
+        self.assertIs(pool.checkout(timeout=5)[0], session)
+
+    def testHealthCheck(self):
+        pool = FTPSessionPool(self.server.host, 21, max_size=1)
+        session, _ = pool.checkout()
+        pool.checkin(session)
+        session.alive = False
+        replacement, _ = pool.checkout()
+        self.assertIsNot(replacement, session)
+        self.assertEqual(pool.size, 1)
+
+    def testIdleTimeout(self):
+        pool = FTPSessionPool(self.server.host, 21, idle_timeout=0)
+        session, _ = pool.checkout()
+        pool.checkin(session)
+        self.assertIsNot(pool.checkout()[0], session)
+        self.assertTrue(session.closed)
+
+    def testClearWhileCheckedOut(self):
+        pool = FTPSessionPool(self.server.host, 21)
+        session, _ = pool.checkout()
+        pool.clear()
+        pool.checkin(session)
+        self.assertEqual(pool.idle_count, 0)
+        self.assertTrue(session.closed)
+
+    def testSessionReuse(self):
+        self.server.add_file('/data/a.csv', b'a')
+        connector = FTPConnector(self.server.host, pool_size=1)
+        self.addCleanup(connector.pool.clear)
+        pool = connector.pool
+        connection = connector.connect()
+        connection.open()
+        session = connection._session
+        connection.cwd = '/data'
+        connection.close()
+        self.assertEqual(pool.idle_count, pool.size)
+
+        # Whoever uses the session next can leave it in another folder.
+        other, _ = pool.checkout()
+        self.assertIs(other, session)
+        other.cwd('/')
+        pool.checkin(other)
+
+        # Reopening checks out the same session, and returns to the connection's own folder.
+        connection.open()
+        try:
+            self.assertIs(connection._session, session)
+            self.assertEqual(str(connection.cwd), '/data')
+            self.assertEqual(Path('a.csv', connection).size, 1)
+        finally:
+            connection.close()
+        self.assertEqual(len(self.server.sessions), 1)
+
+    def testSharedPools(self):
+        pool = FTPConnector(self.server.host).pool
+        self.assertIs(FTPConnector(self.server.host).pool, pool)
+        self.assertIsNot(FTPConnector(self.server.host, pool_size=2).pool, pool)
+        self.assertIsNot(FTPConnector(self.server.host, pool_timeout=1).pool, pool)
+        self.assertEqual(FTPConnector(self.server.host, pool_size=2).pool.max_size, 2)
+
+
+class TestStreamingReads(FakeFTPTestCase, unittest.TestCase):
+
+    data = bytes(range(256)) * 64
+
+    def setUp(self):
+        super().setUp()
+        self.server.add_file('/remote/data.bin', self.data)
+        self.server.add_file('/remote/lines.txt', b'one\ntwo\n')
+        self.path = Path('/remote/data.bin', self.connection)
+
+    def testFullRead(self):
+        pool = self.connector.pool
+        with self.path.open('rb', buffering=0) as file:
+            self.assertIsInstance(file, FTPReadStream)
+            session = file._session
+            self.assertIsNot(session, self.connection._session)
+            self.assertEqual(file.read(), self.data)
+            self.assertEqual(file.read(), b'')
+
+        # The transfer completed, so the session went back to the pool for reuse.
+        self.assertFalse(session.closed)
+        self.assertEqual(pool.size, 2)
+        self.assertEqual(pool.idle_count, 1)
+        self.assertEqual(self.server.count('RETR'), 1)
+
+        # Buffered and text reads stream from the same session.
+        with self.path.open('rb') as file:
+            self.assertEqual(file.read(), self.data)
+        self.assertEqual(Path('/remote/lines.txt', self.connection).load(), ['one', 'two'])
+        self.assertEqual(len(self.server.sessions), 2)
+        self.assertEqual(pool.idle_count, 1)
+
+    def testEarlyClose(self):
+        pool = self.connector.pool
+        file = self.path.open('rb', buffering=0)
+        session = file._session
+        self.assertEqual(file.read(10), self.data[:10])
+        file.close()
+
+        # The transfer was abandoned, so the session was dropped rather than returned.
+        self.assertTrue(session.closed)
+        self.assertEqual(pool.size, 1)
+        self.assertEqual(pool.idle_count, 0)
+        file.close()  # Closing again does nothing.
+        self.assertEqual(pool.size, 1)
+
+    def testExhaustedPool(self):
+        connector = FTPConnector(self.server.host, pool_size=1)
+        connection = connector.connect()
+        connection.open()
+        self.addCleanup(connector.pool.clear)
+        self.addCleanup(connection.close)
+        sessions = len(self.server.sessions)
+
+        # There's no session to spare, so the file is read through a proxy instead.
+        with Path('/remote/data.bin', connection).open('rb') as file:
+            self.assertNotIsInstance(file, FTPReadStream)
+            self.assertNotIsInstance(getattr(file, 'raw', None), FTPReadStream)
+            self.assertEqual(file.read(), self.data)
+        self.assertEqual(len(self.server.sessions), sessions)
+        self.assertEqual(connector.pool.size, 1)
+
+
+class TestSingleSessionPool(FakeFTPTestCase, unittest.TestCase):
+    # With a pool of one session, the connection holds it, and there's none to spare for clones, so
+    # everything that would use clones must fall back to using the connection itself.
+
+    def connector_settings(self):
+        return {'pool_size': 1, 'pool_timeout': 2, 'spool_size': None}
+
+    def setUp(self):
+        super().setUp()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = temp_dir.name
+        self.contents = make_tree(os.path.join(self.root, 'source'))
+        for relative, data in self.contents.items():
+            self.server.add_file('/source/' + relative.replace(os.sep, '/'), data)
+        self.source = Path('/source', self.connection)
+
+    def tearDown(self):
+        super().tearDown()
+        self.assertEqual(len(self.server.sessions), 1)
+
+    def testCloneLimit(self):
+        self.assertEqual(self.connection.clone_limit, 0)
+
+    def testCopyTo(self):
+        destination = os.path.join(self.root, 'destination')
+        self.source.copy_to(Path(destination), workers=4)
+        self.assertEqual(read_tree(destination), self.contents)
+
+    def testWalk(self):
+        walked = [str(dir_path) for dir_path, _, _ in self.source.walk(workers=4)]
+        self.assertEqual(walked, [str(dir_path) for dir_path, _, _ in self.source.walk()])
+        self.assertEqual(len(walked), 10)
+
+    def testAsync(self):
+        destination = os.path.join(self.root, 'destination')
+        with AsyncExecutor(4) as executor:
+            run(self.source.acopy_to(Path(destination), executor=executor))
+        self.assertEqual(read_tree(destination), self.contents)
+
+    def testBackgroundWriteBack(self):
+        connector = FTPConnector(self.server.host, pool_size=1, pool_timeout=2,
+                                 background_writeback=True)
+        self.connection.close()
+        connection = connector.connect()
+        connection.open()
+        self.addCleanup(connector.pool.clear)
+        try:
+            with Path('/source/new.txt', connection).open('w') as file:
+                file.write('new\n')
+            file.wait(5)
+        finally:
+            connection.close()
+        self.assertEqual(self.server.files['/source/new.txt'], b'new\n')
+
+
+class TestTransfers(FakeFTPTestCase, unittest.TestCase):
+
+    data = bytes(range(256)) * 4
+
+    def setUp(self):
+        super().setUp()
+        self.server.add_file('/remote/data.bin', self.data)
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.local_path = os.path.join(temp_dir.name, 'data.bin')
+
+    def readLocal(self):
+        with open(self.local_path, 'rb') as file:
+            return file.read()
+
+    def writeLocal(self, data):
+        with open(self.local_path, 'wb') as file:
+            file.write(data)
+
+    def testDownload(self):
+        self.connection.download('/remote/data.bin', self.local_path)
+        self.assertEqual(self.readLocal(), self.data)
+        self.assertEqual(self.server.count('REST'), 0)
+
+    def testDownloadReconnects(self):
+        self.server.failures.append(100)
+        session = self.connection._session
+        self.connection.download('/remote/data.bin', self.local_path, chunk_size=64)
+        self.assertEqual(self.readLocal(), self.data)
+        self.assertIn('REST 100', self.server.commands)
+        self.assertIsNot(self.connection._session, session)
+        self.assertTrue(session.closed)
+        self.assertEqual(str(self.connection.cwd), '/')
+
+    def testDownloadResume(self):
+        self.writeLocal(self.data[:50])
+        self.connection.download('/remote/data.bin', self.local_path, resume=True)
+        self.assertEqual(self.readLocal(), self.data)
+        self.assertIn('REST 50', self.server.commands)
+
+        # A complete local file isn't downloaded again.
+        self.server.commands.clear()
+        self.connection.download('/remote/data.bin', self.local_path, resume=True)
+        self.assertEqual(self.server.count('RETR'), 0)
+
+    def testDownloadRestartsWhenLocalIsLarger(self):
+        self.writeLocal(b'x' * (len(self.data) + 10))
+        self.connection.download('/remote/data.bin', self.local_path, resume=True)
+        self.assertEqual(self.readLocal(), self.data)
+        self.assertEqual(self.server.count('REST'), 0)
+
+    def testDownloadGivesUp(self):
+        self.server.failures.extend([10, 10])
+        self.assertRaises(ConnectionError, self.connection.download, '/remote/data.bin',
+                          self.local_path, retries=1)
+        self.assertEqual(self.server.count('RETR'), 2)
+
+    def testUpload(self):
+        self.writeLocal(self.data)
+        self.connection.upload(self.local_path, '/remote/copy.bin')
+        self.assertEqual(self.server.files['/remote/copy.bin'], self.data)
+        self.assertEqual(self.server.count('REST'), 0)
+
+    def testUploadReconnects(self):
+        self.writeLocal(self.data)
+        self.server.failures.append(300)
+        self.connection.upload(self.local_path, '/remote/copy.bin')
+        self.assertEqual(self.server.files['/remote/copy.bin'], self.data)
+        self.assertIn('REST 300', self.server.commands)
+        self.assertEqual(self.server.count('STOR'), 2)
+
+    def testUploadResume(self):
+        self.writeLocal(self.data)
+        self.server.add_file('/remote/copy.bin', self.data[:200])
+        self.connection.upload(self.local_path, '/remote/copy.bin', resume=True)
+        self.assertEqual(self.server.files['/remote/copy.bin'], self.data)
+        self.assertIn('REST 200', self.server.commands)
+
+    def testUploadRestartsWhenRemoteIsLarger(self):
+        self.writeLocal(self.data)
+        self.server.add_file('/remote/copy.bin', b'x' * (len(self.data) + 10))
+        self.connection.upload(self.local_path, '/remote/copy.bin', resume=True)
+        self.assertEqual(self.server.files['/remote/copy.bin'], self.data)
+        self.assertEqual(self.server.count('REST'), 0)
+
 
 class TestAnonymousFTP(unittest.TestCase):
 
@@ -0,0 +1,139 @@
+import gzip
+import hashlib
+import io
+import os
+import tempfile
+import unittest
+
+from unittest import mock
+
+import attila.fs.hashing
+
+from attila.abc.files import hash_file_object
+from attila.fs import Path
+from attila.fs.hashing import HashCache
+from attila.fs.local import local_fs_connection
+
+
+class TestHashFileObject(unittest.TestCase):
+
+    data = os.urandom(100000)
+
+    def testBlocks(self):
+        expected = hashlib.sha256(self.data).hexdigest()
+        self.assertEqual(hash_file_object(io.BytesIO(self.data)), expected)
+        self.assertEqual(hash_file_object(io.BytesIO(self.data), block_size=7), expected)
+        self.assertEqual(hash_file_object(io.BytesIO(self.data), 'md5'),
+                         hashlib.md5(self.data).hexdigest())
+
+    def testRemainingContents(self):
+        file_obj = io.BytesIO(self.data)
+        file_obj.seek(1000)
+        self.assertEqual(hash_file_object(file_obj), hashlib.sha256(self.data[1000:]).hexdigest())
+
+    def testWithoutReadInto(self):
+        file_obj = mock.Mock(spec=['read'], wraps=io.BytesIO(self.data))
+        self.assertEqual(hash_file_object(file_obj, block_size=4096),
+                         hashlib.sha256(self.data).hexdigest())
+
+
+class TestHashCache(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = temp_dir.name
+        self.path = Path(os.path.join(self.root, 'data.bin'))
+        self.write(b'abc')
+
+        self.cache = HashCache()
+        self.addCleanup(self.cache.close)
+
+        # Count the times a file is actually read to hash it.
+        patcher = mock.patch('attila.fs.hashing.hash_file_object',
+                             side_effect=attila.fs.hashing.hash_file_object)
+        self.reads = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write(self, data, modified_time=1000000000):
+        with open(str(self.path), 'wb') as file:
+            file.write(data)
+        os.utime(str(self.path), (modified_time, modified_time))
+
+    def testUnchangedFilesAreNotRead(self):
+        expected = hashlib.sha256(b'abc').hexdigest()
+        self.assertIsNone(self.cache.get(self.path))
+        self.assertEqual(self.cache.hash(self.path), expected)
+        self.assertEqual(self.cache.get(self.path), expected)
+        self.assertEqual(self.cache.hash(self.path), expected)
+        self.assertEqual(self.reads.call_count, 1)
+
+        # The record is kept by absolute location, and so is shared by relative paths.
+        with Path(self.root):
+            self.assertEqual(self.cache.hash(Path('data.bin')), expected)
+        self.assertEqual(self.reads.call_count, 1)
+
+    def testChangedFilesAreRead(self):
+        self.cache.hash(self.path)
+        self.write(b'xyz', modified_time=1000000001)
+        self.assertIsNone(self.cache.get(self.path))
+        self.assertEqual(self.cache.hash(self.path), hashlib.sha256(b'xyz').hexdigest())
+
+        self.write(b'abcd', modified_time=1000000001)
+        self.assertEqual(self.cache.hash(self.path), hashlib.sha256(b'abcd').hexdigest())
+        self.assertEqual(self.reads.call_count, 3)
+
+    def testAlgorithms(self):
+        self.assertEqual(self.cache.hash(self.path, 'md5'), hashlib.md5(b'abc').hexdigest())
+        self.assertIsNone(self.cache.get(self.path))
+        self.assertEqual(self.cache.hash(self.path), hashlib.sha256(b'abc').hexdigest())
+        self.assertEqual(self.reads.call_count, 2)
+
+    def testDiscardAndClear(self):
+        self.cache.hash(self.path)
+        self.cache.hash(self.path, 'md5')
+        self.cache.discard(self.path)
+        self.assertIsNone(self.cache.get(self.path))
+        self.assertIsNone(self.cache.get(self.path, 'md5'))
+
+        self.cache.hash(self.path)
+        self.cache.clear()
+        self.assertIsNone(self.cache.get(self.path))
+
+    def testCompressedFilesAreHashedAsStored(self):
+        path = Path(os.path.join(self.root, 'data.txt.gz'))
+        with gzip.open(str(path), 'wb') as file:
+            file.write(b'abc')
+        with open(str(path), 'rb') as file:
+            expected = hashlib.sha256(file.read()).hexdigest()
+        self.assertEqual(self.cache.hash(path), expected)
+        self.assertEqual(path.hash(), expected)
+
+    def testPersistence(self):
+        database = os.path.join(self.root, 'hashes.db')
+        with HashCache(database) as cache:
+            self.assertEqual(str(cache.path), database)
+            expected = cache.hash(self.path)
+        with HashCache(database) as cache:
+            self.assertEqual(cache.get(self.path), expected)
+
+    def testUnidentifiedFileSystems(self):
+        with mock.patch.object(local_fs_connection, 'identity', new_callable=mock.PropertyMock,
+                               return_value=None):
+            self.cache.hash(self.path)
+            self.cache.hash(self.path)
+            self.assertIsNone(self.cache.get(self.path))
+        self.assertEqual(self.reads.call_count, 2)
+
+    def testDefaultCache(self):
+        self.assertIsNone(HashCache.get_default())
+        HashCache.set_default(self.cache)
+        self.addCleanup(HashCache.set_default, None)
+        expected = hashlib.sha256(b'abc').hexdigest()
+        self.assertEqual(self.path.hash(), expected)
+        self.assertEqual(self.cache.get(self.path), expected)
+
+        # A cache can also be given explicitly.
+        with HashCache() as cache:
+            self.assertEqual(self.path.hash(cache=cache), expected)
+            self.assertEqual(cache.get(self.path), expected)
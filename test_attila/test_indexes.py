@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+
+from attila.fs import Path
+from attila.fs.indexes import PathTrie
+
+
+class TestPathTrie(unittest.TestCase):
+
+    def setUp(self):
+        self.root = Path(tempfile.gettempdir())
+
+    def path(self, *names):
+        return Path(os.path.join(str(self.root), *names))
+
+    def names(self, paths):
+        # Reduce paths under the root to sorted relative strings, for comparison.
+        return sorted(os.path.relpath(str(path), str(self.root)) for path in paths)
+
+    def testAdd(self):
+        trie = PathTrie([self.path('a'), self.path('a', 'b')])
+        self.assertEqual(len(trie), 2)
+        trie.add(self.path('a'))
+        self.assertEqual(len(trie), 2)
+        self.assertIn(self.path('a', 'b'), trie)
+        self.assertNotIn(self.path('a', 'c'), trie)
+        self.assertNotIn(str(self.path('a')), trie)
+        self.assertEqual(self.names(trie), ['a', os.path.join('a', 'b')])
+
+    def testUnder(self):
+        trie = PathTrie([self.path('a'), self.path('a', 'b'), self.path('a', 'b', 'c'),
+                         self.path('ab'), self.path('a-b')])
+        self.assertEqual(self.names(trie.under(self.path('a'))),
+                         ['a', os.path.join('a', 'b'), os.path.join('a', 'b', 'c')])
+        self.assertEqual(self.names(trie.under(self.path('a'), include_root=False)),
+                         [os.path.join('a', 'b'), os.path.join('a', 'b', 'c')])
+        self.assertEqual(self.names(trie.under(self.path('a', 'x'))), [])
+        self.assertEqual(len(list(trie.under(self.root))), 5)
+
+    def testOver(self):
+        trie = PathTrie([self.path('a'), self.path('a', 'b'), self.path('ab')])
+        self.assertEqual(list(trie.over(self.path('a', 'b', 'c'))),
+                         [self.path('a'), self.path('a', 'b')])
+        self.assertEqual(list(trie.over(self.path('a', 'b'), include_path=False)),
+                         [self.path('a')])
+        self.assertEqual(list(trie.over(self.path('abc'))), [])
+
+    def testCovers(self):
+        trie = PathTrie([self.path('excluded')])
+        self.assertTrue(trie.covers(self.path('excluded')))
+        self.assertTrue(trie.covers(self.path('excluded', 'deep', 'file.txt')))
+        self.assertFalse(trie.covers(self.path('excluded-not')))
+        self.assertFalse(trie.covers(self.root))
+        self.assertFalse(PathTrie().covers(self.root))
+
+    def testDiscard(self):
+        trie = PathTrie([self.path('a'), self.path('a', 'b', 'c')])
+
+        # Discarding paths which aren't members does nothing, even where they lie on a member's
+        # branch.
+        trie.discard(self.path('x'))
+        trie.discard(self.path('a', 'b'))
+        trie.discard(self.path('a', 'b', 'c', 'd'))
+        self.assertEqual(len(trie), 2)
+        self.assertEqual(self.names(trie), ['a', os.path.join('a', 'b', 'c')])
+
+        # Discarding a member leaves the paths under it.
+        trie.discard(self.path('a'))
+        self.assertEqual(len(trie), 1)
+        self.assertNotIn(self.path('a'), trie)
+        self.assertTrue(trie.covers(self.path('a', 'b', 'c', 'd')))
+        self.assertFalse(trie.covers(self.path('a', 'b')))
+
+        trie.discard(self.path('a', 'b', 'c'))
+        self.assertEqual(len(trie), 0)
+        self.assertFalse(trie)
+        self.assertEqual(list(trie.under(self.root)), [])
+
+    def testDiscardRoot(self):
+        top = Path(os.path.abspath(os.sep))
+        trie = PathTrie([top, self.path('a')])
+        self.assertTrue(trie.covers(self.path('b')))
+        trie.discard(top)
+        self.assertEqual(len(trie), 1)
+        self.assertNotIn(top, trie)
+        self.assertFalse(trie.covers(self.path('b')))
+        self.assertEqual(list(trie.under(top)), [self.path('a')])
+        trie.discard(top)
+        self.assertEqual(len(trie), 1)
@@ -0,0 +1,328 @@
+import io
+import os
+import tempfile
+import threading
+import unittest
+
+from attila.fs import Path
+from attila.fs.ftp import FTPConnector
+from attila.fs.proxies import WRITEBACK_INTERVAL, WRITEBACK_ON_CLOSE, WRITEBACK_ON_FLUSH
+from attila.fs.proxies import ProxyFile, Spool, SpooledProxyFile, open_spooled_reader
+
+from .fake_ftp import FakeFTPTestCase
+
+
+class TestSpool(unittest.TestCase):
+
+    def testSpill(self):
+        spool = Spool(max_size=10)
+        spool.write(b'0123456789')
+        self.assertFalse(spool.spilled)
+        spool.seek(5)
+        spool.write(b'abcdefghij')
+        self.assertTrue(spool.spilled)
+        self.assertEqual(spool.tell(), 15)
+        spool.seek(0)
+        self.assertEqual(spool.read(), b'01234abcdefghij')
+        spool.close()
+        self.assertTrue(spool.closed)
+
+    def testFileno(self):
+        with Spool() as spool:
+            spool.write(b'data')
+            os.fsync(spool.fileno())
+            self.assertTrue(spool.spilled)
+            spool.seek(0)
+            self.assertEqual(spool.read(), b'data')
+
+    def testAppend(self):
+        with Spool(max_size=4, append=True) as spool:
+            spool.write(b'ab')
+            spool.seek(0)
+            spool.write(b'cd')
+            spool.seek(0)
+            spool.write(b'ef')
+            self.assertTrue(spool.spilled)
+            spool.seek(0)
+            self.assertEqual(spool.read(), b'abcdef')
+
+    def testText(self):
+        spool = Spool(max_size=8)
+        with io.TextIOWrapper(spool, 'utf-8', newline='') as file:
+            file.write('line 1\nline 2\n')
+            file.seek(0)
+            self.assertEqual(file.readlines(), ['line 1\n', 'line 2\n'])
+            self.assertTrue(spool.spilled)
+
+    def testSpooledReader(self):
+        def load(file_obj):
+            file_obj.write(b'line 1\nline 2\n')
+
+        with open_spooled_reader(load, 'rb') as file:
+            self.assertIsInstance(file, io.BytesIO)
+            self.assertEqual(file.read(), b'line 1\nline 2\n')
+        with open_spooled_reader(load, max_size=4) as file:
+            self.assertEqual(file.readlines(), ['line 1\n', 'line 2\n'])
+            self.assertNotIsInstance(file.buffer, io.BytesIO)
+
+
+class ProxyTests:
+    # Tests of write-back behaviour shared by proxies kept in files and in spools. Subclasses supply
+    # open(), and read the original file's contents with original().
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = temp_dir.name
+        self.path = Path(os.path.join(self.root, 'original.txt'))
+        with open(str(self.path), 'w') as file:
+            file.write('old\n')
+        self.writebacks = 0
+        self.delay = None  # Called at the start of each write-back
+
+    def open(self, mode, **settings):
+        raise NotImplementedError()
+
+    def original(self):
+        with open(str(self.path)) as file:
+            return file.read()
+
+    def testWriteBackOnClose(self):
+        with self.open('w') as file:
+            self.assertTrue(file.dirty)
+            file.write('new\n')
+            file.flush()
+            self.assertEqual(self.original(), 'old\n')
+        self.assertEqual(self.original(), 'new\n')
+        self.assertEqual(self.writebacks, 1)
+
+        # Opening for writing truncates the file, even if nothing is written.
+        with self.open('w'):
+            pass
+        self.assertEqual(self.original(), '')
+        self.assertEqual(self.writebacks, 2)
+
+    def testUnchangedIsNotWrittenBack(self):
+        with self.open('r+') as file:
+            self.assertEqual(file.read(), 'old\n')
+            self.assertFalse(file.dirty)
+        self.assertEqual(self.writebacks, 0)
+
+    def testAppend(self):
+        with self.open('a') as file:
+            file.write('more\n')
+        self.assertEqual(self.original(), 'old\nmore\n')
+
+    def testWriteBackOnFlush(self):
+        with self.open('w', writeback_policy=WRITEBACK_ON_FLUSH) as file:
+            file.write('new\n')
+            file.flush()
+            self.assertEqual(self.original(), 'new\n')
+            self.assertFalse(file.dirty)
+            file.flush()
+            self.assertEqual(self.writebacks, 1)
+            file.write('more\n')
+            self.assertTrue(file.dirty)
+        self.assertEqual(self.original(), 'new\nmore\n')
+        self.assertEqual(self.writebacks, 2)
+
+    def testWriteBackInterval(self):
+        with self.open('w', writeback_policy=WRITEBACK_INTERVAL, writeback_interval=0) as file:
+            file.write('new\n')
+            file.flush()
+            self.assertEqual(self.original(), 'new\n')
+        self.assertEqual(self.writebacks, 1)
+
+        with self.open('w', writeback_policy=WRITEBACK_INTERVAL, writeback_interval=60) as file:
+            file.write('newer\n')
+            file.flush()
+            self.assertEqual(self.original(), 'new\n')
+        self.assertEqual(self.original(), 'newer\n')
+        self.assertEqual(self.writebacks, 2)
+
+    def testBatchSize(self):
+        with self.open('w', writeback_policy=WRITEBACK_ON_FLUSH, writeback_batch_size=8) as file:
+            file.write('1234\n')
+            file.flush()
+            self.assertEqual(self.writebacks, 0)
+            file.writelines(['5678\n'])
+            file.flush()
+            self.assertEqual(self.writebacks, 1)
+            self.assertEqual(self.original(), '1234\n5678\n')
+            file.write('9\n')
+            file.flush()
+            self.assertEqual(self.writebacks, 1)
+        self.assertEqual(self.original(), '1234\n5678\n9\n')
+        self.assertEqual(self.writebacks, 2)
+
+    def testBackground(self):
+        release = threading.Event()
+        self.delay = release.wait
+        file = self.open('w', background=True)
+        file.write('new\n')
+        file.close()
+        self.assertTrue(file.dirty)
+        self.assertEqual(self.original(), 'old\n')
+        release.set()
+        file.wait(5)
+        self.assertFalse(file.dirty)
+        self.assertEqual(self.original(), 'new\n')
+
+    def testBackgroundFailure(self):
+        def fail():
+            raise OSError("Connection lost.")
+
+        self.delay = fail
+        file = self.open('w', background=True)
+        file.write('new\n')
+        with self.assertLogs('attila.fs.proxies', 'ERROR'):
+            file.close()
+            self.assertRaises(OSError, file.wait, 5)
+        self.assertTrue(file.dirty)
+        self.assertEqual(self.original(), 'old\n')
+
+
+class TestProxyFile(ProxyTests, unittest.TestCase):
+
+    def open(self, mode, **settings):
+        # Each proxy gets a path of its own, since a background write-back may still be using the
+        # last one.
+        self.proxies = getattr(self, 'proxies', 0) + 1
+        proxy_path = Path(os.path.join(self.root, 'proxy%d.txt' % self.proxies))
+        if 'w' not in mode:
+            self.path.copy_to(proxy_path)
+        return ProxyFile(self.path, mode, proxy_path=proxy_path, writeback=self.writeback,
+                         **settings)
+
+    def writeback(self, proxy_path, path):
+        if self.delay is not None:
+            self.delay()
+        self.writebacks += 1
+        proxy_path.copy_to(path, overwrite=True)
+
+    def testProxyIsRemoved(self):
+        with self.open('a') as file:
+            file.write('more\n')
+            self.assertTrue(file.proxy_path.exists)
+        self.assertFalse(file.proxy_path.exists)
+        self.assertEqual(self.original(), 'old\nmore\n')
+
+
+class TestSpooledProxyFile(ProxyTests, unittest.TestCase):
+
+    def open(self, mode, **settings):
+        load = None if 'w' in mode else self.load
+        return SpooledProxyFile(self.path, mode, load=load, writeback=self.writeback, **settings)
+
+    def load(self, file_obj):
+        with open(str(self.path), 'rb') as file:
+            file_obj.write(file.read())
+
+    def writeback(self, file_obj, path):
+        if self.delay is not None:
+            self.delay()
+        self.writebacks += 1
+        with open(str(path), 'wb') as file:
+            file.write(file_obj.read())
+
+    def testSpill(self):
+        with self.open('w', max_size=4) as file:
+            self.assertIsNone(file.proxy_path)
+            file.write('abc')
+            file.flush()
+            self.assertFalse(file.spilled)
+            file.write('def\n')
+            file.flush()
+            self.assertTrue(file.spilled)
+        self.assertEqual(self.original(), 'abcdef\n')
+
+
+class TestFTPProxies(FakeFTPTestCase, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.server.add_file('/data.txt', b'old\n')
+
+    def connect(self, **settings):
+        # Open a connection with its own write-back settings.
+        connector = FTPConnector(self.server.host, transfer_retry_interval=0, **settings)
+        connection = connector.connect()
+        connection.open()
+        self.addCleanup(connector.pool.clear)
+        self.addCleanup(connection.close)
+        return connection
+
+    def testSpooledWriteBack(self):
+        path = Path('/data.txt', self.connection)
+        with path.open('w') as file:
+            self.assertIsNone(file.proxy_path)
+            file.write('new\n')
+            file.flush()
+            self.assertEqual(self.server.count('STOR'), 0)
+        self.assertEqual(self.server.files['/data.txt'], b'new\n')
+        self.assertEqual(self.server.count('STOR'), 1)
+
+        self.server.commands.clear()
+        with path.open('a') as file:
+            file.write('more\n')
+        self.assertEqual(self.server.files['/data.txt'], b'new\nmore\n')
+        self.assertEqual(self.server.count('RETR'), 1)
+        self.assertEqual(self.server.count('STOR'), 1)
+
+        # Reading gives the server's data directly, and writes nothing back.
+        self.server.commands.clear()
+        self.assertEqual(path.load(), ['new', 'more'])
+        self.assertEqual(self.server.count('STOR'), 0)
+
+    def testUnchangedIsNotUploaded(self):
+        with Path('/data.txt', self.connection).open('r+') as file:
+            self.assertEqual(file.read(), 'old\n')
+        self.assertEqual(self.server.count('STOR'), 0)
+
+    def testFileProxy(self):
+        connection = self.connect(spool_size=None)
+        with Path('/data.txt', connection).open('a') as file:
+            self.assertIsNotNone(file.proxy_path)
+            self.assertTrue(file.proxy_path.is_local)
+            file.write('more\n')
+        self.assertFalse(file.proxy_path.exists)
+        self.assertEqual(self.server.files['/data.txt'], b'old\nmore\n')
+        self.assertEqual(self.server.count('STOR'), 1)
+
+    def testWriteBackPolicies(self):
+        for policy, uploads in ((WRITEBACK_ON_CLOSE, 1), (WRITEBACK_ON_FLUSH, 4)):
+            with self.subTest(policy=policy):
+                self.server.commands.clear()
+                connection = self.connect(writeback_policy=policy)
+                with Path('/data.txt', connection).open('w') as file:
+                    for index in range(3):
+                        file.write('line %d\n' % index)
+                        file.flush()
+                        file.flush()  # Nothing has changed, so this never uploads.
+                    file.write('last\n')
+                self.assertEqual(self.server.count('STOR'), uploads)
+                self.assertEqual(self.server.files['/data.txt'],
+                                 b'line 0\nline 1\nline 2\nlast\n')
+
+    def testBatchSize(self):
+        connection = self.connect(writeback_policy=WRITEBACK_ON_FLUSH, writeback_batch_size=14)
+        with Path('/data.txt', connection).open('w') as file:
+            for index in range(4):
+                file.write('line %d\n' % index)
+                file.flush()
+            self.assertEqual(self.server.count('STOR'), 2)
+            self.assertEqual(self.server.files['/data.txt'], b'line 0\nline 1\nline 2\nline 3\n')
+        self.assertEqual(self.server.count('STOR'), 2)
+
+    def testBackgroundWriteBack(self):
+        connection = self.connect(background_writeback=True)
+        file = Path('/data.txt', connection).open('w')
+        file.write('new\n')
+        file.close()
+        file.wait(5)
+        self.assertEqual(self.server.files['/data.txt'], b'new\n')
+        self.assertEqual(self.server.count('STOR'), 1)
+
+        # The upload used a clone, so the connection was free in the meantime.
+        self.assertTrue(connection.is_open)
+        self.assertEqual(Path('/data.txt', connection).size, 4)
@@ -0,0 +1,385 @@
+import os
+import tempfile
+import time
+import unittest
+
+from unittest import mock
+
+from attila.exceptions import TransferError
+from attila.fs import Path
+from attila.fs.local import local_fs_connection
+from attila.fs.transfers import COPY, MAKE_DIR, OVERWRITE, REMOVE, TransferEngine, TransferPlan
+
+from .fake_ftp import FakeFTPTestCase
+from .helpers import make_tree, read_tree
+
+
+class TestTransferPlan(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = temp_dir.name
+        self.source = os.path.join(self.root, 'source')
+        self.destination = os.path.join(self.root, 'destination')
+        self.manifest = os.path.join(self.root, 'manifest.jsonl')
+        self.contents = make_tree(self.source, count=6)
+
+    def build(self, **kwargs):
+        return TransferPlan.build(Path(self.source), Path(self.destination), **kwargs)
+
+    def describe(self, plan):
+        # Reduce a plan's steps to strings, times and sizes, so they can be compared across
+        # connections.
+        return [(action, None if source is None else str(source), str(destination), modified_time,
+                 size)
+                for action, source, destination, modified_time, size in plan]
+
+    def testDryRun(self):
+        plan = self.build()
+        self.assertFalse(os.path.exists(self.destination))
+        self.assertTrue(plan.is_feasible)
+        self.assertFalse(plan.is_complete)
+        self.assertEqual(plan.file_count, len(self.contents))
+        self.assertEqual(plan.steps[0].action, MAKE_DIR)
+        self.assertEqual(str(plan.steps[0].destination), self.destination)
+        self.assertEqual(sum(step.action == MAKE_DIR for step in plan), 10)
+        self.assertEqual({step.action for step in plan}, {MAKE_DIR, COPY})
+
+        # Folders are always made before their contents.
+        made = set()
+        for action, _, destination, _, _ in plan:
+            self.assertIn(str(destination.dir), made | {self.root})
+            if action == MAKE_DIR:
+                made.add(str(destination))
+
+        report = plan.report()
+        self.assertEqual(report.files_copied, len(self.contents))
+        self.assertEqual(report.bytes_copied, sum(map(len, self.contents.values())))
+
+        self.assertEqual(plan.execute(), len(self.contents))
+        self.assertTrue(plan.is_complete)
+        self.assertEqual(read_tree(self.destination), self.contents)
+        self.assertEqual(plan.execute(), 0)
+
+    def testConflicts(self):
+        Path(self.source).copy_to(Path(self.destination))
+        relative = os.path.join('dir0', 'sub0', 'file0.txt')
+        with open(os.path.join(self.destination, relative), 'wb') as file:
+            file.write(b'changed')
+
+        plan = self.build()
+        self.assertFalse(plan.is_feasible)
+        self.assertEqual(len(plan.conflicts), len(self.contents))
+        self.assertIsInstance(plan.conflicts[0].error, FileExistsError)
+        self.assertRaises(FileExistsError, plan.execute)
+        self.assertEqual(read_tree(self.destination)[relative], b'changed')
+
+        plan = self.build(overwrite=True)
+        self.assertTrue(plan.is_feasible)
+        self.assertEqual(plan.file_count, len(self.contents))
+        self.assertEqual({step.action for step in plan}, {OVERWRITE})
+        plan.execute()
+        self.assertEqual(read_tree(self.destination), self.contents)
+
+    def testSaveAndLoad(self):
+        os.makedirs(os.path.join(self.destination, 'dir0', 'sub0'))
+        with open(os.path.join(self.destination, 'dir0', 'sub0', 'file0.txt'), 'wb') as file:
+            file.write(self.contents[os.path.join('dir0', 'sub0', 'file0.txt')])
+        os.utime(os.path.join(self.destination, 'dir0', 'sub0', 'file0.txt'),
+                 (os.path.getmtime(os.path.join(self.source, 'dir0', 'sub0', 'file0.txt')),) * 2)
+        with open(os.path.join(self.destination, 'extra.txt'), 'wb') as file:
+            file.write(b'extra')
+
+        plan = TransferPlan.build_sync(Path(self.source), Path(self.destination), delete=True)
+        self.assertEqual(len(plan.skipped), 1)
+        self.assertEqual(sum(step.action == REMOVE for step in plan), 1)
+        plan.save(self.manifest)
+
+        loaded = TransferPlan.load(self.manifest)
+        self.assertEqual(self.describe(loaded), self.describe(plan))
+        self.assertEqual([tuple(map(str, pair)) for pair in loaded.skipped],
+                         [tuple(map(str, pair)) for pair in plan.skipped])
+        for step in loaded:
+            if step.action in (COPY, OVERWRITE):
+                self.assertEqual(step.modified_time, os.path.getmtime(str(step.source)))
+            else:
+                self.assertIsNone(step.modified_time)
+
+        loaded.execute()
+        self.assertEqual(read_tree(self.destination), self.contents)
+        for relative in self.contents:
+            self.assertEqual(os.path.getmtime(os.path.join(self.destination, relative)),
+                             os.path.getmtime(os.path.join(self.source, relative)))
+
+    def testConflictsAreSaved(self):
+        os.makedirs(self.destination)
+        with open(os.path.join(self.destination, 'dir0'), 'wb') as file:
+            file.write(b'in the way')
+        plan = self.build()
+        plan.save(self.manifest)
+        loaded = TransferPlan.load(self.manifest)
+        self.assertFalse(loaded.is_feasible)
+        conflict, = loaded.conflicts
+        self.assertIsNone(conflict.source)
+        self.assertEqual(str(conflict.destination), os.path.join(self.destination, 'dir0'))
+        self.assertIsInstance(conflict.error, FileExistsError)
+        self.assertRaises(FileExistsError, loaded.execute)
+
+    def testResume(self):
+        # The copy fails partway through, and is resumed from the manifest by a new plan.
+        plan = self.build()
+        missing = os.path.join(self.source, 'dir1', 'sub1', 'file1.txt')
+        os.rename(missing, missing + '.moved')
+        self.assertRaises(FileNotFoundError, plan.execute, manifest=self.manifest)
+        copied = read_tree(self.destination)
+        self.assertTrue(copied)
+        self.assertLess(len(copied), len(self.contents))
+
+        os.rename(missing + '.moved', missing)
+        resumed = TransferPlan.load(self.manifest)
+        pending = resumed.pending()
+        self.assertEqual(len(pending), len(plan.pending()))
+        self.assertEqual(str(pending[0][1].source), missing)
+        self.assertEqual(resumed.execute(manifest=self.manifest), len(self.contents) - len(copied))
+        self.assertTrue(resumed.is_complete)
+        self.assertEqual(read_tree(self.destination), self.contents)
+        self.assertTrue(TransferPlan.load(self.manifest).is_complete)
+
+    def testIncompleteRecordIsIgnored(self):
+        plan = self.build()
+        plan.save(self.manifest)
+
+        # The process made the destination folder, and died while recording the next step.
+        os.mkdir(self.destination)
+        with open(self.manifest, 'a', encoding='utf-8') as file:
+            file.write('{"done": 0}\n{"do')
+        with self.assertLogs('attila.fs.transfers', 'WARNING'):
+            loaded = TransferPlan.load(self.manifest)
+        self.assertEqual([index for index, _ in loaded.pending()], list(range(1, len(plan))))
+
+        # The next completion recorded doesn't run into the incomplete record.
+        loaded.execute(manifest=self.manifest)
+        self.assertTrue(TransferPlan.load(self.manifest).is_complete)
+
+
+class TestConcurrentCopy(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = temp_dir.name
+        self.source = os.path.join(self.root, 'source')
+        self.contents = make_tree(self.source)
+
+    def testCopyTree(self):
+        destination = os.path.join(self.root, 'destination')
+        Path(self.source).copy_to(Path(destination), workers=4)
+        self.assertEqual(read_tree(destination), self.contents)
+
+    def testFailuresAreCollected(self):
+        destination = os.path.join(self.root, 'destination')
+        plan = TransferPlan.build(Path(self.source), Path(destination))
+        os.remove(os.path.join(self.source, 'dir0', 'sub0', 'file0.txt'))
+
+        with self.assertRaises(TransferError) as context:
+            plan.execute(workers=4)
+        failure, = context.exception.failures
+        self.assertEqual(failure[0].name, 'file0.txt')
+        self.assertFalse(plan.is_complete)
+        self.assertEqual(len(read_tree(destination)), len(self.contents) - 1)
+
+    def testLocalConnectionIsShared(self):
+        connection = local_fs_connection()
+        self.assertIs(connection.clone(), connection)
+        self.assertIsNone(connection.clone_limit)
+
+
+class TestConcurrentFTPCopy(FakeFTPTestCase, unittest.TestCase):
+
+    def connector_settings(self):
+        return {'pool_size': 3, 'spool_size': None}
+
+    def setUp(self):
+        super().setUp()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = temp_dir.name
+        self.contents = make_tree(os.path.join(self.root, 'source'))
+        for relative, data in self.contents.items():
+            self.server.add_file('/source/' + relative.replace(os.sep, '/'), data)
+
+    def testClone(self):
+        self.connection.cwd = '/source'
+        clone = self.connection.clone()
+        try:
+            self.assertIsNot(clone._session, self.connection._session)
+            self.assertEqual(str(clone.cwd), '/source')
+            self.assertEqual(self.connector.pool.size, 2)
+        finally:
+            clone.close()
+        self.assertEqual(self.connector.pool.idle_count, 1)
+        self.assertEqual(self.connection.clone_limit, 2)
+
+    def testCopyTree(self):
+        destination = os.path.join(self.root, 'destination')
+        engine = TransferEngine(workers=8)
+        count = engine.copy_to(Path('/source', self.connection), Path(destination))
+        self.assertEqual(count, len(self.contents))
+        self.assertEqual(read_tree(destination), self.contents)
+
+        # The workers were held to the pool's size, and their sessions were given back.
+        pool = self.connector.pool
+        self.assertLessEqual(len(self.server.sessions), pool.max_size)
+        self.assertEqual(pool.idle_count, pool.size - 1)
+
+    def testPlanningRoundTrips(self):
+        # Planning lists each folder once on each side, with no round trips for individual entries.
+        for path, data in list(self.server.files.items()):
+            self.server.add_file('/destination' + path[len('/source'):], data)
+        folders = sum(folder.startswith('/source') for folder in self.server.dirs)
+        self.server.commands.clear()
+        plan = TransferPlan.build(Path('/source', self.connection),
+                                  Path('/destination', self.connection), overwrite=True)
+        self.assertEqual(plan.file_count, len(self.contents))
+        self.assertEqual({step.action for step in plan}, {OVERWRITE})
+        self.assertEqual(self.server.count('MLSD'), 2 * folders)
+        self.assertLessEqual(self.server.count('MLST'), 3)
+
+    def testUpload(self):
+        destination = Path('/destination', self.connection)
+        Path(os.path.join(self.root, 'source')).copy_to(destination, workers=4)
+        uploaded = {
+            path[len('/destination/'):].replace('/', os.sep): data
+            for path, data in self.server.files.items() if path.startswith('/destination/')
+        }
+        self.assertEqual(uploaded, self.contents)
+        self.assertEqual(self.connector.pool.idle_count, self.connector.pool.size - 1)
+
+
+class TestSync(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = temp_dir.name
+        self.source = os.path.join(self.root, 'source')
+        self.destination = os.path.join(self.root, 'destination')
+        self.contents = make_tree(self.source, count=4)
+        self.edited = os.path.join('dir1', 'sub1', 'file1.txt')
+
+    def sync(self, compare='size+mtime'):
+        return Path(self.source).sync_to(Path(self.destination), compare)
+
+    def edit(self, root, relative, modified_time):
+        # Change a file's contents without changing its size, and give it a modification time.
+        path = os.path.join(root, relative)
+        with open(path, 'rb') as file:
+            data = file.read()
+        with open(path, 'wb') as file:
+            file.write(data.upper())
+        os.utime(path, (modified_time, modified_time))
+        return data.upper()
+
+    def testUnchangedFilesAreSkipped(self):
+        self.assertEqual(self.sync().files_copied, len(self.contents))
+        for relative in self.contents:
+            self.assertEqual(os.path.getmtime(os.path.join(self.destination, relative)),
+                             os.path.getmtime(os.path.join(self.source, relative)))
+        report = self.sync()
+        self.assertEqual(report.files_copied, 0)
+        self.assertEqual(report.files_skipped, len(self.contents))
+
+    def testSameSizeEditIsCopied(self):
+        source_path = os.path.join(self.source, self.edited)
+        self.sync()
+        data = self.edit(self.source, self.edited, os.path.getmtime(source_path) + 0.5)
+        self.assertEqual(self.sync().files_copied, 1)
+        self.assertEqual(read_tree(self.destination)[self.edited], data)
+
+    def testSourceClockAhead(self):
+        # The source's times are an hour ahead of the destination's clock, and the file is edited
+        # right after it's synced.
+        ahead = os.path.getmtime(os.path.join(self.source, self.edited)) + 3600
+        os.utime(os.path.join(self.source, self.edited), (ahead, ahead))
+        self.sync()
+        self.edit(self.source, self.edited, ahead + 0.5)
+        self.assertEqual(self.sync().files_copied, 1)
+
+    def testDestinationEditIsCopied(self):
+        self.sync()
+        destination_path = os.path.join(self.destination, self.edited)
+        self.edit(self.destination, self.edited, os.path.getmtime(destination_path) + 60)
+        self.assertEqual(self.sync().files_copied, 1)
+        self.assertEqual(read_tree(self.destination), self.contents)
+
+    def testHashComparison(self):
+        self.sync()
+        destination_path = os.path.join(self.destination, self.edited)
+        self.edit(self.destination, self.edited, os.path.getmtime(destination_path))
+        self.assertEqual(self.sync().files_copied, 0)
+        report = self.sync('hash')
+        self.assertEqual(report.files_copied, 1)
+        self.assertEqual(report.files_skipped, len(self.contents) - 1)
+        self.assertEqual(read_tree(self.destination), self.contents)
+
+
+    def testReportUsesPlannedSizes(self):
+        # The report comes from the sizes listed when the sync was planned, so it costs nothing
+        # more, and doesn't depend on the source still being there.
+        self.sync()
+        source_path = os.path.join(self.source, self.edited)
+        data = self.edit(self.source, self.edited, os.path.getmtime(source_path) + 0.5)
+        plan = TransferPlan.build_sync(Path(self.source), Path(self.destination))
+        for relative in self.contents:
+            os.remove(os.path.join(self.source, relative))
+
+        with mock.patch.object(local_fs_connection, 'size', side_effect=AssertionError), \
+                mock.patch.object(local_fs_connection, 'stat', side_effect=AssertionError):
+            report = plan.report()
+        self.assertEqual(report.files_copied, 1)
+        self.assertEqual(report.bytes_copied, len(data))
+        self.assertEqual(report.files_skipped, len(self.contents) - 1)
+        self.assertEqual(report.bytes_skipped,
+                         sum(map(len, self.contents.values())) - len(data))
+
+
+class TestFTPSync(FakeFTPTestCase, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.source = os.path.join(temp_dir.name, 'source')
+        self.contents = make_tree(self.source, count=4)
+        self.destination = Path('/mirror', self.connection)
+
+        # Date the source files well before the copies are made on the server.
+        modified_time = time.time() - 3600.5
+        for relative in self.contents:
+            os.utime(os.path.join(self.source, relative), (modified_time, modified_time))
+
+    def testTimesArePreserved(self):
+        source = Path(self.source)
+        self.assertEqual(source.sync_to(self.destination).files_copied, len(self.contents))
+        self.assertEqual(self.server.count('MFMT'), len(self.contents))
+        report = source.sync_to(self.destination)
+        self.assertEqual(report.files_copied, 0)
+        self.assertEqual(report.files_skipped, len(self.contents))
+
+        # Times are kept to the second on the server, but an edit a second later is still seen.
+        path = os.path.join(self.source, 'dir0', 'sub0', 'file0.txt')
+        modified_time = os.path.getmtime(path) + 1
+        with open(path, 'wb') as file:
+            file.write(b'LINE 0\n')
+        os.utime(path, (modified_time, modified_time))
+        self.assertEqual(source.sync_to(self.destination).files_copied, 1)
+        self.assertEqual(self.server.files['/mirror/dir0/sub0/file0.txt'], b'LINE 0\n')
+
+    def testTimesCantBeSet(self):
+        # Without MFMT, nothing can be recognized as unchanged by its time.
+        self.server.mfmt = False
+        source = Path(self.source)
+        source.sync_to(self.destination)
+        self.assertEqual(source.sync_to(self.destination).files_copied, len(self.contents))
+        self.assertEqual(source.sync_to(self.destination, 'hash').files_copied, 0)
@@ -0,0 +1,255 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from unittest import mock
+
+from attila.fs import Path
+from attila.fs.watching import CLOSED_WRITE, CREATED, DELETED, MODIFIED, MOVED_FROM, MOVED_TO
+from attila.fs.watching import InotifyWatcher, PollingWatcher, inotify_available
+from attila.fs.watching import wait_for_file, wait_until_stable
+
+from .fake_ftp import FakeFTPTestCase
+
+
+# How long to wait for changes that are expected to be seen quickly.
+QUIET_TIME = .3
+
+
+def drain(watcher):
+    # Collect the events the watcher reports until it goes quiet, as (kind, name) pairs.
+    events = []
+    event = watcher.next_event(QUIET_TIME)
+    while event is not None:
+        events.append((event.kind, event.path.name))
+        event = watcher.next_event(QUIET_TIME)
+    return events
+
+
+class WatcherTests:
+    # Tests which apply to every kind of watcher. Subclasses supply watch().
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = os.path.join(temp_dir.name, 'watched')
+        os.mkdir(self.root)
+        self.write('old.txt', b'old')
+
+    def watch(self, pattern='*', name=None):
+        raise NotImplementedError()
+
+    def write(self, name, data, mode='wb'):
+        with open(os.path.join(self.root, name), mode) as file:
+            file.write(data)
+
+    def testCreateModifyDelete(self):
+        with self.watch() as watcher:
+            self.assertIsNone(watcher.next_event(0))
+            self.write('new.txt', b'new')
+            self.assertIn((CREATED, 'new.txt'), drain(watcher))
+            self.write('old.txt', b'more', 'ab')
+            self.assertIn((MODIFIED, 'old.txt'), drain(watcher))
+            os.remove(os.path.join(self.root, 'new.txt'))
+            self.assertEqual(drain(watcher), [(DELETED, 'new.txt')])
+        self.assertTrue(watcher.closed)
+        self.assertRaises(ValueError, watcher.next_event, 0)
+
+    def testPattern(self):
+        with self.watch('*.csv') as watcher:
+            self.write('ignored.txt', b'x')
+            self.write('data.csv', b'x')
+            self.assertEqual({name for _, name in drain(watcher)}, {'data.csv'})
+
+    def testSingleFile(self):
+        with self.watch(name='old.txt') as watcher:
+            self.assertEqual(str(watcher.path), os.path.join(self.root, 'old.txt'))
+            self.write('other.txt', b'x')
+            self.write('old.txt', b'more', 'ab')
+            self.assertIn((MODIFIED, 'old.txt'), drain(watcher))
+            self.assertEqual({name for _, name in drain(watcher)}, set())
+
+    def testTimeout(self):
+        with self.watch() as watcher:
+            start = time.time()
+            self.assertIsNone(watcher.next_event(.2))
+            self.assertGreaterEqual(time.time() - start, .15)
+
+
+class TestPollingWatcher(WatcherTests, unittest.TestCase):
+
+    def watch(self, pattern='*', name=None):
+        return PollingWatcher(Path(self.root), pattern, name, interval=.05)
+
+    def testFolderRemoved(self):
+        with self.watch() as watcher:
+            shutil.rmtree(self.root)
+            self.assertEqual(drain(watcher), [(DELETED, 'old.txt')])
+
+
+@unittest.skipUnless(inotify_available(), "inotify is not available.")
+class TestInotifyWatcher(WatcherTests, unittest.TestCase):
+
+    def watch(self, pattern='*', name=None):
+        return InotifyWatcher(Path(self.root), pattern, name)
+
+    def testClosedWrite(self):
+        with self.watch() as watcher:
+            self.write('new.txt', b'new')
+            self.assertEqual(drain(watcher),
+                             [(CREATED, 'new.txt'), (MODIFIED, 'new.txt'),
+                              (CLOSED_WRITE, 'new.txt')])
+
+    def testMoves(self):
+        with self.watch() as watcher:
+            os.rename(os.path.join(self.root, 'old.txt'), os.path.join(self.root, 'new.txt'))
+            self.assertEqual(drain(watcher), [(MOVED_FROM, 'old.txt'), (MOVED_TO, 'new.txt')])
+
+    def testFolderRemoved(self):
+        with self.watch() as watcher:
+            shutil.rmtree(self.root)
+            self.assertEqual(drain(watcher), [(DELETED, 'old.txt'), (DELETED, 'watched')])
+
+    def testPathWatch(self):
+        with Path(self.root).watch() as watcher:
+            self.assertIsInstance(watcher, InotifyWatcher)
+        with Path(self.root)['old.txt'].watch() as watcher:
+            self.assertEqual(watcher.name, 'old.txt')
+
+
+class WaitTests:
+    # Tests of waiting for files, with whichever kind of watcher the local connection uses.
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = temp_dir.name
+
+    def later(self, delay, function, *args):
+        # Call the function on another thread after a delay.
+        timer = threading.Timer(delay, function, args)
+        timer.start()
+        self.addCleanup(timer.join)
+
+    def write(self, name, data, mode='wb'):
+        with open(os.path.join(self.root, name), mode) as file:
+            file.write(data)
+
+    def testExistingFile(self):
+        self.write('b.csv', b'b')
+        self.write('a.csv', b'a')
+        self.write('a.txt', b'a')
+        found = wait_for_file(Path(self.root), '*.csv', timeout=5, stable=False)
+        self.assertEqual(str(found), os.path.join(self.root, 'a.csv'))
+
+    def testArrival(self):
+        self.later(.2, self.write, 'data.csv', b'data')
+        start = time.time()
+        found = wait_for_file(Path(self.root), '*.csv', timeout=5, interval=.2,
+                              poll_interval=.05)
+        self.assertEqual(str(found), os.path.join(self.root, 'data.csv'))
+        self.assertLess(time.time() - start, 4)
+
+    def testTimeout(self):
+        self.write('data.txt', b'data')
+        self.assertIsNone(wait_for_file(Path(self.root), '*.csv', timeout=.3, poll_interval=.05))
+
+    def testWaitUntilStable(self):
+        # The file keeps growing for a while, and is only stable once its writer stops.
+        path = os.path.join(self.root, 'data.csv')
+        self.write('data.csv', b'')
+
+        def append():
+            for _ in range(5):
+                self.write('data.csv', b'x', 'ab')
+                time.sleep(.05)
+
+        self.later(0, append)
+        self.assertTrue(wait_until_stable(Path(path), interval=.3, timeout=5))
+        self.assertEqual(os.path.getsize(path), 5)
+
+    def testWaitUntilStableTimeout(self):
+        self.assertFalse(wait_until_stable(Path(os.path.join(self.root, 'missing.csv')),
+                                           interval=.1, timeout=.3))
+
+
+@unittest.skipUnless(inotify_available(), "inotify is not available.")
+class TestInotifyWait(WaitTests, unittest.TestCase):
+    pass
+
+
+class TestPollingWait(WaitTests, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('attila.fs.local.inotify_available', return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def testPathWatch(self):
+        with Path(self.root).watch() as watcher:
+            self.assertIsInstance(watcher, PollingWatcher)
+
+    def noisyListings(self, *names, limit=200):
+        # Make each listing of the folder, up to the limit, see the named files change first.
+        # Return a list which grows by one entry per listing.
+        listings = []
+        original = PollingWatcher._list
+
+        def _list(watcher):
+            listings.append(None)
+            if len(listings) <= limit:
+                for name in names:
+                    self.write(name, b'x', 'ab')
+            return original(watcher)
+
+        patcher = mock.patch.object(PollingWatcher, '_list', _list)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return listings
+
+    def testNoisySibling(self):
+        # Changes to another file matching the pattern don't hold up the file being waited on, or
+        # cause the folder to be listed again and again.
+        self.write('data.csv', b'data')
+        listings = self.noisyListings('noise.csv')
+        start = time.time()
+        found = wait_for_file(Path(self.root), '*.csv', timeout=3, interval=.2,
+                              poll_interval=.05)
+        self.assertEqual(str(found), os.path.join(self.root, 'data.csv'))
+        self.assertLess(time.time() - start, 2)
+        self.assertLess(len(listings), 20)
+
+    def testNoisySiblingTimeout(self):
+        # The timeout is honoured while the file and another matching one keep changing.
+        self.write('data.csv', b'data')
+        self.noisyListings('data.csv', 'noise.csv', limit=1000)
+        start = time.time()
+        self.assertIsNone(wait_for_file(Path(self.root), '*.csv', timeout=.5, interval=.2,
+                                        poll_interval=.05))
+        self.assertLess(time.time() - start, 1.5)
+
+
+class TestFTPWatching(FakeFTPTestCase, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.server.add_file('/in/old.txt', b'old')
+        self.folder = Path('/in', self.connection)
+
+    def testPolling(self):
+        with self.folder.watch(interval=.05) as watcher:
+            self.assertIsInstance(watcher, PollingWatcher)
+            self.server.add_file('/in/new.txt', b'new')
+            self.assertEqual(drain(watcher), [(CREATED, 'new.txt')])
+            self.server.add_file('/in/old.txt', b'changed')
+            self.assertEqual(drain(watcher), [(MODIFIED, 'old.txt')])
+
+    def testWaitForFile(self):
+        self.assertIsNone(self.folder.wait_for_file('*.csv', timeout=.2, interval=.1))
+        self.server.add_file('/in/data.csv', b'data')
+        found = self.folder.wait_for_file('*.csv', timeout=5, interval=.1)
+        self.assertEqual(str(found), '/in/data.csv')